@@ -1,12 +1,9 @@
-import psycopg2
+from sqlalchemy import text
 
-conn = psycopg2.connect(
-    host="localhost",
-    database="jaap_sanjapamba",
-    user="postgres",
-    password="Informatico593"
-)
-cur = conn.cursor()
-cur.execute("SELECT COUNT(*) FROM usuarios.t_usuario_sistema;")
-print("Total de usuarios:", cur.fetchone()[0])
-conn.close()
+from db.session import engine, estadisticas_pool
+
+with engine.connect() as conn:
+    total = conn.execute(text("SELECT COUNT(*) FROM usuarios.t_usuario_sistema;")).scalar()
+    print("Total de usuarios:", total)
+    print("Servidor:", engine.url.render_as_string(hide_password=True))
+print("Pool:", estadisticas_pool())
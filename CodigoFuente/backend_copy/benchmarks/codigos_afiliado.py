@@ -0,0 +1,128 @@
+# benchmarks/codigos_afiliado.py
+"""
+Prueba de carga de la asignación de códigos de afiliado
+
+N creadores simultáneos (hilos con su propia sesión) crean afiliados en la
+base configurada y se verifica que ningún código se repita:
+- secuencia: código de services.affiliate_codes (lo que usa la API).
+- bloques: cada creador reserva un bloque de códigos y crea el lote.
+- maximo: el método anterior (último código + 1), como comparación; los
+  choques aparecen como violaciones del índice único.
+
+La unicidad de los códigos (y de las afiliaciones activas) se verifica en
+tests/test_codigos_afiliado.py; este script mide el rendimiento y muestra
+los choques del método anterior.
+
+Los afiliados creados se borran al terminar (los códigos de la secuencia
+quedan consumidos). Necesita al menos un usuario y un sector.
+
+Uso (desde backend_copy/):
+    python -m benchmarks.codigos_afiliado [creadores] [afiliados_por_creador]
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import select, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import main  # noqa: F401  (registra todos los modelos)
+from db.session import engine, crear_engine
+from models.affiliate import UsuarioAfiliado
+from models.sector import Sector
+from models.user import UsuarioSistema
+from services.affiliate_codes import reservar_codigos, siguiente_codigo
+
+
+def _codigo_maximo(db) -> int:
+    ultimo = db.execute(
+        select(UsuarioAfiliado.cod_usuario_afi).order_by(UsuarioAfiliado.cod_usuario_afi.desc()).limit(1)
+    ).scalar()
+    return (ultimo or 0) + 1
+
+
+def _creador(Sesion, modo: str, cantidad: int, id_usuario: int, id_sector: int, barrera, codigos: list, ids: list, choques: list):
+    db = Sesion()
+    try:
+        barrera.wait()
+        if modo == "bloques":
+            filas = [
+                {"cod_usuario_afi": codigo, "fecha_afiliacion": date.today(), "id_sector": id_sector,
+                 "id_usuario_sistema": id_usuario, "activo": False}
+                for codigo in reservar_codigos(db, cantidad)
+            ]
+            creados = db.execute(
+                insert(UsuarioAfiliado).returning(UsuarioAfiliado.id_usuario_afi, UsuarioAfiliado.cod_usuario_afi), filas
+            ).all()
+            db.commit()
+            ids.extend(fila[0] for fila in creados)
+            codigos.extend(fila[1] for fila in creados)
+            return
+
+        for _ in range(cantidad):
+            codigo = siguiente_codigo(db) if modo == "secuencia" else _codigo_maximo(db)
+            afiliado = UsuarioAfiliado(
+                cod_usuario_afi=codigo, fecha_afiliacion=date.today(),
+                id_sector=id_sector, id_usuario_sistema=id_usuario, activo=False
+            )
+            db.add(afiliado)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                choques.append(codigo)
+                continue
+            ids.append(afiliado.id_usuario_afi)
+            codigos.append(codigo)
+    finally:
+        db.close()
+
+
+def ejecutar(Sesion, modo: str, creadores: int, por_creador: int, id_usuario: int, id_sector: int) -> None:
+    codigos, ids, choques = [], [], []
+    barrera = threading.Barrier(creadores)
+    hilos = [
+        threading.Thread(target=_creador, args=(Sesion, modo, por_creador, id_usuario, id_sector, barrera, codigos, ids, choques))
+        for _ in range(creadores)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    repetidos = sum(1 for veces in Counter(codigos).values() if veces > 1)
+    print(f"{modo:>9}: {len(codigos)} afiliados en {segundos:.2f} s ({len(codigos) / segundos:,.0f}/s)  "
+          f"códigos repetidos: {repetidos}  choques: {len(choques)}")
+
+    db = Sesion()
+    try:
+        for desde in range(0, len(ids), 5000):
+            db.execute(delete(UsuarioAfiliado).where(UsuarioAfiliado.id_usuario_afi.in_(ids[desde:desde + 5000])))
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    creadores = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    por_creador = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    # Una conexión por creador para que esperen a la base y no al pool
+    Sesion = sessionmaker(bind=crear_engine(engine.url, pool_size=creadores, max_overflow=0))
+    db = Sesion()
+    try:
+        id_usuario = db.execute(select(UsuarioSistema.id_usuario_sistema).limit(1)).scalar()
+        id_sector = db.execute(select(Sector.id_sector).limit(1)).scalar()
+    finally:
+        db.close()
+    if id_usuario is None or id_sector is None:
+        sys.exit("Se necesita al menos un usuario y un sector")
+
+    print(f"{creadores} creadores x {por_creador} afiliados")
+    for modo in ("secuencia", "bloques", "maximo"):
+        ejecutar(Sesion, modo, creadores, por_creador, id_usuario, id_sector)
@@ -0,0 +1,66 @@
+# benchmarks/conciliacion.py
+"""
+Benchmark de conciliación de archivos de pagos (líneas por segundo)
+
+Arma un CSV sintético con las facturas abiertas de la base configurada y lo
+concilia en modo simulación (no registra pagos; la transacción se descarta).
+Con --registrar también registra los pagos conciliados y hace commit: mide
+el camino completo, pero deja los pagos en la base (usar una base de pruebas).
+
+Uso (desde backend_copy/):
+    python -m benchmarks.conciliacion [lineas] [--registrar]
+"""
+import io
+import random
+import sys
+import time
+
+from sqlalchemy import select, func
+
+import main  # noqa: F401  (registra todos los modelos)
+from db.session import SessionLocal
+from models.invoice import Factura
+from models.user import UsuarioSistema
+from services.reconciliation import conciliar_archivo, leer_csv
+
+
+def archivo_sintetico(db, lineas: int) -> io.StringIO:
+    """CSV con números de factura abiertos; 1 de cada 10 líneas sin coincidencia"""
+    facturas = db.execute(
+        select(Factura.num_factura, Factura.saldo_pendiente)
+        .where(Factura.estado == "pendiente", Factura.saldo_pendiente > 0)
+    ).all()
+    if not facturas:
+        sys.exit("No hay facturas abiertas para armar el archivo")
+
+    archivo = io.StringIO()
+    archivo.write("fecha;referencia;valor;comprobante\n")
+    for i in range(lineas):
+        num_factura, saldo = random.choice(facturas)
+        referencia = num_factura if i % 10 else f"999{i:09d}"
+        archivo.write(f"2026-10-01;{referencia};{saldo};BENCH{i}\n")
+    archivo.seek(0)
+    return archivo
+
+
+if __name__ == "__main__":
+    argumentos = [argumento for argumento in sys.argv[1:] if not argumento.startswith("--")]
+    lineas = int(argumentos[0]) if argumentos else 100000
+    registrar = "--registrar" in sys.argv
+
+    db = SessionLocal()
+    try:
+        archivo = archivo_sintetico(db, lineas)
+        id_cajero = db.execute(select(func.min(UsuarioSistema.id_usuario_sistema))).scalar() if registrar else None
+        inicio = time.perf_counter()
+        resumen = conciliar_archivo(
+            db, leer_csv(archivo), id_cajero=id_cajero, origen=f"benchmark-{time.time_ns()}", simular=not registrar,
+        )
+        segundos = time.perf_counter() - inicio
+    finally:
+        db.close()
+
+    print(f"{lineas} líneas en {segundos:.2f} s ({lineas / segundos:,.0f} líneas/s){' con registro' if registrar else ''}")
+    print(f"conciliadas: {resumen['conciliadas']}  sin conciliar: {resumen['no_conciliadas']}  criterios: {resumen['por_criterio']}")
+    if registrar:
+        print(f"registrados: {resumen['registrados']}  duplicados: {resumen['duplicados']}")
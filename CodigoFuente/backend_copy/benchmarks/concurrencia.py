@@ -0,0 +1,144 @@
+# benchmarks/concurrencia.py
+"""
+Benchmark de concurrencia: N clientes simultáneos contra los endpoints de
+lectura más usados
+
+Levanta la API con uvicorn (un proceso) sobre la base configurada, o usa
+una API ya levantada si se pasa la URL. Cada endpoint se prueba por
+separado: los N clientes hacen sus peticiones a la vez y se mide
+peticiones/s, latencia p50/p95/p99 y errores.
+
+- Endpoints async (AsyncSession + asyncpg): /notifications/no-leidas/count,
+  /verify-session, /sectors/, /meters/.
+- Referencia síncrona (threadpool + psycopg2): /sectors/{id}, con el mismo
+  trabajo de base (usuario, permisos y una consulta) que /sectors/.
+- Al final se muestran los pools: "timeouts" cuenta los pedidos de conexión
+  que vencieron DB_POOL_TIMEOUT (respuestas 500). uvicorn se levanta con
+  keep-alive de 120 s: con el de 5 s por defecto, las conexiones que quedan
+  ociosas entre endpoints se cierran y aparecen como RemoteProtocolError.
+
+Uso (desde backend_copy/):
+    python -m benchmarks.concurrencia [clientes] [peticiones_por_cliente] [url]
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+from sqlalchemy import select
+
+import main  # noqa: F401  (registra todos los modelos)
+from db.session import SessionLocal
+from models.role import RolAccion
+from models.sector import Sector
+from models.user import UsuarioSistema
+from security.async_auth import permiso_concedido
+from security.jwt import create_access_token
+
+PUERTO = int(os.getenv("BENCH_PUERTO", 8077))
+
+
+def token_y_sector() -> tuple:
+    """Token de un usuario activo con lectura de sectores y medidores, y un id de sector"""
+    db = SessionLocal()
+    try:
+        for usuario in db.execute(
+            select(UsuarioSistema).where(UsuarioSistema.activo == True).order_by(UsuarioSistema.id_usuario_sistema)
+        ).scalars():
+            permisos = db.execute(
+                select(RolAccion.nombre_accion, RolAccion.tipo_accion)
+                .where(RolAccion.id_rol == usuario.id_rol, RolAccion.activo == True)
+            ).all()
+            if permiso_concedido(permisos, "sectores", "lectura") and permiso_concedido(permisos, "medidores", "lectura"):
+                token = create_access_token({"sub": usuario.usuario, "id_usuario_sistema": usuario.id_usuario_sistema})
+                return token, db.execute(select(Sector.id_sector).limit(1)).scalar()
+    finally:
+        db.close()
+    sys.exit("Se necesita un usuario activo con lectura de sectores y medidores")
+
+
+async def probar(cliente: httpx.AsyncClient, ruta: str, clientes: int, peticiones: int) -> dict:
+    latencias, errores = [], Counter()
+
+    async def un_cliente():
+        for _ in range(peticiones):
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.get(ruta)
+                if respuesta.status_code != 200:
+                    errores[respuesta.status_code] += 1
+            except httpx.HTTPError as e:
+                errores[type(e).__name__] += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(un_cliente() for _ in range(clientes)))
+    segundos = time.perf_counter() - inicio
+
+    cuantiles = statistics.quantiles(latencias, n=100)
+    return {
+        "rps": len(latencias) / segundos,
+        "p50": cuantiles[49] * 1000,
+        "p95": cuantiles[94] * 1000,
+        "p99": cuantiles[98] * 1000,
+        "errores": dict(errores),
+    }
+
+
+async def ejecutar(url: str, clientes: int, peticiones: int):
+    token, id_sector = token_y_sector()
+    rutas = [
+        "/notifications/no-leidas/count",
+        "/verify-session",
+        "/sectors/",
+        "/meters/?limit=50",
+        f"/sectors/{id_sector}",
+    ]
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(
+        base_url=url, headers={"Authorization": f"Bearer {token}"}, limits=limites, timeout=120
+    ) as cliente:
+        for ruta in rutas:
+            await probar(cliente, ruta, min(clientes, 20), 1)  # calentamiento
+            r = await probar(cliente, ruta, clientes, peticiones)
+            print(f"{ruta:>32}: {r['rps']:8.1f} pet/s  p50 {r['p50']:7.1f} ms  p95 {r['p95']:7.1f} ms  "
+                  f"p99 {r['p99']:7.1f} ms  errores {r['errores'] or 0}")
+        estado = (await cliente.get("/health/db")).json()
+        print(f"pool síncrono: {estado['pool']}")
+        print(f"pool async:    {estado['pool_async']}")
+
+
+def levantar_api() -> subprocess.Popen:
+    """uvicorn main:app en un proceso aparte (sin recarga, un worker)"""
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PUERTO), "--log-level", "warning",
+         "--backlog", "4096", "--timeout-keep-alive", "120"],
+        stdout=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PUERTO}/health", timeout=1)
+            return proceso
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proceso.terminate()
+    sys.exit("La API no respondió")
+
+
+if __name__ == "__main__":
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    peticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    url = sys.argv[3] if len(sys.argv) > 3 else None
+
+    proceso = None if url else levantar_api()
+    try:
+        print(f"{clientes} clientes x {peticiones} peticiones por endpoint")
+        asyncio.run(ejecutar(url or f"http://127.0.0.1:{PUERTO}", clientes, peticiones))
+    finally:
+        if proceso:
+            proceso.terminate()
+            proceso.wait()
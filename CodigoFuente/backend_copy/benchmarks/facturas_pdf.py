@@ -0,0 +1,61 @@
+# benchmarks/facturas_pdf.py
+"""
+Benchmark de generación de facturas en PDF (páginas por segundo por núcleo)
+
+Uso (desde backend_copy/):
+    python -m benchmarks.facturas_pdf [cantidad]
+"""
+import io
+import os
+import sys
+import time
+
+from utils import invoice_pdf
+
+
+def datos_ficticios(cantidad: int) -> list:
+    """Facturas sintéticas con el mismo formato que obtener_datos_facturas"""
+    return [
+        {
+            "id_factura": i,
+            "num_factura": f"001-001-{i:09d}",
+            "periodo": "10/2026",
+            "fecha_emision": "19/10/2026",
+            "lectura_anterior": f"{1000 + i % 500:.2f}",
+            "lectura_actual": f"{1020 + i % 500:.2f}",
+            "consumo": "20.00",
+            "subtotal": "6.50",
+            "total": "6.50",
+            "cod_usuario_afi": i,
+            "nombre_afiliado": f"Afiliado Número {i}",
+            "cedula": f"{1700000000 + i}",
+            "nombre_sector": f"Sector {i % 12}",
+            "num_medidor": f"MED-{i:06d}",
+        }
+        for i in range(1, cantidad + 1)
+    ]
+
+
+def medir(nombre: str, funcion, paginas: int, nucleos: int) -> None:
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    por_segundo = paginas / segundos
+    print(f"{nombre:<28} {segundos:8.2f} s  {por_segundo:10.0f} pág/s  {por_segundo / nucleos:10.0f} pág/s/núcleo")
+
+
+if __name__ == "__main__":
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lista_datos = datos_ficticios(cantidad)
+    nucleos = invoice_pdf.PDF_WORKERS
+
+    print(f"📊 {cantidad} facturas, {nucleos} procesos (PDF_WORKERS), {os.cpu_count()} CPUs")
+    print("-" * 80)
+
+    medir("Secuencial (1 núcleo)", lambda: [invoice_pdf.renderizar_factura_pdf(d) for d in lista_datos], cantidad, 1)
+    medir("Pool -> ZIP", lambda: invoice_pdf.escribir_zip(io.BytesIO(), lista_datos), cantidad, nucleos)
+    medir("Pool -> PDF combinado", lambda: invoice_pdf.escribir_pdf_combinado(io.BytesIO(), lista_datos), cantidad, nucleos)
+
+    invoice_pdf._cache_pdf.clear()
+    medir("Caché (primera vez)", lambda: [invoice_pdf.obtener_pdf_cacheado(d) for d in lista_datos[:1000]], 1000, 1)
+    medir("Caché (acierto)", lambda: [invoice_pdf.obtener_pdf_cacheado(d) for d in lista_datos[:1000]], 1000, 1)
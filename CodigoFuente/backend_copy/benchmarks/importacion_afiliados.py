@@ -0,0 +1,76 @@
+# benchmarks/importacion_afiliados.py
+"""
+Benchmark de importación de hogares (afiliado + medidor) por minuto
+
+Arma un CSV con usuarios activos que aún no están afiliados, lo importa en
+la base configurada y después borra los medidores y afiliados creados.
+Una de cada 50 filas trae un error a propósito (medidor repetido).
+
+Uso (desde backend_copy/):
+    python -m benchmarks.importacion_afiliados [hogares]
+"""
+import io
+import sys
+import time
+
+from sqlalchemy import select, delete, exists
+
+import main  # noqa: F401  (registra todos los modelos)
+from db.session import SessionLocal
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.sector import Sector
+from models.user import UsuarioSistema
+from services.affiliation_import import importar_afiliaciones, leer_csv
+
+PREFIJO = "BENCH-IMP-"
+
+
+def archivo_sintetico(db, hogares: int) -> io.StringIO:
+    cedulas = db.execute(
+        select(UsuarioSistema.cedula)
+        .where(
+            UsuarioSistema.activo == True,
+            ~exists().where(UsuarioAfiliado.id_usuario_sistema == UsuarioSistema.id_usuario_sistema)
+        )
+        .limit(hogares)
+    ).scalars().all()
+    sectores = db.execute(select(Sector.nombre_sector)).scalars().all()
+    if not cedulas or not sectores:
+        sys.exit("Se necesitan usuarios sin afiliar y al menos un sector")
+
+    archivo = io.StringIO()
+    archivo.write("cedula;sector;num_medidor;latitud;longitud\n")
+    for i, cedula in enumerate(cedulas):
+        numero = i - 1 if i % 50 == 49 else i
+        archivo.write(f"{cedula};{sectores[i % len(sectores)]};{PREFIJO}{numero:06d};"
+                      f"{-1.5 + (i % 300) * 0.0001:.7f};{-78.5 + (i // 300) * 0.0001:.7f}\n")
+    archivo.seek(0)
+    return archivo
+
+
+def limpiar(db) -> None:
+    ids_afi = db.execute(
+        select(Medidor.id_usuario_afi).where(Medidor.num_medidor.like(f"{PREFIJO}%"))
+    ).scalars().all()
+    db.execute(delete(Medidor).where(Medidor.num_medidor.like(f"{PREFIJO}%")))
+    for desde in range(0, len(ids_afi), 5000):
+        db.execute(delete(UsuarioAfiliado).where(UsuarioAfiliado.id_usuario_afi.in_(ids_afi[desde:desde + 5000])))
+    db.commit()
+
+
+if __name__ == "__main__":
+    hogares = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    db = SessionLocal()
+    try:
+        archivo = archivo_sintetico(db, hogares)
+        inicio = time.perf_counter()
+        resumen = importar_afiliaciones(db, leer_csv(archivo))
+        segundos = time.perf_counter() - inicio
+        limpiar(db)
+    finally:
+        db.close()
+
+    print(f"{resumen['filas']} filas en {segundos:.2f} s ({resumen['medidores_creados'] / segundos * 60:,.0f} hogares/min)")
+    print(f"afiliados: {resumen['afiliados_creados']}  medidores: {resumen['medidores_creados']}  rechazadas: {resumen['rechazadas']}")
@@ -0,0 +1,115 @@
+# benchmarks/perfiles_carga.py
+"""
+Benchmark de perfiles de carga: filas y bytes leídos por GET /meters/ y
+GET /affiliates/
+
+Ejecuta la consulta de cada listado y arma su respuesta de dos formas:
+- antes: JOINs en cascada como con lazy="joined" en los modelos (medidor ->
+  afiliado -> usuario -> rol -> acciones, más los sectores).
+- después: el perfil del endpoint (db/load_profiles.py).
+Cuenta consultas, filas y bytes aproximados (tamaño de los valores) que
+devuelve la base. Solo lee.
+
+Uso (desde backend_copy/):
+    python -m benchmarks.perfiles_carga [limite]
+"""
+import sys
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+import main  # noqa: F401  (registra todos los modelos)
+from db.load_profiles import perfil
+from db.session import SessionLocal, engine
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.role import Rol
+from models.sector import Sector
+from models.user import UsuarioSistema
+from routes.afiliates import affiliate_to_response
+from schemas.meter import MedidorCompleto
+
+
+class Contador:
+    """Consultas, filas y bytes de los resultados (cursor de psycopg2 en memoria)"""
+
+    def __init__(self):
+        self.consultas = self.filas = self.bytes = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.consultas += 1
+        if cursor.description is None:
+            return
+        filas = cursor.fetchall()
+        cursor.scroll(0, mode="absolute")  # el ORM lee las mismas filas después
+        self.filas += len(filas)
+        self.bytes += sum(_tamano(valor) for fila in filas for valor in fila)
+
+
+def _tamano(valor) -> int:
+    if valor is None:
+        return 0
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return len(valor)
+    return len(str(valor).encode())
+
+
+def _cascada_usuario(ruta):
+    return ruta.joinedload(UsuarioSistema.rol).joinedload(Rol.acciones)
+
+
+# Lo que hacían los modelos con lazy="joined" en cada relación
+ANTES = {
+    "medidores": [
+        _cascada_usuario(joinedload(Medidor.usuario_afiliado).joinedload(UsuarioAfiliado.usuario_sistema)),
+        joinedload(Medidor.usuario_afiliado).joinedload(UsuarioAfiliado.sector),
+        joinedload(Medidor.sector),
+    ],
+    "afiliados": [
+        _cascada_usuario(joinedload(UsuarioAfiliado.usuario_sistema)),
+        joinedload(UsuarioAfiliado.sector),
+    ],
+}
+DESPUES = {"medidores": perfil("medidor_lista"), "afiliados": perfil("afiliado_lista")}
+
+
+def listar(db, listado: str, opciones: list, limite: int) -> int:
+    """Misma consulta y respuesta que el endpoint"""
+    if listado == "medidores":
+        medidores = db.query(Medidor).options(*opciones).offset(0).limit(limite).all()
+        return len([MedidorCompleto.model_validate(m).model_dump() for m in medidores])
+
+    afiliados = (
+        db.query(UsuarioAfiliado).options(*opciones)
+        .join(UsuarioSistema).join(Sector)
+        .order_by(UsuarioAfiliado.cod_usuario_afi.desc())
+        .offset(0).limit(limite).all()
+    )
+    return len([affiliate_to_response(a, db) for a in afiliados])
+
+
+def medir(listado: str, opciones: list, limite: int) -> dict:
+    contador = Contador()
+    db = SessionLocal()
+    event.listen(engine, "after_cursor_execute", contador)
+    try:
+        inicio = time.perf_counter()
+        registros = listar(db, listado, opciones, limite)
+        segundos = time.perf_counter() - inicio
+    finally:
+        event.remove(engine, "after_cursor_execute", contador)
+        db.close()
+    return {"registros": registros, "consultas": contador.consultas, "filas": contador.filas,
+            "bytes": contador.bytes, "ms": segundos * 1000}
+
+
+if __name__ == "__main__":
+    limite = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    for listado in ("medidores", "afiliados"):
+        for nombre, opciones in (("antes", ANTES[listado]), ("después", DESPUES[listado])):
+            medir(listado, opciones, limite)  # calentamiento
+            r = medir(listado, opciones, limite)
+            print(f"{listado:>9} {nombre:>7}: {r['registros']} registros  {r['consultas']} consultas  "
+                  f"{r['filas']:>6} filas  {r['bytes'] / 1024:>9.1f} KB  {r['ms']:.1f} ms")
@@ -0,0 +1,41 @@
+# benchmarks/rutas.py
+"""
+Benchmark de rutas de lectura (vecino más cercano + 2-opt)
+
+Medidores sintéticos sobre calles en cuadrícula de un sector de ~3 x 2 km
+(no usa la base de datos).
+
+Uso (desde backend_copy/):
+    python -m benchmarks.rutas [medidores ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from services.routing import optimizar_ruta, largo_ruta
+
+
+def medidores_sinteticos(n: int, semilla: int = 0) -> np.ndarray:
+    """Casas a lo largo de calles (cada 100 m) con algo de dispersión y altitud"""
+    rng = np.random.default_rng(semilla)
+    calle_horizontal = rng.random(n) < 0.5
+    x = np.where(calle_horizontal, rng.random(n) * 3000, rng.integers(0, 31, n) * 100.0)
+    y = np.where(calle_horizontal, rng.integers(0, 21, n) * 100.0, rng.random(n) * 2000)
+    x += rng.normal(0, 8, n)
+    y += rng.normal(0, 8, n)
+    z = 2800 + y * 0.03 + rng.normal(0, 2, n)
+    return np.column_stack([x, y, z])
+
+
+if __name__ == "__main__":
+    tamanios = [int(arg) for arg in sys.argv[1:]] or [500, 2000, 5000]
+
+    for n in tamanios:
+        puntos = medidores_sinteticos(n)
+        inicio = time.perf_counter()
+        ruta, estadisticas = optimizar_ruta(puntos)
+        segundos = time.perf_counter() - inicio
+        largo = largo_ruta(puntos, ruta)
+        print(f"{n} medidores en {segundos:.3f} s  ruta: {largo / 1000:.1f} km "
+              f"(vecino más cercano: {estadisticas['largo_inicial'] / 1000:.1f} km, {estadisticas['mejoras']} mejoras 2-opt)")
@@ -0,0 +1,120 @@
+# benchmarks/serializacion.py
+"""
+Microbenchmark de serialización de los listados (GET /meters/,
+GET /affiliates/, GET /users)
+
+Con los datos ya leídos de la base configurada, compara por endpoint el
+tiempo de pasar de la consulta a los bytes de la respuesta:
+- pydantic+json: objetos ORM (o dicts armados a mano), validación con el
+  response_model, jsonable_encoder y json de la biblioteca estándar (lo que
+  hace FastAPI con JSONResponse).
+- dump_json: objetos ORM validados y codificados con TypeAdapter.dump_json.
+- filas+orjson: tuplas de columnas -> dicts -> orjson (utils/serialization).
+- fields=tabla: solo las columnas de la tabla de usuarios del frontend
+  (utils/fields.py).
+
+Uso (desde backend_copy/):
+    python -m benchmarks.serializacion [filas] [repeticiones]
+"""
+import json
+import sys
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+import main  # noqa: F401  (registra todos los modelos)
+from db.load_profiles import perfil
+from db.session import SessionLocal
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.user import UsuarioSistema
+from routes.afiliates import affiliate_to_response, CAMPOS_AFILIADO, unir_tablas_afiliado
+from routes.meters import CAMPOS_MEDIDOR, consulta_medidores
+from routes.user import user_to_response, CAMPOS_USUARIO, consulta_usuarios, usuarios_a_respuesta
+from schemas.meter import MedidorCompleto
+from schemas.user import UserListResponse
+from utils.serialization import a_json
+
+
+def _pydantic_json(adaptador: TypeAdapter, datos) -> bytes:
+    """Camino de FastAPI: validar, pasar a tipos JSON y codificar con json"""
+    validados = adaptador.validate_python(datos, from_attributes=True)
+    contenido = jsonable_encoder(adaptador.dump_python(validados, mode="json"))
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _dump_json(adaptador: TypeAdapter, datos) -> bytes:
+    return adaptador.dump_json(adaptador.validate_python(datos, from_attributes=True))
+
+
+def casos(db, filas: int) -> dict:
+    """endpoint -> {camino: función sin argumentos que produce los bytes}"""
+    # Medidores
+    medidores = db.query(Medidor).options(*perfil("medidor_lista")).order_by(Medidor.id_medidor).limit(filas).all()
+    elegidos_medidor = CAMPOS_MEDIDOR.por_defecto
+    filas_medidores = db.execute(consulta_medidores(elegidos_medidor).order_by(Medidor.id_medidor).limit(filas)).all()
+    medidores_ta = TypeAdapter(List[MedidorCompleto])
+
+    # Afiliados (response_model=List[dict])
+    afiliados = [
+        affiliate_to_response(a, db)
+        for a in db.query(UsuarioAfiliado).options(*perfil("afiliado_lista")).limit(filas).all()
+    ]
+    elegidos_afiliado = CAMPOS_AFILIADO.por_defecto
+    filas_afiliados = db.execute(unir_tablas_afiliado(
+        select(*CAMPOS_AFILIADO.columnas(elegidos_afiliado)).select_from(UsuarioAfiliado).limit(filas)
+    )).all()
+    afiliados_ta = TypeAdapter(List[dict])
+
+    # Usuarios (las fotos se codifican igual en los dos caminos)
+    usuarios = [user_to_response(u, db) for u in db.query(UsuarioSistema).limit(filas).all()]
+    elegidos_usuario = CAMPOS_USUARIO.por_defecto
+    filas_usuarios = db.execute(consulta_usuarios(elegidos_usuario).limit(filas)).all()
+    usuarios_ta = TypeAdapter(List[UserListResponse])
+
+    # Columnas de una tabla del frontend (?fields=)
+    tabla_usuarios = CAMPOS_USUARIO.elegir("id,nombres,apellidos,cedula,rol,activo")
+    filas_tabla = db.execute(consulta_usuarios(tabla_usuarios).limit(filas)).all()
+
+    return {
+        "medidores": {
+            "pydantic+json": lambda: _pydantic_json(medidores_ta, medidores),
+            "dump_json": lambda: _dump_json(medidores_ta, medidores),
+            "filas+orjson": lambda: a_json([CAMPOS_MEDIDOR.respuesta(f, elegidos_medidor) for f in filas_medidores]),
+        },
+        "afiliados": {
+            "pydantic+json": lambda: _pydantic_json(afiliados_ta, afiliados),
+            "dump_json": lambda: _dump_json(afiliados_ta, afiliados),
+            "filas+orjson": lambda: a_json([CAMPOS_AFILIADO.respuesta(f, elegidos_afiliado) for f in filas_afiliados]),
+        },
+        "usuarios": {
+            "pydantic+json": lambda: _pydantic_json(usuarios_ta, usuarios),
+            "dump_json": lambda: _dump_json(usuarios_ta, usuarios),
+            "filas+orjson": lambda: a_json(usuarios_a_respuesta(db, filas_usuarios, elegidos_usuario)),
+            "fields=tabla": lambda: a_json(usuarios_a_respuesta(db, filas_tabla, tabla_usuarios)),
+        },
+    }
+
+
+if __name__ == "__main__":
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    db = SessionLocal()
+    try:
+        por_endpoint = casos(db, filas)
+        for endpoint, caminos in por_endpoint.items():
+            base = None
+            for camino, funcion in caminos.items():
+                funcion()  # calentamiento
+                inicio = time.perf_counter()
+                for _ in range(repeticiones):
+                    contenido = funcion()
+                ms = (time.perf_counter() - inicio) / repeticiones * 1000
+                base = base or ms
+                print(f"{endpoint:>9} {camino:>14}: {ms:8.2f} ms  {len(contenido) / 1024:8.1f} KB  x{base / ms:.1f}")
+    finally:
+        db.close()
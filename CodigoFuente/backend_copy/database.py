@@ -1,26 +0,0 @@
-# app/database.py
-# Configuración de la base de datos y sesión de SQLAlchemy
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from .config import settings
-
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,           # Detecta conexiones caídas
-    pool_recycle=1800,            # Renueva conexiones cada 30 min
-    connect_args={"connect_timeout": 10}  # Evita bloqueos largos
-)
-
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base = declarative_base()
-
-# Dependency para obtener la sesión de DB
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,62 @@
+# db/async_session.py
+"""
+Acceso asíncrono a la base (AsyncSession + asyncpg)
+
+Los routers con def normal corren en el threadpool de Starlette (unos 40
+hilos) y cada petición retiene un hilo y una conexión mientras espera a la
+base. Los endpoints async def usan get_async_db: la espera se hace en el
+event loop, así las peticiones concurrentes no quedan limitadas por el
+threadpool.
+
+- DATABASE_URL_ASYNC: URL para asyncpg; por defecto la de DATABASE_URL con
+  el driver cambiado a postgresql+asyncpg.
+- DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW: pool propio del engine async
+  (se suma al del engine síncrono en las conexiones abiertas del proceso).
+- get_async_db deja pasar a lo sumo DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW
+  peticiones a la vez (asyncio.Semaphore); las demás esperan su turno en el
+  event loop, sin límite de tiempo. Sin ese límite, con cientos de clientes
+  las peticiones hacían cola dentro del pool y las que pasaban DB_POOL_TIMEOUT
+  respondían 500 (TimeoutError del pool).
+  El resto de ajustes (timeouts, statement_timeout, application_name,
+  sentencias preparadas) son los de db/session.py.
+
+Las sesiones no expiran los objetos al hacer commit y las relaciones no se
+cargan solas (en async una carga perezosa falla): cada consulta pide lo que
+la respuesta usa.
+"""
+import asyncio
+import os
+from typing import AsyncIterator
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from db.session import SQLALCHEMY_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, PoolMedidoAsync, opciones_engine
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv(
+    "DATABASE_URL_ASYNC",
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+)
+
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", DB_POOL_SIZE))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", DB_MAX_OVERFLOW))
+
+
+def crear_engine_async(url: str = SQLALCHEMY_ASYNC_DATABASE_URL, **ajustes):
+    """AsyncEngine con el pool medido y la configuración del entorno"""
+    ajustes = {"pool_size": DB_ASYNC_POOL_SIZE, "max_overflow": DB_ASYNC_MAX_OVERFLOW, **ajustes}
+    return create_async_engine(url, poolclass=PoolMedidoAsync, **opciones_engine(url, **ajustes))
+
+
+async_engine = crear_engine_async()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False, autoflush=False)
+
+# Una sesión async por conexión que el pool puede abrir
+_sesiones_async = asyncio.Semaphore(DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependencia de FastAPI: una AsyncSession por petición (espera turno si el pool está lleno)"""
+    async with _sesiones_async:
+        async with AsyncSessionLocal() as db:
+            yield db
@@ -0,0 +1,62 @@
+# db/bulk.py
+"""
+Sentencias por lotes con arreglos por columna (unnest)
+
+Un executemany de miles de filas (aunque SQLAlchemy lo agrupe en INSERTs de
+varios VALUES) arma y envía un parámetro por celda, y el servidor planifica
+cada grupo por separado. Con unnest cada columna viaja como un solo arreglo:
+
+    INSERT INTO t (a, b) SELECT a, b FROM unnest(:a, :b) AS filas(a, b)
+
+Una sentencia por lote sin importar la cantidad de filas; sirve igual para
+INSERT ... ON CONFLICT, UPDATE ... FROM y joins contra las filas del lote.
+Las filas salen de unnest en el orden de los arreglos: quien necesite un
+orden de bloqueo fijo ordena las filas antes de llamar.
+
+Cada arreglo se envía como el literal de texto de PostgreSQL ('{1,2,3}')
+con CAST al tipo de la columna: psycopg2 no adapta valor por valor (un
+ARRAY[...] de miles de elementos) y el servidor no planifica esa expresión.
+"""
+from datetime import date, datetime
+from typing import List, Sequence
+
+from sqlalchemy import Table, String, func, bindparam, cast, column, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+
+
+def _elemento(valor) -> str:
+    if valor is None:
+        return "NULL"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, (int, float)):
+        return str(valor)
+    if isinstance(valor, (date, datetime)):
+        valor = valor.isoformat()
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def arreglo_literal(valores) -> str:
+    """Literal de arreglo de PostgreSQL ('{"a",NULL,"b"}') con los valores"""
+    return "{" + ",".join(map(_elemento, valores)) + "}"
+
+
+def filas_unnest(tabla: Table, columnas: Sequence[str], filas: List[dict]):
+    """
+    Tabla derivada unnest(...) AS filas(columnas) con los valores de filas
+    (dicts); cada arreglo toma el tipo de la columna de la tabla.
+    """
+    arreglos = [
+        cast(bindparam(None, arreglo_literal(fila[nombre] for fila in filas), type_=String), ARRAY(tabla.c[nombre].type))
+        for nombre in columnas
+    ]
+    return (
+        func.unnest(*arreglos)
+        .table_valued(*(column(nombre, tabla.c[nombre].type) for nombre in columnas))
+        .render_derived(name="filas")
+    )
+
+
+def insertar_filas(tabla: Table, columnas: Sequence[str], filas: List[dict]):
+    """INSERT INTO tabla (columnas) SELECT * FROM unnest(...) (admite on_conflict_* y returning)"""
+    return pg_insert(tabla).from_select(list(columnas), select(filas_unnest(tabla, columnas, filas)))
@@ -0,0 +1,95 @@
+# db/load_profiles.py
+"""
+Perfiles de carga de relaciones por endpoint
+
+Las relaciones de los modelos son perezosas (lazy="select"): consultar
+Medidor ya no arrastra afiliado -> usuario -> rol -> acciones en un solo
+JOIN que repite las acciones del rol por fila y trae las fotos de perfil.
+Cada endpoint pide lo que su respuesta usa con un perfil con nombre:
+
+    db.query(Medidor).options(*perfil("medidor_lista"))
+
+- selectinload: la relación se carga con una segunda consulta (IN de las
+  claves) para todas las filas a la vez; joinedload para un solo registro.
+- load_only: solo las columnas que la respuesta muestra.
+- Con SQL_RAISELOAD=1 (desarrollo y pruebas) los perfiles estrictos agregan
+  raiseload("*"): una relación que el perfil no carga lanza un error en
+  lugar de hacer una consulta por fila.
+"""
+import os
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.orm import selectinload, joinedload, raiseload, defer
+
+SQL_RAISELOAD = os.getenv("SQL_RAISELOAD", "0") == "1"
+
+
+def _usuario_actual() -> list:
+    from models.user import UsuarioSistema
+
+    # El usuario del token solo se usa para permisos; la foto no se lee
+    return [defer(UsuarioSistema.foto)]
+
+
+def _medidor(cargar) -> list:
+    from models.affiliate import UsuarioAfiliado
+    from models.meter import Medidor
+    from models.sector import Sector
+
+    return [
+        cargar(Medidor.usuario_afiliado).load_only(
+            UsuarioAfiliado.id_usuario_afi,
+            UsuarioAfiliado.cod_usuario_afi,
+            UsuarioAfiliado.fecha_afiliacion,
+            UsuarioAfiliado.id_sector,
+        ),
+        cargar(Medidor.sector).load_only(Sector.id_sector, Sector.nombre_sector),
+    ]
+
+
+def _afiliado(cargar) -> list:
+    from models.affiliate import UsuarioAfiliado
+    from models.sector import Sector
+    from models.user import UsuarioSistema
+
+    return [
+        cargar(UsuarioAfiliado.usuario_sistema).load_only(
+            UsuarioSistema.id_usuario_sistema,
+            UsuarioSistema.usuario,
+            UsuarioSistema.nombres,
+            UsuarioSistema.apellidos,
+            UsuarioSistema.cedula,
+            UsuarioSistema.email,
+            UsuarioSistema.telefono,
+            UsuarioSistema.direccion,
+            UsuarioSistema.activo,
+        ),
+        cargar(UsuarioAfiliado.sector).load_only(
+            Sector.id_sector, Sector.nombre_sector, Sector.descripcion, Sector.activo
+        ),
+    ]
+
+
+def _rol_con_acciones() -> list:
+    from models.role import Rol
+
+    return [selectinload(Rol.acciones)]
+
+
+# nombre -> (estricto, opciones)
+PERFILES: Dict[str, Tuple[bool, Callable[[], list]]] = {
+    "usuario_actual": (False, _usuario_actual),
+    "medidor_lista": (True, lambda: _medidor(selectinload)),
+    "medidor_detalle": (True, lambda: _medidor(joinedload)),
+    "afiliado_lista": (True, lambda: _afiliado(selectinload)),
+    "afiliado_detalle": (True, lambda: _afiliado(joinedload)),
+    "rol_con_acciones": (True, _rol_con_acciones),
+}
+
+
+def perfil(nombre: str) -> List:
+    """Opciones de carga del perfil (para .options(*perfil(...)))"""
+    estricto, opciones = PERFILES[nombre]
+    if estricto and SQL_RAISELOAD:
+        return [*opciones(), raiseload("*")]
+    return opciones()
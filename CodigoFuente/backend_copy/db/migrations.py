@@ -0,0 +1,78 @@
+# db/migrations.py
+"""
+Migración de bases existentes
+
+Las tablas y columnas que agregan los modelos no existen en una base creada
+antes que ellos (la de producción, ver backups/*.dump) y la aplicación no
+las crea: sin migrar, las consultas fallan con UndefinedColumn/UndefinedTable
+(por ejemplo, cualquier carga de UsuarioSistema sin foto_hash). Antes de
+desplegar una versión nueva del backend, con la aplicación detenida:
+
+    python -m db.migrations
+
+Cada paso está en el servicio al que pertenece, es idempotente (IF NOT
+EXISTS, checkfirst) y hace commit al terminar. Si un paso se detiene por
+datos que hay que corregir a mano (p. ej. duplicados que impiden un índice
+único), se corrigen y se vuelve a ejecutar todo desde el principio.
+"""
+from typing import Callable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+
+def pasos() -> List[Tuple[str, Callable[[Session], object]]]:
+    """(descripción, función(db)) en el orden en que deben ejecutarse"""
+    from services.invoice_documents import migrar_facturas
+    from services.billing import migrar_lecturas
+    from services.invoice_numbers import migrar_numeracion
+    from services.anomalies import crear_tabla_alertas
+    from services.rollups import crear_resumenes
+    from services.water_loss import crear_tablas_perdidas
+    from services.payments import migrar_pagos
+    from services.aging import crear_tabla_deuda
+    from services.meter_map import migrar_coordenadas
+    from services.blobs import crear_esquema_archivos, migrar_fotos_usuarios
+    from services.affiliate_codes import crear_secuencia
+    from services.affiliates import crear_indice_afiliacion_activa
+
+    return [
+        ("Facturas (periodo, lecturas, estado, sector)", migrar_facturas),
+        ("Lecturas por periodo (una por medidor y mes)", migrar_lecturas),
+        ("Numeración de facturas por punto de emisión", migrar_numeracion),
+        ("Alertas de lecturas sospechosas", crear_tabla_alertas),
+        ("Resúmenes mensuales de consumo y facturación", crear_resumenes),
+        ("Macromedidores y agua no facturada", crear_tablas_perdidas),
+        ("Libro de pagos, cierres de caja y saldos", migrar_pagos),
+        ("Deuda por periodo (antigüedad de cartera)", crear_tabla_deuda),
+        ("Coordenadas de medidores con índice GiST y teselas del mapa", migrar_coordenadas),
+        ("Esquema de archivos (t_blob y foto_hash)", crear_esquema_archivos),
+        ("Fotos de perfil al almacenamiento de archivos", migrar_fotos_usuarios),
+        ("Secuencia de códigos de afiliado", crear_secuencia),
+        ("Índice de afiliaciones activas", crear_indice_afiliacion_activa),
+    ]
+
+
+def migrar(db: Session) -> int:
+    """Ejecuta todos los pasos en orden; se detiene en el primero que falle. Retorna los pasos ejecutados."""
+    ejecutados = 0
+    for descripcion, paso in pasos():
+        try:
+            paso(db)
+        except Exception:
+            db.rollback()
+            print(f"❌ Migración detenida en: {descripcion}")
+            raise
+        ejecutados += 1
+        print(f"✅ {descripcion}")
+    return ejecutados
+
+
+if __name__ == "__main__":
+    from db.session import SessionLocal
+
+    # Uso: python -m db.migrations   (antes de cada despliegue; se puede repetir)
+    db = SessionLocal()
+    try:
+        print(f"✅ Base migrada: {migrar(db)} pasos")
+    finally:
+        db.close()
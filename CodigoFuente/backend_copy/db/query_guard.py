@@ -0,0 +1,217 @@
+# db/query_guard.py
+"""
+Vigilancia de consultas SQL por petición (desarrollo y pruebas)
+
+Con SQL_DETECTAR_N1=1 cada petición guarda sus sentencias (SQL, parámetros
+y la línea del código de la aplicación que la lanzó) y al terminar avisa:
+
+- N+1: el mismo SELECT ejecutado SQL_N1_UMBRAL veces o más con parámetros
+  distintos, p. ej. una relación perezosa leída dentro de un bucle o
+  UsuarioSistema.get_permissions(db) por fila. El aviso trae la ruta, el SQL
+  y el archivo:línea de la primera ejecución.
+- Presupuesto: un endpoint marcado con @max_queries(n) que hace más de n
+  sentencias (usuario y permisos incluidos).
+
+Con SQL_PRESUPUESTO_ESTRICTO=1 (pruebas) un presupuesto excedido responde
+500 con el detalle: la prueba del endpoint falla. Los N+1 solo se avisan.
+
+presupuesto_consultas(n) hace la misma revisión sobre un bloque de código
+que usa la sesión directamente (servicios, scripts) y lanza
+PresupuestoExcedido al salir. registrar_consultas() solo registra (las
+pruebas de la API lo usan para revisar cada petición).
+"""
+import os
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.serialization import a_json
+
+try:
+    from greenlet import getcurrent
+except ImportError:  # greenlet solo hace falta para las sesiones async
+    getcurrent = None
+
+SQL_PRESUPUESTO_ESTRICTO = os.getenv("SQL_PRESUPUESTO_ESTRICTO", "0") == "1"
+SQL_DETECTAR_N1 = os.getenv("SQL_DETECTAR_N1", "0") == "1" or SQL_PRESUPUESTO_ESTRICTO
+SQL_N1_UMBRAL = int(os.getenv("SQL_N1_UMBRAL", 3))
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_EXCLUIDOS = (os.path.abspath(__file__), _RAIZ + "venv" + os.sep)
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+def max_queries(n: int):
+    """Presupuesto de sentencias SQL de un endpoint (se revisa con SQL_DETECTAR_N1=1)"""
+    def decorar(endpoint):
+        endpoint.max_consultas = n
+        return endpoint
+    return decorar
+
+
+# ========================================
+# REGISTRO DE SENTENCIAS
+# ========================================
+def _linea_propia(frame) -> Optional[str]:
+    """Primer marco de la pila que es código de la aplicación -> 'archivo:línea en función'"""
+    while frame is not None:
+        archivo = frame.f_code.co_filename
+        if archivo.startswith(_RAIZ) and not archivo.startswith(_EXCLUIDOS):
+            return f"{archivo[len(_RAIZ):]}:{frame.f_lineno} en {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _ubicacion() -> str:
+    ubicacion = _linea_propia(sys._getframe(1))
+    # Con AsyncSession la sentencia corre en un greenlet aparte: la línea del
+    # endpoint está en la pila del greenlet que lo lanzó
+    greenlet = getcurrent().parent if getcurrent is not None else None
+    while ubicacion is None and greenlet is not None:
+        ubicacion = _linea_propia(greenlet.gr_frame)
+        greenlet = greenlet.parent
+    return ubicacion or "?"
+
+
+class RegistroConsultas:
+    """Sentencias SQL ejecutadas en una petición o bloque"""
+
+    def __init__(self):
+        self.sentencias = []  # (sql, parámetros, ubicación)
+
+    @property
+    def total(self) -> int:
+        return len(self.sentencias)
+
+    def n_mas_uno(self, umbral: int = SQL_N1_UMBRAL) -> List[tuple]:
+        """[(sql, veces, ubicación)] de los SELECT repetidos con parámetros distintos"""
+        por_sql = defaultdict(list)
+        for sql, parametros, ubicacion in self.sentencias:
+            if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                por_sql[sql].append((parametros, ubicacion))
+
+        repetidas = []
+        for sql, ejecuciones in por_sql.items():
+            if len(ejecuciones) >= umbral and len({parametros for parametros, _ in ejecuciones}) > 1:
+                repetidas.append((sql, len(ejecuciones), ejecuciones[0][1]))
+        return repetidas
+
+    def problemas(self, maximo: Optional[int] = None, umbral: int = SQL_N1_UMBRAL) -> tuple:
+        """(avisos de N+1, aviso de presupuesto excedido o None)"""
+        avisos = [
+            f"N+1: {veces} veces la misma consulta ({ubicacion})\n    {' '.join(sql.split())[:300]}"
+            for sql, veces, ubicacion in self.n_mas_uno(umbral)
+        ]
+        excedido = None
+        if maximo is not None and self.total > maximo:
+            lineas = "\n".join(f"    {ubicacion}: {' '.join(sql.split())[:120]}" for sql, _, ubicacion in self.sentencias)
+            excedido = f"{self.total} consultas SQL (presupuesto: {maximo})\n{lineas}"
+        return avisos, excedido
+
+
+_registro_actual: ContextVar[Optional[RegistroConsultas]] = ContextVar("registro_consultas", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _registrar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    registro = _registro_actual.get()
+    if registro is not None:
+        registro.sentencias.append((statement, repr(parameters), _ubicacion()))
+
+
+@contextmanager
+def registrar_consultas():
+    """
+    Registra las sentencias del bloque sin revisarlas -> RegistroConsultas.
+    Ve las del mismo contexto: el threadpool de Starlette y las sesiones
+    async lo copian, así que dentro de un middleware ASGI registra la petición.
+    """
+    registro = RegistroConsultas()
+    token = _registro_actual.set(registro)
+    try:
+        yield registro
+    finally:
+        _registro_actual.reset(token)
+
+
+@contextmanager
+def presupuesto_consultas(maximo: Optional[int] = None, umbral: int = SQL_N1_UMBRAL):
+    """
+    Revisa las sentencias del bloque: lanza PresupuestoExcedido si pasa de
+    maximo o tiene un N+1. Solo ve las consultas del mismo hilo/contexto (no
+    las de una petición hecha con TestClient: para eso está el middleware).
+    """
+    with registrar_consultas() as registro:
+        yield registro
+
+    avisos, excedido = registro.problemas(maximo, umbral)
+    if excedido:
+        avisos.append(excedido)
+    if avisos:
+        raise PresupuestoExcedido("\n".join(avisos))
+
+
+# ========================================
+# MIDDLEWARE
+# ========================================
+class VigilanciaConsultasMiddleware:
+    """Middleware ASGI: registra las sentencias de cada petición y avisa N+1 y presupuestos excedidos"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registro = RegistroConsultas()
+        token = _registro_actual.set(registro)
+        reemplazada = False
+
+        async def enviar(mensaje):
+            nonlocal reemplazada
+            if mensaje["type"] == "http.response.start":
+                # El endpoint ya terminó: se revisan sus consultas antes de responder
+                detalle = self._revisar(scope, registro)
+                if detalle and SQL_PRESUPUESTO_ESTRICTO:
+                    reemplazada = True
+                    cuerpo = a_json({"detail": detalle})
+                    await send({
+                        "type": "http.response.start",
+                        "status": 500,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(cuerpo)).encode())],
+                    })
+                    await send({"type": "http.response.body", "body": cuerpo})
+                    return
+            elif reemplazada:
+                return
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _registro_actual.reset(token)
+
+    @staticmethod
+    def _revisar(scope, registro: RegistroConsultas) -> Optional[str]:
+        """Imprime los avisos; devuelve el detalle si se excedió el presupuesto"""
+        ruta = scope.get("route")
+        nombre = f"{scope['method']} {getattr(ruta, 'path', scope['path'])}"
+        avisos, excedido = registro.problemas(getattr(getattr(ruta, "endpoint", None), "max_consultas", None))
+
+        for aviso in avisos:
+            print(f"⚠️  {nombre}: {aviso}")
+        if excedido:
+            print(f"⚠️  {nombre}: {excedido}")
+            return f"Presupuesto de consultas SQL excedido en {nombre}: {excedido.splitlines()[0]}"
+        return None
@@ -1,5 +1,5 @@
 # main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from routes import auth
@@ -9,12 +9,27 @@ from routes import sectors
 from routes import notifications
 from routes import afiliates
 from routes import meters
+from routes import invoices
+from routes import readings
+from routes import clients
+from routes import payments
+from routes import collection
+from routes import water_loss
+from routes import reader
+from routes import blobs
+from routes import dashboard
+from utils.serialization import RespuestaJSON
+from db.session import engine, estadisticas_pool
+from db.async_session import async_engine
+from db.query_guard import VigilanciaConsultasMiddleware, SQL_DETECTAR_N1
+from utils.metrics import MetricasMiddleware, exportar, CONTENT_TYPE
 import os
 
 app = FastAPI(
     title="Sistema de Facturación de Agua",
     description="API para el sistema de facturación JAAP Sanjapamba",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=RespuestaJSON
 )
 
 # Configurar CORS para HTTPS
@@ -38,6 +53,13 @@ app.add_middleware(
     allowed_hosts=["localhost", "127.0.0.1", "*.localhost"]
 )
 
+# Métricas por ruta (latencia, estados, consultas SQL, tamaño) para /metrics
+app.add_middleware(MetricasMiddleware)
+
+# Desarrollo y pruebas: avisos de N+1 y presupuestos de consultas (@max_queries)
+if SQL_DETECTAR_N1:
+    app.add_middleware(VigilanciaConsultasMiddleware)
+
 # Incluir rutas
 app.include_router(auth.router)
 app.include_router(user.router)
@@ -46,6 +68,15 @@ app.include_router(sectors.router)
 app.include_router(notifications.router)
 app.include_router(afiliates.router)
 app.include_router(meters.router)
+app.include_router(invoices.router)
+app.include_router(readings.router)
+app.include_router(clients.router)
+app.include_router(payments.router)
+app.include_router(collection.router)
+app.include_router(water_loss.router)
+app.include_router(reader.router)
+app.include_router(blobs.router)
+app.include_router(dashboard.router)
 
 
 # Health check general
@@ -58,6 +89,23 @@ async def health_check():
         "secure": True
     }
 
+# Estado del pool de conexiones (monitoreo)
+@app.get("/health/db")
+async def health_db():
+    return {
+        "status": "healthy",
+        "pool": estadisticas_pool(),
+        "pool_async": estadisticas_pool(async_engine)
+    }
+
+# Métricas en formato Prometheus (rutas y pools de conexiones)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(
+        content=exportar({"sync": engine, "async": async_engine}),
+        media_type=CONTENT_TYPE
+    )
+
 # Endpoint de información de la API
 @app.get("/")
 async def root():
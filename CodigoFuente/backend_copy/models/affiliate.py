@@ -1,8 +1,11 @@
 # models/usuario_afiliado.py
-from sqlalchemy import Column, Integer, Boolean, Date, ForeignKey
+from sqlalchemy import Column, Integer, Boolean, Date, ForeignKey, Sequence, Index
 from sqlalchemy.orm import relationship
 from db.session import Base
 
+# Códigos de afiliado: secuencia de la base (ver services/affiliate_codes.py)
+seq_cod_usuario_afi = Sequence("seq_cod_usuario_afi", schema="usuarios", metadata=Base.metadata)
+
 class UsuarioAfiliado(Base):
     __tablename__ = "t_usuario_afiliado"
     __table_args__ = {"schema": "usuarios"}
@@ -11,17 +14,20 @@ class UsuarioAfiliado(Base):
     id_usuario_afi = Column(Integer, primary_key=True, index=True)
     fecha_afiliacion = Column(Date, nullable=True)
     activo = Column(Boolean, default=True)
-    cod_usuario_afi = Column(Integer, nullable=False)
+    cod_usuario_afi = Column(
+        Integer, seq_cod_usuario_afi, server_default=seq_cod_usuario_afi.next_value(),
+        nullable=False, unique=True, index=True
+    )
     
     # 🔗 Relaciones foráneas
     id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), nullable=False)
-    id_usuario_sistema = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=False)
+    id_usuario_sistema = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=False, index=True)
     
     
 
     # Relaciones ORM
-    usuario_sistema = relationship("UsuarioSistema", backref="afiliaciones", lazy="joined")
-    sector = relationship("Sector", backref="afiliados", lazy="joined")  # relación con t_sector
+    usuario_sistema = relationship("UsuarioSistema", backref="afiliaciones")
+    sector = relationship("Sector", backref="afiliados")  # relación con t_sector
 
     def __repr__(self):
         return f"<UsuarioAfiliado cod={self.cod_usuario_afi}, usuario_id={self.id_usuario_sistema}, sector_id={self.id_sector}>"
@@ -47,3 +53,12 @@ class UsuarioAfiliado(Base):
                 "nombre_sector": getattr(self.sector, "nombre_sector", None)
             } if self.sector else None
         }
+
+
+# Un usuario tiene a lo sumo una afiliación activa: el índice parcial lo
+# garantiza aunque dos procesos validen y afilien al mismo usuario a la vez
+# (bases existentes: python -m services.affiliates --migrar)
+Index(
+    "ux_afiliado_usuario_activo", UsuarioAfiliado.id_usuario_sistema,
+    unique=True, postgresql_where=UsuarioAfiliado.activo == True
+)
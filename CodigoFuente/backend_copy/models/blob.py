@@ -0,0 +1,22 @@
+# models/blob.py
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class Blob(Base):
+    """
+    Archivo guardado por contenido (el contenido está en disco, ver
+    utils/blob_storage.py; aquí solo los datos para servirlo)
+    Tabla: t_blob
+    """
+    __tablename__ = "t_blob"
+    __table_args__ = {"schema": "archivos"}
+
+    hash = Column(String(64), primary_key=True)  # SHA-256 en hexadecimal
+    tamano = Column(BigInteger, nullable=False)
+    tipo_contenido = Column(String(100), nullable=False, default="application/octet-stream")
+    fecha_creacion = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<Blob hash={self.hash[:12]}, tamano={self.tamano}>"
@@ -0,0 +1,25 @@
+# models/collection.py
+from sqlalchemy import Column, Integer, Numeric, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class DeudaPeriodo(Base):
+    """
+    Deuda abierta por afiliado y periodo facturado (base de la antigüedad de cartera)
+    La mantienen la facturación (suma) y los pagos (resta); las filas saldadas se eliminan.
+    Tabla: t_deuda_periodo
+    """
+    __tablename__ = "t_deuda_periodo"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_usuario_afi = Column(Integer, ForeignKey("usuarios.t_usuario_afiliado.id_usuario_afi"), primary_key=True)
+    periodo = Column(Date, primary_key=True)
+    id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), nullable=True, index=True)
+    fecha_emision = Column(Date, nullable=False, index=True)  # la más antigua del periodo: define la antigüedad
+    monto = Column(Numeric(12, 2), nullable=False, default=0)
+    num_facturas = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DeudaPeriodo afiliado={self.id_usuario_afi}, periodo={self.periodo}, monto={self.monto}>"
@@ -0,0 +1,45 @@
+# models/consumption.py
+from sqlalchemy import Column, Integer, Numeric, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class ConsumoMensualAfiliado(Base):
+    """
+    Resumen mensual precalculado por afiliado (dashboard del cliente)
+    Lo mantienen la carga de lecturas y la facturación.
+    Tabla: t_consumo_mensual_afiliado
+    """
+    __tablename__ = "t_consumo_mensual_afiliado"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_usuario_afi = Column(Integer, ForeignKey("usuarios.t_usuario_afiliado.id_usuario_afi"), primary_key=True)
+    periodo = Column(Date, primary_key=True)
+    consumo = Column(Numeric(12, 2), nullable=False, default=0)
+    num_lecturas = Column(Integer, nullable=False, default=0)
+    monto_facturado = Column(Numeric(12, 2), nullable=False, default=0)
+    num_facturas = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ConsumoMensualAfiliado afiliado={self.id_usuario_afi}, periodo={self.periodo}, consumo={self.consumo}>"
+
+
+class ConsumoMensualSector(Base):
+    """
+    Resumen mensual precalculado por sector (gráficos del administrador)
+    Tabla: t_consumo_mensual_sector
+    """
+    __tablename__ = "t_consumo_mensual_sector"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), primary_key=True)
+    periodo = Column(Date, primary_key=True)
+    consumo = Column(Numeric(14, 2), nullable=False, default=0)
+    num_lecturas = Column(Integer, nullable=False, default=0)
+    monto_facturado = Column(Numeric(14, 2), nullable=False, default=0)
+    num_facturas = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ConsumoMensualSector sector={self.id_sector}, periodo={self.periodo}, consumo={self.consumo}>"
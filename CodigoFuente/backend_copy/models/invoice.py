@@ -0,0 +1,82 @@
+# models/invoice.py
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class Factura(Base):
+    """
+    Modelo de Factura
+    Tabla: t_factura
+    """
+    __tablename__ = "t_factura"
+    __table_args__ = (
+        # La numeración es secuencial y sin huecos por punto de emisión
+        UniqueConstraint("punto_emision", "secuencial", name="uq_factura_punto_secuencial"),
+        {"schema": "facturacion"},
+    )
+
+    # Campos principales
+    id_factura = Column(Integer, primary_key=True, index=True)
+    punto_emision = Column(String(7), nullable=False, default="001-001")
+    secuencial = Column(Integer, nullable=True)
+    num_factura = Column(String(50), nullable=True)  # '001-001-000000123'
+    periodo = Column(Date, nullable=False, index=True)  # primer día del mes facturado
+    fecha_emision = Column(DateTime, server_default=func.now(), nullable=False)
+    lectura_anterior = Column(Numeric(12, 2), nullable=True)
+    lectura_actual = Column(Numeric(12, 2), nullable=True)
+    consumo = Column("consumo_m3", Numeric(12, 2), key="consumo", nullable=False, default=0)
+    # Desglose de la tarifa (columnas heredadas de t_factura)
+    valor_consumo = Column(Numeric(10, 2), nullable=True, default=0)  # valor base
+    exceso_m3 = Column(Numeric(12, 2), nullable=True, default=0)
+    valor_exceso = Column(Numeric(10, 2), nullable=True, default=0)
+    descuento = Column(Numeric(10, 2), nullable=True, default=0)
+    impuesto = Column(Numeric(10, 2), nullable=True, default=0)
+    subtotal = Column(Numeric(10, 2), nullable=False, default=0)
+    total = Column(Numeric(10, 2), nullable=False, default=0)
+    saldo_pendiente = Column(Numeric(10, 2), nullable=False, default=0)  # lo que falta cobrar
+    estado = Column(String(20), nullable=False, default="pendiente")  # 'pendiente', 'pagada', 'anulada'
+    estimada = Column(Boolean, nullable=False, default=False)  # facturada con lectura estimada
+    activo = Column(Boolean, default=True)
+
+    # 🔗 Relaciones foráneas
+    id_usuario_afi = Column(Integer, ForeignKey("usuarios.t_usuario_afiliado.id_usuario_afi"), nullable=False, index=True)
+    id_medidor = Column(Integer, ForeignKey("medidores.t_medidor.id_medidor"), nullable=True)
+    id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), nullable=True, index=True)
+    id_lectura = Column(Integer, ForeignKey("medidores.t_lecturas.id_lectura"), nullable=True, unique=True)
+
+    def __repr__(self):
+        return f"<Factura id={self.id_factura}, num={self.num_factura}, afiliado={self.id_usuario_afi}, periodo={self.periodo}>"
+
+
+class ContadorFactura(Base):
+    """
+    Siguiente secuencial disponible por punto de emisión
+    Tabla: t_contador_factura
+    """
+    __tablename__ = "t_contador_factura"
+    __table_args__ = {"schema": "facturacion"}
+
+    punto_emision = Column(String(7), primary_key=True)
+    siguiente = Column(Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return f"<ContadorFactura {self.punto_emision} siguiente={self.siguiente}>"
+
+
+class RangoFacturaLibre(Base):
+    """
+    Rangos de secuenciales reservados que no llegaron a usarse
+    (se reasignan antes de avanzar el contador para no dejar huecos)
+    Tabla: t_rango_factura_libre
+    """
+    __tablename__ = "t_rango_factura_libre"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_rango = Column(Integer, primary_key=True, index=True)
+    punto_emision = Column(String(7), nullable=False, index=True)
+    desde = Column(Integer, nullable=False)
+    hasta = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<RangoFacturaLibre {self.punto_emision} {self.desde}-{self.hasta}>"
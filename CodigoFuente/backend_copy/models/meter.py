@@ -1,5 +1,5 @@
 # models/medidor.py
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, LargeBinary, DateTime, ForeignKey, Index, Float, cast, func
 from sqlalchemy.orm import relationship
 from db.session import Base
 
@@ -10,9 +10,9 @@ class Medidor(Base):
 
     # Campos principales
     id_medidor = Column(Integer, primary_key=True, index=True)
-    num_medidor = Column(String(50), nullable=False)
-    latitud = Column(Numeric(10, 2), nullable=True)
-    longitud = Column(Numeric(10, 2), nullable=True)
+    num_medidor = Column(String(50), nullable=False, unique=True)
+    latitud = Column(Numeric(10, 7), nullable=True)   # ~1 cm de precisión
+    longitud = Column(Numeric(10, 7), nullable=True)
     altitud = Column(Numeric(10, 2), nullable=True)
     activo = Column(Boolean, default=True)
 
@@ -21,8 +21,8 @@ class Medidor(Base):
     id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), nullable=True)
 
     # Relaciones ORM
-    usuario_afiliado = relationship("UsuarioAfiliado", backref="medidor", lazy="joined") # relación con t_usuario_afiliado
-    sector = relationship("Sector", backref="medidores", lazy="joined") # relación con t_sector
+    usuario_afiliado = relationship("UsuarioAfiliado", backref="medidor") # relación con t_usuario_afiliado
+    sector = relationship("Sector", backref="medidores") # relación con t_sector
 
     def __repr__(self):
         return f"<Medidor id={self.id_medidor}, num_medidor={self.num_medidor}, usuario_afi={self.id_usuario_afi}, sector={self.id_sector}>"
@@ -51,3 +51,31 @@ class Medidor(Base):
                 "nombre_sector": getattr(self.sector, "nombre_sector", None)
             } if self.sector else None
         }
+
+
+# Ubicación como point(longitud, latitud) con índice GiST: consultas por
+# rectángulo (ubicacion <@ box) y por cercanía (ORDER BY ubicacion <-> point).
+# Las consultas deben usar esta misma expresión para aprovechar el índice.
+ubicacion_medidor = func.point(cast(Medidor.longitud, Float), cast(Medidor.latitud, Float))
+Index("ix_medidor_ubicacion", ubicacion_medidor, postgresql_using="gist")
+
+
+class TeselaMapa(Base):
+    """
+    Tesela precalculada del mapa de medidores (GeoJSON comprimido con gzip).
+    Se borra cuando cambia un medidor dentro de ella y se regenera al pedirla.
+    Tabla: t_tesela_mapa
+    """
+    __tablename__ = "t_tesela_mapa"
+    __table_args__ = {"schema": "medidores"}
+
+    z = Column(Integer, primary_key=True)
+    x = Column(Integer, primary_key=True)
+    y = Column(Integer, primary_key=True)
+    contenido = Column(LargeBinary, nullable=False)
+    etag = Column(String(40), nullable=False)
+    num_medidores = Column(Integer, nullable=False, default=0)
+    fecha_generacion = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<TeselaMapa {self.z}/{self.x}/{self.y} medidores={self.num_medidores}>"
@@ -0,0 +1,95 @@
+# models/payment.py
+from sqlalchemy import Column, Integer, String, Text, Numeric, Boolean, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class Pago(Base):
+    """
+    Libro de pagos (solo inserción: los montos nunca se modifican ni se eliminan)
+    Tabla: t_pagos
+    """
+    __tablename__ = "t_pagos"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_pago = Column(Integer, primary_key=True, index=True)
+    # Generada por el cliente en cada intento de cobro: evita pagos duplicados por doble clic
+    clave_idempotencia = Column(String(64), nullable=False, unique=True)
+    monto = Column("monto_pago", Numeric(12, 2), key="monto", nullable=False)
+    metodo = Column("metodo_pago", String(50), key="metodo", nullable=False, default="efectivo")  # 'efectivo', 'transferencia', 'deposito'
+    referencia = Column(String(100), nullable=True)
+    observacion = Column("observaciones", Text, key="observacion", nullable=True)
+    fecha_pago = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    # Solo los pagos anulados antes de la migración tienen activo = false
+    activo = Column(Boolean, nullable=False, default=True)
+
+    # 🔗 Relaciones foráneas
+    id_usuario_afi = Column(Integer, ForeignKey("usuarios.t_usuario_afiliado.id_usuario_afi"), nullable=False, index=True)
+    # Puede faltar solo en pagos anteriores a la migración
+    id_cajero = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=True, index=True)
+    # Se asigna una sola vez, al cerrar la caja
+    id_cierre_caja = Column(Integer, ForeignKey("facturacion.t_cierre_caja.id_cierre_caja"), nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<Pago id={self.id_pago}, afiliado={self.id_usuario_afi}, monto={self.monto}>"
+
+
+class PagoFactura(Base):
+    """
+    Aplicación de un pago a las facturas pendientes (de la más antigua a la más nueva)
+    Tabla: t_pago_factura
+    """
+    __tablename__ = "t_pago_factura"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_pago_factura = Column(Integer, primary_key=True, index=True)
+    id_pago = Column(Integer, ForeignKey("facturacion.t_pagos.id_pago"), nullable=False, index=True)
+    id_factura = Column(Integer, ForeignKey("facturacion.t_factura.id_factura"), nullable=False, index=True)
+    monto = Column(Numeric(12, 2), nullable=False)
+
+    def __repr__(self):
+        return f"<PagoFactura pago={self.id_pago}, factura={self.id_factura}, monto={self.monto}>"
+
+
+class SaldoAfiliado(Base):
+    """
+    Saldo materializado por afiliado. Se actualiza en la misma transacción
+    que la facturación y los pagos; las consultas de caja leen solo esta fila.
+    Saldo negativo = saldo a favor del afiliado.
+    Tabla: t_saldo_afiliado
+    """
+    __tablename__ = "t_saldo_afiliado"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_usuario_afi = Column(Integer, ForeignKey("usuarios.t_usuario_afiliado.id_usuario_afi"), primary_key=True)
+    total_facturado = Column(Numeric(14, 2), nullable=False, default=0)
+    total_pagado = Column(Numeric(14, 2), nullable=False, default=0)
+    saldo = Column(Numeric(14, 2), nullable=False, default=0)
+    facturas_pendientes = Column(Integer, nullable=False, default=0)
+    fecha_ultimo_pago = Column(DateTime, nullable=True)
+    fecha_actualizacion = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SaldoAfiliado afiliado={self.id_usuario_afi}, saldo={self.saldo}>"
+
+
+class CierreCaja(Base):
+    """
+    Cierre de caja de un cajero: agrupa los pagos cobrados desde el cierre anterior
+    Tabla: t_cierre_caja
+    """
+    __tablename__ = "t_cierre_caja"
+    __table_args__ = {"schema": "facturacion"}
+
+    id_cierre_caja = Column(Integer, primary_key=True, index=True)
+    clave_idempotencia = Column(String(64), nullable=True, unique=True)
+    id_cajero = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=False, index=True)
+    fecha_cierre = Column(DateTime, server_default=func.now(), nullable=False)
+    num_pagos = Column(Integer, nullable=False, default=0)
+    monto_total = Column(Numeric(14, 2), nullable=False, default=0)
+    monto_declarado = Column(Numeric(14, 2), nullable=True)
+    diferencia = Column(Numeric(14, 2), nullable=True)
+    observacion = Column(String(255), nullable=True)
+
+    def __repr__(self):
+        return f"<CierreCaja id={self.id_cierre_caja}, cajero={self.id_cajero}, total={self.monto_total}>"
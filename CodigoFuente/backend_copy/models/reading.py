@@ -0,0 +1,70 @@
+# models/reading.py
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class Lectura(Base):
+    """
+    Modelo de Lectura de medidor
+    Tabla: t_lecturas
+    """
+    __tablename__ = "t_lecturas"
+    __table_args__ = (
+        UniqueConstraint("id_medidor", "periodo", name="uq_lectura_medidor_periodo"),
+        {"schema": "medidores"},
+    )
+
+    # Campos principales
+    id_lectura = Column(Integer, primary_key=True, index=True)
+    periodo = Column(Date, nullable=False, index=True)  # primer día del mes leído
+    fecha_lectura = Column(DateTime, server_default=func.now(), nullable=False)
+    lectura_anterior = Column(Numeric(12, 2), nullable=True)
+    lectura_actual = Column(Numeric(12, 2), nullable=False)
+    consumo = Column("consumo_m3", Numeric(12, 2), key="consumo", nullable=False, default=0)
+    observacion = Column(String(255), nullable=True)
+    activo = Column(Boolean, default=True)
+
+    # Lecturas estimadas (el lector no pudo acceder al medidor)
+    estimada = Column(Boolean, nullable=False, default=False)
+    metodo_estimacion = Column(String(20), nullable=True)  # 'promedio', 'mes_anio_anterior', 'mediana_sector'
+    # m3 facturados de más por estimaciones anteriores que aún no se consumen:
+    # la siguiente lectura descuenta desde lectura_actual + ajuste_estimacion
+    ajuste_estimacion = Column(Numeric(12, 2), nullable=False, default=0)
+
+    # Foto del medidor como evidencia (archivo en el almacenamiento por contenido)
+    foto_hash = Column(String(64), ForeignKey("archivos.t_blob.hash"), nullable=True)
+
+    # 🔗 Relaciones foráneas
+    id_medidor = Column(Integer, ForeignKey("medidores.t_medidor.id_medidor"), nullable=False, index=True)
+    id_lector = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=True)
+
+    def __repr__(self):
+        return f"<Lectura id={self.id_lectura}, medidor={self.id_medidor}, periodo={self.periodo}, consumo={self.consumo}>"
+
+
+class AlertaLectura(Base):
+    """
+    Lectura sospechosa detectada antes de facturar (cola de revisión del lector)
+    Tabla: t_alerta_lectura
+    """
+    __tablename__ = "t_alerta_lectura"
+    __table_args__ = {"schema": "medidores"}
+
+    id_alerta = Column(Integer, primary_key=True, index=True)
+    periodo = Column(Date, nullable=False, index=True)
+    tipo = Column(String(30), nullable=False)  # 'consumo_atipico', 'consumo_cero', 'lectura_negativa'
+    valor = Column(Numeric(12, 2), nullable=True)  # consumo, racha de ceros o diferencia negativa
+    puntaje = Column(Numeric(8, 2), nullable=True)  # z-score robusto (mediana/MAD)
+    detalle = Column(String(255), nullable=True)
+    estado = Column(String(20), nullable=False, default="pendiente")  # 'pendiente', 'confirmada', 'descartada'
+    fecha_creacion = Column(DateTime, server_default=func.now(), nullable=False)
+    fecha_revision = Column(DateTime, nullable=True)
+
+    # 🔗 Relaciones foráneas
+    id_lectura = Column(Integer, ForeignKey("medidores.t_lecturas.id_lectura", ondelete="CASCADE"), nullable=False, index=True)
+    id_medidor = Column(Integer, ForeignKey("medidores.t_medidor.id_medidor"), nullable=False)
+    id_revisor = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=True)
+
+    def __repr__(self):
+        return f"<AlertaLectura id={self.id_alerta}, tipo={self.tipo}, medidor={self.id_medidor}, estado={self.estado}>"
@@ -15,7 +15,7 @@ class Rol(Base):
     fecha_creacion = Column(DateTime, server_default=func.now())
     
     # Relación con acciones del rol
-    acciones = relationship("RolAccion", back_populates="rol", lazy="joined")
+    acciones = relationship("RolAccion", back_populates="rol")
     
     def __repr__(self):
         return f"<Rol {self.nombre_rol}>"
@@ -1,5 +1,5 @@
 # models/user.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, LargeBinary, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, LargeBinary, Date, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from db.session import Base
@@ -27,7 +27,8 @@ class UsuarioSistema(Base):
     fecha_nac = Column(Date, nullable=True)
     fecha_registro = Column(DateTime, server_default=func.now())
     ultimo_acceso = Column(DateTime, nullable=True)
-    foto = Column(LargeBinary, nullable=True)
+    foto = Column(LargeBinary, nullable=True)  # heredada: las fotos nuevas van a foto_hash (python -m services.blobs las migra)
+    foto_hash = Column(String(64), ForeignKey("archivos.t_blob.hash"), nullable=True)
     
     # Campos para control de intentos fallidos y bloqueos
     intentos_fallidos = Column(Integer, default=0)
@@ -36,7 +37,7 @@ class UsuarioSistema(Base):
  
     
     # Relación con el rol
-    rol = relationship("Rol", backref="usuarios", lazy="joined")
+    rol = relationship("Rol", backref="usuarios")
     
     def __repr__(self):
         return f"<Usuario {self.usuario}>"
@@ -116,4 +117,13 @@ class UsuarioSistema(Base):
             base_dict["rol"] = self.get_rol_info(db)
             base_dict["permisos"] = self.get_permissions(db)
         
-        return base_dict
\ No newline at end of file
+        return base_dict
+
+
+# Búsqueda por prefijo (LIKE 'texto%') sin distinguir mayúsculas: índices
+# btree con text_pattern_ops sobre lower(...) (no necesitan extensiones)
+Index("ix_usuario_nombres_prefijo", func.lower(UsuarioSistema.nombres).label("nombres_lower"),
+      postgresql_ops={"nombres_lower": "text_pattern_ops"})
+Index("ix_usuario_apellidos_prefijo", func.lower(UsuarioSistema.apellidos).label("apellidos_lower"),
+      postgresql_ops={"apellidos_lower": "text_pattern_ops"})
+Index("ix_usuario_cedula_prefijo", UsuarioSistema.cedula, postgresql_ops={"cedula": "text_pattern_ops"})
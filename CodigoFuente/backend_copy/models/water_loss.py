@@ -0,0 +1,74 @@
+# models/water_loss.py
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from db.session import Base
+
+
+class MacroMedidor(Base):
+    """
+    Macromedidor de una línea de distribución que abastece a un sector
+    (un sector puede tener varias líneas)
+    Tabla: t_macro_medidor
+    """
+    __tablename__ = "t_macro_medidor"
+    __table_args__ = {"schema": "medidores"}
+
+    id_macro_medidor = Column(Integer, primary_key=True, index=True)
+    num_macro_medidor = Column(String(50), nullable=False, unique=True)
+    descripcion = Column(String(255), nullable=True)
+    activo = Column(Boolean, default=True, nullable=False)
+    id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<MacroMedidor id={self.id_macro_medidor}, num='{self.num_macro_medidor}', sector={self.id_sector}>"
+
+
+class LecturaMacro(Base):
+    """
+    Lectura mensual de un macromedidor
+    Tabla: t_lectura_macro
+    """
+    __tablename__ = "t_lectura_macro"
+    __table_args__ = (
+        UniqueConstraint("id_macro_medidor", "periodo", name="uq_lectura_macro_periodo"),
+        {"schema": "medidores"},
+    )
+
+    id_lectura_macro = Column(Integer, primary_key=True, index=True)
+    periodo = Column(Date, nullable=False, index=True)  # primer día del mes leído
+    fecha_lectura = Column(DateTime, server_default=func.now(), nullable=False)
+    lectura_anterior = Column(Numeric(14, 2), nullable=True)
+    lectura_actual = Column(Numeric(14, 2), nullable=False)
+    volumen = Column(Numeric(14, 2), nullable=False, default=0)  # m3 entregados en el periodo
+    observacion = Column(String(255), nullable=True)
+
+    id_macro_medidor = Column(Integer, ForeignKey("medidores.t_macro_medidor.id_macro_medidor"), nullable=False, index=True)
+    id_lector = Column(Integer, ForeignKey("usuarios.t_usuario_sistema.id_usuario_sistema"), nullable=True)
+
+    def __repr__(self):
+        return f"<LecturaMacro macro={self.id_macro_medidor}, periodo={self.periodo}, volumen={self.volumen}>"
+
+
+class PerdidaSector(Base):
+    """
+    Resultado precalculado del análisis de agua no facturada por sector y periodo
+    (lo regenera services/water_loss.py; el dashboard solo lee esta tabla)
+    Tabla: t_perdida_sector
+    """
+    __tablename__ = "t_perdida_sector"
+    __table_args__ = {"schema": "medidores"}
+
+    id_sector = Column(Integer, ForeignKey("medidores.t_sector.id_sector"), primary_key=True)
+    periodo = Column(Date, primary_key=True)
+    volumen_suministrado = Column(Numeric(14, 2), nullable=False, default=0)  # suma de macromedidores
+    volumen_consumido = Column(Numeric(14, 2), nullable=False, default=0)     # suma de medidores de clientes
+    volumen_perdido = Column(Numeric(14, 2), nullable=False, default=0)
+    porcentaje_perdida = Column(Numeric(7, 2), nullable=True)  # NULL si no hubo suministro medido
+    tendencia = Column(Numeric(7, 2), nullable=True)           # puntos porcentuales por mes
+    ranking = Column(Integer, nullable=True)                   # 1 = sector con más pérdida
+    num_medidores = Column(Integer, nullable=False, default=0)
+    num_estimadas = Column(Integer, nullable=False, default=0)
+    fecha_calculo = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<PerdidaSector sector={self.id_sector}, periodo={self.periodo}, porcentaje={self.porcentaje_perdida}>"
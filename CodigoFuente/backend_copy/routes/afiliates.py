@@ -1,10 +1,12 @@
 # routes/affiliates.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, exists, or_, tuple_, cast, String, Select
 from psycopg2.errors import ForeignKeyViolation, UniqueViolation
 from typing import List, Optional
 from datetime import date, datetime
+import io
 from models.affiliate import UsuarioAfiliado
 from models.user import UsuarioSistema
 from models.sector import Sector
@@ -13,12 +15,25 @@ from schemas.affiliate import (
     AffiliateCreate, 
     AffiliateUpdate, 
     AffiliateResponse,
-    AffiliateWithUserInfo
+    AffiliateWithUserInfo,
+    AffiliateBulkCreate,
+    AffiliateBulkResponse,
+    AffiliationImportResponse
 )
 from schemas.notification import NotificacionCreate
 from utils.notifications import registrar_notificacion
 from utils.audit_logger import registrar_auditoria
+from services.dashboard import obtener_resumen, invalidar_resumen
+from utils.search import filtro_prefijo
+from utils.serialization import respuesta_json
+from utils.fields import CamposPermitidos, usa_tabla
+from services.affiliate_codes import siguiente_codigo
+from services.affiliates import crear_afiliados
+from services.affiliation_import import importar_afiliaciones, leer_csv
+from services.reader_package import invalidar_paquetes
 from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
 from security.jwt import verify_token
 
 router = APIRouter(prefix="/affiliates", tags=["affiliates"])
@@ -36,7 +51,7 @@ def get_db():
 # ============================================================================
 def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
     """Obtiene el usuario actual desde el payload del JWT"""
-    user = db.query(UsuarioSistema).filter(
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
         UsuarioSistema.usuario == payload["sub"]
     ).first()
     
@@ -138,53 +153,118 @@ def affiliate_to_response(affiliate: UsuarioAfiliado, db: Session) -> dict:
         } if sector else None
     }
 
+# ============================================================================
+# CAMPOS DE LA RESPUESTA (mismo formato que affiliate_to_response, ?fields=)
+# ============================================================================
+CAMPOS_AFILIADO = CamposPermitidos({
+    "id_usuario_afi": ([UsuarioAfiliado.id_usuario_afi], lambda f: f.id_usuario_afi),
+    "cod_usuario_afi": ([UsuarioAfiliado.cod_usuario_afi], lambda f: f.cod_usuario_afi),
+    "fecha_afiliacion": (
+        [UsuarioAfiliado.fecha_afiliacion],
+        lambda f: f.fecha_afiliacion.isoformat() if f.fecha_afiliacion else None
+    ),
+    "id_sector": ([UsuarioAfiliado.id_sector], lambda f: f.id_sector),
+    "id_usuario_sistema": ([UsuarioAfiliado.id_usuario_sistema], lambda f: f.id_usuario_sistema),
+    "activo": ([UsuarioAfiliado.activo], lambda f: f.activo),
+    "usuario": (
+        [
+            UsuarioAfiliado.id_usuario_sistema,
+            UsuarioSistema.usuario,
+            UsuarioSistema.nombres,
+            UsuarioSistema.apellidos,
+            UsuarioSistema.cedula,
+            UsuarioSistema.email,
+            UsuarioSistema.telefono,
+            UsuarioSistema.direccion,
+            UsuarioSistema.activo.label("usuario_activo")
+        ],
+        lambda f: {
+            "id": f.id_usuario_sistema,
+            "usuario": f.usuario,
+            "nombres": f.nombres,
+            "apellidos": f.apellidos,
+            "cedula": f.cedula,
+            "email": f.email,
+            "telefono": f.telefono,
+            "direccion": f.direccion,
+            "activo": f.usuario_activo
+        }
+    ),
+    "sector": (
+        [
+            UsuarioAfiliado.id_sector,
+            Sector.nombre_sector,
+            Sector.descripcion.label("sector_descripcion"),
+            Sector.activo.label("sector_activo")
+        ],
+        lambda f: {
+            "id_sector": f.id_sector,
+            "nombre_sector": f.nombre_sector,
+            "descripcion": f.sector_descripcion,
+            "activo": f.sector_activo
+        }
+    ),
+})
+
+def unir_tablas_afiliado(stmt: Select) -> Select:
+    """JOIN con usuario y sector solo si las columnas o filtros los usan (llamar después de los filtros)"""
+    if usa_tabla(stmt, UsuarioSistema):
+        stmt = stmt.join(UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema)
+    if usa_tabla(stmt, Sector):
+        stmt = stmt.join(Sector, Sector.id_sector == UsuarioAfiliado.id_sector)
+    return stmt
+
 # ========================================
 # LISTAR AFILIADOS
 # ========================================
 @router.get("/", response_model=List[dict])
+@max_queries(3)
 def listar_afiliados(
     search: Optional[str] = Query(None, description="Buscar por nombre, cédula, código"),
     id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
     activo: Optional[bool] = Query(None, description="Filtrar por estado activo"),
     skip: int = Query(0, ge=0, description="Número de registros a saltar"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
     db: Session = Depends(get_db),
     payload: dict = Depends(verify_token)
 ):
     """
     Lista todos los afiliados con filtros opcionales
+    Con fields= solo se consultan y devuelven esos campos (ver CAMPOS_AFILIADO)
     Requiere permiso: afiliados.lectura o afiliados.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "afiliados", "lectura")
     
-    query = db.query(UsuarioAfiliado).join(UsuarioSistema).join(Sector)
+    # Solo las columnas de los campos pedidos, directamente desde la consulta
+    elegidos = CAMPOS_AFILIADO.elegir(fields)
+    stmt = select(*CAMPOS_AFILIADO.columnas(elegidos)).select_from(UsuarioAfiliado)
     
     # Filtro de búsqueda
     if search:
         search_filter = f"%{search}%"
-        query = query.filter(
+        stmt = stmt.where(
             (UsuarioSistema.nombres.ilike(search_filter)) |
             (UsuarioSistema.apellidos.ilike(search_filter)) |
             (UsuarioSistema.cedula.ilike(search_filter)) |
-            (UsuarioAfiliado.cod_usuario_afi.cast(db.String).ilike(search_filter))
+            (cast(UsuarioAfiliado.cod_usuario_afi, String).ilike(search_filter))
         )
     
     # Filtro por sector
     if id_sector:
-        query = query.filter(UsuarioAfiliado.id_sector == id_sector)
+        stmt = stmt.where(UsuarioAfiliado.id_sector == id_sector)
     
     # Filtro por estado
     if activo is not None:
-        query = query.filter(UsuarioAfiliado.activo == activo)
-    
-    # Ordenar por código de afiliado
-    query = query.order_by(UsuarioAfiliado.cod_usuario_afi.desc())
+        stmt = stmt.where(UsuarioAfiliado.activo == activo)
     
-    # Paginación
-    affiliates = query.offset(skip).limit(limit).all()
+    # Ordenar por código de afiliado y paginar
+    filas = db.execute(
+        unir_tablas_afiliado(stmt).order_by(UsuarioAfiliado.cod_usuario_afi.desc()).offset(skip).limit(limit)
+    ).all()
     
-    return [affiliate_to_response(aff, db) for aff in affiliates]
+    return respuesta_json([CAMPOS_AFILIADO.respuesta(fila, elegidos) for fila in filas])
 
 # ========================================
 # OBTENER AFILIADO POR ID
@@ -192,17 +272,32 @@ def listar_afiliados(
 @router.get("/{id_usuario_afi}", response_model=dict)
 def obtener_afiliado(
     id_usuario_afi: int,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
     db: Session = Depends(get_db),
     payload: dict = Depends(verify_token)
 ):
     """
     Obtiene un afiliado específico por ID
+    Con fields= solo se consultan y devuelven esos campos (ver CAMPOS_AFILIADO)
     Requiere permiso: afiliados.lectura o afiliados.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "afiliados", "lectura")
     
-    affiliate = db.query(UsuarioAfiliado).filter(
+    if fields is not None:
+        elegidos = CAMPOS_AFILIADO.elegir(fields)
+        fila = db.execute(unir_tablas_afiliado(
+            select(*CAMPOS_AFILIADO.columnas(elegidos)).select_from(UsuarioAfiliado)
+            .where(UsuarioAfiliado.id_usuario_afi == id_usuario_afi)
+        )).first()
+        if not fila:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Afiliado no encontrado"
+            )
+        return respuesta_json(CAMPOS_AFILIADO.respuesta(fila, elegidos))
+    
+    affiliate = db.query(UsuarioAfiliado).options(*perfil("afiliado_detalle")).filter(
         UsuarioAfiliado.id_usuario_afi == id_usuario_afi
     ).first()
     
@@ -218,51 +313,63 @@ def obtener_afiliado(
 # LISTAR USUARIOS NO AFILIADOS
 # ========================================
 @router.get("/available/users", response_model=List[dict])
+@max_queries(3)
 def listar_usuarios_disponibles(
-    search: Optional[str] = Query(None, description="Buscar por nombre o cédula"),
+    search: Optional[str] = Query(None, description="Inicio del nombre, apellido o cédula"),
+    despues_de_nombre: Optional[str] = Query(None, description="Nombres del último usuario de la página anterior"),
+    despues_de_id: Optional[int] = Query(None, description="ID del último usuario de la página anterior"),
+    limit: int = Query(50, ge=1, le=200, description="Número máximo de registros"),
     db: Session = Depends(get_db),
     payload: dict = Depends(verify_token)
 ):
     """
-    Lista usuarios del sistema que NO están afiliados
+    Lista usuarios del sistema que NO están afiliados, ordenados por nombre.
+    Paginación por cursor: para la siguiente página enviar nombres e id del
+    último usuario recibido.
     Requiere permiso: afiliados.lectura o afiliados.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "afiliados", "lectura")
     
-    # Obtener IDs de usuarios ya afiliados
-    afiliados_ids = db.query(UsuarioAfiliado.id_usuario_sistema).filter(
-        UsuarioAfiliado.activo == True
-    ).all()
-    afiliados_ids = [id[0] for id in afiliados_ids]
+    if (despues_de_nombre is None) != (despues_de_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El cursor necesita despues_de_nombre y despues_de_id"
+        )
     
-    # Buscar usuarios que NO estén afiliados y estén activos
-    query = db.query(UsuarioSistema).filter(
-        UsuarioSistema.activo == True,
-        ~UsuarioSistema.id_usuario_sistema.in_(afiliados_ids) if afiliados_ids else True
+    # Anti-join: usuarios activos sin afiliación activa (solo las columnas necesarias)
+    afiliado = exists().where(
+        UsuarioAfiliado.id_usuario_sistema == UsuarioSistema.id_usuario_sistema,
+        UsuarioAfiliado.activo == True
     )
-    
-    # Filtro de búsqueda
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            (UsuarioSistema.nombres.ilike(search_filter)) |
-            (UsuarioSistema.apellidos.ilike(search_filter)) |
-            (UsuarioSistema.cedula.ilike(search_filter))
+    stmt = select(
+        UsuarioSistema.id_usuario_sistema,
+        UsuarioSistema.usuario,
+        UsuarioSistema.nombres,
+        UsuarioSistema.apellidos,
+        UsuarioSistema.cedula,
+        UsuarioSistema.email,
+        UsuarioSistema.telefono,
+        UsuarioSistema.direccion
+    ).where(UsuarioSistema.activo == True, ~afiliado)
+    
+    # Filtro de búsqueda (por prefijo, usa índices)
+    if search and search.strip():
+        stmt = stmt.where(or_(
+            filtro_prefijo(search, UsuarioSistema.nombres, UsuarioSistema.apellidos),
+            filtro_prefijo(search, UsuarioSistema.cedula, minusculas=False)
+        ))
+    
+    if despues_de_id is not None:
+        stmt = stmt.where(
+            tuple_(UsuarioSistema.nombres, UsuarioSistema.id_usuario_sistema) > tuple_(despues_de_nombre, despues_de_id)
         )
     
-    users = query.order_by(UsuarioSistema.nombres).all()
+    users = db.execute(
+        stmt.order_by(UsuarioSistema.nombres, UsuarioSistema.id_usuario_sistema).limit(limit)
+    ).mappings().all()
     
-    return [{
-        "id_usuario_sistema": user.id_usuario_sistema,
-        "usuario": user.usuario,
-        "nombres": user.nombres,
-        "apellidos": user.apellidos,
-        "cedula": user.cedula,
-        "email": user.email,
-        "telefono": user.telefono,
-        "direccion": user.direccion
-    } for user in users]
+    return [dict(user) for user in users]
 
 # ========================================
 # CREAR AFILIADO
@@ -314,12 +421,8 @@ def crear_afiliado(
             detail=f"El usuario '{user.nombres} {user.apellidos}' ya está afiliado"
         )
     
-    # Generar código de afiliado (último código + 1)
-    ultimo_codigo = db.query(UsuarioAfiliado.cod_usuario_afi).order_by(
-        UsuarioAfiliado.cod_usuario_afi.desc()
-    ).first()
-    
-    nuevo_codigo = (ultimo_codigo[0] + 1) if ultimo_codigo else 1
+    # Código de afiliado desde la secuencia (seguro con creaciones simultáneas)
+    nuevo_codigo = siguiente_codigo(db)
     
     # Crear nuevo afiliado
     nuevo_afiliado = UsuarioAfiliado(
@@ -333,6 +436,7 @@ def crear_afiliado(
     try:
         db.add(nuevo_afiliado)
         db.commit()
+        invalidar_resumen()
         db.refresh(nuevo_afiliado)
         
         # Auditoría
@@ -373,6 +477,121 @@ def crear_afiliado(
             detail=f"Error al crear el afiliado: {str(e)}"
         )
 
+# ========================================
+# AFILIACIÓN MASIVA
+# ========================================
+@router.post("/bulk", response_model=AffiliateBulkResponse, status_code=status.HTTP_201_CREATED)
+def crear_afiliados_masivo(
+    request: AffiliateBulkCreate,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Afilia un lote de usuarios (hasta 5000) en una sola transacción.
+    Las filas con errores se devuelven en 'errores' y no impiden las demás.
+    Requiere permiso: afiliados.crear o afiliados.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "afiliados", "crear")
+
+    try:
+        resumen = crear_afiliados(db, request.afiliados)
+    except IntegrityError as e:
+        # Las afiliaciones simultáneas del mismo usuario no llegan aquí (se
+        # informan por fila); queda un usuario o sector borrado a mitad del lote
+        db.rollback()
+        if isinstance(e.orig, ForeignKeyViolation):
+            detalle = "Otro proceso eliminó alguno de los usuarios o sectores del lote; reintente"
+        else:
+            detalle = f"Conflicto de integridad al guardar el lote: {str(e.orig)}"
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detalle
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en la afiliación masiva: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error en la afiliación masiva: {str(e)}"
+        )
+
+    if resumen["creados"]:
+        invalidar_resumen()
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Afiliación masiva: {resumen['creados']} creados, {resumen['rechazados']} rechazados por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    return resumen
+
+# ========================================
+# IMPORTACIÓN DE HOGARES (AFILIADO + MEDIDOR)
+# ========================================
+@router.post("/import", response_model=AffiliationImportResponse)
+def importar_hogares(
+    file: UploadFile = File(...),
+    codificacion: str = Query("utf-8", description="Codificación del archivo (utf-8, latin-1)"),
+    simular: bool = Query(False, description="Solo validar, sin crear registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Importa una hoja (CSV) con columnas cedula, sector (id o nombre),
+    num_medidor y opcionalmente latitud, longitud y altitud: crea la
+    afiliación de cada usuario y su medidor. Devuelve los errores por fila.
+    Requiere permiso: afiliados.crear y medidores.crear
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "afiliados", "crear")
+    require_permission(current_user, db, "medidores", "crear")
+
+    try:
+        texto = io.TextIOWrapper(file.file, encoding=codificacion, errors="replace", newline="")
+        filas = leer_csv(texto)
+        resumen = importar_afiliaciones(db, filas, simular=simular)
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Codificación desconocida: {codificacion}"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al importar afiliaciones: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al importar el archivo: {str(e)}"
+        )
+
+    if resumen["medidores_creados"]:
+        invalidar_resumen()
+        invalidar_paquetes(resumen["sectores"])
+
+        registrar_auditoria(
+            db=db,
+            accion="CREATE",
+            descripcion=f"Importación '{file.filename}': {resumen['afiliados_creados']} afiliados y {resumen['medidores_creados']} medidores creados, {resumen['rechazadas']} filas rechazadas por '{payload['sub']}'",
+            id_usuario=current_user.id_usuario_sistema
+        )
+
+        registrar_notificacion(
+            db=db,
+            id_usuario=current_user.id_usuario_sistema,
+            titulo="Importación completada",
+            mensaje=f"{file.filename}: {resumen['medidores_creados']} de {resumen['filas']} hogares importados.",
+            tipo="exito" if not resumen["rechazadas"] else "alerta"
+        )
+
+    return resumen
+
 # ========================================
 # ACTUALIZAR AFILIADO
 # ========================================
@@ -391,7 +610,7 @@ def actualizar_afiliado(
     require_permission(current_user, db, "afiliados", "actualizar")
     
     # Buscar el afiliado
-    affiliate = db.query(UsuarioAfiliado).filter(
+    affiliate = db.query(UsuarioAfiliado).options(*perfil("afiliado_detalle")).filter(
         UsuarioAfiliado.id_usuario_afi == id_usuario_afi
     ).first()
     
@@ -420,6 +639,7 @@ def actualizar_afiliado(
     
     try:
         db.commit()
+        invalidar_resumen()
         db.refresh(affiliate)
         
         # Auditoría
@@ -467,7 +687,7 @@ def eliminar_afiliado(
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "afiliados", "eliminar")
     
-    affiliate = db.query(UsuarioAfiliado).filter(
+    affiliate = db.query(UsuarioAfiliado).options(*perfil("afiliado_detalle")).filter(
         UsuarioAfiliado.id_usuario_afi == id_usuario_afi
     ).first()
     
@@ -485,6 +705,7 @@ def eliminar_afiliado(
         # Intentar eliminar físicamente
         db.delete(affiliate)
         db.commit()
+        invalidar_resumen()
         
         # Auditoría
         registrar_auditoria(
@@ -523,6 +744,7 @@ def eliminar_afiliado(
             
             affiliate.activo = False
             db.commit()
+            invalidar_resumen()
             db.refresh(affiliate)
             
             # Auditoría
@@ -579,7 +801,7 @@ def toggle_affiliate_status(
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "afiliados", "actualizar")
     
-    affiliate = db.query(UsuarioAfiliado).filter(
+    affiliate = db.query(UsuarioAfiliado).options(*perfil("afiliado_detalle")).filter(
         UsuarioAfiliado.id_usuario_afi == id_usuario_afi
     ).first()
     
@@ -595,6 +817,7 @@ def toggle_affiliate_status(
     
     try:
         db.commit()
+        invalidar_resumen()
         db.refresh(affiliate)
         
         user = affiliate.usuario_sistema
@@ -625,31 +848,21 @@ def obtener_estadisticas_afiliados(
     payload: dict = Depends(verify_token)
 ):
     """
-    Obtiene estadísticas de afiliados
+    Obtiene estadísticas de afiliados (del resumen del dashboard)
     Requiere permiso: afiliados.lectura o afiliados.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "afiliados", "lectura")
     
-    total = db.query(UsuarioAfiliado).count()
-    activos = db.query(UsuarioAfiliado).filter(UsuarioAfiliado.activo == True).count()
-    inactivos = db.query(UsuarioAfiliado).filter(UsuarioAfiliado.activo == False).count()
-    
-    # Afiliados por sector
-    por_sector = db.query(
-        Sector.nombre_sector,
-        db.func.count(UsuarioAfiliado.id_usuario_afi)
-    ).join(
-        UsuarioAfiliado, Sector.id_sector == UsuarioAfiliado.id_sector
-    ).filter(
-        UsuarioAfiliado.activo == True
-    ).group_by(
-        Sector.nombre_sector
-    ).all()
+    resumen = obtener_resumen(db)
+    
+    # Afiliados activos por sector
+    por_sector = {}
+    for sector in resumen["por_sector"]:
+        if sector["afiliados_activos"]:
+            por_sector[sector["nombre_sector"]] = por_sector.get(sector["nombre_sector"], 0) + sector["afiliados_activos"]
     
     return {
-        "total": total,
-        "activos": activos,
-        "inactivos": inactivos,
-        "por_sector": [{"sector": s[0], "cantidad": s[1]} for s in por_sector]
+        **resumen["afiliados"],
+        "por_sector": [{"sector": nombre, "cantidad": cantidad} for nombre, cantidad in por_sector.items()]
     }
\ No newline at end of file
@@ -1,18 +1,24 @@
 # routes/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from schemas.user import UserLogin
 from models.user import UsuarioSistema
 from models.role import Rol, RolAccion
 from db.session import SessionLocal
-from security.jwt import create_access_token, verify_token
+from db.async_session import get_async_db
+from db.query_guard import max_queries
+from security.jwt import create_access_token, verify_token, verify_token_async
 from security.password import verify_password, hash_password
 import base64
 from secrets import token_urlsafe
 import secrets
 import string
 from utils.email import email_service
+from services.blobs import foto_usuario
 
 router = APIRouter(tags=["auth"])
 
@@ -95,6 +101,43 @@ def get_user_role_and_permissions(db: Session, user: UsuarioSistema) -> dict:
         "permisos": permisos_data
     }
 
+async def get_user_role_and_permissions_async(db: AsyncSession, user: UsuarioSistema) -> dict:
+    """get_user_role_and_permissions con AsyncSession (rol y acciones en una consulta)"""
+    if not user.id_rol:
+        return {
+            "rol": None,
+            "permisos": []
+        }
+    
+    filas = (await db.execute(
+        select(Rol.id_rol, Rol.nombre_rol, Rol.descripcion,
+               RolAccion.id_rol_accion, RolAccion.nombre_accion, RolAccion.tipo_accion)
+        .outerjoin(RolAccion, (RolAccion.id_rol == Rol.id_rol) & (RolAccion.activo == True))
+        .where(Rol.id_rol == user.id_rol, Rol.activo == True)
+    )).all()
+    
+    if not filas:
+        return {
+            "rol": None,
+            "permisos": []
+        }
+    
+    return {
+        "rol": {
+            "id_rol": filas[0].id_rol,
+            "nombre_rol": filas[0].nombre_rol,
+            "descripcion": filas[0].descripcion
+        },
+        "permisos": [
+            {
+                "id_rol_accion": fila.id_rol_accion,
+                "nombre_accion": fila.nombre_accion,
+                "tipo_accion": fila.tipo_accion
+            }
+            for fila in filas if fila.id_rol_accion is not None
+        ]
+    }
+
 # ========================================
 # FUNCIONES DE CONTROL DE BLOQUEO
 # ========================================
@@ -237,7 +280,7 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
 
         # Obtener rol y permisos
         rol_permisos = get_user_role_and_permissions(db, db_user)
-        foto_url = process_user_photo(db_user.foto) if hasattr(db_user, 'foto') and db_user.foto else None
+        foto_url = process_user_photo(foto_usuario(db_user))
 
         # Crear token
         token_data = {
@@ -286,11 +329,11 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
 # VERIFICAR SESIÓN
 # ========================================
 @router.get("/verify-session")
-def verify_session(payload: dict = Depends(verify_token), db: Session = Depends(get_db)):
-    """Verifica que el token sea válido y devuelve datos del usuario con rol y permisos"""
-    db_user = db.query(UsuarioSistema).filter(
-        UsuarioSistema.usuario == payload["sub"]
-    ).first()
+async def verify_session(payload: dict = Depends(verify_token_async), db: AsyncSession = Depends(get_async_db)):
+    """Verifica que el token sea válido y devuelve datos del usuario con rol y permisos (async)"""
+    db_user = (await db.execute(
+        select(UsuarioSistema).where(UsuarioSistema.usuario == payload["sub"])
+    )).scalars().first()
     
     if not db_user:
         raise HTTPException(
@@ -320,13 +363,15 @@ def verify_session(payload: dict = Depends(verify_token), db: Session = Depends(
     primer_login = db_user.ultimo_acceso is None
     if primer_login:
         db_user.ultimo_acceso = datetime.now()
-        db.commit()
+        await db.commit()
 
 
 
     # Obtener rol y permisos actualizados
-    rol_permisos = get_user_role_and_permissions(db, db_user)
-    foto_url = process_user_photo(db_user.foto) if hasattr(db_user, 'foto') and db_user.foto else None
+    rol_permisos = await get_user_role_and_permissions_async(db, db_user)
+    # Foto en el almacenamiento de archivos: se lee fuera del event loop
+    foto = await run_in_threadpool(foto_usuario, db_user) if db_user.foto_hash else db_user.foto
+    foto_url = process_user_photo(foto)
 
     return {
         "id_usuario_sistema": db_user.id_usuario_sistema,
@@ -416,7 +461,7 @@ def get_profile(payload: dict = Depends(verify_token), db: Session = Depends(get
         )
     
     rol_permisos = get_user_role_and_permissions(db, db_user)
-    foto_url = process_user_photo(db_user.foto) if hasattr(db_user, 'foto') and db_user.foto else None
+    foto_url = process_user_photo(foto_usuario(db_user))
     
     return {
         "id_usuario_sistema": db_user.id_usuario_sistema,
@@ -521,6 +566,7 @@ def unlock_user(
 # OBTENER USUARIOS BLOQUEADOS (ADMIN)
 # ========================================
 @router.get("/admin/blocked-users")
+@max_queries(5)
 def get_blocked_users(
     payload: dict = Depends(verify_token),
     db: Session = Depends(get_db)
@@ -0,0 +1,207 @@
+# routes/blobs.py
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, File
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from models.blob import Blob
+from schemas.reading import BlobResponse
+from services.blobs import registrar_blob, ImagenNoReconocida
+from utils.blob_storage import hash_valido, existe_blob, ruta_blob, ruta_miniatura, encolar_miniatura
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/blobs", tags=["archivos"])
+
+# Un hash siempre identifica el mismo contenido: el navegador puede guardarlo sin revalidar
+CACHE_INMUTABLE = "private, max-age=31536000, immutable"
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+
+def _blob_registrado(db: Session, hash_blob: str) -> Blob:
+    """Blob registrado y presente en disco, o 404"""
+    blob = db.get(Blob, hash_blob) if hash_valido(hash_blob) else None
+    if not blob or not existe_blob(hash_blob):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archivo no encontrado"
+        )
+    return blob
+
+# ========================================
+# SUBIR ARCHIVO
+# ========================================
+@router.post("/", response_model=BlobResponse, status_code=status.HTTP_201_CREATED)
+def subir_archivo(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Sube una foto (p. ej. la esfera del medidor como evidencia de la lectura).
+    Retorna el hash SHA-256 que luego se envía en la lectura; si el mismo
+    contenido ya existía no se guarda de nuevo.
+    Requiere permiso: lecturas.crear o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "crear")
+
+    if not (file.content_type or "").startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe ser una imagen"
+        )
+
+    try:
+        return registrar_blob(db, file.file)
+    except ImagenNoReconocida as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al guardar archivo: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al guardar el archivo"
+        )
+
+# ========================================
+# DESCARGAR ARCHIVO
+# ========================================
+@router.get("/{hash_blob}")
+def descargar_archivo(
+    hash_blob: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Contenido del archivo (admite Range para descargas parciales).
+    Requiere permiso: lecturas.lectura o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "lectura")
+
+    blob = _blob_registrado(db, hash_blob)
+    etag = f'"{blob.hash}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_INMUTABLE}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return FileResponse(ruta_blob(blob.hash), media_type=blob.tipo_contenido, headers=headers)
+
+
+@router.get("/{hash_blob}/thumbnail")
+def descargar_miniatura(
+    hash_blob: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Miniatura JPEG de una imagen (se genera en segundo plano al subirla).
+    Requiere permiso: lecturas.lectura o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "lectura")
+
+    blob = _blob_registrado(db, hash_blob)
+    miniatura = ruta_miniatura(blob.hash)
+    if not miniatura.is_file():
+        if blob.tipo_contenido.startswith("image/"):
+            encolar_miniatura(blob.hash)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="La miniatura no está disponible todavía"
+        )
+
+    etag = f'"{blob.hash}-miniatura"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_INMUTABLE}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return FileResponse(miniatura, media_type="image/jpeg", headers=headers)
@@ -0,0 +1,95 @@
+# routes/clients.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import date
+
+from models.user import UsuarioSistema
+from models.affiliate import UsuarioAfiliado
+from models.consumption import ConsumoMensualAfiliado
+from schemas.consumption import ConsumoAfiliadoResponse, ConsumoMensualResponse
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/clientes", tags=["clientes"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ========================================
+# DASHBOARD DEL CLIENTE
+# ========================================
+@router.get("/me/consumo", response_model=List[ConsumoAfiliadoResponse])
+@max_queries(2)
+def mi_consumo(
+    meses: int = Query(12, ge=1, le=60, description="Cantidad de meses hacia atrás"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Historial mensual de consumo y facturación de las afiliaciones del usuario actual.
+    Lee únicamente los resúmenes precalculados (una consulta por endpoint).
+    Solo requiere sesión: cada cliente ve sus propias afiliaciones.
+    """
+    current_user = get_current_user(payload, db)
+
+    hoy = date.today()
+    indice = hoy.year * 12 + hoy.month - 1 - (meses - 1)
+    desde = date(indice // 12, indice % 12 + 1, 1)
+
+    filas = db.execute(
+        select(
+            UsuarioAfiliado.id_usuario_afi,
+            UsuarioAfiliado.cod_usuario_afi,
+            UsuarioAfiliado.id_sector,
+            ConsumoMensualAfiliado.periodo,
+            ConsumoMensualAfiliado.consumo,
+            ConsumoMensualAfiliado.num_lecturas,
+            ConsumoMensualAfiliado.monto_facturado,
+            ConsumoMensualAfiliado.num_facturas,
+        )
+        .outerjoin(
+            ConsumoMensualAfiliado,
+            (ConsumoMensualAfiliado.id_usuario_afi == UsuarioAfiliado.id_usuario_afi)
+            & (ConsumoMensualAfiliado.periodo >= desde)
+        )
+        .where(UsuarioAfiliado.id_usuario_sistema == current_user.id_usuario_sistema)
+        .order_by(UsuarioAfiliado.id_usuario_afi, ConsumoMensualAfiliado.periodo)
+    ).all()
+
+    afiliaciones = {}
+    for fila in filas:
+        afiliacion = afiliaciones.setdefault(fila.id_usuario_afi, ConsumoAfiliadoResponse(
+            id_usuario_afi=fila.id_usuario_afi,
+            cod_usuario_afi=fila.cod_usuario_afi,
+            id_sector=fila.id_sector,
+        ))
+        if fila.periodo is not None:
+            afiliacion.consumos.append(ConsumoMensualResponse.model_validate(fila))
+
+    return list(afiliaciones.values())
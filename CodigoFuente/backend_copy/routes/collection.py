@@ -0,0 +1,247 @@
+# routes/collection.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func, exists, select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, timedelta
+from decimal import Decimal
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.collection import DeudaPeriodo
+from models.payment import SaldoAfiliado
+from schemas.collection import AntiguedadAfiliadoResponse, AntiguedadResumenResponse, CandidatoCorteResponse
+from services.aging import (
+    consulta_antiguedad, resumen_antiguedad, reconstruir_deuda, condicion_rango,
+    CORTE_DIAS_MINIMO, CORTE_MONTO_MINIMO
+)
+from utils.audit_logger import registrar_auditoria
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/cobranza", tags=["cobranza"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+# ========================================
+# ANTIGÜEDAD DE CARTERA
+# ========================================
+def _consulta_afiliados(db: Session, id_sector: Optional[int], rango: Optional[str]):
+    """Aging por afiliado con datos de contacto; filtros por sector y rango"""
+    hoy = date.today()
+    try:
+        aging = consulta_antiguedad(hoy)
+        if id_sector is not None:
+            aging = aging.where(DeudaPeriodo.id_sector == id_sector)
+        if rango:
+            aging = aging.having(func.sum(DeudaPeriodo.monto).filter(condicion_rango(rango, hoy)) > 0)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    aging = aging.subquery()
+    query = db.query(
+        aging,
+        UsuarioAfiliado.cod_usuario_afi,
+        UsuarioSistema.nombres,
+        UsuarioSistema.apellidos,
+        UsuarioSistema.cedula,
+    ).join(
+        UsuarioAfiliado, UsuarioAfiliado.id_usuario_afi == aging.c.id_usuario_afi
+    ).join(
+        UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema
+    )
+    return query, aging, hoy
+
+
+def _afiliado_response(fila, hoy: date, schema=AntiguedadAfiliadoResponse):
+    return schema(**fila._asdict(), dias_mora=(hoy - fila.fecha_mas_antigua).days)
+
+
+@router.get("/aging", response_model=List[AntiguedadAfiliadoResponse])
+@max_queries(3)
+def listar_antiguedad(
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    rango: Optional[str] = Query(None, description="0_30, 31_60, 61_90 o 90_mas"),
+    skip: int = Query(0, ge=0, description="Registros a saltar"),
+    limit: int = Query(100, ge=1, le=500, description="Límite de registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Deuda de cada afiliado por antigüedad (0-30, 31-60, 61-90 y más de 90 días),
+    ordenada de mayor a menor deuda.
+    Requiere permiso: cobranza.lectura o cobranza.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "cobranza", "lectura")
+
+    query, aging, hoy = _consulta_afiliados(db, id_sector, rango)
+    filas = query.order_by(aging.c.deuda_total.desc(), aging.c.id_usuario_afi).offset(skip).limit(limit).all()
+
+    return [_afiliado_response(fila, hoy) for fila in filas]
+
+
+@router.get("/aging/resumen", response_model=AntiguedadResumenResponse)
+def obtener_resumen_antiguedad(
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Totales de cartera por rango de antigüedad
+    Requiere permiso: cobranza.lectura o cobranza.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "cobranza", "lectura")
+
+    return resumen_antiguedad(db, id_sector)
+
+
+@router.post("/aging/verificar")
+def verificar_antiguedad(
+    corregir: bool = Query(False, description="Reemplazar el estado incremental por el recalculado"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Recalcula la deuda por periodo desde las facturas y la compara con el estado
+    incremental. Con corregir=true lo reemplaza.
+    Requiere permiso: cobranza.actualizar o cobranza.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "cobranza", "actualizar")
+
+    resultado = reconstruir_deuda(db, corregir=corregir)
+
+    if resultado["corregido"]:
+        registrar_auditoria(
+            db=db,
+            accion="UPDATE",
+            descripcion=f"Reconstrucción de cartera: {resultado['diferencias']} diferencias corregidas por '{payload['sub']}'",
+            id_usuario=current_user.id_usuario_sistema
+        )
+
+    return resultado
+
+# ========================================
+# CANDIDATOS A CORTE DE SERVICIO
+# ========================================
+@router.get("/candidatos-corte", response_model=List[CandidatoCorteResponse])
+@max_queries(3)
+def listar_candidatos_corte(
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    dias_minimo: int = Query(CORTE_DIAS_MINIMO, ge=1, description="Días de mora de la deuda más antigua"),
+    monto_minimo: Decimal = Query(CORTE_MONTO_MINIMO, ge=0, description="Deuda total mínima"),
+    skip: int = Query(0, ge=0, description="Registros a saltar"),
+    limit: int = Query(100, ge=1, le=500, description="Límite de registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Afiliados con deuda vencida y servicio activo, para programar cortes.
+    Se calcula sobre la deuda incremental: refleja los pagos al instante.
+    Un afiliado con saldo en cero o a favor (t_saldo_afiliado) nunca es
+    candidato, aunque tenga deuda por periodo pendiente de aplicar.
+    Requiere permiso: cobranza.lectura o cobranza.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "cobranza", "lectura")
+
+    query, aging, hoy = _consulta_afiliados(db, id_sector, None)
+    # Medidores activos de cada candidato en la misma consulta (array(SELECT ...))
+    medidores = func.array(
+        select(Medidor.num_medidor)
+        .where(Medidor.id_usuario_afi == aging.c.id_usuario_afi, Medidor.activo == True)
+        .order_by(Medidor.num_medidor)
+        .scalar_subquery()
+    ).label("medidores")
+    query = query.add_columns(medidores).filter(
+        aging.c.fecha_mas_antigua <= hoy - timedelta(days=dias_minimo),
+        aging.c.deuda_total >= monto_minimo,
+        exists().where(Medidor.id_usuario_afi == aging.c.id_usuario_afi, Medidor.activo == True),
+        exists().where(SaldoAfiliado.id_usuario_afi == aging.c.id_usuario_afi, SaldoAfiliado.saldo > 0)
+    )
+    filas = query.order_by(aging.c.fecha_mas_antigua, aging.c.deuda_total.desc()).offset(skip).limit(limit).all()
+
+    return [_afiliado_response(fila, hoy, CandidatoCorteResponse) for fila in filas]
@@ -0,0 +1,108 @@
+# routes/dashboard.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from schemas.dashboard import ResumenDashboard
+from services.dashboard import obtener_resumen
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+
+# ========================================
+# RESUMEN
+# ========================================
+@router.get("/summary", response_model=ResumenDashboard)
+def obtener_resumen_dashboard(
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Totales de medidores, afiliados y sectores y conteos por sector
+    (dos consultas; se guardan unos segundos en memoria).
+    Requiere permiso: dashboard.lectura o dashboard.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "dashboard", "lectura")
+
+    return obtener_resumen(db)
@@ -0,0 +1,239 @@
+# routes/invoices.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+from datetime import date
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from services.invoice_documents import obtener_datos_facturas
+from services.billing import facturar_periodo, PUNTO_EMISION_DEFAULT
+from utils.audit_logger import registrar_auditoria
+from utils.notifications import registrar_notificacion
+from utils.invoice_pdf import obtener_pdf_cacheado, escribir_pdf_combinado, escribir_zip
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/invoices", tags=["facturas"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+# ========================================
+# GENERAR FACTURAS DEL PERIODO
+# ========================================
+@router.post("/generate", status_code=status.HTTP_201_CREATED)
+def generar_facturas(
+    periodo: date = Query(..., description="Periodo a facturar (primer día del mes)"),
+    id_sector: Optional[int] = Query(None, description="Facturar solo un sector"),
+    punto_emision: str = Query(PUNTO_EMISION_DEFAULT, pattern=r"^\d{3}-\d{3}$", description="Punto de emisión"),
+    estimar: bool = Query(True, description="Estimar las lecturas faltantes antes de facturar"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Genera las facturas de todas las lecturas pendientes del periodo.
+    Los medidores sin lectura se facturan con una lectura estimada.
+    La numeración se reserva por bloques, secuencial y sin huecos.
+    Requiere permiso: facturas.crear o facturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "facturas", "crear")
+
+    try:
+        resumen = facturar_periodo(db, periodo, punto_emision, id_sector, estimar=estimar)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al generar facturas: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al generar las facturas: {str(e)}"
+        )
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Facturación del periodo {periodo:%m/%Y}: {resumen['emitidas']} facturas ({resumen['estimadas']} estimadas, {resumen['primera']} a {resumen['ultima']}) por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    registrar_notificacion(
+        db=db,
+        id_usuario=current_user.id_usuario_sistema,
+        titulo="Facturación completada",
+        mensaje=f"Se emitieron {resumen['emitidas']} facturas del periodo {periodo:%m/%Y}.",
+        tipo="exito"
+    )
+
+    return resumen
+
+# ========================================
+# IMPRESIÓN POR LOTES
+# ========================================
+@router.get("/batch/pdf")
+def descargar_lote_facturas(
+    periodo: date = Query(..., description="Periodo facturado (primer día del mes)"),
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    formato: str = Query("zip", pattern="^(zip|pdf)$", description="zip: un PDF por factura, pdf: un solo PDF combinado"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Descarga las facturas de un periodo (y opcionalmente de un sector)
+    como ZIP o como un único PDF combinado para imprimir.
+    Requiere permiso: facturas.lectura o facturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "facturas", "lectura")
+
+    lista_datos = obtener_datos_facturas(db, periodo=periodo, id_sector=id_sector)
+
+    if not lista_datos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No hay facturas para los filtros indicados"
+        )
+
+    sufijo = f"{periodo:%Y-%m}" + (f"_sector{id_sector}" if id_sector else "")
+
+    # El lote se arma en un archivo temporal (en memoria hasta 32 MB) y se envía por bloques
+    archivo = SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    if formato == "pdf":
+        escribir_pdf_combinado(archivo, lista_datos)
+        media_type = "application/pdf"
+        disposicion = f'inline; filename="facturas_{sufijo}.pdf"'
+    else:
+        escribir_zip(archivo, lista_datos)
+        media_type = "application/zip"
+        disposicion = f'attachment; filename="facturas_{sufijo}.zip"'
+    archivo.seek(0)
+
+    def leer_bloques():
+        try:
+            while bloque := archivo.read(64 * 1024):
+                yield bloque
+        finally:
+            archivo.close()
+
+    return StreamingResponse(
+        leer_bloques(),
+        media_type=media_type,
+        headers={"Content-Disposition": disposicion}
+    )
+
+# ========================================
+# PDF DE UNA FACTURA
+# ========================================
+@router.get("/{id_factura}/pdf")
+def descargar_factura_pdf(
+    id_factura: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Genera (o reutiliza desde caché) el PDF de una factura.
+    Requiere permiso: facturas.lectura o facturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "facturas", "lectura")
+
+    lista_datos = obtener_datos_facturas(db, ids=[id_factura])
+
+    if not lista_datos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Factura no encontrada"
+        )
+
+    clave, pdf = obtener_pdf_cacheado(lista_datos[0])
+    etag = f'"{clave}"'
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={
+            "ETag": etag,
+            "Cache-Control": "private, max-age=0, must-revalidate",
+            "Content-Disposition": f'inline; filename="factura_{lista_datos[0]["num_factura"]}.pdf"'
+        }
+    )
@@ -1,10 +1,14 @@
 # routes/meters.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, or_
+from sqlalchemy import or_, select, exists, tuple_, Select
 from psycopg2.errors import ForeignKeyViolation, UniqueViolation
 from typing import List, Optional
+import gzip
+from datetime import datetime, time
 
 from models.meter import Medidor
 from models.user import UsuarioSistema
@@ -12,12 +16,27 @@ from models.affiliate import UsuarioAfiliado
 from models.sector import Sector
 from schemas.meter import (
     MedidorCreate, MedidorUpdate, MedidorResponse, 
-    MedidorCompleto, MedidorStats, AfiliadoDisponible
+    MedidorCompleto, MedidorStats, AfiliadoDisponible, RutaLecturaResponse,
+    MedidoresMapaResponse
 )
+from services.routing import calcular_ruta
+from services.meter_map import (
+    medidores_en_caja, medidores_cercanos, transmitir_geojson,
+    obtener_tesela, invalidar_teselas, TESELA_ZOOM_MAX
+)
+from services.reader_package import invalidar_paquetes
+from services.dashboard import obtener_resumen, invalidar_resumen
+from utils.search import filtro_prefijo
+from utils.serialization import respuesta_json
+from utils.fields import CamposPermitidos, usa_tabla
 from utils.notifications import registrar_notificacion
 from utils.audit_logger import registrar_auditoria
 from db.session import SessionLocal
-from security.jwt import verify_token
+from db.async_session import get_async_db
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token, verify_token_async
+from security.async_auth import get_current_user_async, require_permission_async
 
 router = APIRouter(prefix="/meters", tags=["medidores"])
 
@@ -33,7 +52,7 @@ def get_db():
 # ============================================================================
 def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
     """Obtiene el usuario actual desde el payload del JWT"""
-    user = db.query(UsuarioSistema).filter(
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
         UsuarioSistema.usuario == payload["sub"]
     ).first()
     
@@ -98,48 +117,99 @@ def require_permission(user: UsuarioSistema, db: Session, module: str, action: s
             detail=f"No tienes permisos para {action or 'acceder a'} {module}"
         )
 
+# ============================================================================
+# CAMPOS DE LA RESPUESTA (mismo formato que MedidorCompleto, ?fields=)
+# ============================================================================
+def _afiliado_del_medidor(fila) -> Optional[dict]:
+    if fila.cod_usuario_afi is None:
+        return None
+    return {
+        "id_usuario_afi": fila.id_usuario_afi,
+        "cod_usuario_afi": fila.cod_usuario_afi,
+        "fecha_afiliacion": datetime.combine(fila.fecha_afiliacion, time()) if fila.fecha_afiliacion else None,
+        "id_sector": fila.id_sector_afiliado
+    }
+
+CAMPOS_MEDIDOR = CamposPermitidos({
+    "num_medidor": ([Medidor.num_medidor], lambda f: f.num_medidor),
+    "latitud": ([Medidor.latitud], lambda f: f.latitud),
+    "longitud": ([Medidor.longitud], lambda f: f.longitud),
+    "altitud": ([Medidor.altitud], lambda f: f.altitud),
+    "id_usuario_afi": ([Medidor.id_usuario_afi], lambda f: f.id_usuario_afi),
+    "id_sector": ([Medidor.id_sector], lambda f: f.id_sector),
+    "activo": ([Medidor.activo], lambda f: f.activo),
+    "id_medidor": ([Medidor.id_medidor], lambda f: f.id_medidor),
+    "usuario_afiliado": (
+        [
+            Medidor.id_usuario_afi,
+            UsuarioAfiliado.cod_usuario_afi,
+            UsuarioAfiliado.fecha_afiliacion,
+            UsuarioAfiliado.id_sector.label("id_sector_afiliado")
+        ],
+        _afiliado_del_medidor
+    ),
+    "sector": (
+        [Medidor.id_sector, Sector.nombre_sector],
+        lambda f: {"id_sector": f.id_sector, "nombre_sector": f.nombre_sector} if f.nombre_sector is not None else None
+    ),
+})
+
+def consulta_medidores(elegidos) -> Select:
+    """SELECT de las columnas de los campos elegidos (JOIN solo con las tablas que usan)"""
+    stmt = select(*CAMPOS_MEDIDOR.columnas(elegidos)).select_from(Medidor)
+    if usa_tabla(stmt, UsuarioAfiliado):
+        stmt = stmt.outerjoin(UsuarioAfiliado, UsuarioAfiliado.id_usuario_afi == Medidor.id_usuario_afi)
+    if usa_tabla(stmt, Sector):
+        stmt = stmt.outerjoin(Sector, Sector.id_sector == Medidor.id_sector)
+    return stmt
+
 # ========================================
 # CRUD MEDIDORES
 # ========================================
 @router.get("/", response_model=List[MedidorCompleto])
-def listar_medidores(
+@max_queries(3)
+async def listar_medidores(
     search: Optional[str] = Query(None, description="Búsqueda por número de medidor"),
     id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
     activo: Optional[bool] = Query(None, description="Filtrar por estado"),
     asignado: Optional[bool] = Query(None, description="Filtrar por asignación"),
     skip: int = Query(0, ge=0, description="Registros a saltar"),
     limit: int = Query(100, ge=1, le=500, description="Límite de registros"),
-    db: Session = Depends(get_db),
-    payload: dict = Depends(verify_token)
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
+    db: AsyncSession = Depends(get_async_db),
+    payload: dict = Depends(verify_token_async)
 ):
     """
-    Lista todos los medidores con filtros opcionales
+    Lista todos los medidores con filtros opcionales (async)
+    Con fields= solo se consultan y devuelven esos campos (ver CAMPOS_MEDIDOR)
     Requiere permiso: medidores.lectura o medidores.crud
     """
-    current_user = get_current_user(payload, db)
-    require_permission(current_user, db, "medidores", "lectura")
+    current_user = await get_current_user_async(payload, db)
+    await require_permission_async(current_user, db, "medidores", "lectura")
     
-    query = db.query(Medidor)
+    # Solo las columnas de los campos pedidos, directamente desde la consulta
+    elegidos = CAMPOS_MEDIDOR.elegir(fields)
+    stmt = consulta_medidores(elegidos)
     
     # Aplicar filtros
     if search:
-        query = query.filter(Medidor.num_medidor.ilike(f"%{search}%"))
+        stmt = stmt.where(Medidor.num_medidor.ilike(f"%{search}%"))
     
     if id_sector is not None:
-        query = query.filter(Medidor.id_sector == id_sector)
+        stmt = stmt.where(Medidor.id_sector == id_sector)
     
     if activo is not None:
-        query = query.filter(Medidor.activo == activo)
+        stmt = stmt.where(Medidor.activo == activo)
     
     if asignado is not None:
         if asignado:
-            query = query.filter(Medidor.id_usuario_afi.isnot(None))
+            stmt = stmt.where(Medidor.id_usuario_afi.isnot(None))
         else:
-            query = query.filter(Medidor.id_usuario_afi.is_(None))
+            stmt = stmt.where(Medidor.id_usuario_afi.is_(None))
     
-    medidores = query.offset(skip).limit(limit).all()
+    filas = (await db.execute(stmt.order_by(Medidor.id_medidor).offset(skip).limit(limit))).all()
     
-    return medidores
+    return respuesta_json([CAMPOS_MEDIDOR.respuesta(fila, elegidos) for fila in filas])
 
 
 @router.get("/stats/count", response_model=MedidorStats)
@@ -148,99 +218,291 @@ def obtener_estadisticas_medidores(
     payload: dict = Depends(verify_token)
 ):
     """
-    Obtiene estadísticas de medidores
+    Obtiene estadísticas de medidores (del resumen del dashboard)
     Requiere permiso: medidores.lectura o medidores.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "medidores", "lectura")
     
-    total = db.query(Medidor).count()
-    activos = db.query(Medidor).filter(Medidor.activo == True).count()
-    inactivos = db.query(Medidor).filter(Medidor.activo == False).count()
-    asignados = db.query(Medidor).filter(Medidor.id_usuario_afi.isnot(None)).count()
-    sin_asignar = db.query(Medidor).filter(Medidor.id_usuario_afi.is_(None)).count()
+    resumen = obtener_resumen(db)
     
     # Estadísticas por sector
     por_sector = {}
-    sectores_stats = db.query(
-        Sector.nombre_sector,
-        func.count(Medidor.id_medidor).label('total')
-    ).outerjoin(Medidor, Sector.id_sector == Medidor.id_sector)\
-     .group_by(Sector.nombre_sector).all()
-    
-    for sector, count in sectores_stats:
-        por_sector[sector] = count
-    
-    return MedidorStats(
-        total=total,
-        activos=activos,
-        inactivos=inactivos,
-        asignados=asignados,
-        sin_asignar=sin_asignar,
-        por_sector=por_sector
-    )
+    for sector in resumen["por_sector"]:
+        por_sector[sector["nombre_sector"]] = por_sector.get(sector["nombre_sector"], 0) + sector["medidores"]
+    
+    return MedidorStats(**resumen["medidores"], por_sector=por_sector)
 
 
 @router.get("/available/affiliates", response_model=List[AfiliadoDisponible])
+@max_queries(3)
 def listar_afiliados_disponibles(
-    search: Optional[str] = Query(None, description="Búsqueda por código de afiliado"),
+    search: Optional[str] = Query(None, description="Código de afiliado o inicio del nombre/apellido"),
+    despues_de_codigo: Optional[int] = Query(None, description="Código del último afiliado de la página anterior"),
+    despues_de_id: Optional[int] = Query(None, description="ID del último afiliado de la página anterior"),
+    limit: int = Query(100, ge=1, le=500, description="Número máximo de registros"),
     db: Session = Depends(get_db),
     payload: dict = Depends(verify_token)
 ):
     """
-    Lista afiliados sin medidor asignado
+    Lista afiliados sin medidor asignado, ordenados por código.
+    Paginación por cursor: para la siguiente página enviar código e id del
+    último afiliado recibido.
     Requiere permiso: medidores.lectura o medidores.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "medidores", "lectura")
     
-    # Subconsulta para obtener IDs de afiliados que ya tienen medidor
-    subquery = db.query(Medidor.id_usuario_afi).filter(
-        Medidor.id_usuario_afi.isnot(None)
-    ).subquery()
+    if (despues_de_codigo is None) != (despues_de_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El cursor necesita despues_de_codigo y despues_de_id"
+        )
     
-    query = db.query(UsuarioAfiliado).filter(
-        UsuarioAfiliado.id_usuario_afi.notin_(subquery)
+    # Anti-join: afiliados sin ningún medidor (una consulta con sector y nombre)
+    tiene_medidor = exists().where(Medidor.id_usuario_afi == UsuarioAfiliado.id_usuario_afi)
+    stmt = (
+        select(
+            UsuarioAfiliado.id_usuario_afi,
+            UsuarioAfiliado.cod_usuario_afi,
+            UsuarioAfiliado.fecha_afiliacion,
+            UsuarioAfiliado.id_sector,
+            Sector.nombre_sector,
+            UsuarioSistema.nombres,
+            UsuarioSistema.apellidos
+        )
+        .outerjoin(Sector, Sector.id_sector == UsuarioAfiliado.id_sector)
+        .outerjoin(UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema)
+        .where(~tiene_medidor)
     )
     
-    if search:
-        query = query.filter(UsuarioAfiliado.cod_usuario_afi.ilike(f"%{search}%"))
+    if search and search.strip():
+        search = search.strip()
+        if search.isdigit():
+            stmt = stmt.where(UsuarioAfiliado.cod_usuario_afi == int(search))
+        else:
+            stmt = stmt.where(filtro_prefijo(search, UsuarioSistema.nombres, UsuarioSistema.apellidos))
     
-    afiliados = query.limit(100).all()
+    if despues_de_id is not None:
+        stmt = stmt.where(
+            tuple_(UsuarioAfiliado.cod_usuario_afi, UsuarioAfiliado.id_usuario_afi) > tuple_(despues_de_codigo, despues_de_id)
+        )
     
-    # Transformar a schema
-    resultado = []
-    for afiliado in afiliados:
-        sector_nombre = None
-        if afiliado.sector:
-            sector_nombre = getattr(afiliado.sector, 'nombre_sector', None)
-        
-        resultado.append(AfiliadoDisponible(
+    afiliados = db.execute(
+        stmt.order_by(UsuarioAfiliado.cod_usuario_afi, UsuarioAfiliado.id_usuario_afi).limit(limit)
+    ).all()
+    
+    return [
+        AfiliadoDisponible(
             id_usuario_afi=afiliado.id_usuario_afi,
             cod_usuario_afi=afiliado.cod_usuario_afi,
-            nombre_afiliado=f"{afiliado.usuario_sistema.nombres} {afiliado.usuario_sistema.apellidos}" if afiliado.usuario_sistema else None,
+            nombre_afiliado=f"{afiliado.nombres} {afiliado.apellidos}" if afiliado.nombres is not None else None,
             fecha_afiliacion=afiliado.fecha_afiliacion,
             id_sector=afiliado.id_sector,
-            nombre_sector=sector_nombre
-        ))
-    
-    return resultado
+            nombre_sector=afiliado.nombre_sector
+        )
+        for afiliado in afiliados
+    ]
+
+
+# ========================================
+# CONSULTAS DE MAPA
+# ========================================
+@router.get("/bbox", response_model=MedidoresMapaResponse)
+@max_queries(3)
+def listar_medidores_en_caja(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    activo: Optional[bool] = Query(None, description="Filtrar por estado"),
+    limit: int = Query(5000, ge=1, le=20000, description="Máximo de medidores"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Medidores dentro del área visible del mapa (índice GiST de ubicación).
+    Respuesta compacta: columnas + filas.
+    Requiere permiso: medidores.lectura o medidores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "medidores", "lectura")
+
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El rectángulo es inválido (mínimos mayores que máximos)"
+        )
+
+    return medidores_en_caja(db, min_lat, min_lon, max_lat, max_lon, id_sector, activo, limit)
+
+
+@router.get("/nearest", response_model=MedidoresMapaResponse)
+@max_queries(3)
+def listar_medidores_cercanos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=200, description="Cantidad de medidores"),
+    radio: Optional[float] = Query(None, gt=0, le=50000, description="Radio máximo en metros"),
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    activo: Optional[bool] = Query(True, description="Filtrar por estado"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Medidores más cercanos a un punto, con la distancia en metros
+    (última columna).
+    Requiere permiso: medidores.lectura o medidores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "medidores", "lectura")
+
+    return medidores_cercanos(db, lat, lon, k, radio, id_sector, activo)
+
+
+@router.get("/geojson")
+def exportar_geojson(
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    activo: Optional[bool] = Query(None, description="Filtrar por estado"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Todos los medidores con coordenadas como FeatureCollection GeoJSON.
+    Se envía por partes (streaming), sin armar la respuesta completa en memoria.
+    Requiere permiso: medidores.lectura o medidores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "medidores", "lectura")
+
+    return StreamingResponse(
+        transmitir_geojson(id_sector=id_sector, activo=activo),
+        media_type="application/geo+json",
+        headers={"Content-Disposition": 'inline; filename="medidores.geojson"'}
+    )
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+def obtener_tesela_mapa(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Tesela z/x/y (Web Mercator) en GeoJSON: grupos de medidores en zoom bajo y
+    medidores individuales en zoom alto. Precalculada y con ETag; responde 304
+    si el cliente ya tiene la versión vigente.
+    Requiere permiso: medidores.lectura o medidores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "medidores", "lectura")
+
+    if not (0 <= z <= TESELA_ZOOM_MAX) or not (0 <= x < 2 ** z) or not (0 <= y < 2 ** z):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tesela inválida (zoom de 0 a {TESELA_ZOOM_MAX}, x e y de 0 a 2^z - 1)"
+        )
+
+    tesela = obtener_tesela(db, z, x, y)
+    etag = f'"{tesela.etag}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=60",
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Se guarda comprimida: se envía tal cual si el cliente acepta gzip
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        contenido = tesela.contenido
+    else:
+        contenido = gzip.decompress(tesela.contenido)
+    return Response(content=contenido, media_type="application/geo+json", headers=headers)
+
+# ========================================
+# RUTA DE LECTURA
+# ========================================
+def _leer_poligono(poligono: str):
+    """'lat,lon;lat,lon;...' -> [(lat, lon), ...] (mínimo 3 vértices)"""
+    try:
+        vertices = [tuple(float(valor) for valor in punto.split(",")) for punto in poligono.split(";") if punto.strip()]
+    except ValueError:
+        vertices = []
+    if len(vertices) < 3 or any(len(v) != 2 or not (-90 <= v[0] <= 90 and -180 <= v[1] <= 180) for v in vertices):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Polígono inválido. Formato: lat,lon;lat,lon;lat,lon (mínimo 3 vértices)"
+        )
+    return vertices
+
+
+@router.get("/route", response_model=RutaLecturaResponse)
+def obtener_ruta_lectura(
+    id_sector: Optional[int] = Query(None, description="Sector asignado al lector"),
+    poligono: Optional[str] = Query(None, description="Zona a recorrer: lat,lon;lat,lon;lat,lon"),
+    lat_inicio: Optional[float] = Query(None, ge=-90, le=90, description="Latitud del punto de partida"),
+    lon_inicio: Optional[float] = Query(None, ge=-180, le=180, description="Longitud del punto de partida"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Ordena los medidores activos del sector (o del polígono) en una ruta de
+    recorrido (vecino más cercano + 2-opt). La ruta queda en caché hasta que
+    cambien los medidores.
+    Requiere permiso: medidores.lectura o medidores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "medidores", "lectura")
+
+    if id_sector is None and not poligono:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar un sector o un polígono"
+        )
+    if (lat_inicio is None) != (lon_inicio is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El punto de partida necesita latitud y longitud"
+        )
+
+    vertices = _leer_poligono(poligono) if poligono else None
+    inicio = (lat_inicio, lon_inicio) if lat_inicio is not None else None
+
+    return calcular_ruta(db, id_sector=id_sector, poligono=vertices, inicio=inicio)
 
 
 @router.get("/{id_medidor}", response_model=MedidorCompleto)
 def obtener_medidor(
     id_medidor: int,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
     db: Session = Depends(get_db),
     payload: dict = Depends(verify_token)
 ):
     """
     Obtiene un medidor específico por ID
+    Con fields= solo se consultan y devuelven esos campos (ver CAMPOS_MEDIDOR)
     Requiere permiso: medidores.lectura o medidores.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "medidores", "lectura")
     
-    medidor = db.query(Medidor).filter(Medidor.id_medidor == id_medidor).first()
+    if fields is not None:
+        elegidos = CAMPOS_MEDIDOR.elegir(fields)
+        fila = db.execute(consulta_medidores(elegidos).where(Medidor.id_medidor == id_medidor)).first()
+        if not fila:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Medidor no encontrado"
+            )
+        return respuesta_json(CAMPOS_MEDIDOR.respuesta(fila, elegidos))
+    
+    medidor = db.query(Medidor).options(*perfil("medidor_detalle")).filter(Medidor.id_medidor == id_medidor).first()
     
     if not medidor:
         raise HTTPException(
@@ -300,7 +562,10 @@ def crear_medidor(
     
     try:
         db.add(nuevo_medidor)
+        invalidar_teselas(db, [(nuevo_medidor.latitud, nuevo_medidor.longitud)])
         db.commit()
+        invalidar_resumen()
+        invalidar_paquetes([nuevo_medidor.id_sector])
         db.refresh(nuevo_medidor)
         
         # Registrar auditoría
@@ -357,7 +622,7 @@ def actualizar_medidor(
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "medidores", "actualizar")
     
-    medidor = db.query(Medidor).filter(Medidor.id_medidor == id_medidor).first()
+    medidor = db.query(Medidor).options(*perfil("medidor_detalle")).filter(Medidor.id_medidor == id_medidor).first()
     
     if not medidor:
         raise HTTPException(
@@ -390,11 +655,18 @@ def actualizar_medidor(
             )
     
     # Actualizar solo los campos enviados
+    coordenadas = [(medidor.latitud, medidor.longitud)]
+    sectores = [medidor.id_sector]
     for key, value in medidor_update.dict(exclude_unset=True).items():
         setattr(medidor, key, value)
+    coordenadas.append((medidor.latitud, medidor.longitud))
+    sectores.append(medidor.id_sector)
     
     try:
+        invalidar_teselas(db, coordenadas)
         db.commit()
+        invalidar_resumen()
+        invalidar_paquetes(sectores)
         db.refresh(medidor)
         
         # Registrar auditoría
@@ -439,7 +711,7 @@ def eliminar_medidor(
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "medidores", "eliminar")
     
-    medidor = db.query(Medidor).filter(Medidor.id_medidor == id_medidor).first()
+    medidor = db.query(Medidor).options(*perfil("medidor_detalle")).filter(Medidor.id_medidor == id_medidor).first()
     
     if not medidor:
         raise HTTPException(
@@ -447,10 +719,16 @@ def eliminar_medidor(
             detail="Medidor no encontrado"
         )
     
+    coordenadas = [(medidor.latitud, medidor.longitud)]
+    sectores = [medidor.id_sector]
+    
     try:
         # Intentar eliminar físicamente
         db.delete(medidor)
+        invalidar_teselas(db, coordenadas)
         db.commit()
+        invalidar_resumen()
+        invalidar_paquetes(sectores)
         
         # Auditoría
         registrar_auditoria(
@@ -490,7 +768,10 @@ def eliminar_medidor(
                 )
             
             medidor.activo = False
+            invalidar_teselas(db, coordenadas)
             db.commit()
+            invalidar_resumen()
+            invalidar_paquetes(sectores)
             db.refresh(medidor)
             
             # Auditoría
@@ -546,7 +827,7 @@ def toggle_medidor_status(
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "medidores", "actualizar")
     
-    medidor = db.query(Medidor).filter(Medidor.id_medidor == id_medidor).first()
+    medidor = db.query(Medidor).options(*perfil("medidor_detalle")).filter(Medidor.id_medidor == id_medidor).first()
     
     if not medidor:
         raise HTTPException(
@@ -559,7 +840,10 @@ def toggle_medidor_status(
     estado_texto = "activado" if medidor.activo else "desactivado"
     
     try:
+        invalidar_teselas(db, [(medidor.latitud, medidor.longitud)])
         db.commit()
+        invalidar_resumen()
+        invalidar_paquetes([medidor.id_sector])
         db.refresh(medidor)
         
         # Registrar auditoría
@@ -1,14 +1,19 @@
 # routes/notifications.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
 from db.session import SessionLocal
+from db.async_session import get_async_db
+from db.load_profiles import perfil
+from db.query_guard import max_queries
 from models.notification import Notificacion  # ✅ CORREGIDO: notificacion en lugar de notification
 from models.user import UsuarioSistema  # Para obtener el usuario
 from schemas.notification import NotificacionCreate, NotificacionResponse, NotificacionUpdate
-from security.jwt import verify_token
+from security.jwt import verify_token, verify_token_async
 
 router = APIRouter(
     prefix="/notifications",
@@ -35,7 +40,7 @@ def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
     Obtiene el usuario actual desde el payload del JWT
     Compatible con la función de routes/users.py
     """
-    user = db.query(UsuarioSistema).filter(
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
         UsuarioSistema.usuario == payload["sub"]
     ).first()
     
@@ -124,6 +129,7 @@ def crear_notificacion_endpoint(
 # LISTAR NOTIFICACIONES
 # ========================================
 @router.get("/", response_model=List[NotificacionResponse])
+@max_queries(2)
 def listar_notificaciones(
     estado: Optional[str] = None,
     db: Session = Depends(get_db),
@@ -205,23 +211,36 @@ def obtener_notificacion(
 # CONTADOR DE NO LEÍDAS
 # ========================================
 @router.get("/no-leidas/count")
-def contar_no_leidas(
-    db: Session = Depends(get_db),
-    payload: dict = Depends(verify_token)
+async def contar_no_leidas(
+    db: AsyncSession = Depends(get_async_db),
+    payload: dict = Depends(verify_token_async)
 ):
-    """Cuenta las notificaciones no leídas del usuario"""
+    """Cuenta las notificaciones no leídas del usuario (async: se consulta en cada carga de página)"""
     try:
-        id_usuario = get_current_user_id(payload, db)
-        
-        count = db.query(Notificacion).filter(
-            Notificacion.id_usuario_sistema == id_usuario,
-            Notificacion.estado == "no_leido"
-        ).count()
-        
-        print(f"✅ Usuario {id_usuario} tiene {count} notificaciones no leídas")
+        id_usuario = payload.get("id_usuario_sistema") or payload.get("user_id")
+        if not id_usuario:
+            # Tokens antiguos: buscar por username
+            id_usuario = await db.scalar(
+                select(UsuarioSistema.id_usuario_sistema).where(UsuarioSistema.usuario == payload.get("sub"))
+            )
+            if not id_usuario:
+                print(f"❌ No se pudo identificar al usuario. Payload: {payload}")
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="No se pudo identificar al usuario"
+                )
+        
+        count = await db.scalar(
+            select(func.count()).select_from(Notificacion).where(
+                Notificacion.id_usuario_sistema == id_usuario,
+                Notificacion.estado == "no_leido"
+            )
+        )
         
         return {"no_leidas": count}
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error contando notificaciones: {e}")
         raise HTTPException(
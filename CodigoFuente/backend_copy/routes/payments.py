@@ -0,0 +1,445 @@
+# routes/payments.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, timedelta
+import io
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from models.affiliate import UsuarioAfiliado
+from models.invoice import Factura
+from models.payment import Pago, SaldoAfiliado, CierreCaja
+from schemas.payment import (
+    PagoCreate, PagoResponse, PagoListResponse,
+    SaldoAfiliadoResponse, SaldoDetalleResponse, FacturaPendienteResponse,
+    CierreCajaCreate, CierreCajaResponse
+)
+from services.payments import registrar_pagos, cerrar_caja
+from services.reconciliation import conciliar_archivo, leer_csv, leer_ancho_fijo
+from utils.audit_logger import registrar_auditoria
+from utils.notifications import registrar_notificacion
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/payments", tags=["pagos"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+# ========================================
+# CONSULTA DE SALDOS (CAJA)
+# ========================================
+def _consulta_saldos(db: Session):
+    """Afiliado + saldo materializado (sin sumar facturas ni pagos)"""
+    return db.query(
+        UsuarioAfiliado.id_usuario_afi,
+        UsuarioAfiliado.cod_usuario_afi,
+        UsuarioAfiliado.id_sector,
+        UsuarioSistema.nombres,
+        UsuarioSistema.apellidos,
+        UsuarioSistema.cedula,
+        SaldoAfiliado.saldo,
+        SaldoAfiliado.total_facturado,
+        SaldoAfiliado.total_pagado,
+        SaldoAfiliado.facturas_pendientes,
+        SaldoAfiliado.fecha_ultimo_pago,
+    ).join(
+        UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema
+    ).outerjoin(
+        SaldoAfiliado, SaldoAfiliado.id_usuario_afi == UsuarioAfiliado.id_usuario_afi
+    )
+
+
+def _saldo_response(fila, schema):
+    """Los afiliados sin movimientos aún no tienen fila de saldo"""
+    datos = {k: v for k, v in fila._asdict().items() if v is not None}
+    return schema(**datos)
+
+
+@router.get("/affiliates", response_model=List[SaldoAfiliadoResponse])
+@max_queries(3)
+def buscar_afiliados(
+    q: str = Query(..., min_length=1, description="Código de afiliado, cédula o nombre"),
+    limit: int = Query(20, ge=1, le=100, description="Límite de registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Búsqueda rápida de afiliados con su saldo para la caja.
+    Requiere permiso: pagos.lectura o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "lectura")
+
+    q = q.strip()
+    query = _consulta_saldos(db).filter(UsuarioAfiliado.activo == True)
+
+    if q.isdigit():
+        condiciones = [UsuarioSistema.cedula.startswith(q)]
+        if len(q) <= 9:
+            condiciones.append(UsuarioAfiliado.cod_usuario_afi == int(q))
+        query = query.filter(or_(*condiciones))
+    else:
+        for palabra in q.split():
+            patron = f"%{palabra}%"
+            query = query.filter(or_(
+                UsuarioSistema.nombres.ilike(patron),
+                UsuarioSistema.apellidos.ilike(patron)
+            ))
+
+    filas = query.order_by(UsuarioAfiliado.cod_usuario_afi).limit(limit).all()
+    return [_saldo_response(fila, SaldoAfiliadoResponse) for fila in filas]
+
+
+@router.get("/affiliates/{id_usuario_afi}/saldo", response_model=SaldoDetalleResponse)
+def obtener_saldo(
+    id_usuario_afi: int,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Saldo materializado del afiliado y sus facturas pendientes (más antigua primero).
+    Requiere permiso: pagos.lectura o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "lectura")
+
+    fila = _consulta_saldos(db).filter(UsuarioAfiliado.id_usuario_afi == id_usuario_afi).first()
+    if not fila:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Afiliado no encontrado"
+        )
+
+    facturas = db.query(
+        Factura.id_factura,
+        Factura.num_factura,
+        Factura.periodo,
+        Factura.total,
+        Factura.saldo_pendiente,
+    ).filter(
+        Factura.id_usuario_afi == id_usuario_afi,
+        Factura.estado == "pendiente",
+        Factura.activo == True
+    ).order_by(Factura.periodo, Factura.id_factura).all()
+
+    detalle = _saldo_response(fila, SaldoDetalleResponse)
+    detalle.facturas = [FacturaPendienteResponse.model_validate(f) for f in facturas]
+    return detalle
+
+# ========================================
+# REGISTRO DE PAGOS
+# ========================================
+@router.post("/", response_model=PagoResponse, status_code=status.HTTP_201_CREATED)
+def registrar_pago(
+    pago: PagoCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Registra un pago en caja. Reenviar la misma clave_idempotencia devuelve el
+    pago original (200) sin cobrar de nuevo.
+    Requiere permiso: pagos.crear o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "crear")
+
+    try:
+        resumen = registrar_pagos(db, [pago], current_user.id_usuario_sistema)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al registrar pago: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al registrar el pago: {str(e)}"
+        )
+
+    if resumen["errores"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=resumen["errores"][0]["error"]
+        )
+
+    registrado = resumen["pagos"][0]
+    if registrado["duplicado"]:
+        response.status_code = status.HTTP_200_OK
+        return registrado
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Pago #{registrado['id_pago']} de ${registrado['monto']} al afiliado {registrado['id_usuario_afi']} por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    return registrado
+
+
+@router.get("/", response_model=List[PagoListResponse])
+@max_queries(3)
+def listar_pagos(
+    id_usuario_afi: Optional[int] = Query(None, description="Filtrar por afiliado"),
+    id_cajero: Optional[int] = Query(None, description="Filtrar por cajero"),
+    id_cierre_caja: Optional[int] = Query(None, description="Filtrar por cierre de caja"),
+    desde: Optional[date] = Query(None, description="Fecha inicial"),
+    hasta: Optional[date] = Query(None, description="Fecha final"),
+    skip: int = Query(0, ge=0, description="Registros a saltar"),
+    limit: int = Query(100, ge=1, le=500, description="Límite de registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Lista los pagos del libro (más recientes primero)
+    Requiere permiso: pagos.lectura o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "lectura")
+
+    query = db.query(Pago)
+
+    if id_usuario_afi is not None:
+        query = query.filter(Pago.id_usuario_afi == id_usuario_afi)
+
+    if id_cajero is not None:
+        query = query.filter(Pago.id_cajero == id_cajero)
+
+    if id_cierre_caja is not None:
+        query = query.filter(Pago.id_cierre_caja == id_cierre_caja)
+
+    if desde:
+        query = query.filter(Pago.fecha_pago >= desde)
+
+    if hasta:
+        query = query.filter(Pago.fecha_pago < hasta + timedelta(days=1))
+
+    return query.order_by(Pago.id_pago.desc()).offset(skip).limit(limit).all()
+
+# ========================================
+# CIERRE DE CAJA
+# ========================================
+@router.post("/cierre-caja", response_model=CierreCajaResponse, status_code=status.HTTP_201_CREATED)
+def crear_cierre_caja(
+    request: CierreCajaCreate,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Cierra la caja del cajero actual: registra el lote de pagos recibido (si lo hay)
+    y agrupa todos sus pagos sin cierre, en una sola transacción.
+    Requiere permiso: pagos.crear o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "crear")
+
+    try:
+        cierre, resumen = cerrar_caja(
+            db,
+            current_user.id_usuario_sistema,
+            pagos=request.pagos,
+            monto_declarado=request.monto_declarado,
+            observacion=request.observacion,
+            clave_idempotencia=request.clave_idempotencia,
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al cerrar caja: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al cerrar la caja: {str(e)}"
+        )
+
+    respuesta = CierreCajaResponse.model_validate(cierre)
+    detalle_lote = ""
+    if resumen:
+        respuesta.registrados = resumen["registrados"]
+        respuesta.duplicados = resumen["duplicados"]
+        respuesta.errores = resumen["errores"]
+        detalle_lote = f" ({resumen['registrados']} registrados en lote)"
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Cierre de caja #{cierre.id_cierre_caja}: {cierre.num_pagos} pagos por ${cierre.monto_total}{detalle_lote} por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    if cierre.diferencia:
+        registrar_notificacion(
+            db=db,
+            id_usuario=current_user.id_usuario_sistema,
+            titulo="Diferencia en cierre de caja",
+            mensaje=f"El cierre #{cierre.id_cierre_caja} tiene una diferencia de ${cierre.diferencia}.",
+            tipo="alerta"
+        )
+
+    return respuesta
+
+
+@router.get("/cierre-caja", response_model=List[CierreCajaResponse])
+@max_queries(3)
+def listar_cierres_caja(
+    id_cajero: Optional[int] = Query(None, description="Filtrar por cajero"),
+    skip: int = Query(0, ge=0, description="Registros a saltar"),
+    limit: int = Query(50, ge=1, le=200, description="Límite de registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Lista los cierres de caja (más recientes primero)
+    Requiere permiso: pagos.lectura o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "lectura")
+
+    query = db.query(CierreCaja)
+    if id_cajero is not None:
+        query = query.filter(CierreCaja.id_cajero == id_cajero)
+
+    return query.order_by(CierreCaja.id_cierre_caja.desc()).offset(skip).limit(limit).all()
+
+# ========================================
+# CONCILIACIÓN DE ARCHIVOS DE BANCOS
+# ========================================
+@router.post("/conciliacion")
+def conciliar_pagos(
+    file: UploadFile = File(...),
+    origen: str = Query(..., min_length=2, max_length=50, description="Banco o recaudador que envía el archivo"),
+    formato: str = Query("auto", description="csv, ancho_fijo o auto (según la extensión)"),
+    codificacion: str = Query("utf-8", description="Codificación del archivo (utf-8, latin-1)"),
+    simular: bool = Query(False, description="Solo conciliar, sin registrar pagos"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Concilia un archivo de pagos de un banco o recaudador contra las facturas
+    abiertas, registra los pagos conciliados y devuelve el reporte de las líneas
+    que no se pudieron conciliar.
+    Requiere permiso: pagos.crear o pagos.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "pagos", "crear")
+
+    if formato == "auto":
+        formato = "csv" if (file.filename or "").lower().endswith(".csv") else "ancho_fijo"
+
+    if formato not in ("csv", "ancho_fijo"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato inválido. Debe ser csv, ancho_fijo o auto"
+        )
+
+    try:
+        texto = io.TextIOWrapper(file.file, encoding=codificacion, errors="replace", newline="")
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Codificación desconocida: {codificacion}"
+        )
+
+    lineas = leer_csv(texto) if formato == "csv" else leer_ancho_fijo(texto)
+
+    try:
+        resumen = conciliar_archivo(db, lineas, current_user.id_usuario_sistema, origen, simular=simular)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al conciliar archivo: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al conciliar el archivo: {str(e)}"
+        )
+
+    if not simular:
+        registrar_auditoria(
+            db=db,
+            accion="CREATE",
+            descripcion=f"Conciliación '{file.filename}' ({origen}): {resumen['registrados']} pagos registrados, {resumen['no_conciliadas']} líneas sin conciliar por '{payload['sub']}'",
+            id_usuario=current_user.id_usuario_sistema
+        )
+
+        registrar_notificacion(
+            db=db,
+            id_usuario=current_user.id_usuario_sistema,
+            titulo="Conciliación completada",
+            mensaje=f"{file.filename}: {resumen['conciliadas']} de {resumen['lineas']} líneas conciliadas.",
+            tipo="exito" if not resumen["no_conciliadas"] else "alerta"
+        )
+
+    return resumen
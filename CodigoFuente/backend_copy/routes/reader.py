@@ -0,0 +1,137 @@
+# routes/reader.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from models.sector import Sector
+from services.reader_package import obtener_paquete, FORMATOS
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/lector", tags=["lector"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+
+# ========================================
+# PAQUETE SIN CONEXIÓN
+# ========================================
+@router.get("/package")
+def descargar_paquete(
+    request: Request,
+    id_sector: int = Query(..., description="Sector asignado al lector"),
+    periodo: Optional[date] = Query(None, description="Periodo a leer (por defecto el mes actual)"),
+    formato: str = Query("json", pattern="^(json|sqlite)$", description="json (comprimido) o sqlite"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Paquete para trabajar sin conexión: medidores del sector en orden de ruta,
+    afiliados, lecturas previas y rangos de consumo esperados.
+    Soporta ETag (304) y descargas por partes (Range) para retomar descargas
+    cortadas. Las lecturas se sincronizan con POST /readings/bulk.
+    Requiere permiso: lecturas.lectura o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "lectura")
+
+    if not db.query(Sector.id_sector).filter(Sector.id_sector == id_sector).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sector no encontrado"
+        )
+
+    periodo = (periodo or date.today()).replace(day=1)
+    archivo, huella = obtener_paquete(db, id_sector, periodo, formato)
+
+    etag = f'"{huella}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    extension, media_type = FORMATOS[formato]
+    return FileResponse(
+        archivo,
+        media_type=media_type,
+        filename=f"paquete_sector{id_sector}_{periodo:%Y%m}.{extension}",
+        headers=headers
+    )
@@ -0,0 +1,263 @@
+# routes/readings.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from models.meter import Medidor
+from models.reading import AlertaLectura
+from schemas.reading import (
+    LecturaBulkRequest, LecturaBulkResponse,
+    AlertaLecturaResponse, AlertaLecturaUpdate
+)
+from services.readings import registrar_lecturas
+from services.anomalies import detectar_anomalias
+from services.reader_package import invalidar_paquetes
+from utils.audit_logger import registrar_auditoria
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/readings", tags=["lecturas"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+# ========================================
+# CARGA MASIVA DE LECTURAS
+# ========================================
+@router.post("/bulk", response_model=LecturaBulkResponse, status_code=status.HTTP_201_CREATED)
+def cargar_lecturas(
+    request: LecturaBulkRequest,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Registra un lote de lecturas y ejecuta el análisis de anomalías del periodo.
+    También la usan los dispositivos de los lectores para sincronizar.
+    Requiere permiso: lecturas.crear o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "crear")
+
+    try:
+        resumen = registrar_lecturas(db, request.lecturas, current_user.id_usuario_sistema)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al registrar lecturas: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al registrar las lecturas: {str(e)}"
+        )
+
+    # Las lecturas nuevas son las "previas" de los paquetes de meses siguientes
+    if resumen["periodos"]:
+        invalidar_paquetes(despues_de=resumen["periodos"][0])
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Carga de lecturas: {resumen['registradas']} registradas, {resumen['rechazadas']} rechazadas por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    return resumen
+
+# ========================================
+# ANÁLISIS DE ANOMALÍAS
+# ========================================
+@router.post("/analysis")
+def analizar_lecturas(
+    periodo: date = Query(..., description="Periodo a analizar (primer día del mes)"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Vuelve a ejecutar el análisis de anomalías sobre todo el periodo.
+    Requiere permiso: lecturas.actualizar o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "actualizar")
+
+    return detectar_anomalias(db, periodo.replace(day=1))
+
+# ========================================
+# COLA DE REVISIÓN
+# ========================================
+@router.get("/alerts", response_model=List[AlertaLecturaResponse])
+@max_queries(3)
+def listar_alertas(
+    periodo: Optional[date] = Query(None, description="Filtrar por periodo"),
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    tipo: Optional[str] = Query(None, description="consumo_atipico, consumo_cero o lectura_negativa"),
+    estado: Optional[str] = Query("pendiente", description="pendiente, confirmada o descartada"),
+    skip: int = Query(0, ge=0, description="Registros a saltar"),
+    limit: int = Query(100, ge=1, le=500, description="Límite de registros"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Lista las lecturas sospechosas pendientes de revisión
+    Requiere permiso: lecturas.lectura o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "lectura")
+
+    query = db.query(
+        AlertaLectura.id_alerta,
+        AlertaLectura.id_lectura,
+        AlertaLectura.id_medidor,
+        Medidor.num_medidor,
+        Medidor.id_sector,
+        AlertaLectura.periodo,
+        AlertaLectura.tipo,
+        AlertaLectura.valor,
+        AlertaLectura.puntaje,
+        AlertaLectura.detalle,
+        AlertaLectura.estado,
+        AlertaLectura.fecha_creacion,
+    ).join(Medidor, Medidor.id_medidor == AlertaLectura.id_medidor)
+
+    if periodo:
+        query = query.filter(AlertaLectura.periodo == periodo.replace(day=1))
+
+    if id_sector is not None:
+        query = query.filter(Medidor.id_sector == id_sector)
+
+    if tipo:
+        query = query.filter(AlertaLectura.tipo == tipo)
+
+    if estado:
+        query = query.filter(AlertaLectura.estado == estado)
+
+    alertas = query.order_by(
+        AlertaLectura.periodo.desc(), Medidor.id_sector, Medidor.num_medidor
+    ).offset(skip).limit(limit).all()
+
+    return [AlertaLecturaResponse.model_validate(alerta) for alerta in alertas]
+
+
+@router.patch("/alerts/{id_alerta}", response_model=AlertaLecturaResponse)
+def revisar_alerta(
+    id_alerta: int,
+    revision: AlertaLecturaUpdate,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Registra el resultado de la revisión de una alerta
+    Requiere permiso: lecturas.actualizar o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "actualizar")
+
+    alerta = db.query(AlertaLectura).filter(AlertaLectura.id_alerta == id_alerta).first()
+
+    if not alerta:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alerta no encontrada"
+        )
+
+    alerta.estado = revision.estado
+    if revision.detalle:
+        alerta.detalle = revision.detalle
+    alerta.fecha_revision = datetime.now()
+    alerta.id_revisor = current_user.id_usuario_sistema
+
+    try:
+        db.commit()
+        db.refresh(alerta)
+
+        registrar_auditoria(
+            db=db,
+            accion="UPDATE",
+            descripcion=f"Alerta de lectura {id_alerta} ({alerta.tipo}) marcada como {alerta.estado} por '{payload['sub']}'",
+            id_usuario=current_user.id_usuario_sistema
+        )
+
+        return AlertaLecturaResponse.model_validate(alerta)
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al revisar alerta: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al revisar la alerta"
+        )
@@ -14,6 +14,8 @@ from schemas.notification import NotificacionCreate
 from utils.notifications import registrar_notificacion
 from utils.audit_logger import registrar_auditoria
 from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
 from security.jwt import verify_token
 
 router = APIRouter(prefix="/roles", tags=["roles"])
@@ -30,7 +32,7 @@ def get_db():
 # ============================================================================
 def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
     """Obtiene el usuario actual desde el payload del JWT"""
-    user = db.query(UsuarioSistema).filter(
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
         UsuarioSistema.usuario == payload["sub"]
     ).first()
     
@@ -107,6 +109,7 @@ def require_permission(user: UsuarioSistema, db: Session, module: str, action: s
 # CRUD ROLES
 # ========================================
 @router.get("/", response_model=List[RolResponse])
+@max_queries(3)
 def listar_roles(
     db: Session = Depends(get_db),
     payload: dict = Depends(verify_token)
@@ -134,7 +137,7 @@ def obtener_rol(
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "roles", "lectura")
     
-    rol = db.query(Rol).filter(Rol.id_rol == id_rol).first()
+    rol = db.query(Rol).options(*perfil("rol_con_acciones")).filter(Rol.id_rol == id_rol).first()
     
     if not rol:
         raise HTTPException(
@@ -468,6 +471,7 @@ def toggle_rol_status(
 # CRUD ROL_ACCIONES
 # ========================================
 @router.get("/{id_rol}/acciones", response_model=List[RolAccionResponse])
+@max_queries(3)
 def listar_acciones_rol(
     id_rol: int,
     db: Session = Depends(get_db),
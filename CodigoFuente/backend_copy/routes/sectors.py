@@ -1,18 +1,28 @@
 # routes/sectors.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from psycopg2.errors import ForeignKeyViolation
 from typing import List, Optional
+from datetime import date
 from models.sector import Sector
+from models.consumption import ConsumoMensualSector
 from models.user import UsuarioSistema
 from models.role import RolAccion
 from schemas.sector import SectorCreate, SectorUpdate, SectorResponse
+from schemas.consumption import ConsumoSectorResponse
 from schemas.notification import NotificacionCreate
 from utils.notifications import registrar_notificacion
 from utils.audit_logger import registrar_auditoria
+from services.dashboard import obtener_resumen, invalidar_resumen
 from db.session import SessionLocal
-from security.jwt import verify_token
+from db.async_session import get_async_db
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token, verify_token_async
+from security.async_auth import get_current_user_async, require_permission_async
 
 router = APIRouter(prefix="/sectors", tags=["sectors"])
 
@@ -29,7 +39,7 @@ def get_db():
 # ============================================================================
 def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
     """Obtiene el usuario actual desde el payload del JWT"""
-    user = db.query(UsuarioSistema).filter(
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
         UsuarioSistema.usuario == payload["sub"]
     ).first()
     
@@ -107,41 +117,41 @@ def require_permission(user: UsuarioSistema, db: Session, module: str, action: s
 # ========================================
 
 @router.get("/", response_model=List[SectorResponse])
-def listar_sectores(
+@max_queries(3)
+async def listar_sectores(
     search: Optional[str] = Query(None, description="Buscar por nombre o descripción"),
     activo: Optional[bool] = Query(None, description="Filtrar por estado activo"),
     skip: int = Query(0, ge=0, description="Número de registros a saltar"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros"),
-    db: Session = Depends(get_db),
-    payload: dict = Depends(verify_token)
+    db: AsyncSession = Depends(get_async_db),
+    payload: dict = Depends(verify_token_async)
 ):
     """
-    Lista todos los sectores con filtros opcionales
+    Lista todos los sectores con filtros opcionales (async)
     Requiere permiso: sectores.lectura o sectores.crud
     """
     # Obtener usuario actual y verificar permisos
-    current_user = get_current_user(payload, db)
-    require_permission(current_user, db, "sectores", "lectura")
+    current_user = await get_current_user_async(payload, db)
+    await require_permission_async(current_user, db, "sectores", "lectura")
     
-    query = db.query(Sector)
+    stmt = select(Sector)
     
     # Filtro de búsqueda
     if search:
         search_filter = f"%{search}%"
-        query = query.filter(
+        stmt = stmt.where(
             (Sector.nombre_sector.ilike(search_filter)) |
             (Sector.descripcion.ilike(search_filter))
         )
     
     # Filtro por estado
     if activo is not None:
-        query = query.filter(Sector.activo == activo)
-    
-    # Ordenar por nombre
-    query = query.order_by(Sector.nombre_sector)
+        stmt = stmt.where(Sector.activo == activo)
     
-    # Paginación
-    sectores = query.offset(skip).limit(limit).all()
+    # Ordenar por nombre y paginar
+    sectores = (await db.execute(
+        stmt.order_by(Sector.nombre_sector).offset(skip).limit(limit)
+    )).scalars().all()
     
     return sectores
 
@@ -198,6 +208,7 @@ def crear_sector(
     try:
         db.add(nuevo_sector)
         db.commit()
+        invalidar_resumen()
         db.refresh(nuevo_sector)
         
         # ✅ Registrar auditoría
@@ -270,6 +281,7 @@ def actualizar_sector(
     
     try:
         db.commit()
+        invalidar_resumen()
         db.refresh(sector)
         
         # ✅ Registrar auditoría
@@ -325,6 +337,7 @@ def eliminar_sector(
         # ✅ Intentar eliminar físicamente
         db.delete(sector)
         db.commit()
+        invalidar_resumen()
         
         # Auditoría
         registrar_auditoria(
@@ -364,6 +377,7 @@ def eliminar_sector(
             
             sector.activo = False
             db.commit()
+            invalidar_resumen()
             db.refresh(sector)
             
             # Auditoría
@@ -432,6 +446,7 @@ def toggle_sector_status(
     
     try:
         db.commit()
+        invalidar_resumen()
         db.refresh(sector)
         
         # ✅ Registrar auditoría
@@ -462,18 +477,48 @@ def obtener_estadisticas_sectores(
     payload: dict = Depends(verify_token)
 ):
     """
-    Obtiene estadísticas de sectores
+    Obtiene estadísticas de sectores (del resumen del dashboard)
     Requiere permiso: sectores.lectura o sectores.crud
     """
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "sectores", "lectura")
     
-    total = db.query(Sector).count()
-    activos = db.query(Sector).filter(Sector.activo == True).count()
-    inactivos = db.query(Sector).filter(Sector.activo == False).count()
-    
-    return {
-        "total": total,
-        "activos": activos,
-        "inactivos": inactivos
-    }
\ No newline at end of file
+    return obtener_resumen(db)["sectores"]
+
+
+@router.get("/stats/consumo", response_model=List[ConsumoSectorResponse])
+@max_queries(3)
+def obtener_consumo_sectores(
+    desde: Optional[date] = Query(None, description="Periodo inicial"),
+    hasta: Optional[date] = Query(None, description="Periodo final"),
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Serie mensual de consumo y facturación por sector (gráficos del dashboard).
+    Lee los resúmenes precalculados, no las lecturas ni las facturas.
+    Requiere permiso: sectores.lectura o sectores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "sectores", "lectura")
+
+    query = db.query(
+        ConsumoMensualSector.id_sector,
+        Sector.nombre_sector,
+        ConsumoMensualSector.periodo,
+        ConsumoMensualSector.consumo,
+        ConsumoMensualSector.num_lecturas,
+        ConsumoMensualSector.monto_facturado,
+        ConsumoMensualSector.num_facturas,
+    ).join(Sector, Sector.id_sector == ConsumoMensualSector.id_sector)
+
+    if desde:
+        query = query.filter(ConsumoMensualSector.periodo >= desde.replace(day=1))
+    if hasta:
+        query = query.filter(ConsumoMensualSector.periodo <= hasta)
+    if id_sector is not None:
+        query = query.filter(ConsumoMensualSector.id_sector == id_sector)
+
+    filas = query.order_by(ConsumoMensualSector.periodo, ConsumoMensualSector.id_sector).all()
+    return [ConsumoSectorResponse.model_validate(fila) for fila in filas]
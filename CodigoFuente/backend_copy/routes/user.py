@@ -1,7 +1,7 @@
 # routes/users.py
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, select, Select
 from typing import List, Optional
 from datetime import datetime
 from schemas.notification import NotificacionCreate
@@ -10,9 +10,13 @@ from sqlalchemy.exc import IntegrityError
 from psycopg2.errors import ForeignKeyViolation
 
 import base64
+import io
 
 from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
 from models.user import UsuarioSistema
+from models.role import Rol, RolAccion
 from schemas.user import (
     UserCreate, 
     UserUpdate, 
@@ -24,6 +28,9 @@ from schemas.user import (
 from security.jwt import verify_token
 from security.password import hash_password, verify_password
 from utils.audit_logger import registrar_auditoria
+from services.blobs import registrar_blob, foto_usuario, ImagenNoReconocida
+from utils.serialization import respuesta_json
+from utils.fields import CamposPermitidos, usa_tabla
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -39,7 +46,7 @@ def get_db():
 # ============================================================================
 def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
     """Obtiene el usuario actual desde el payload del JWT"""
-    user = db.query(UsuarioSistema).filter(
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
         UsuarioSistema.usuario == payload["sub"]
     ).first()
     
@@ -134,7 +141,7 @@ def process_user_photo(foto_bytes):
 # ============================================================================
 def user_to_response(user: UsuarioSistema, db: Session = None) -> dict:
     """Convierte un usuario de BD a diccionario de respuesta"""
-    foto_url = process_user_photo(user.foto) if user.foto else None
+    foto_url = process_user_photo(foto_usuario(user))
     
     # Obtener información del rol
     rol_info = None
@@ -170,28 +177,96 @@ def user_to_response(user: UsuarioSistema, db: Session = None) -> dict:
         "foto": foto_url
     }
 
+def permisos_por_rol(db: Session, ids_rol: set) -> dict:
+    """{id_rol: [permisos activos]} de varios roles en una consulta"""
+    permisos = {id_rol: [] for id_rol in ids_rol}
+    if ids_rol:
+        acciones = db.execute(
+            select(RolAccion.id_rol, RolAccion.nombre_accion, RolAccion.tipo_accion)
+            .where(RolAccion.id_rol.in_(ids_rol), RolAccion.activo == True)
+        )
+        for id_rol, nombre_accion, tipo_accion in acciones:
+            permisos[id_rol].append({"nombre_accion": nombre_accion, "tipo_accion": tipo_accion})
+    return permisos
+
+
+# ============================================================================
+# CAMPOS DE LA RESPUESTA (mismo formato que UserListResponse, ?fields=)
+# ============================================================================
+# "permisos" se completa después con permisos_por_rol (una consulta por página)
+CAMPOS_USUARIO = CamposPermitidos({
+    "id": ([UsuarioSistema.id_usuario_sistema], lambda f: f.id_usuario_sistema),
+    "usuario": ([UsuarioSistema.usuario], lambda f: f.usuario),
+    "nombres": ([UsuarioSistema.nombres], lambda f: f.nombres),
+    "apellidos": ([UsuarioSistema.apellidos], lambda f: f.apellidos),
+    "sexo": ([UsuarioSistema.sexo], lambda f: f.sexo),
+    "fecha_nac": ([UsuarioSistema.fecha_nac], lambda f: f.fecha_nac),
+    "email": ([UsuarioSistema.email], lambda f: f.email),
+    "cedula": ([UsuarioSistema.cedula], lambda f: f.cedula),
+    "telefono": ([UsuarioSistema.telefono], lambda f: f.telefono),
+    "direccion": ([UsuarioSistema.direccion], lambda f: f.direccion),
+    "id_rol": ([UsuarioSistema.id_rol], lambda f: f.id_rol),
+    "rol": (
+        [UsuarioSistema.id_rol, Rol.nombre_rol, Rol.descripcion.label("rol_descripcion")],
+        lambda f: {
+            "id_rol": f.id_rol,
+            "nombre_rol": f.nombre_rol,
+            "descripcion": f.rol_descripcion
+        } if f.nombre_rol is not None else None
+    ),
+    "permisos": ([UsuarioSistema.id_rol], lambda f: []),
+    "activo": ([UsuarioSistema.activo], lambda f: f.activo),
+    "fecha_registro": ([UsuarioSistema.fecha_registro], lambda f: f.fecha_registro),
+    "ultimo_acceso": ([UsuarioSistema.ultimo_acceso], lambda f: f.ultimo_acceso),
+    "foto": ([UsuarioSistema.foto, UsuarioSistema.foto_hash], lambda f: process_user_photo(foto_usuario(f))),
+}, por_defecto=(
+    "id", "usuario", "nombres", "apellidos", "sexo", "fecha_nac", "email", "cedula", "telefono",
+    "direccion", "id_rol", "rol", "permisos", "activo", "fecha_registro", "foto"
+))
+
+def usuarios_a_respuesta(db: Session, filas: list, elegidos) -> list:
+    """Filas de la consulta -> respuestas con las claves elegidas (permisos en una sola consulta)"""
+    respuestas = [CAMPOS_USUARIO.respuesta(fila, elegidos) for fila in filas]
+    if "permisos" in elegidos:
+        permisos = permisos_por_rol(db, {fila.id_rol for fila in filas})
+        for respuesta, fila in zip(respuestas, filas):
+            respuesta["permisos"] = permisos.get(fila.id_rol, [])
+    return respuestas
+
+def consulta_usuarios(elegidos) -> Select:
+    """SELECT de las columnas de los campos elegidos (JOIN con el rol solo si se pide)"""
+    stmt = select(*CAMPOS_USUARIO.columnas(elegidos)).select_from(UsuarioSistema)
+    if usa_tabla(stmt, Rol):
+        stmt = stmt.outerjoin(Rol, Rol.id_rol == UsuarioSistema.id_rol)
+    return stmt
+
 # ========================================
 # LISTAR USUARIOS
 # ========================================
 @router.get("", response_model=List[UserListResponse])
+@max_queries(4)
 def get_users(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     rol: Optional[str] = None,
     activo: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
     payload: dict = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
     """
     Obtiene lista de usuarios con filtros opcionales
+    Con fields= solo se consultan y devuelven esos campos (ver CAMPOS_USUARIO)
     Requiere permiso: usuarios.leer o usuarios.crud
     """
     # Obtener usuario actual y verificar permisos
     current_user = get_current_user(payload, db)
     require_permission(current_user, db, "usuarios", "lectura")
     
-    query = db.query(UsuarioSistema) 
+    # Solo las columnas de los campos pedidos, directamente desde la consulta
+    elegidos = CAMPOS_USUARIO.elegir(fields)
+    stmt = consulta_usuarios(elegidos)
     
     # Filtro de búsqueda
     if search:
@@ -201,22 +276,23 @@ def get_users(
             UsuarioSistema.email.ilike(f"%{search}%"),
             UsuarioSistema.usuario.ilike(f"%{search}%")
         )
-        query = query.filter(search_filter)  # consultas 
+        stmt = stmt.where(search_filter)  # consultas 
     
     # Filtro de rol
     if rol and rol != "all":
-        query = query.filter(UsuarioSistema.id_rol == rol)
+        stmt = stmt.where(UsuarioSistema.id_rol == rol)
     
     # Filtro de estado
     if activo is not None:
-        query = query.filter(UsuarioSistema.activo == activo)
+        stmt = stmt.where(UsuarioSistema.activo == activo)
     
     # Ordenar por fecha de registro descendente
-    query = query.order_by(UsuarioSistema.fecha_registro.desc())
-    
-    users = query.offset(skip).limit(limit).all()
+    filas = db.execute(
+        stmt.order_by(UsuarioSistema.fecha_registro.desc(), UsuarioSistema.id_usuario_sistema.desc())
+        .offset(skip).limit(limit)
+    ).all()
     
-    return [user_to_response(user, db) for user in users]
+    return respuesta_json(usuarios_a_respuesta(db, filas, elegidos))
 
 # ========================================
 # OBTENER USUARIO POR ID
@@ -224,11 +300,13 @@ def get_users(
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
     user_id: int,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
     payload: dict = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
     """
     Obtiene un usuario específico por ID
+    Con fields= solo se consultan y devuelven esos campos (ver CAMPOS_USUARIO)
     Admin o el mismo usuario pueden acceder
     """
     current_user = get_current_user(payload, db)
@@ -243,6 +321,18 @@ def get_user(
             detail="No tienes permisos para ver este usuario"
         )
     
+    if fields is not None:
+        elegidos = CAMPOS_USUARIO.elegir(fields)
+        fila = db.execute(
+            consulta_usuarios(elegidos).where(UsuarioSistema.id_usuario_sistema == user_id)
+        ).first()
+        if not fila:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Usuario no encontrado"
+            )
+        return respuesta_json(usuarios_a_respuesta(db, [fila], elegidos)[0])
+    
     user = db.query(UsuarioSistema).filter(
         UsuarioSistema.id_usuario_sistema == user_id
     ).first()
@@ -859,15 +949,21 @@ async def upload_user_photo(
             detail="La imagen no debe superar los 2MB"
         )
     
-    # Guardar foto en la base de datos
-    user.foto = contents
-    
     try:
+        # Guardar foto en el almacenamiento de archivos (la tabla solo guarda el hash)
+        blob = registrar_blob(db, io.BytesIO(contents))
+        user.foto_hash = blob["hash"]
+        user.foto = None
         db.commit()
         db.refresh(user)
         
         return user_to_response(user, db)
     
+    except ImagenNoReconocida as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         db.rollback()
         print(f"Error al subir foto: {e}")
@@ -1006,6 +1102,7 @@ def get_user_lock_status(
 # LISTAR USUARIOS BLOQUEADOS
 # ========================================
 @router.get("/admin/blocked-users", status_code=status.HTTP_200_OK)
+@max_queries(3)
 def get_blocked_users(
     payload: dict = Depends(verify_token),
     db: Session = Depends(get_db)
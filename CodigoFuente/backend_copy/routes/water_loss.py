@@ -0,0 +1,291 @@
+# routes/water_loss.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+
+from models.user import UsuarioSistema
+from models.role import RolAccion
+from models.sector import Sector
+from models.water_loss import MacroMedidor, PerdidaSector
+from schemas.water_loss import (
+    MacroMedidorCreate, MacroMedidorResponse,
+    LecturaMacroBulkRequest, LecturaMacroBulkResponse,
+    PerdidaSectorResponse
+)
+from services.water_loss import registrar_lecturas_macro, analizar_perdidas, analizar_periodos
+from utils.audit_logger import registrar_auditoria
+from db.session import SessionLocal
+from db.load_profiles import perfil
+from db.query_guard import max_queries
+from security.jwt import verify_token
+
+router = APIRouter(prefix="/perdidas", tags=["agua no facturada"])
+
+def get_db():
+    """Dependencia para obtener la sesión de base de datos"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ============================================================================
+# HELPER: Obtener usuario actual desde el token
+# ============================================================================
+def get_current_user(payload: dict, db: Session) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = db.query(UsuarioSistema).options(*perfil("usuario_actual")).filter(
+        UsuarioSistema.usuario == payload["sub"]
+    ).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+# ============================================================================
+# HELPER: Verificar permisos de usuario
+# ============================================================================
+def check_permission(user: UsuarioSistema, db: Session, module: str, action: str = None) -> bool:
+    """
+    Verifica si el usuario tiene permiso para una acción.
+    Si tiene permiso de crear, actualizar o eliminar, también tiene lectura.
+    """
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    permisos = db.query(RolAccion).filter(
+        RolAccion.id_rol == user.id_rol,
+        RolAccion.activo == True
+    ).all()
+
+    acciones_usuario = set()
+
+    for permiso in permisos:
+        if not permiso.nombre_accion:
+            continue
+
+        perm_module = permiso.nombre_accion.lower().strip()
+        perm_action = (permiso.tipo_accion or '').lower().strip()
+
+        if perm_module != module:
+            continue
+
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+def require_permission(user: UsuarioSistema, db: Session, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    if not check_permission(user, db, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
+
+# ========================================
+# MACROMEDIDORES
+# ========================================
+@router.post("/macro-medidores", response_model=MacroMedidorResponse, status_code=status.HTTP_201_CREATED)
+def crear_macro_medidor(
+    macro: MacroMedidorCreate,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Registra el macromedidor de una línea de distribución de un sector
+    Requiere permiso: sectores.crear o sectores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "sectores", "crear")
+
+    if not db.query(Sector.id_sector).filter(Sector.id_sector == macro.id_sector).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sector no encontrado"
+        )
+    if db.query(MacroMedidor.id_macro_medidor).filter(MacroMedidor.num_macro_medidor == macro.num_macro_medidor).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ya existe un macromedidor con el número '{macro.num_macro_medidor}'"
+        )
+
+    nuevo = MacroMedidor(**macro.model_dump())
+    db.add(nuevo)
+    db.commit()
+    db.refresh(nuevo)
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Macromedidor '{nuevo.num_macro_medidor}' creado en el sector {nuevo.id_sector} por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    return nuevo
+
+
+@router.get("/macro-medidores", response_model=List[MacroMedidorResponse])
+@max_queries(3)
+def listar_macro_medidores(
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Lista los macromedidores
+    Requiere permiso: sectores.lectura o sectores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "sectores", "lectura")
+
+    query = db.query(MacroMedidor)
+    if id_sector is not None:
+        query = query.filter(MacroMedidor.id_sector == id_sector)
+    return query.order_by(MacroMedidor.id_sector, MacroMedidor.num_macro_medidor).all()
+
+
+@router.post("/macro-lecturas", response_model=LecturaMacroBulkResponse, status_code=status.HTTP_201_CREATED)
+def cargar_lecturas_macro(
+    request: LecturaMacroBulkRequest,
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Registra lecturas de macromedidores y recalcula el análisis de pérdidas
+    de los periodos afectados (analizado=False si el análisis falló).
+    Requiere permiso: lecturas.crear o lecturas.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "lecturas", "crear")
+
+    try:
+        resumen = registrar_lecturas_macro(db, request.lecturas, current_user.id_usuario_sistema)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al registrar lecturas de macromedidores: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al registrar las lecturas: {str(e)}"
+        )
+
+    # Las lecturas ya están guardadas: un error en el análisis se informa y la
+    # carga no falla (se repite con POST /perdidas/analizar)
+    try:
+        analizar_periodos(db, resumen["periodos"])
+    except Exception as e:
+        db.rollback()
+        resumen["analizado"] = False
+        print(f"⚠️ Lecturas de macromedidores guardadas sin análisis de pérdidas: {e}")
+
+    registrar_auditoria(
+        db=db,
+        accion="CREATE",
+        descripcion=f"Carga de lecturas de macromedidores: {resumen['registradas']} registradas, {resumen['rechazadas']} rechazadas por '{payload['sub']}'",
+        id_usuario=current_user.id_usuario_sistema
+    )
+
+    return resumen
+
+# ========================================
+# ANÁLISIS DE AGUA NO FACTURADA
+# ========================================
+@router.post("/analizar")
+def ejecutar_analisis(
+    periodo: date = Query(..., description="Periodo a analizar (primer día del mes)"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Recalcula y guarda el análisis de pérdidas del periodo
+    (por ejemplo después de cargar lecturas atrasadas de clientes).
+    Requiere permiso: sectores.actualizar o sectores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "sectores", "actualizar")
+
+    resultado = analizar_perdidas(db, periodo)
+    return {"periodo": resultado["periodo"], "sectores": resultado["sectores"]}
+
+
+def _consulta_perdidas(db: Session):
+    return db.query(
+        PerdidaSector.id_sector,
+        Sector.nombre_sector,
+        PerdidaSector.periodo,
+        PerdidaSector.volumen_suministrado,
+        PerdidaSector.volumen_consumido,
+        PerdidaSector.volumen_perdido,
+        PerdidaSector.porcentaje_perdida,
+        PerdidaSector.tendencia,
+        PerdidaSector.ranking,
+        PerdidaSector.num_medidores,
+        PerdidaSector.num_estimadas,
+        PerdidaSector.fecha_calculo,
+    ).join(Sector, Sector.id_sector == PerdidaSector.id_sector)
+
+
+@router.get("/", response_model=List[PerdidaSectorResponse])
+@max_queries(3)
+def ranking_perdidas(
+    periodo: date = Query(..., description="Periodo (primer día del mes)"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Ranking de sectores por porcentaje de agua no facturada en el periodo.
+    Lee el resultado guardado, no recalcula.
+    Requiere permiso: sectores.lectura o sectores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "sectores", "lectura")
+
+    filas = _consulta_perdidas(db).filter(
+        PerdidaSector.periodo == periodo.replace(day=1)
+    ).order_by(
+        PerdidaSector.ranking.asc().nulls_last(), PerdidaSector.id_sector
+    ).all()
+    return [PerdidaSectorResponse.model_validate(fila) for fila in filas]
+
+
+@router.get("/serie", response_model=List[PerdidaSectorResponse])
+@max_queries(3)
+def serie_perdidas(
+    desde: Optional[date] = Query(None, description="Periodo inicial"),
+    hasta: Optional[date] = Query(None, description="Periodo final"),
+    id_sector: Optional[int] = Query(None, description="Filtrar por sector"),
+    db: Session = Depends(get_db),
+    payload: dict = Depends(verify_token)
+):
+    """
+    Serie mensual de pérdidas por sector (gráficos del dashboard)
+    Requiere permiso: sectores.lectura o sectores.crud
+    """
+    current_user = get_current_user(payload, db)
+    require_permission(current_user, db, "sectores", "lectura")
+
+    query = _consulta_perdidas(db)
+    if desde:
+        query = query.filter(PerdidaSector.periodo >= desde.replace(day=1))
+    if hasta:
+        query = query.filter(PerdidaSector.periodo <= hasta)
+    if id_sector is not None:
+        query = query.filter(PerdidaSector.id_sector == id_sector)
+
+    filas = query.order_by(PerdidaSector.periodo, PerdidaSector.id_sector).all()
+    return [PerdidaSectorResponse.model_validate(fila) for fila in filas]
@@ -2,7 +2,7 @@
 # schemas/affiliate.py
 # ============================================================================
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class AffiliateBase(BaseModel):
@@ -14,6 +14,10 @@ class AffiliateCreate(AffiliateBase):
     """Schema para crear un afiliado"""
     id_usuario_sistema: int = Field(..., description="ID del usuario del sistema a afiliar")
 
+class AffiliateBulkCreate(BaseModel):
+    """Lote de afiliaciones (campañas de afiliación)"""
+    afiliados: List[AffiliateCreate] = Field(..., min_length=1, max_length=5000)
+
 class AffiliateUpdate(BaseModel):
     """Schema para actualizar un afiliado"""
     id_sector: Optional[int] = Field(None, description="ID del sector")
@@ -31,6 +35,24 @@ class AffiliateResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AffiliateBulkResponse(BaseModel):
+    """Resultado de la afiliación masiva"""
+    creados: int
+    rechazados: int
+    afiliados: List[AffiliateResponse] = []
+    errores: List[dict] = []
+
+class AffiliationImportResponse(BaseModel):
+    """Resultado de la importación de afiliaciones y medidores"""
+    filas: int
+    validas: int
+    afiliados_creados: int
+    medidores_creados: int
+    rechazadas: int
+    sectores: List[int] = []
+    errores: List[dict] = []
+    simulacion: bool = False
+
 class UserInfoSimple(BaseModel):
     """Información básica del usuario"""
     id: int
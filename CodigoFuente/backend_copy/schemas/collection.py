@@ -0,0 +1,48 @@
+# schemas/collection.py
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date
+from decimal import Decimal
+
+
+# ========================================
+# SCHEMAS PARA ANTIGÜEDAD DE CARTERA
+# ========================================
+class AntiguedadAfiliadoResponse(BaseModel):
+    """Deuda de un afiliado separada por días de antigüedad"""
+    id_usuario_afi: int
+    cod_usuario_afi: int
+    id_sector: Optional[int] = None
+    nombres: str
+    apellidos: str
+    cedula: str
+    deuda_0_30: Decimal
+    deuda_31_60: Decimal
+    deuda_61_90: Decimal
+    deuda_90_mas: Decimal
+    deuda_total: Decimal
+    facturas_pendientes: int
+    fecha_mas_antigua: date
+    dias_mora: int
+
+    class Config:
+        from_attributes = True
+
+
+class AntiguedadResumenResponse(BaseModel):
+    fecha_corte: date
+    deuda_0_30: Decimal
+    deuda_31_60: Decimal
+    deuda_61_90: Decimal
+    deuda_90_mas: Decimal
+    deuda_total: Decimal
+    afiliados_0_30: int
+    afiliados_31_60: int
+    afiliados_61_90: int
+    afiliados_90_mas: int
+    afiliados: int
+
+
+class CandidatoCorteResponse(AntiguedadAfiliadoResponse):
+    """Afiliado con deuda vencida y al menos un medidor activo"""
+    medidores: List[str] = []
@@ -0,0 +1,30 @@
+# schemas/consumption.py
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date
+from decimal import Decimal
+
+
+class ConsumoMensualResponse(BaseModel):
+    """Un punto de la serie mensual (gráficos de consumo)"""
+    periodo: date
+    consumo: Decimal
+    num_lecturas: int
+    monto_facturado: Decimal
+    num_facturas: int
+
+    class Config:
+        from_attributes = True
+
+
+class ConsumoAfiliadoResponse(BaseModel):
+    """Serie mensual de una afiliación del cliente"""
+    id_usuario_afi: int
+    cod_usuario_afi: int
+    id_sector: int
+    consumos: List[ConsumoMensualResponse] = []
+
+
+class ConsumoSectorResponse(ConsumoMensualResponse):
+    id_sector: int
+    nombre_sector: Optional[str] = None
@@ -0,0 +1,39 @@
+# schemas/dashboard.py
+from pydantic import BaseModel
+from typing import List
+from datetime import datetime
+
+
+# ========================================
+# SCHEMAS PARA EL RESUMEN DEL DASHBOARD
+# ========================================
+class TotalesMedidores(BaseModel):
+    total: int = 0
+    activos: int = 0
+    inactivos: int = 0
+    asignados: int = 0
+    sin_asignar: int = 0
+
+
+class TotalesEstado(BaseModel):
+    total: int = 0
+    activos: int = 0
+    inactivos: int = 0
+
+
+class ResumenSector(BaseModel):
+    id_sector: int
+    nombre_sector: str
+    activo: bool = True
+    medidores: int = 0
+    medidores_activos: int = 0
+    afiliados_activos: int = 0
+
+
+class ResumenDashboard(BaseModel):
+    medidores: TotalesMedidores
+    afiliados: TotalesEstado
+    sectores: TotalesEstado
+    por_sector: List[ResumenSector] = []
+    generado: datetime
+    desde_cache: bool = False
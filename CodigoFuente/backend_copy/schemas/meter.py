@@ -1,6 +1,6 @@
 # schemas/meter.py
 from pydantic import BaseModel, validator, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
 
@@ -124,4 +124,39 @@ class AfiliadoDisponible(BaseModel):
     nombre_sector: Optional[str] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# ========================================
+# SCHEMAS PARA RUTAS DE LECTURA
+# ========================================
+class RutaMedidor(BaseModel):
+    """Parada de la ruta del lector"""
+    orden: int
+    id_medidor: int
+    num_medidor: str
+    latitud: float
+    longitud: float
+    distancia_acumulada: float = Field(..., description="Metros recorridos hasta este medidor")
+
+
+class RutaLecturaResponse(BaseModel):
+    total_medidores: int
+    distancia_total: float = Field(..., description="Metros de la ruta optimizada")
+    distancia_inicial: float = Field(..., description="Metros de la ruta por vecino más cercano")
+    mejoras_2opt: int
+    tiempo_calculo: float = Field(..., description="Segundos del cálculo original")
+    desde_cache: bool = False
+    medidores: List[RutaMedidor] = []
+    sin_coordenadas: List[int] = Field([], description="Medidores del sector sin coordenadas (no incluidos)")
+
+
+# ========================================
+# SCHEMAS PARA CONSULTAS DE MAPA
+# ========================================
+class MedidoresMapaResponse(BaseModel):
+    """Respuesta compacta: nombres de columnas una vez y filas como listas"""
+    columnas: List[str]
+    filas: List[list] = []
+    total: int
+    truncado: bool = False
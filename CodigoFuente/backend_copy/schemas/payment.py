@@ -0,0 +1,119 @@
+# schemas/payment.py
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
+from datetime import date, datetime
+from decimal import Decimal
+
+
+# ========================================
+# SCHEMAS PARA PAGOS
+# ========================================
+class PagoCreate(BaseModel):
+    """Pago cobrado en caja"""
+    clave_idempotencia: str = Field(..., min_length=8, max_length=64, description="Clave única generada por el cliente en cada intento de cobro")
+    id_usuario_afi: int = Field(..., description="ID del afiliado")
+    monto: Decimal = Field(..., gt=0, max_digits=12, decimal_places=2)
+    metodo: str = "efectivo"
+    referencia: Optional[str] = Field(None, max_length=100)
+    observacion: Optional[str] = Field(None, max_length=255)
+
+    @field_validator('metodo')
+    @classmethod
+    def validate_metodo(cls, v):
+        metodos_validos = ['efectivo', 'transferencia', 'deposito']
+        if v not in metodos_validos:
+            raise ValueError(f"Método inválido. Debe ser uno de: {', '.join(metodos_validos)}")
+        return v
+
+
+class PagoResponse(BaseModel):
+    id_pago: int
+    clave_idempotencia: str
+    id_usuario_afi: int
+    monto: Decimal
+    metodo: str
+    fecha_pago: datetime
+    duplicado: bool = False
+    saldo: Optional[Decimal] = None  # saldo del afiliado después del pago
+
+    class Config:
+        from_attributes = True
+
+
+class PagoListResponse(BaseModel):
+    id_pago: int
+    id_usuario_afi: int
+    monto: Decimal
+    metodo: str
+    referencia: Optional[str] = None
+    observacion: Optional[str] = None
+    fecha_pago: datetime
+    id_cajero: int
+    id_cierre_caja: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+# ========================================
+# SCHEMAS PARA SALDOS
+# ========================================
+class SaldoAfiliadoResponse(BaseModel):
+    """Resultado de la búsqueda de afiliados en caja"""
+    id_usuario_afi: int
+    cod_usuario_afi: int
+    id_sector: int
+    nombres: str
+    apellidos: str
+    cedula: str
+    saldo: Decimal = Decimal(0)
+    facturas_pendientes: int = 0
+    fecha_ultimo_pago: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class FacturaPendienteResponse(BaseModel):
+    id_factura: int
+    num_factura: Optional[str] = None
+    periodo: date
+    total: Decimal
+    saldo_pendiente: Decimal
+
+    class Config:
+        from_attributes = True
+
+
+class SaldoDetalleResponse(SaldoAfiliadoResponse):
+    total_facturado: Decimal = Decimal(0)
+    total_pagado: Decimal = Decimal(0)
+    facturas: List[FacturaPendienteResponse] = []
+
+
+# ========================================
+# SCHEMAS PARA CIERRE DE CAJA
+# ========================================
+class CierreCajaCreate(BaseModel):
+    """Cierre de caja, opcionalmente con el lote de pagos cobrados sin conexión"""
+    clave_idempotencia: Optional[str] = Field(None, min_length=8, max_length=64)
+    monto_declarado: Optional[Decimal] = Field(None, ge=0, description="Efectivo contado por el cajero")
+    observacion: Optional[str] = Field(None, max_length=255)
+    pagos: List[PagoCreate] = Field(default=[], max_length=5000)
+
+
+class CierreCajaResponse(BaseModel):
+    id_cierre_caja: int
+    id_cajero: int
+    fecha_cierre: datetime
+    num_pagos: int
+    monto_total: Decimal
+    monto_declarado: Optional[Decimal] = None
+    diferencia: Optional[Decimal] = None
+    observacion: Optional[str] = None
+    registrados: int = 0
+    duplicados: int = 0
+    errores: List[dict] = []
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,93 @@
+# schemas/reading.py
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
+from datetime import date, datetime
+from decimal import Decimal
+
+
+# ========================================
+# SCHEMAS PARA LECTURAS
+# ========================================
+class LecturaCreate(BaseModel):
+    """Lectura tomada en campo"""
+    id_medidor: int = Field(..., description="ID del medidor")
+    periodo: date = Field(..., description="Periodo leído (cualquier día del mes)")
+    lectura_actual: Decimal = Field(..., ge=0, description="Valor marcado por el medidor")
+    fecha_lectura: Optional[datetime] = None
+    observacion: Optional[str] = Field(None, max_length=255)
+    foto_hash: Optional[str] = Field(None, pattern="^[0-9a-f]{64}$", description="Foto subida antes a POST /blobs")
+
+
+class LecturaBulkRequest(BaseModel):
+    """Lote de lecturas (carga masiva o sincronización del dispositivo)"""
+    lecturas: List[LecturaCreate] = Field(..., min_length=1, max_length=20000)
+
+
+class LecturaBulkResponse(BaseModel):
+    registradas: int
+    rechazadas: int
+    errores: List[dict] = []
+    analizado: bool = True  # False: lecturas guardadas, repetir POST /readings/analysis
+
+
+class LecturaResponse(BaseModel):
+    id_lectura: int
+    id_medidor: int
+    periodo: date
+    fecha_lectura: Optional[datetime] = None
+    lectura_anterior: Optional[Decimal] = None
+    lectura_actual: Decimal
+    consumo: Decimal
+    observacion: Optional[str] = None
+    estimada: bool = False
+    metodo_estimacion: Optional[str] = None
+    ajuste_estimacion: Decimal = Decimal(0)
+    foto_hash: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+# ========================================
+# SCHEMAS PARA ALERTAS DE LECTURA
+# ========================================
+class AlertaLecturaResponse(BaseModel):
+    id_alerta: int
+    id_lectura: int
+    id_medidor: int
+    num_medidor: Optional[str] = None
+    id_sector: Optional[int] = None
+    periodo: date
+    tipo: str
+    valor: Optional[Decimal] = None
+    puntaje: Optional[Decimal] = None
+    detalle: Optional[str] = None
+    estado: str
+    fecha_creacion: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AlertaLecturaUpdate(BaseModel):
+    """Resultado de la revisión del lector"""
+    estado: str = Field(..., description="confirmada o descartada")
+    detalle: Optional[str] = Field(None, max_length=255)
+
+    @field_validator('estado')
+    @classmethod
+    def validate_estado(cls, v):
+        estados_validos = ['confirmada', 'descartada']
+        if v not in estados_validos:
+            raise ValueError(f"Estado inválido. Debe ser uno de: {', '.join(estados_validos)}")
+        return v
+
+
+# ========================================
+# SCHEMAS PARA ARCHIVOS (FOTOS)
+# ========================================
+class BlobResponse(BaseModel):
+    hash: str
+    tamano: int
+    tipo_contenido: str
+    duplicado: bool = False  # el mismo contenido ya estaba guardado
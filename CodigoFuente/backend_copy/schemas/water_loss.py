@@ -0,0 +1,68 @@
+# schemas/water_loss.py
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import date, datetime
+from decimal import Decimal
+
+
+# ========================================
+# SCHEMAS PARA MACROMEDIDORES
+# ========================================
+class MacroMedidorCreate(BaseModel):
+    num_macro_medidor: str = Field(..., min_length=1, max_length=50)
+    descripcion: Optional[str] = Field(None, max_length=255)
+    id_sector: int = Field(..., description="Sector que abastece la línea")
+
+
+class MacroMedidorResponse(BaseModel):
+    id_macro_medidor: int
+    num_macro_medidor: str
+    descripcion: Optional[str] = None
+    activo: bool
+    id_sector: int
+
+    class Config:
+        from_attributes = True
+
+
+class LecturaMacroCreate(BaseModel):
+    """Lectura mensual de un macromedidor"""
+    id_macro_medidor: int
+    periodo: date = Field(..., description="Periodo leído (cualquier día del mes)")
+    lectura_actual: Decimal = Field(..., ge=0)
+    fecha_lectura: Optional[datetime] = None
+    observacion: Optional[str] = Field(None, max_length=255)
+
+
+class LecturaMacroBulkRequest(BaseModel):
+    lecturas: List[LecturaMacroCreate] = Field(..., min_length=1, max_length=1000)
+
+
+class LecturaMacroBulkResponse(BaseModel):
+    registradas: int
+    rechazadas: int
+    errores: List[dict] = []
+    periodos: List[date] = []
+    analizado: bool = True  # False: lecturas guardadas, repetir POST /perdidas/analizar
+
+
+# ========================================
+# SCHEMAS PARA AGUA NO FACTURADA
+# ========================================
+class PerdidaSectorResponse(BaseModel):
+    """Resultado precalculado de un sector en un periodo (gráficos del dashboard)"""
+    id_sector: int
+    nombre_sector: Optional[str] = None
+    periodo: date
+    volumen_suministrado: Decimal
+    volumen_consumido: Decimal
+    volumen_perdido: Decimal
+    porcentaje_perdida: Optional[Decimal] = None
+    tendencia: Optional[Decimal] = None
+    ranking: Optional[int] = None
+    num_medidores: int
+    num_estimadas: int
+    fecha_calculo: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,70 @@
+# security/async_auth.py
+"""
+Usuario actual y permisos para los endpoints async (AsyncSession)
+
+Misma regla que check_permission de los routers: crud da todas las
+acciones del módulo y crear/actualizar/eliminar incluyen lectura.
+"""
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.role import RolAccion
+from models.user import UsuarioSistema
+from db.load_profiles import perfil
+
+
+async def get_current_user_async(payload: dict, db: AsyncSession) -> UsuarioSistema:
+    """Obtiene el usuario actual desde el payload del JWT"""
+    user = (await db.execute(
+        select(UsuarioSistema).options(*perfil("usuario_actual")).where(UsuarioSistema.usuario == payload["sub"])
+    )).scalars().first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario no encontrado"
+        )
+
+    return user
+
+
+def permiso_concedido(permisos: Iterable[Tuple[str, str]], module: str, action: Optional[str] = None) -> bool:
+    """[(nombre_accion, tipo_accion)] del rol -> ¿tiene permiso para la acción del módulo?"""
+    module = module.lower().strip()
+    action = action.lower().strip() if action else None
+
+    acciones_usuario = set()
+    for nombre_accion, tipo_accion in permisos:
+        if not nombre_accion or nombre_accion.lower().strip() != module:
+            continue
+
+        perm_action = (tipo_accion or '').lower().strip()
+        if perm_action in ['crud', 'operaciones crud']:
+            return True
+        acciones_usuario.add(perm_action)
+
+    if action is None:
+        return bool(acciones_usuario)
+
+    if action in ['leer', 'lectura']:
+        if any(a in acciones_usuario for a in ['lectura', 'leer', 'crear', 'actualizar', 'eliminar']):
+            return True
+
+    return action in acciones_usuario
+
+
+async def require_permission_async(user: UsuarioSistema, db: AsyncSession, module: str, action: str = None):
+    """Verifica permiso y lanza excepción si no lo tiene"""
+    permisos = (await db.execute(
+        select(RolAccion.nombre_accion, RolAccion.tipo_accion)
+        .where(RolAccion.id_rol == user.id_rol, RolAccion.activo == True)
+    )).all()
+
+    if not permiso_concedido(permisos, module, action):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permisos para {action or 'acceder a'} {module}"
+        )
@@ -58,4 +58,8 @@ def verify_token(token: str = Depends(oauth2_scheme)):
         raise HTTPException(
             status_code=401, 
             detail="Token inválido o expirado"
-        )
\ No newline at end of file
+        )
+
+async def verify_token_async(token: str = Depends(oauth2_scheme)):
+    """verify_token para endpoints async def (sin pasar por el threadpool)"""
+    return verify_token(token)
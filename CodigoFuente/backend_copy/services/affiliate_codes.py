@@ -0,0 +1,83 @@
+# services/affiliate_codes.py
+"""
+Asignación de códigos de afiliado
+
+Los códigos salen de la secuencia usuarios.seq_cod_usuario_afi:
+- nextval() es atómico, así que dos creaciones simultáneas nunca reciben el
+  mismo código y no hace falta bloquear ni ordenar t_usuario_afiliado.
+- reservar_codigos(n) pide n valores en una sola consulta (afiliaciones
+  masivas).
+- A diferencia de los números de factura, los códigos no necesitan ser
+  consecutivos: si la transacción falla el código se pierde (queda un hueco).
+
+Antes del primer uso en una base existente hay que crear la secuencia a
+partir del código más alto (python -m services.affiliate_codes).
+"""
+from typing import List
+
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import Session
+
+from models.affiliate import seq_cod_usuario_afi
+
+
+def reservar_codigos(db: Session, cantidad: int) -> List[int]:
+    """`cantidad` códigos nuevos, en orden ascendente (una consulta, no hace commit)"""
+    if cantidad <= 0:
+        return []
+    codigos = db.execute(
+        select(seq_cod_usuario_afi.next_value()).select_from(func.generate_series(1, cantidad))
+    ).scalars().all()
+    return sorted(codigos)
+
+
+def siguiente_codigo(db: Session) -> int:
+    return reservar_codigos(db, 1)[0]
+
+
+# ========================================
+# MIGRACIÓN
+# ========================================
+def crear_secuencia(db: Session) -> int:
+    """
+    Crea la secuencia (si no existe), la ubica después del código más alto y
+    cambia el índice de cod_usuario_afi por uno único. Hace commit.
+    Retorna el siguiente código que se asignará.
+    """
+    duplicados = db.execute(text("""
+        SELECT cod_usuario_afi, count(*) FROM usuarios.t_usuario_afiliado
+        GROUP BY cod_usuario_afi HAVING count(*) > 1 ORDER BY cod_usuario_afi
+    """)).all()
+    if duplicados:
+        for codigo, cantidad in duplicados:
+            print(f"⚠️ Código de afiliado {codigo} repetido {cantidad} veces")
+        raise RuntimeError("Hay códigos de afiliado repetidos; corríjalos antes de migrar")
+
+    db.execute(text("CREATE SEQUENCE IF NOT EXISTS usuarios.seq_cod_usuario_afi"))
+    siguiente = db.execute(text("""
+        SELECT setval('usuarios.seq_cod_usuario_afi',
+                      COALESCE((SELECT max(cod_usuario_afi) FROM usuarios.t_usuario_afiliado), 0) + 1,
+                      false)
+    """)).scalar()
+    db.execute(text("DROP INDEX IF EXISTS usuarios.ix_usuarios_t_usuario_afiliado_cod_usuario_afi"))
+    db.execute(text(
+        "CREATE UNIQUE INDEX ix_usuarios_t_usuario_afiliado_cod_usuario_afi "
+        "ON usuarios.t_usuario_afiliado (cod_usuario_afi)"
+    ))
+    db.execute(text(
+        "ALTER TABLE usuarios.t_usuario_afiliado "
+        "ALTER COLUMN cod_usuario_afi SET DEFAULT nextval('usuarios.seq_cod_usuario_afi')"
+    ))
+    db.commit()
+    return siguiente
+
+
+if __name__ == "__main__":
+    from db.session import SessionLocal
+
+    # Uso: python -m services.affiliate_codes
+    db = SessionLocal()
+    try:
+        print(f"✅ Secuencia de códigos de afiliado lista; siguiente código: {crear_secuencia(db)}")
+    finally:
+        db.close()
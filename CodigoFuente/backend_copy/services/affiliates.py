@@ -0,0 +1,149 @@
+# services/affiliates.py
+"""
+Afiliación masiva
+
+Valida el lote completo con una consulta por conjunto (usuarios, sectores y
+afiliaciones activas), reserva todos los códigos en una sola llamada a la
+secuencia e inserta los afiliados en un solo INSERT por lotes. Las filas con
+errores se devuelven sin detener el resto.
+
+La validación no bloquea nada: si otro proceso afilia al mismo usuario entre
+la validación y el INSERT, el índice único parcial ux_afiliado_usuario_activo
+(una afiliación activa por usuario) descarta esa fila con ON CONFLICT DO
+NOTHING y se informa como error de la fila; el resto del lote se crea.
+"""
+from datetime import date
+from typing import List
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from db.bulk import insertar_filas
+from models.affiliate import UsuarioAfiliado
+from models.sector import Sector
+from models.user import UsuarioSistema
+from schemas.affiliate import AffiliateCreate
+from services.affiliate_codes import reservar_codigos
+
+COLUMNAS_AFILIADO = ("cod_usuario_afi", "fecha_afiliacion", "id_sector", "id_usuario_sistema", "activo")
+
+
+def crear_afiliados(db: Session, solicitudes: List[AffiliateCreate]) -> dict:
+    """Crea los afiliados válidos del lote (hace commit) y retorna el resumen con los errores por fila"""
+    ids_usuario = {s.id_usuario_sistema for s in solicitudes}
+    usuarios = set(db.execute(
+        select(UsuarioSistema.id_usuario_sistema).where(UsuarioSistema.id_usuario_sistema.in_(ids_usuario))
+    ).scalars())
+    sectores = set(db.execute(
+        select(Sector.id_sector).where(Sector.id_sector.in_({s.id_sector for s in solicitudes}))
+    ).scalars())
+    ya_afiliados = set(db.execute(
+        select(UsuarioAfiliado.id_usuario_sistema).where(
+            UsuarioAfiliado.id_usuario_sistema.in_(ids_usuario),
+            UsuarioAfiliado.activo == True
+        )
+    ).scalars())
+
+    errores, validas = [], []
+    for fila, solicitud in enumerate(solicitudes, start=1):
+        if solicitud.id_usuario_sistema not in usuarios:
+            error = "Usuario del sistema no encontrado"
+        elif solicitud.id_sector not in sectores:
+            error = "Sector no encontrado"
+        elif solicitud.id_usuario_sistema in ya_afiliados:
+            error = "El usuario ya está afiliado"
+        else:
+            error = None
+            ya_afiliados.add(solicitud.id_usuario_sistema)  # repetidos dentro del lote
+            validas.append((fila, solicitud))
+        if error:
+            errores.append({"fila": fila, "id_usuario_sistema": solicitud.id_usuario_sistema, "error": error})
+
+    creados = []
+    if validas:
+        hoy = date.today()
+        codigos = reservar_codigos(db, len(validas))
+        filas = [
+            {
+                "cod_usuario_afi": codigo,
+                "fecha_afiliacion": hoy,
+                "id_sector": solicitud.id_sector,
+                "id_usuario_sistema": solicitud.id_usuario_sistema,
+                "activo": solicitud.activo,
+            }
+            for codigo, (_, solicitud) in zip(codigos, validas)
+        ]
+        creados = db.execute(
+            insertar_filas(UsuarioAfiliado.__table__, COLUMNAS_AFILIADO, filas)
+            .on_conflict_do_nothing(
+                index_elements=[UsuarioAfiliado.id_usuario_sistema],
+                index_where=UsuarioAfiliado.activo == True
+            )
+            .returning(
+                UsuarioAfiliado.id_usuario_afi,
+                UsuarioAfiliado.cod_usuario_afi,
+                UsuarioAfiliado.fecha_afiliacion,
+                UsuarioAfiliado.id_sector,
+                UsuarioAfiliado.id_usuario_sistema,
+                UsuarioAfiliado.activo,
+            )
+        ).mappings().all()
+        db.commit()
+
+        # Los códigos se asignaron en el orden del lote: se devuelve en ese orden
+        creados = sorted(creados, key=lambda afiliado: afiliado["cod_usuario_afi"])
+        insertados = {afiliado["cod_usuario_afi"] for afiliado in creados}
+        for codigo, (fila, solicitud) in zip(codigos, validas):
+            if codigo not in insertados:
+                errores.append({
+                    "fila": fila,
+                    "id_usuario_sistema": solicitud.id_usuario_sistema,
+                    "error": "El usuario ya está afiliado (afiliado por otro proceso durante la carga)",
+                })
+        errores.sort(key=lambda error: error["fila"])
+
+    return {
+        "creados": len(creados),
+        "rechazados": len(errores),
+        "afiliados": [dict(afiliado) for afiliado in creados],
+        "errores": errores,
+    }
+
+
+# ========================================
+# MIGRACIÓN
+# ========================================
+def crear_indice_afiliacion_activa(db: Session) -> None:
+    """
+    Bases existentes: crea el índice único parcial de afiliaciones activas
+    (ux_afiliado_usuario_activo). Falla si ya hay usuarios con más de una
+    afiliación activa. Hace commit.
+    """
+    duplicados = db.execute(text("""
+        SELECT id_usuario_sistema, count(*) FROM usuarios.t_usuario_afiliado
+        WHERE activo GROUP BY id_usuario_sistema HAVING count(*) > 1 ORDER BY id_usuario_sistema
+    """)).all()
+    if duplicados:
+        for id_usuario, cantidad in duplicados:
+            print(f"⚠️ Usuario {id_usuario} con {cantidad} afiliaciones activas")
+        raise RuntimeError("Hay usuarios con más de una afiliación activa; corríjalos antes de migrar")
+
+    db.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_afiliado_usuario_activo "
+        "ON usuarios.t_usuario_afiliado (id_usuario_sistema) WHERE activo"
+    ))
+    db.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    from db.session import SessionLocal
+
+    # Uso: python -m services.affiliates --migrar   (una sola vez en bases existentes)
+    db = SessionLocal()
+    try:
+        if "--migrar" in sys.argv:
+            crear_indice_afiliacion_activa(db)
+            print("✅ Índice de afiliaciones activas creado")
+    finally:
+        db.close()
@@ -0,0 +1,303 @@
+# services/affiliation_import.py
+"""
+Importación de afiliaciones y medidores de un sector nuevo
+
+Cada fila de la hoja (exportada como CSV) es un hogar: cédula del usuario,
+sector, número de medidor y coordenadas. Por cada fila se crea la afiliación
+(o se reutiliza la activa del mismo sector si aún no tiene medidor) y el
+medidor asignado a ella.
+
+- El archivo se procesa por bloques de IMPORTACION_CHUNK filas; cada bloque
+  resuelve usuarios, afiliaciones y medidores existentes con una consulta por
+  conjunto y se escribe en su propia transacción (un INSERT por lotes de
+  afiliados y otro de medidores).
+- La unicidad de num_medidor y de id_usuario_afi del medidor se verifica en
+  memoria (contra la base y contra las filas anteriores del archivo), así
+  una fila repetida no hace fallar el bloque entero.
+- Las filas con errores se devuelven con el motivo y no detienen las demás.
+"""
+import csv
+import os
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Iterator, Optional, TextIO, Union
+
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.orm import Session
+
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.sector import Sector
+from models.user import UsuarioSistema
+from services.affiliate_codes import reservar_codigos
+from services.meter_map import invalidar_teselas
+
+IMPORTACION_CHUNK = int(os.getenv("IMPORTACION_CHUNK", 1000))
+
+# Mayor altitud que cabe en Medidor.altitud (Numeric(10, 2))
+ALTITUD_MAXIMA = Decimal("99999999.99")
+
+ALIAS_COLUMNAS = {
+    "cedula": ("cedula", "identificacion", "ci"),
+    "sector": ("sector", "id_sector", "nombre_sector"),
+    "num_medidor": ("num_medidor", "medidor", "numero_medidor", "nro_medidor"),
+    "latitud": ("latitud", "lat"),
+    "longitud": ("longitud", "lon", "lng"),
+    "altitud": ("altitud", "alt", "altura"),
+}
+
+
+@dataclass
+class FilaImportacion:
+    numero: int
+    cedula: str = ""
+    sector: str = ""
+    num_medidor: str = ""
+    latitud: str = ""
+    longitud: str = ""
+    altitud: str = ""
+
+
+# ========================================
+# LECTURA DEL ARCHIVO
+# ========================================
+def leer_csv(archivo: TextIO) -> Iterator[FilaImportacion]:
+    """Lee un CSV con encabezado (separador detectado: , ; | o tabulador)"""
+    muestra = archivo.readline()
+    separador = max(",;|\t", key=muestra.count)
+    encabezado = [c.strip().lower().replace(" ", "_") for c in next(csv.reader([muestra], delimiter=separador))]
+
+    posiciones = {}
+    for campo, alias in ALIAS_COLUMNAS.items():
+        for nombre in alias:
+            if nombre in encabezado:
+                posiciones[campo] = encabezado.index(nombre)
+                break
+
+    faltantes = {"cedula", "sector", "num_medidor"} - set(posiciones)
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el archivo: {', '.join(sorted(faltantes))}")
+
+    for numero, valores in enumerate(csv.reader(archivo, delimiter=separador), start=2):
+        if not valores or not any(valores):
+            continue
+        fila = FilaImportacion(numero=numero)
+        for campo, posicion in posiciones.items():
+            setattr(fila, campo, valores[posicion].strip() if posicion < len(valores) else "")
+        yield fila
+
+
+def _coordenada(valor: str, limite: Union[int, Decimal]) -> Optional[Decimal]:
+    """'-1,2345' o '-1.2345' -> Decimal (ValueError si no es válida)"""
+    if not valor:
+        return None
+    try:
+        numero = Decimal(valor.replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Valor no numérico '{valor}'")
+    if not numero.is_finite():
+        raise ValueError(f"Valor no numérico '{valor}'")
+    if not -limite <= numero <= limite:
+        raise ValueError(f"Valor fuera de rango '{valor}'")
+    return numero
+
+
+# ========================================
+# IMPORTACIÓN
+# ========================================
+class _Importacion:
+    """Estado compartido entre bloques (sectores y unicidad dentro del archivo)"""
+
+    def __init__(self, db: Session):
+        sectores = db.execute(select(Sector.id_sector, Sector.nombre_sector)).all()
+        self.sector_por_id = {id_sector: id_sector for id_sector, _ in sectores}
+        self.sector_por_nombre = {nombre.strip().lower(): id_sector for id_sector, nombre in sectores if nombre}
+        self.medidores_archivo = set()
+        self.cedulas_archivo = set()
+
+    def sector(self, valor: str) -> Optional[int]:
+        if valor.isdigit():
+            return self.sector_por_id.get(int(valor))
+        return self.sector_por_nombre.get(valor.strip().lower())
+
+
+def _validar_bloque(db: Session, estado: _Importacion, bloque: list, errores: list) -> list:
+    """Filas del bloque listas para escribir -> [(fila, id_usuario_sistema, id_usuario_afi | None, id_sector, lat, lon, alt)]"""
+    cedulas = {fila.cedula for fila in bloque if fila.cedula}
+    usuarios = dict(db.execute(
+        select(UsuarioSistema.cedula, UsuarioSistema.id_usuario_sistema)
+        .where(UsuarioSistema.cedula.in_(cedulas), UsuarioSistema.activo == True)
+    ).all()) if cedulas else {}
+
+    afiliaciones = {
+        id_usuario: (id_afi, id_sector)
+        for id_usuario, id_afi, id_sector in db.execute(
+            select(UsuarioAfiliado.id_usuario_sistema, UsuarioAfiliado.id_usuario_afi, UsuarioAfiliado.id_sector)
+            .where(UsuarioAfiliado.id_usuario_sistema.in_(usuarios.values()), UsuarioAfiliado.activo == True)
+        )
+    } if usuarios else {}
+
+    numeros = {fila.num_medidor for fila in bloque if fila.num_medidor}
+    medidores_existentes = set(db.execute(
+        select(Medidor.num_medidor).where(Medidor.num_medidor.in_(numeros))
+    ).scalars()) if numeros else set()
+
+    ids_afi = [id_afi for id_afi, _ in afiliaciones.values()]
+    afiliados_con_medidor = set(db.execute(
+        select(Medidor.id_usuario_afi).where(Medidor.id_usuario_afi.in_(ids_afi))
+    ).scalars()) if ids_afi else set()
+
+    validas = []
+    for fila in bloque:
+        def rechazar(motivo: str):
+            errores.append({"fila": fila.numero, "cedula": fila.cedula, "num_medidor": fila.num_medidor, "error": motivo})
+
+        id_usuario = usuarios.get(fila.cedula)
+        id_sector = estado.sector(fila.sector)
+        if not fila.cedula or not fila.num_medidor:
+            rechazar("La cédula y el número de medidor son obligatorios")
+            continue
+        if id_usuario is None:
+            rechazar("No existe un usuario activo con esa cédula")
+            continue
+        if id_sector is None:
+            rechazar(f"Sector '{fila.sector}' no encontrado")
+            continue
+        if len(fila.num_medidor) > 50:
+            rechazar("El número de medidor supera los 50 caracteres")
+            continue
+        if fila.num_medidor in medidores_existentes:
+            rechazar("Ya existe un medidor con ese número")
+            continue
+        if fila.num_medidor in estado.medidores_archivo:
+            rechazar("Número de medidor repetido en el archivo")
+            continue
+        if fila.cedula in estado.cedulas_archivo:
+            rechazar("Cédula repetida en el archivo (un medidor por afiliado)")
+            continue
+
+        id_afi = None
+        if id_usuario in afiliaciones:
+            id_afi, sector_afiliado = afiliaciones[id_usuario]
+            if sector_afiliado != id_sector:
+                rechazar("El usuario ya está afiliado en otro sector")
+                continue
+            if id_afi in afiliados_con_medidor:
+                rechazar("El afiliado ya tiene un medidor asignado")
+                continue
+
+        try:
+            latitud = _coordenada(fila.latitud, 90)
+            longitud = _coordenada(fila.longitud, 180)
+            altitud = _coordenada(fila.altitud, ALTITUD_MAXIMA)
+        except ValueError as e:
+            rechazar(f"Coordenadas inválidas: {e}")
+            continue
+        if (latitud is None) != (longitud is None):
+            rechazar("Latitud y longitud van juntas")
+            continue
+
+        estado.medidores_archivo.add(fila.num_medidor)
+        estado.cedulas_archivo.add(fila.cedula)
+        validas.append((fila, id_usuario, id_afi, id_sector, latitud, longitud, altitud))
+    return validas
+
+
+def _escribir_bloque(db: Session, validas: list) -> int:
+    """Inserta los afiliados nuevos y los medidores del bloque (sin commit) -> afiliados creados"""
+    nuevas = [(fila, id_usuario, id_sector) for fila, id_usuario, id_afi, id_sector, *_ in validas if id_afi is None]
+    id_afi_por_usuario = {}
+    if nuevas:
+        hoy = date.today()
+        codigos = reservar_codigos(db, len(nuevas))
+        creados = db.execute(
+            insert(UsuarioAfiliado).returning(
+                UsuarioAfiliado.id_usuario_sistema, UsuarioAfiliado.id_usuario_afi, sort_by_parameter_order=True
+            ),
+            [
+                {
+                    "cod_usuario_afi": codigo,
+                    "fecha_afiliacion": hoy,
+                    "id_sector": id_sector,
+                    "id_usuario_sistema": id_usuario,
+                    "activo": True,
+                }
+                for codigo, (_, id_usuario, id_sector) in zip(codigos, nuevas)
+            ]
+        ).all()
+        id_afi_por_usuario = dict(creados)
+
+    db.execute(insert(Medidor), [
+        {
+            "num_medidor": fila.num_medidor,
+            "latitud": latitud,
+            "longitud": longitud,
+            "altitud": altitud,
+            "activo": True,
+            "id_usuario_afi": id_afi if id_afi is not None else id_afi_por_usuario[id_usuario],
+            "id_sector": id_sector,
+        }
+        for fila, id_usuario, id_afi, id_sector, latitud, longitud, altitud in validas
+    ])
+    invalidar_teselas(db, [(latitud, longitud) for *_, latitud, longitud, _ in validas])
+    return len(nuevas)
+
+
+def importar_afiliaciones(db: Session, filas: Iterator[FilaImportacion], simular: bool = False) -> dict:
+    """
+    Importa los hogares del archivo (un commit por bloque). Con simular=True
+    solo valida. Retorna el resumen, los sectores modificados y los errores
+    por fila.
+    """
+    estado = _Importacion(db)
+    errores = []
+    sectores = set()
+    leidas = afiliados_creados = medidores_creados = 0
+
+    while True:
+        bloque = list(islice(filas, IMPORTACION_CHUNK))
+        if not bloque:
+            break
+        leidas += len(bloque)
+
+        validas = _validar_bloque(db, estado, bloque, errores)
+        if simular or not validas:
+            continue
+
+        try:
+            afiliados_creados += _escribir_bloque(db, validas)
+            db.commit()
+        except (IntegrityError, DataError) as e:
+            # IntegrityError: otro proceso creó el mismo medidor o afiliación
+            # mientras tanto. DataError: un valor que la validación dejó pasar
+            # y la base rechaza. Se descarta el bloque y sigue el resto.
+            db.rollback()
+            print(f"⚠️ Bloque de importación descartado: {e.orig}")
+            if isinstance(e, IntegrityError):
+                motivo = "Conflicto con otro registro creado al mismo tiempo; vuelva a importar la fila"
+            else:
+                motivo = f"La base rechazó un valor del bloque ({str(e.orig).splitlines()[0]}); revise el bloque y vuelva a importarlo"
+            errores.extend(
+                {"fila": fila.numero, "cedula": fila.cedula, "num_medidor": fila.num_medidor, "error": motivo}
+                for fila, *_ in validas
+            )
+            continue
+
+        medidores_creados += len(validas)
+        sectores.update(id_sector for _, _, _, id_sector, *_ in validas)
+        print(f"🏠 Importación: {medidores_creados} hogares de {leidas} filas")
+
+    errores.sort(key=lambda error: error["fila"])
+    return {
+        "filas": leidas,
+        "validas": leidas - len(errores),
+        "afiliados_creados": afiliados_creados,
+        "medidores_creados": medidores_creados,
+        "rechazadas": len(errores),
+        "sectores": sorted(sectores),
+        "errores": errores,
+        "simulacion": simular,
+    }
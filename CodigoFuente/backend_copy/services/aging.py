@@ -0,0 +1,248 @@
+# services/aging.py
+"""
+Antigüedad de cartera (aging) y candidatos a corte
+
+La deuda abierta se guarda por afiliado y periodo (t_deuda_periodo) y se
+actualiza de forma incremental en la misma transacción que la facturación y
+los pagos. Los rangos 0-30 / 31-60 / 61-90 / 90+ días se calculan al consultar
+con SUM(...) FILTER sobre esa tabla pequeña (solo filas con deuda), así la
+consulta no recorre facturas ni pagos y siempre está al día.
+"""
+import os
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import Select, select, delete, func, and_, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from db.bulk import filas_unnest
+from models.collection import DeudaPeriodo
+from models.invoice import Factura
+
+# (nombre, días desde, días hasta)
+RANGOS = (
+    ("0_30", 0, 30),
+    ("31_60", 31, 60),
+    ("61_90", 61, 90),
+    ("90_mas", 91, None),
+)
+
+CORTE_DIAS_MINIMO = int(os.getenv("CORTE_DIAS_MINIMO", 90))
+CORTE_MONTO_MINIMO = Decimal(os.getenv("CORTE_MONTO_MINIMO", "0.01"))
+
+COLUMNAS_DEUDA = ("id_usuario_afi", "periodo", "id_sector", "fecha_emision", "monto", "num_facturas")
+
+
+def acumular_deuda(db: Session, movimientos: Iterable[tuple]) -> None:
+    """
+    Suma movimientos (id_usuario_afi, periodo, id_sector, fecha_emision, monto,
+    num_facturas) a la deuda por periodo y elimina las filas que quedan saldadas.
+    No hace commit.
+    """
+    totales = {}
+    for id_usuario_afi, periodo, id_sector, fecha_emision, monto, num_facturas in movimientos:
+        clave = (id_usuario_afi, periodo)
+        fila = totales.setdefault(clave, {
+            "id_usuario_afi": id_usuario_afi,
+            "periodo": periodo,
+            "id_sector": id_sector,
+            "fecha_emision": fecha_emision,
+            "monto": Decimal(0),
+            "num_facturas": 0,
+        })
+        fila["monto"] += Decimal(monto)
+        fila["num_facturas"] += num_facturas
+        fila["fecha_emision"] = min(fila["fecha_emision"], fecha_emision)
+
+    if not totales:
+        return
+
+    # Orden fijo de claves: dos transacciones concurrentes bloquean en el mismo orden
+    filas = filas_unnest(DeudaPeriodo.__table__, COLUMNAS_DEUDA, [totales[clave] for clave in sorted(totales)])
+    db.execute(sumar_deuda(select(filas)))
+    eliminar_deuda_saldada(db, {clave[0] for clave in totales})
+
+
+def sumar_deuda(filas: Select):
+    """
+    INSERT ... ON CONFLICT que suma a la deuda por periodo las filas de la
+    consulta (columnas COLUMNAS_DEUDA, una fila por afiliado y periodo, en
+    orden de clave). Sirve como sentencia o como CTE.
+    """
+    tabla = DeudaPeriodo.__table__
+    stmt = pg_insert(tabla).from_select(COLUMNAS_DEUDA, filas)
+    return stmt.on_conflict_do_update(
+        index_elements=["id_usuario_afi", "periodo"],
+        set_={
+            "monto": tabla.c.monto + stmt.excluded.monto,
+            "num_facturas": tabla.c.num_facturas + stmt.excluded.num_facturas,
+            "fecha_emision": func.least(tabla.c.fecha_emision, stmt.excluded.fecha_emision),
+            "id_sector": func.coalesce(stmt.excluded.id_sector, tabla.c.id_sector),
+            "fecha_actualizacion": func.now(),
+        }
+    )
+
+
+def eliminar_deuda_saldada(db: Session, ids_afiliado: Iterable[int]) -> None:
+    """Elimina las filas de deuda de los afiliados que quedaron en cero o menos"""
+    db.execute(
+        delete(DeudaPeriodo)
+        .where(
+            DeudaPeriodo.id_usuario_afi == any_(bindparam("ids_afiliado", sorted(ids_afiliado), type_=ARRAY(Integer))),
+            DeudaPeriodo.monto <= 0,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ========================================
+# CONSULTAS
+# ========================================
+def condicion_rango(nombre: str, hoy: date):
+    """Condición sobre fecha_emision para un rango de antigüedad"""
+    for rango, desde, hasta in RANGOS:
+        if rango == nombre:
+            condicion = DeudaPeriodo.fecha_emision <= hoy - timedelta(days=desde)
+            if hasta is not None:
+                condicion = and_(condicion, DeudaPeriodo.fecha_emision >= hoy - timedelta(days=hasta))
+            return condicion
+    raise ValueError(f"Rango inválido. Debe ser uno de: {', '.join(r[0] for r in RANGOS)}")
+
+
+def consulta_antiguedad(hoy: Optional[date] = None):
+    """SELECT agrupado por afiliado con la deuda de cada rango (sin filtros)"""
+    hoy = hoy or date.today()
+    columnas = [
+        func.coalesce(func.sum(DeudaPeriodo.monto).filter(condicion_rango(nombre, hoy)), 0).label(f"deuda_{nombre}")
+        for nombre, _, _ in RANGOS
+    ]
+    return (
+        select(
+            DeudaPeriodo.id_usuario_afi,
+            func.max(DeudaPeriodo.id_sector).label("id_sector"),
+            *columnas,
+            func.sum(DeudaPeriodo.monto).label("deuda_total"),
+            func.sum(DeudaPeriodo.num_facturas).label("facturas_pendientes"),
+            func.min(DeudaPeriodo.fecha_emision).label("fecha_mas_antigua"),
+        )
+        .group_by(DeudaPeriodo.id_usuario_afi)
+    )
+
+
+def resumen_antiguedad(db: Session, id_sector: Optional[int] = None, hoy: Optional[date] = None) -> dict:
+    """Totales de cartera por rango (una sola consulta)"""
+    hoy = hoy or date.today()
+    columnas = []
+    for nombre, _, _ in RANGOS:
+        condicion = condicion_rango(nombre, hoy)
+        columnas.append(func.coalesce(func.sum(DeudaPeriodo.monto).filter(condicion), 0).label(f"deuda_{nombre}"))
+        columnas.append(func.count(func.distinct(DeudaPeriodo.id_usuario_afi)).filter(condicion).label(f"afiliados_{nombre}"))
+
+    stmt = select(
+        *columnas,
+        func.coalesce(func.sum(DeudaPeriodo.monto), 0).label("deuda_total"),
+        func.count(func.distinct(DeudaPeriodo.id_usuario_afi)).label("afiliados"),
+    )
+    if id_sector is not None:
+        stmt = stmt.where(DeudaPeriodo.id_sector == id_sector)
+
+    return {"fecha_corte": hoy, **db.execute(stmt).one()._asdict()}
+
+
+# ========================================
+# RECONSTRUCCIÓN Y VERIFICACIÓN
+# ========================================
+def deuda_desde_facturas(db: Session) -> dict:
+    """Deuda por (afiliado, periodo) calculada desde cero a partir de las facturas"""
+    filas = db.execute(
+        select(
+            Factura.id_usuario_afi,
+            Factura.periodo,
+            func.max(Factura.id_sector),
+            func.min(func.date(Factura.fecha_emision)),
+            func.sum(Factura.saldo_pendiente),
+            func.count(),
+        )
+        .where(Factura.estado == "pendiente", Factura.activo == True, Factura.saldo_pendiente > 0)
+        .group_by(Factura.id_usuario_afi, Factura.periodo)
+    ).all()
+    return {(fila[0], fila[1]): fila for fila in filas}
+
+
+def reconstruir_deuda(db: Session, corregir: bool = False) -> dict:
+    """
+    Compara la deuda incremental con la calculada desde las facturas.
+    Con corregir=True reemplaza la tabla por el cálculo completo. Hace commit.
+    """
+    esperada = deuda_desde_facturas(db)
+    actual = {
+        (fila.id_usuario_afi, fila.periodo): fila
+        for fila in db.execute(select(DeudaPeriodo)).scalars()
+    }
+
+    diferencias = []
+    for clave in sorted(esperada.keys() | actual.keys()):
+        fila_esperada, fila_actual = esperada.get(clave), actual.get(clave)
+        valores_esperados = (fila_esperada[4], fila_esperada[5], fila_esperada[3]) if fila_esperada else (Decimal(0), 0, None)
+        valores_actuales = (fila_actual.monto, fila_actual.num_facturas, fila_actual.fecha_emision) if fila_actual else (Decimal(0), 0, None)
+        if valores_esperados != valores_actuales:
+            diferencias.append({
+                "id_usuario_afi": clave[0],
+                "periodo": clave[1].isoformat(),
+                "monto_esperado": float(valores_esperados[0]),
+                "monto_actual": float(valores_actuales[0]),
+                "facturas_esperadas": valores_esperados[1],
+                "facturas_actuales": valores_actuales[1],
+                "fecha_emision_esperada": valores_esperados[2],
+                "fecha_emision_actual": valores_actuales[2],
+            })
+
+    if corregir and diferencias:
+        db.execute(delete(DeudaPeriodo))
+        db.expunge_all()
+        acumular_deuda(db, (
+            (id_usuario_afi, periodo, id_sector, fecha_emision, monto, num_facturas)
+            for id_usuario_afi, periodo, id_sector, fecha_emision, monto, num_facturas in esperada.values()
+        ))
+        db.commit()
+    else:
+        db.rollback()
+
+    return {
+        "filas_esperadas": len(esperada),
+        "filas_actuales": len(actual),
+        "diferencias": len(diferencias),
+        "corregido": corregir and bool(diferencias),
+        "detalle": diferencias[:100],
+    }
+
+
+def crear_tabla_deuda(db: Session) -> None:
+    """
+    Bases existentes: crea facturacion.t_deuda_periodo y la llena con la deuda
+    de las facturas pendientes (después de migrar los pagos). Hace commit.
+    """
+    DeudaPeriodo.__table__.create(db.connection(), checkfirst=True)
+    db.commit()
+
+    resultado = reconstruir_deuda(db, corregir=True)
+    if resultado["corregido"]:
+        print(f"📊 Deuda por periodo reconstruida: {resultado['filas_esperadas']} filas")
+
+
+if __name__ == "__main__":
+    import sys
+    from db.session import SessionLocal
+
+    # Uso: python -m services.aging [--corregir]
+    db = SessionLocal()
+    try:
+        resultado = reconstruir_deuda(db, corregir="--corregir" in sys.argv)
+        print(f"📋 Verificación de cartera: {resultado['diferencias']} diferencias "
+              f"({resultado['filas_actuales']} filas incrementales, {resultado['filas_esperadas']} esperadas)")
+        for diferencia in resultado["detalle"]:
+            print(f"   {diferencia}")
+    finally:
+        db.close()
@@ -0,0 +1,184 @@
+# services/anomalies.py
+"""
+Detección de lecturas sospechosas (etapa posterior a la carga de lecturas)
+
+Todo el periodo se analiza de una vez con arreglos numpy:
+- Se arma una matriz medidores x meses con el consumo de los últimos
+  ANOMALIA_HISTORIA meses (NaN donde no hay lectura).
+- Consumo atípico: z-score robusto = 0.6745 * (x - mediana) / MAD.
+- Consumo cero: racha de meses seguidos en cero que termina en el periodo.
+- Lectura negativa: lectura actual menor a la anterior (vuelta del contador
+  o cambio de medidor). No cuenta la diferencia que ya se registró como
+  ajuste de una lectura estimada.
+Las alertas alimentan la cola de revisión del lector.
+"""
+import os
+import warnings
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import select, delete, insert, extract, cast, func, Float, Integer
+from sqlalchemy.orm import Session
+
+from models.reading import Lectura, AlertaLectura
+
+ANOMALIA_HISTORIA = int(os.getenv("ANOMALIA_HISTORIA", 12))      # meses de historia
+ANOMALIA_MIN_HISTORIA = int(os.getenv("ANOMALIA_MIN_HISTORIA", 3))
+ANOMALIA_Z = float(os.getenv("ANOMALIA_Z", 3.5))
+ANOMALIA_MAD_MINIMO = float(os.getenv("ANOMALIA_MAD_MINIMO", 1.0))  # m3, evita dividir para cero
+ANOMALIA_RACHA_CEROS = int(os.getenv("ANOMALIA_RACHA_CEROS", 3))
+
+
+def indice_mes(periodo: date) -> int:
+    """Número de mes absoluto (año * 12 + mes) para ubicar columnas"""
+    return periodo.year * 12 + periodo.month - 1
+
+
+def matriz_consumo(db: Session, periodo: date, meses: int, ids_medidor: Optional[List[int]] = None):
+    """
+    Carga la historia de consumo en una sola consulta y la convierte
+    en una matriz medidores x meses.
+
+    Retorna (ids_medidor, matriz_consumo, id_lectura_actual, diferencia_actual)
+    donde las dos últimas corresponden a la columna del periodo.
+    """
+    mes_final = indice_mes(periodo)
+    mes_inicial = mes_final - meses
+
+    # array_agg: una sola fila con una lista por columna (evita construir
+    # cientos de miles de filas en Python antes de pasarlas a numpy)
+    mes_col = cast(extract("year", Lectura.periodo) * 12 + extract("month", Lectura.periodo) - 1, Integer)
+    stmt = select(
+        func.array_agg(Lectura.id_medidor),
+        func.array_agg(mes_col),
+        func.array_agg(cast(Lectura.consumo, Float)),
+        func.array_agg(Lectura.id_lectura),
+        func.array_agg(cast(Lectura.lectura_actual + Lectura.ajuste_estimacion - Lectura.lectura_anterior, Float)),
+    ).where(
+        Lectura.periodo.between(date(mes_inicial // 12, mes_inicial % 12 + 1, 1), periodo)
+    )
+    if ids_medidor is not None:
+        stmt = stmt.where(Lectura.id_medidor.in_(ids_medidor))
+
+    columnas = db.execute(stmt).one()
+    if columnas[0] is None:
+        vacio = np.empty(0)
+        return vacio.astype(np.int64), np.empty((0, meses + 1)), vacio.astype(np.int64), vacio
+
+    # None -> NaN
+    id_medidor, mes, valores, id_lectura_col, diferencia_col = (
+        np.asarray(columna, dtype=np.float64) for columna in columnas
+    )
+
+    ids, fila = np.unique(id_medidor.astype(np.int64), return_inverse=True)
+    columna = mes.astype(np.int64) - mes_inicial
+
+    consumo = np.full((len(ids), meses + 1), np.nan)
+    consumo[fila, columna] = valores
+
+    # Datos de la lectura del periodo analizado (última columna)
+    actual = columna == meses
+    id_lectura = np.zeros(len(ids), dtype=np.int64)
+    diferencia = np.full(len(ids), np.nan)
+    id_lectura[fila[actual]] = id_lectura_col[actual].astype(np.int64)
+    diferencia[fila[actual]] = diferencia_col[actual]
+
+    return ids, consumo, id_lectura, diferencia
+
+
+def calcular_indicadores(consumo: np.ndarray):
+    """
+    Indicadores vectorizados sobre la matriz medidores x meses.
+    Retorna (z_score, racha_ceros, cantidad_historia).
+    """
+    historia = consumo[:, :-1]
+    actual = consumo[:, -1]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # filas sin historia
+        mediana = np.nanmedian(historia, axis=1)
+        mad = np.nanmedian(np.abs(historia - mediana[:, None]), axis=1)
+
+    cantidad_historia = np.sum(~np.isnan(historia), axis=1)
+    z_score = 0.6745 * (actual - mediana) / np.maximum(mad, ANOMALIA_MAD_MINIMO)
+
+    # Racha de ceros que termina en el periodo: producto acumulado desde la derecha
+    ceros = (consumo == 0)[:, ::-1]
+    racha_ceros = np.cumprod(ceros, axis=1).sum(axis=1)
+
+    return z_score, racha_ceros, cantidad_historia
+
+
+def detectar_anomalias(db: Session, periodo: date, ids_medidor: Optional[List[int]] = None) -> dict:
+    """
+    Analiza las lecturas del periodo y regenera sus alertas pendientes.
+    Las alertas ya revisadas (confirmadas/descartadas) no se tocan.
+    """
+    ids, consumo, id_lectura, diferencia = matriz_consumo(db, periodo, ANOMALIA_HISTORIA, ids_medidor)
+
+    con_lectura = id_lectura > 0
+    z_score, racha_ceros, cantidad_historia = calcular_indicadores(consumo)
+    actual = consumo[:, -1]
+
+    atipico = con_lectura & (cantidad_historia >= ANOMALIA_MIN_HISTORIA) & (np.abs(z_score) > ANOMALIA_Z)
+    cero = con_lectura & (racha_ceros >= ANOMALIA_RACHA_CEROS)
+    negativo = con_lectura & (diferencia < 0)
+
+    alertas = []
+    for i in np.flatnonzero(atipico):
+        alertas.append({
+            "id_lectura": int(id_lectura[i]), "id_medidor": int(ids[i]), "periodo": periodo,
+            "tipo": "consumo_atipico", "valor": float(actual[i]), "puntaje": round(float(z_score[i]), 2),
+            "detalle": "Consumo fuera del rango habitual del medidor", "estado": "pendiente",
+        })
+    for i in np.flatnonzero(cero):
+        alertas.append({
+            "id_lectura": int(id_lectura[i]), "id_medidor": int(ids[i]), "periodo": periodo,
+            "tipo": "consumo_cero", "valor": int(racha_ceros[i]), "puntaje": None,
+            "detalle": f"{int(racha_ceros[i])} meses seguidos sin consumo (posible medidor trabado)", "estado": "pendiente",
+        })
+    for i in np.flatnonzero(negativo):
+        alertas.append({
+            "id_lectura": int(id_lectura[i]), "id_medidor": int(ids[i]), "periodo": periodo,
+            "tipo": "lectura_negativa", "valor": float(diferencia[i]), "puntaje": None,
+            "detalle": "Lectura menor a la anterior (vuelta del contador o cambio de medidor)", "estado": "pendiente",
+        })
+
+    # Las alertas que el lector ya revisó no se vuelven a generar
+    revisadas = select(AlertaLectura.id_lectura, AlertaLectura.tipo).where(
+        AlertaLectura.periodo == periodo,
+        AlertaLectura.estado != "pendiente"
+    )
+    if ids_medidor is not None:
+        revisadas = revisadas.where(AlertaLectura.id_medidor.in_(ids_medidor))
+    ya_revisadas = set(db.execute(revisadas).all())
+    alertas = [a for a in alertas if (a["id_lectura"], a["tipo"]) not in ya_revisadas]
+
+    # Regenerar solo las alertas pendientes de las lecturas analizadas
+    limpiar = delete(AlertaLectura).where(
+        AlertaLectura.periodo == periodo,
+        AlertaLectura.estado == "pendiente"
+    )
+    if ids_medidor is not None:
+        limpiar = limpiar.where(AlertaLectura.id_medidor.in_(ids_medidor))
+    db.execute(limpiar)
+    if alertas:
+        db.execute(insert(AlertaLectura), alertas)
+    db.commit()
+
+    resumen = {
+        "periodo": periodo.isoformat(),
+        "lecturas_analizadas": int(con_lectura.sum()),
+        "consumo_atipico": int(atipico.sum()),
+        "consumo_cero": int(cero.sum()),
+        "lectura_negativa": int(negativo.sum()),
+    }
+    print(f"🔎 Análisis de lecturas {periodo:%m/%Y}: {resumen}")
+    return resumen
+
+
+def crear_tabla_alertas(db: Session) -> None:
+    """Bases existentes: crea medidores.t_alerta_lectura. Hace commit."""
+    AlertaLectura.__table__.create(db.connection(), checkfirst=True)
+    db.commit()
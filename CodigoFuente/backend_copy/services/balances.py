@@ -0,0 +1,183 @@
+# services/balances.py
+"""
+Saldo materializado por afiliado (t_saldo_afiliado)
+
+La facturación suma a total_facturado y los pagos a total_pagado, siempre en
+la misma transacción que el movimiento. Las filas se actualizan en orden de
+id_usuario_afi para que dos transacciones concurrentes no se bloqueen entre sí.
+
+La facturación empieza por bloquear_saldos() y los pagos por el upsert de
+acumular_saldos(): la fila de saldo de cada afiliado es el primer bloqueo que
+toman (antes que facturas y deuda), así las dos operaciones sobre un mismo
+afiliado se ejecutan una después de otra.
+Un saldo negativo es saldo a favor: los pagos lo dejan y la facturación lo
+descuenta de las facturas nuevas.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import select, insert, update, delete, func, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from db.bulk import filas_unnest, insertar_filas
+from models.payment import SaldoAfiliado, Pago
+from models.invoice import Factura
+
+CAMPOS = ("total_facturado", "total_pagado", "facturas_pendientes")
+
+
+def bloquear_saldos(db: Session, ids_afiliado: Iterable[int]) -> dict:
+    """
+    Bloquea (FOR UPDATE, en orden de id_usuario_afi) las filas de saldo de los
+    afiliados, creándolas en cero si no existen. No hace commit.
+    Retorna {id_usuario_afi: saldo}.
+    """
+    ids = sorted(set(ids_afiliado))
+    if not ids:
+        return {}
+
+    db.execute(
+        insertar_filas(
+            SaldoAfiliado.__table__,
+            ("id_usuario_afi", "total_facturado", "total_pagado", "saldo", "facturas_pendientes"),
+            [
+                {"id_usuario_afi": id_usuario_afi, "total_facturado": 0, "total_pagado": 0, "saldo": 0, "facturas_pendientes": 0}
+                for id_usuario_afi in ids
+            ],
+        ).on_conflict_do_nothing(index_elements=["id_usuario_afi"])
+    )
+    return dict(db.execute(
+        select(SaldoAfiliado.id_usuario_afi, SaldoAfiliado.saldo)
+        .where(SaldoAfiliado.id_usuario_afi == any_(bindparam("ids_afiliado", ids, type_=ARRAY(Integer))))
+        .order_by(SaldoAfiliado.id_usuario_afi)
+        .with_for_update()
+    ).all())
+
+
+def acumular_saldos(
+    db: Session,
+    movimientos: Iterable[tuple],
+    fecha_ultimo_pago: Optional[datetime] = None,
+) -> dict:
+    """
+    Suma movimientos (id_usuario_afi, {campo: delta}) a los saldos con
+    INSERT ... ON CONFLICT. No hace commit. Retorna {id_usuario_afi: saldo nuevo}.
+    """
+    totales = defaultdict(lambda: defaultdict(Decimal))
+    for id_usuario_afi, deltas in movimientos:
+        for campo, delta in deltas.items():
+            totales[id_usuario_afi][campo] += Decimal(delta)
+
+    if not totales:
+        return {}
+
+    filas = []
+    for id_usuario_afi in sorted(totales):
+        valores = {campo: totales[id_usuario_afi].get(campo, 0) for campo in CAMPOS}
+        filas.append({
+            "id_usuario_afi": id_usuario_afi,
+            **valores,
+            "saldo": valores["total_facturado"] - valores["total_pagado"],
+            "fecha_ultimo_pago": fecha_ultimo_pago,
+        })
+
+    tabla = SaldoAfiliado.__table__
+    stmt = insertar_filas(tabla, ("id_usuario_afi", *CAMPOS, "saldo", "fecha_ultimo_pago"), filas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id_usuario_afi"],
+        set_={
+            **{campo: tabla.c[campo] + stmt.excluded[campo] for campo in CAMPOS},
+            "saldo": tabla.c.saldo + stmt.excluded.saldo,
+            "fecha_ultimo_pago": func.coalesce(stmt.excluded.fecha_ultimo_pago, tabla.c.fecha_ultimo_pago),
+            "fecha_actualizacion": func.now(),
+        }
+    ).returning(tabla.c.id_usuario_afi, tabla.c.saldo)
+
+    # Una sola sentencia con arreglos por columna, en orden de id_usuario_afi
+    return {fila.id_usuario_afi: fila.saldo for fila in db.execute(stmt)}
+
+
+def restar_pendientes(db: Session, pagadas: dict) -> None:
+    """
+    Descuenta de facturas_pendientes las facturas que un lote de pagos dejó
+    pagadas ({id_usuario_afi: cantidad}) con un solo UPDATE ... FROM unnest.
+    No hace commit.
+    """
+    filas = [
+        {"id_usuario_afi": id_usuario_afi, "facturas_pendientes": cantidad}
+        for id_usuario_afi, cantidad in sorted(pagadas.items()) if cantidad
+    ]
+    if not filas:
+        return
+
+    tabla = SaldoAfiliado.__table__
+    cambios = filas_unnest(tabla, ("id_usuario_afi", "facturas_pendientes"), filas)
+    db.execute(
+        update(tabla)
+        .where(tabla.c.id_usuario_afi == cambios.c.id_usuario_afi)
+        .values(facturas_pendientes=tabla.c.facturas_pendientes - cambios.c.facturas_pendientes)
+    )
+
+
+def reconstruir_saldos(db: Session) -> int:
+    """
+    Recalcula todos los saldos desde facturas y pagos (carga inicial o corrección).
+    Hace commit. Retorna la cantidad de afiliados con saldo.
+    """
+    db.execute(delete(SaldoAfiliado))
+
+    facturas = db.execute(
+        select(
+            Factura.id_usuario_afi,
+            func.sum(Factura.total),
+            func.count().filter(Factura.saldo_pendiente > 0),
+        )
+        .where(Factura.activo == True, Factura.estado != "anulada")
+        .group_by(Factura.id_usuario_afi)
+    ).all()
+    pagos = db.execute(
+        select(Pago.id_usuario_afi, func.sum(Pago.monto), func.max(Pago.fecha_pago))
+        .where(Pago.activo == True)
+        .group_by(Pago.id_usuario_afi)
+    ).all()
+
+    saldos = {}
+    for id_usuario_afi, total, pendientes in facturas:
+        saldos[id_usuario_afi] = {
+            "id_usuario_afi": id_usuario_afi,
+            "total_facturado": total,
+            "total_pagado": Decimal(0),
+            "facturas_pendientes": pendientes,
+            "fecha_ultimo_pago": None,
+        }
+    for id_usuario_afi, total, ultimo in pagos:
+        fila = saldos.setdefault(id_usuario_afi, {
+            "id_usuario_afi": id_usuario_afi,
+            "total_facturado": Decimal(0),
+            "facturas_pendientes": 0,
+        })
+        fila["total_pagado"] = total
+        fila["fecha_ultimo_pago"] = ultimo
+
+    filas = [
+        {**fila, "saldo": fila["total_facturado"] - fila["total_pagado"]}
+        for fila in saldos.values()
+    ]
+    if filas:
+        db.execute(insert(SaldoAfiliado.__table__), filas)
+    db.commit()
+    return len(filas)
+
+
+if __name__ == "__main__":
+    from db.session import SessionLocal
+
+    # Uso: python -m services.balances
+    db = SessionLocal()
+    try:
+        print(f"💰 Saldos reconstruidos: {reconstruir_saldos(db)} afiliados")
+    finally:
+        db.close()
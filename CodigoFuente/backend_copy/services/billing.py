@@ -0,0 +1,260 @@
+# services/billing.py
+"""
+Facturación por lotes de un periodo
+
+Flujo:
+0. Etapa de estimación: los medidores sin lectura en el periodo reciben una
+   lectura estimada (services/estimation.py) y su factura queda marcada.
+1. Una consulta trae todas las lecturas del periodo que aún no tienen factura.
+2. Por cada bloque de FACTURACION_CHUNK lecturas se reserva un bloque de
+   números de factura (una sola ida y vuelta) y se insertan las facturas
+   con un INSERT masivo, junto con los resúmenes mensuales de facturación,
+   el saldo materializado y la deuda por periodo de cada afiliado.
+   El saldo a favor del afiliado (saldo negativo, pagos de más) se descuenta
+   de sus facturas nuevas: solo lo que queda por cobrar pasa a la deuda.
+3. Si el bloque falla, los números reservados vuelven al contador.
+"""
+import os
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+from sqlalchemy import select, insert, exists, text
+from sqlalchemy.orm import Session
+
+from models.invoice import Factura
+from models.reading import Lectura
+from models.meter import Medidor
+from services.invoice_numbers import reservar_numeros, formatear_num_factura
+from services import rollups
+from services.estimation import estimar_lecturas_faltantes
+from services.balances import acumular_saldos, bloquear_saldos
+from services.payments import aplicar_saldo_a_favor
+from services.aging import acumular_deuda
+
+# Tarifa: valor base que cubre CONSUMO_BASE m3 + excedente por m3
+TARIFA_BASE = Decimal(os.getenv("TARIFA_BASE", "3.00"))
+CONSUMO_BASE = Decimal(os.getenv("CONSUMO_BASE", "15"))
+PRECIO_M3_EXCEDENTE = Decimal(os.getenv("PRECIO_M3_EXCEDENTE", "0.25"))
+
+FACTURACION_CHUNK = int(os.getenv("FACTURACION_CHUNK", 5000))
+PUNTO_EMISION_DEFAULT = os.getenv("PUNTO_EMISION", "001-001")
+
+
+def desglosar_tarifa(consumo: Decimal) -> dict:
+    """Valor base, m3 de excedente y su valor según la tarifa vigente"""
+    excedente = max(Decimal(0), Decimal(consumo) - CONSUMO_BASE)
+    valor_exceso = (excedente * PRECIO_M3_EXCEDENTE).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return {"valor_consumo": TARIFA_BASE, "exceso_m3": excedente, "valor_exceso": valor_exceso}
+
+
+def lecturas_pendientes(db: Session, periodo: date, id_sector: Optional[int] = None) -> list:
+    """Lecturas del periodo, de medidores asignados, que todavía no se facturaron"""
+    stmt = (
+        select(
+            Lectura.id_lectura,
+            Lectura.id_medidor,
+            Lectura.lectura_anterior,
+            Lectura.lectura_actual,
+            Lectura.consumo,
+            Lectura.estimada,
+            Medidor.id_usuario_afi,
+            Medidor.id_sector,
+        )
+        .join(Medidor, Medidor.id_medidor == Lectura.id_medidor)
+        .where(
+            Lectura.periodo == periodo,
+            Medidor.id_usuario_afi.isnot(None),
+            ~exists().where(Factura.id_lectura == Lectura.id_lectura)
+        )
+        .order_by(Medidor.id_sector, Lectura.id_medidor)
+    )
+    if id_sector is not None:
+        stmt = stmt.where(Medidor.id_sector == id_sector)
+    return db.execute(stmt).all()
+
+
+def facturar_periodo(
+    db: Session,
+    periodo: date,
+    punto_emision: str = PUNTO_EMISION_DEFAULT,
+    id_sector: Optional[int] = None,
+    estimar: bool = True,
+) -> dict:
+    """
+    Genera las facturas del periodo. Retorna un resumen de la ejecución.
+    Con estimar=True primero se estiman las lecturas faltantes.
+    """
+    estimacion = estimar_lecturas_faltantes(db, periodo, id_sector) if estimar else None
+
+    lecturas = lecturas_pendientes(db, periodo, id_sector)
+    hoy = date.today()
+    emitidas = estimadas = 0
+    monto_total = credito_aplicado = Decimal(0)
+    primera = ultima = None
+
+    for inicio in range(0, len(lecturas), FACTURACION_CHUNK):
+        chunk = lecturas[inicio:inicio + FACTURACION_CHUNK]
+
+        with reservar_numeros(punto_emision, len(chunk)) as bloque:
+            try:
+                # Primer bloqueo: los saldos de los afiliados del bloque (mismo orden que los pagos)
+                saldos = bloquear_saldos(db, (lectura.id_usuario_afi for lectura in chunk))
+                credito = {id_usuario_afi: -saldo for id_usuario_afi, saldo in saldos.items() if saldo < 0}
+
+                filas = []
+                for lectura in chunk:
+                    secuencial = bloque.siguiente()
+                    desglose = desglosar_tarifa(lectura.consumo)
+                    total = desglose["valor_consumo"] + desglose["valor_exceso"]
+                    # El saldo a favor se descuenta de las facturas nuevas
+                    abono = min(credito.get(lectura.id_usuario_afi, Decimal(0)), total)
+                    if abono:
+                        credito[lectura.id_usuario_afi] -= abono
+                    filas.append({
+                        "punto_emision": punto_emision,
+                        "secuencial": secuencial,
+                        "num_factura": formatear_num_factura(punto_emision, secuencial),
+                        "periodo": periodo,
+                        "lectura_anterior": lectura.lectura_anterior,
+                        "lectura_actual": lectura.lectura_actual,
+                        "consumo": lectura.consumo,
+                        **desglose,
+                        "descuento": 0,
+                        "impuesto": 0,
+                        "subtotal": total,
+                        "total": total,
+                        "saldo_pendiente": total - abono,
+                        "estado": "pendiente" if total > abono else "pagada",
+                        "estimada": lectura.estimada,
+                        "activo": True,
+                        "id_usuario_afi": lectura.id_usuario_afi,
+                        "id_medidor": lectura.id_medidor,
+                        "id_sector": lectura.id_sector,
+                        "id_lectura": lectura.id_lectura,
+                    })
+                    monto_total += total
+                    credito_aplicado += abono
+                    estimadas += lectura.estimada
+
+                ids_factura = db.execute(
+                    insert(Factura).returning(Factura.id_factura, sort_by_parameter_order=True), filas
+                ).scalars().all()
+                aplicar_saldo_a_favor(db, [
+                    (fila["id_usuario_afi"], id_factura, fila["total"] - fila["saldo_pendiente"])
+                    for fila, id_factura in zip(filas, ids_factura)
+                    if fila["saldo_pendiente"] < fila["total"]
+                ])
+                rollups.acumular(db, periodo, (
+                    (fila["id_usuario_afi"], fila["id_sector"], {"monto_facturado": fila["total"], "num_facturas": 1})
+                    for fila in filas
+                ))
+                acumular_saldos(db, (
+                    (fila["id_usuario_afi"], {
+                        "total_facturado": fila["total"],
+                        "facturas_pendientes": 1 if fila["saldo_pendiente"] > 0 else 0,
+                    })
+                    for fila in filas
+                ))
+                # Solo lo que queda por cobrar pasa a la deuda por periodo
+                acumular_deuda(db, (
+                    (fila["id_usuario_afi"], periodo, fila["id_sector"], hoy, fila["saldo_pendiente"], 1)
+                    for fila in filas
+                    if fila["saldo_pendiente"] > 0
+                ))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            bloque.confirmar()
+
+        emitidas += len(filas)
+        primera = primera or filas[0]["num_factura"]
+        ultima = filas[-1]["num_factura"]
+        print(f"🧾 Facturas emitidas: {emitidas}/{len(lecturas)}")
+
+    return {
+        "periodo": periodo.isoformat(),
+        "punto_emision": punto_emision,
+        "emitidas": emitidas,
+        "estimadas": estimadas,
+        "sin_lectura": estimacion["sin_historial"] if estimacion else None,
+        "monto_total": float(monto_total),
+        "saldo_a_favor_aplicado": float(credito_aplicado),
+        "primera": primera,
+        "ultima": ultima,
+    }
+
+
+def migrar_lecturas(db: Session) -> None:
+    """
+    Bases existentes: adapta medidores.t_lecturas al modelo Lectura.
+    Las lecturas pasan a Numeric(12,2) y fecha_lectura a timestamp; se agrega
+    periodo (el mes de fecha_lectura), las columnas de estimación y la
+    restricción única por medidor y periodo. Falla si hay lecturas sin fecha,
+    valor o medidor, o más de una lectura del mismo medidor en un mes. Hace commit.
+    """
+    db.execute(text("""
+        ALTER TABLE medidores.t_lecturas
+            ALTER COLUMN lectura_anterior TYPE NUMERIC(12, 2),
+            ALTER COLUMN lectura_actual TYPE NUMERIC(12, 2),
+            ALTER COLUMN consumo_m3 TYPE NUMERIC(12, 2),
+            ALTER COLUMN fecha_lectura TYPE TIMESTAMP USING fecha_lectura::timestamp,
+            ADD COLUMN IF NOT EXISTS periodo DATE,
+            ADD COLUMN IF NOT EXISTS estimada BOOLEAN NOT NULL DEFAULT false,
+            ADD COLUMN IF NOT EXISTS metodo_estimacion VARCHAR(20),
+            ADD COLUMN IF NOT EXISTS ajuste_estimacion NUMERIC(12, 2) NOT NULL DEFAULT 0
+    """))
+    db.execute(text(
+        "ALTER TABLE facturacion.t_factura ADD COLUMN IF NOT EXISTS estimada BOOLEAN NOT NULL DEFAULT false"
+    ))
+
+    incompletas = db.execute(text("""
+        SELECT id_lectura, id_medidor FROM medidores.t_lecturas
+        WHERE fecha_lectura IS NULL OR lectura_actual IS NULL OR id_medidor IS NULL ORDER BY id_lectura
+    """)).all()
+    if incompletas:
+        for id_lectura, id_medidor in incompletas:
+            print(f"⚠️ Lectura {id_lectura} (medidor {id_medidor}) sin fecha, valor o medidor")
+        raise RuntimeError("Hay lecturas sin fecha, valor o medidor; corríjalas antes de migrar")
+
+    db.execute(text("""
+        UPDATE medidores.t_lecturas SET
+            periodo = date_trunc('month', fecha_lectura)::date,
+            consumo_m3 = coalesce(consumo_m3, greatest(lectura_actual - coalesce(lectura_anterior, lectura_actual), 0)),
+            activo = coalesce(activo, true)
+        WHERE periodo IS NULL
+    """))
+
+    duplicadas = db.execute(text("""
+        SELECT id_medidor, periodo, count(*) FROM medidores.t_lecturas
+        GROUP BY id_medidor, periodo HAVING count(*) > 1 ORDER BY id_medidor, periodo
+    """)).all()
+    if duplicadas:
+        for id_medidor, periodo, cantidad in duplicadas:
+            print(f"⚠️ Medidor {id_medidor} con {cantidad} lecturas en {periodo:%m/%Y}")
+        raise RuntimeError("Hay medidores con más de una lectura en el mismo mes; corríjalas antes de migrar")
+
+    db.execute(text("""
+        ALTER TABLE medidores.t_lecturas
+            ALTER COLUMN periodo SET NOT NULL,
+            ALTER COLUMN fecha_lectura SET NOT NULL,
+            ALTER COLUMN fecha_lectura SET DEFAULT now(),
+            ALTER COLUMN lectura_actual SET NOT NULL,
+            ALTER COLUMN consumo_m3 SET NOT NULL,
+            ALTER COLUMN id_medidor SET NOT NULL,
+            ALTER COLUMN activo SET DEFAULT true
+    """))
+    existe = db.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'uq_lectura_medidor_periodo'"
+    )).scalar()
+    if not existe:
+        db.execute(text(
+            "ALTER TABLE medidores.t_lecturas "
+            "ADD CONSTRAINT uq_lectura_medidor_periodo UNIQUE (id_medidor, periodo)"
+        ))
+    for columna in ("periodo", "id_medidor"):
+        db.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_medidores_t_lecturas_{columna} ON medidores.t_lecturas ({columna})"
+        ))
+    db.commit()
@@ -0,0 +1,133 @@
+# services/blobs.py
+"""
+Registro de archivos en la base de datos (el contenido vive en disco,
+ver utils/blob_storage.py)
+
+- registrar_blob(): guarda el archivo, agrega su fila en t_blob (si ya
+  existía no hace nada) y pide la miniatura al hilo de fondo.
+- Las lecturas y los usuarios guardan solo el hash.
+- Solo se aceptan imágenes reconocidas por sus primeros bytes: el tipo que
+  declara el cliente no se guarda (se serviría tal cual, p. ej. un SVG con
+  JavaScript).
+- crear_esquema_archivos() crea el esquema en bases existentes y
+  migrar_fotos_usuarios() saca las fotos de perfil de t_usuario_sistema.foto
+  al almacenamiento de archivos (python -m services.blobs).
+"""
+from typing import BinaryIO, Iterable, Optional, Set
+
+from sqlalchemy import select, update, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models.blob import Blob
+from models.user import UsuarioSistema
+from utils.blob_storage import guardar_stream, guardar_bytes, leer_blob, encolar_miniatura, tipo_imagen
+
+MIGRACION_LOTE = 200
+
+
+class ImagenNoReconocida(Exception):
+    pass
+
+
+def registrar_blob(db: Session, origen: BinaryIO) -> dict:
+    """
+    Guarda la imagen y su registro (hace commit) -> {hash, tamano, tipo_contenido, duplicado}.
+    El tipo sale de los primeros bytes; lanza ImagenNoReconocida si no son
+    de un formato de imagen aceptado (FIRMAS_IMAGEN).
+    """
+    tipo_contenido = tipo_imagen(origen.read(16))
+    if tipo_contenido is None:
+        raise ImagenNoReconocida("El archivo no es una imagen JPEG, PNG, GIF, BMP o WebP")
+    origen.seek(0)
+    hash_blob, tamano, duplicado = guardar_stream(origen)
+    db.execute(
+        pg_insert(Blob)
+        .values(hash=hash_blob, tamano=tamano, tipo_contenido=tipo_contenido)
+        .on_conflict_do_nothing()
+    )
+    db.commit()
+    encolar_miniatura(hash_blob)
+    return {"hash": hash_blob, "tamano": tamano, "tipo_contenido": tipo_contenido, "duplicado": duplicado}
+
+
+def blobs_existentes(db: Session, hashes: Iterable[str]) -> Set[str]:
+    """Hashes del conjunto que están registrados (una consulta)"""
+    hashes = {h for h in hashes if h}
+    if not hashes:
+        return set()
+    return set(db.execute(select(Blob.hash).where(Blob.hash.in_(hashes))).scalars())
+
+
+def foto_usuario(user: UsuarioSistema) -> Optional[bytes]:
+    """Bytes de la foto de perfil (almacenamiento de archivos o columna heredada)"""
+    if user.foto_hash:
+        return leer_blob(user.foto_hash)
+    return user.foto
+
+
+# ========================================
+# MIGRACIÓN
+# ========================================
+def crear_esquema_archivos(db: Session) -> None:
+    """
+    Bases existentes: crea el esquema archivos con t_blob y las columnas
+    foto_hash de t_usuario_sistema y t_lecturas. Hace commit.
+    """
+    db.execute(text("CREATE SCHEMA IF NOT EXISTS archivos"))
+    Blob.__table__.create(db.connection(), checkfirst=True)
+    for tabla in ("usuarios.t_usuario_sistema", "medidores.t_lecturas"):
+        db.execute(text(
+            f"ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS foto_hash VARCHAR(64) REFERENCES archivos.t_blob (hash)"
+        ))
+    db.commit()
+
+
+def migrar_fotos_usuarios(db: Session) -> int:
+    """
+    Mueve las fotos guardadas en t_usuario_sistema.foto al almacenamiento de
+    archivos, por lotes (cada lote en su propia transacción). Hace commit.
+    """
+    migradas = 0
+    while True:
+        usuarios = db.execute(
+            select(UsuarioSistema.id_usuario_sistema, UsuarioSistema.foto)
+            .where(UsuarioSistema.foto.isnot(None))
+            .order_by(UsuarioSistema.id_usuario_sistema)
+            .limit(MIGRACION_LOTE)
+        ).all()
+        if not usuarios:
+            break
+
+        registros, asignaciones = {}, []
+        for id_usuario, foto in usuarios:
+            foto = bytes(foto)
+            hash_blob, tamano, _ = guardar_bytes(foto)
+            tipo = tipo_imagen(foto[:16]) or "application/octet-stream"
+            registros[hash_blob] = {"hash": hash_blob, "tamano": tamano, "tipo_contenido": tipo}
+            asignaciones.append({"id_usuario_sistema": id_usuario, "foto_hash": hash_blob, "foto": None})
+
+        db.execute(pg_insert(Blob).on_conflict_do_nothing(), list(registros.values()))
+        # UPDATE por clave primaria en lote (executemany)
+        db.execute(update(UsuarioSistema), asignaciones)
+        db.commit()
+        for hash_blob, registro in registros.items():
+            if registro["tipo_contenido"].startswith("image/"):
+                encolar_miniatura(hash_blob)
+        migradas += len(usuarios)
+        print(f"🖼️ Fotos migradas: {migradas}")
+
+    return migradas
+
+
+if __name__ == "__main__":
+    from db.session import SessionLocal
+
+    # Uso: python -m services.blobs   (una sola vez en bases existentes, antes de desplegar)
+    # Después conviene VACUUM FULL usuarios.t_usuario_sistema para devolver el espacio
+    db = SessionLocal()
+    try:
+        crear_esquema_archivos(db)
+        print(f"✅ Fotos de usuarios migradas: {migrar_fotos_usuarios(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,133 @@
+# services/dashboard.py
+"""
+Resumen del dashboard de administración
+
+- Totales de medidores, afiliados y sectores en una sola consulta: un
+  subquery de agregados por tabla con COUNT(*) FILTER (WHERE ...), unidos en
+  una fila.
+- Conteos por sector en una segunda consulta (agregados por sector unidos
+  a t_sector con LEFT JOIN).
+- El resultado queda en memoria del proceso DASHBOARD_TTL segundos; las
+  altas, cambios y bajas de medidores, afiliados y sectores lo invalidan
+  (en otros procesos vence por tiempo).
+"""
+import os
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.sector import Sector
+
+DASHBOARD_TTL = float(os.getenv("DASHBOARD_TTL", 5))  # segundos
+
+_cache_resumen: Optional[tuple] = None  # (vence, resumen)
+_cache_generacion = 0  # sube con cada invalidación
+_cache_lock = Lock()
+
+
+def calcular_resumen(db: Session) -> dict:
+    """Estadísticas del dashboard (dos consultas)"""
+    medidores = select(
+        func.count().label("total"),
+        func.count().filter(Medidor.activo == True).label("activos"),
+        func.count().filter(Medidor.activo == False).label("inactivos"),
+        func.count().filter(Medidor.id_usuario_afi.isnot(None)).label("asignados"),
+        func.count().filter(Medidor.id_usuario_afi.is_(None)).label("sin_asignar"),
+    ).subquery()
+    afiliados = select(
+        func.count().label("total"),
+        func.count().filter(UsuarioAfiliado.activo == True).label("activos"),
+        func.count().filter(UsuarioAfiliado.activo == False).label("inactivos"),
+    ).subquery()
+    sectores = select(
+        func.count().label("total"),
+        func.count().filter(Sector.activo == True).label("activos"),
+        func.count().filter(Sector.activo == False).label("inactivos"),
+    ).subquery()
+    totales = db.execute(select(medidores, afiliados, sectores)).one()
+
+    medidores_sector = (
+        select(
+            Medidor.id_sector,
+            func.count().label("medidores"),
+            func.count().filter(Medidor.activo == True).label("medidores_activos"),
+        )
+        .group_by(Medidor.id_sector)
+        .subquery()
+    )
+    afiliados_sector = (
+        select(
+            UsuarioAfiliado.id_sector,
+            func.count().filter(UsuarioAfiliado.activo == True).label("afiliados_activos"),
+        )
+        .group_by(UsuarioAfiliado.id_sector)
+        .subquery()
+    )
+    por_sector = db.execute(
+        select(
+            Sector.id_sector,
+            Sector.nombre_sector,
+            Sector.activo,
+            func.coalesce(medidores_sector.c.medidores, 0),
+            func.coalesce(medidores_sector.c.medidores_activos, 0),
+            func.coalesce(afiliados_sector.c.afiliados_activos, 0),
+        )
+        .outerjoin(medidores_sector, medidores_sector.c.id_sector == Sector.id_sector)
+        .outerjoin(afiliados_sector, afiliados_sector.c.id_sector == Sector.id_sector)
+        .order_by(Sector.nombre_sector, Sector.id_sector)
+    ).all()
+
+    columnas = [
+        ("medidores", ["total", "activos", "inactivos", "asignados", "sin_asignar"]),
+        ("afiliados", ["total", "activos", "inactivos"]),
+        ("sectores", ["total", "activos", "inactivos"]),
+    ]
+    resumen, posicion = {}, 0
+    for grupo, campos in columnas:
+        resumen[grupo] = dict(zip(campos, totales[posicion:posicion + len(campos)]))
+        posicion += len(campos)
+
+    resumen["por_sector"] = [
+        {
+            "id_sector": id_sector,
+            "nombre_sector": nombre,
+            "activo": activo,
+            "medidores": cantidad_medidores,
+            "medidores_activos": medidores_activos,
+            "afiliados_activos": afiliados_activos,
+        }
+        for id_sector, nombre, activo, cantidad_medidores, medidores_activos, afiliados_activos in por_sector
+    ]
+    resumen["generado"] = datetime.now()
+    return resumen
+
+
+def obtener_resumen(db: Session) -> dict:
+    """Resumen desde la caché del proceso (se recalcula al vencer o invalidarse)"""
+    global _cache_resumen
+    with _cache_lock:
+        if _cache_resumen is not None and _cache_resumen[0] > time.monotonic():
+            return {**_cache_resumen[1], "desde_cache": True}
+        generacion = _cache_generacion
+
+    resumen = calcular_resumen(db)
+    with _cache_lock:
+        # Si hubo una invalidación mientras se calculaba, el resultado puede no
+        # incluir ese cambio: se devuelve pero no se guarda
+        if generacion == _cache_generacion:
+            _cache_resumen = (time.monotonic() + DASHBOARD_TTL, resumen)
+    return {**resumen, "desde_cache": False}
+
+
+def invalidar_resumen() -> None:
+    """Descarta el resumen guardado (llamar después del commit de un cambio)"""
+    global _cache_resumen, _cache_generacion
+    with _cache_lock:
+        _cache_resumen = None
+        _cache_generacion += 1
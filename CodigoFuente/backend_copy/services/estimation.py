@@ -0,0 +1,183 @@
+# services/estimation.py
+"""
+Estimación de lecturas faltantes (etapa previa a la facturación)
+
+Cuando el lector no pudo acceder a un medidor, el periodo se factura con una
+lectura estimada. Todo el periodo se estima de una vez con arreglos numpy
+sobre la matriz de consumo de anomalías (sin consultas por medidor):
+1. Promedio de los últimos ESTIMACION_MESES meses con lectura.
+2. Si no hay, el consumo del mismo mes del año anterior.
+3. Si no hay, la mediana del consumo real del sector en el periodo
+   (o de todo el periodo si el sector no tiene lecturas).
+
+La lectura estimada queda marcada (estimada=True) y la siguiente lectura real
+la concilia: si el medidor marca menos de lo estimado, el consumo es cero y la
+diferencia queda como ajuste_estimacion hasta que se consuma.
+"""
+import os
+import warnings
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select, exists, cast, func, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models.meter import Medidor
+from models.reading import Lectura
+from services.anomalies import matriz_consumo
+from services.readings import lecturas_previas
+from services.water_loss import analizar_periodos
+from services.reader_package import invalidar_paquetes
+from services import rollups
+
+ESTIMACION_MESES = int(os.getenv("ESTIMACION_MESES", 3))
+HISTORIA_MESES = 12  # la columna 0 de la matriz es el mismo mes del año anterior
+
+OBSERVACIONES = {
+    "promedio": f"Lectura estimada (promedio de {ESTIMACION_MESES} meses)",
+    "mes_anio_anterior": "Lectura estimada (mismo mes del año anterior)",
+    "mediana_sector": "Lectura estimada (mediana del sector)",
+}
+
+
+def medidores_sin_lectura(db: Session, periodo: date, id_sector: Optional[int] = None) -> list:
+    """Medidores activos y asignados sin lectura en el periodo -> [(id_medidor, id_usuario_afi, id_sector)]"""
+    stmt = (
+        select(Medidor.id_medidor, Medidor.id_usuario_afi, Medidor.id_sector)
+        .where(
+            Medidor.activo == True,
+            Medidor.id_usuario_afi.isnot(None),
+            ~exists().where(Lectura.id_medidor == Medidor.id_medidor, Lectura.periodo == periodo),
+        )
+        .order_by(Medidor.id_medidor)
+    )
+    if id_sector is not None:
+        stmt = stmt.where(Medidor.id_sector == id_sector)
+    return db.execute(stmt).all()
+
+
+def medianas_sector(db: Session, periodo: date) -> tuple:
+    """
+    Mediana del consumo real (no estimado) del periodo por sector, en una consulta.
+    Retorna ({id_sector: mediana}, mediana_general).
+    """
+    sectores, consumos = db.execute(
+        select(func.array_agg(Medidor.id_sector), func.array_agg(cast(Lectura.consumo, Float)))
+        .join(Medidor, Medidor.id_medidor == Lectura.id_medidor)
+        .where(Lectura.periodo == periodo, Lectura.estimada == False)
+    ).one()
+    if consumos is None:
+        return {}, np.nan
+
+    consumos = np.asarray(consumos, dtype=np.float64)
+    sectores = np.asarray([s if s is not None else -1 for s in sectores], dtype=np.int64)
+
+    orden = np.argsort(sectores, kind="stable")
+    sectores, consumos = sectores[orden], consumos[orden]
+    unicos, inicios = np.unique(sectores, return_index=True)
+    medianas = {
+        int(sector): float(np.median(grupo))
+        for sector, grupo in zip(unicos, np.split(consumos, inicios[1:]))
+        if sector >= 0
+    }
+    return medianas, float(np.median(consumos))
+
+
+def calcular_estimaciones(consumo: np.ndarray, mediana_sector: np.ndarray):
+    """
+    Estimación vectorizada sobre la matriz medidores x meses (la última columna
+    es el periodo a estimar). Retorna (estimacion, metodo) con metodo:
+    0 = promedio, 1 = mes del año anterior, 2 = mediana del sector, -1 = sin datos.
+    """
+    historia = consumo[:, :-1]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # filas sin meses recientes
+        promedio = np.nanmean(historia[:, -ESTIMACION_MESES:], axis=1)
+    anio_anterior = historia[:, 0]
+
+    estimacion = np.full(len(consumo), np.nan)
+    metodo = np.full(len(consumo), -1, dtype=np.int64)
+    for codigo, valores in enumerate((promedio, anio_anterior, mediana_sector)):
+        usar = np.isnan(estimacion) & ~np.isnan(valores)
+        estimacion[usar] = valores[usar]
+        metodo[usar] = codigo
+
+    return np.round(np.maximum(estimacion, 0), 2), metodo
+
+
+def estimar_lecturas_faltantes(db: Session, periodo: date, id_sector: Optional[int] = None) -> dict:
+    """
+    Registra lecturas estimadas para los medidores sin lectura en el periodo.
+    Los medidores sin ninguna lectura anterior no se estiman (no hay desde
+    dónde contar). Hace commit.
+    """
+    faltantes = medidores_sin_lectura(db, periodo, id_sector)
+    if not faltantes:
+        return {"estimadas": 0, "sin_historial": 0, "por_metodo": {}}
+
+    ids_faltantes = [fila.id_medidor for fila in faltantes]
+    previas = lecturas_previas(db, ids_faltantes, periodo)
+    candidatos = [fila for fila in faltantes if fila.id_medidor in previas]
+    sin_historial = len(faltantes) - len(candidatos)
+
+    # Matriz alineada con los candidatos (los que no tienen historia en la
+    # ventana quedan en NaN y pasan a la mediana del sector)
+    ids_candidatos = np.array([fila.id_medidor for fila in candidatos], dtype=np.int64)
+    ids_matriz, matriz, _, _ = matriz_consumo(db, periodo, HISTORIA_MESES, ids_candidatos.tolist())
+    consumo = np.full((len(candidatos), HISTORIA_MESES + 1), np.nan)
+    encontrado = np.isin(ids_candidatos, ids_matriz)
+    consumo[encontrado] = matriz[np.searchsorted(ids_matriz, ids_candidatos[encontrado])]
+
+    medianas, mediana_general = medianas_sector(db, periodo)
+    mediana_sector = np.array([medianas.get(fila.id_sector, mediana_general) for fila in candidatos], dtype=np.float64)
+
+    estimacion, metodo = calcular_estimaciones(consumo, mediana_sector)
+    nombres = list(OBSERVACIONES)
+    ahora = datetime.now()
+
+    filas = []
+    for i, fila in enumerate(candidatos):
+        if metodo[i] < 0:
+            sin_historial += 1
+            continue
+        anterior = previas[fila.id_medidor].valor
+        estimado = Decimal(str(estimacion[i]))
+        filas.append({
+            "id_medidor": fila.id_medidor,
+            "periodo": periodo,
+            "fecha_lectura": ahora,
+            "lectura_anterior": anterior,
+            "lectura_actual": anterior + estimado,
+            "consumo": estimado,
+            "observacion": OBSERVACIONES[nombres[metodo[i]]],
+            "estimada": True,
+            "metodo_estimacion": nombres[metodo[i]],
+            "ajuste_estimacion": Decimal(0),
+            "id_lector": None,
+        })
+
+    if filas:
+        # Si mientras tanto llegó la lectura real, esa se conserva
+        tabla = Lectura.__table__
+        stmt = pg_insert(tabla).on_conflict_do_nothing(constraint="uq_lectura_medidor_periodo").returning(tabla.c.id_medidor)
+        insertadas = set(db.execute(stmt, filas).scalars())
+        datos = {fila.id_medidor: fila for fila in candidatos}
+        filas = [fila for fila in filas if fila["id_medidor"] in insertadas]
+        rollups.acumular(db, periodo, (
+            (datos[fila["id_medidor"]].id_usuario_afi, datos[fila["id_medidor"]].id_sector,
+             {"consumo": fila["consumo"], "num_lecturas": 1})
+            for fila in filas
+        ))
+        db.commit()
+        invalidar_paquetes(despues_de=periodo)
+        analizar_periodos(db, [periodo], {datos[fila["id_medidor"]].id_sector for fila in filas})
+
+    por_metodo = {}
+    for fila in filas:
+        por_metodo[fila["metodo_estimacion"]] = por_metodo.get(fila["metodo_estimacion"], 0) + 1
+
+    print(f"📐 Lecturas estimadas del periodo {periodo:%m/%Y}: {len(filas)} ({sin_historial} sin historial)")
+    return {"estimadas": len(filas), "sin_historial": sin_historial, "por_metodo": por_metodo}
@@ -0,0 +1,199 @@
+# services/invoice_documents.py
+"""
+Documentos de facturas: carga de datos y paquetes por sector
+"""
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from models.invoice import Factura
+from models.affiliate import UsuarioAfiliado
+from models.user import UsuarioSistema
+from models.meter import Medidor
+from models.sector import Sector
+from utils.invoice_pdf import agrupar_por_sector, escribir_zip
+
+
+def _formato(valor) -> str:
+    return f"{valor:.2f}" if valor is not None else "-"
+
+
+def obtener_datos_facturas(
+    db: Session,
+    ids: Optional[List[int]] = None,
+    periodo: Optional[date] = None,
+    id_sector: Optional[int] = None,
+) -> List[dict]:
+    """
+    Carga en una sola consulta (solo columnas) los datos que necesita la plantilla.
+    No instancia objetos ORM por fila.
+    """
+    stmt = (
+        select(
+            Factura.id_factura,
+            Factura.num_factura,
+            Factura.periodo,
+            Factura.fecha_emision,
+            Factura.lectura_anterior,
+            Factura.lectura_actual,
+            Factura.consumo,
+            Factura.estimada,
+            Factura.subtotal,
+            Factura.total,
+            UsuarioAfiliado.cod_usuario_afi,
+            UsuarioSistema.nombres,
+            UsuarioSistema.apellidos,
+            UsuarioSistema.cedula,
+            Sector.nombre_sector,
+            Medidor.num_medidor,
+        )
+        .join(UsuarioAfiliado, UsuarioAfiliado.id_usuario_afi == Factura.id_usuario_afi)
+        .join(UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema)
+        .outerjoin(Sector, Sector.id_sector == Factura.id_sector)
+        .outerjoin(Medidor, Medidor.id_medidor == Factura.id_medidor)
+        .where(Factura.activo == True)
+    )
+
+    if ids is not None:
+        stmt = stmt.where(Factura.id_factura.in_(ids))
+    if periodo is not None:
+        stmt = stmt.where(Factura.periodo == periodo)
+    if id_sector is not None:
+        stmt = stmt.where(Factura.id_sector == id_sector)
+
+    stmt = stmt.order_by(Sector.nombre_sector, Factura.num_factura)
+
+    return [
+        {
+            "id_factura": row.id_factura,
+            "num_factura": row.num_factura or str(row.id_factura),
+            "periodo": row.periodo.strftime("%m/%Y") if row.periodo else "-",
+            "fecha_emision": row.fecha_emision.strftime("%d/%m/%Y") if row.fecha_emision else "-",
+            "lectura_anterior": _formato(row.lectura_anterior),
+            "lectura_actual": _formato(row.lectura_actual) + (" (estimada)" if row.estimada else ""),
+            "consumo": _formato(row.consumo),
+            "subtotal": _formato(row.subtotal),
+            "total": _formato(row.total),
+            "cod_usuario_afi": row.cod_usuario_afi,
+            "nombre_afiliado": f"{row.nombres} {row.apellidos}",
+            "cedula": row.cedula,
+            "nombre_sector": row.nombre_sector or "-",
+            "num_medidor": row.num_medidor or "-",
+        }
+        for row in db.execute(stmt)
+    ]
+
+
+def generar_paquetes_por_sector(db: Session, periodo: date, directorio: Path) -> List[Path]:
+    """
+    Genera un ZIP por sector con las facturas del periodo (proceso por lotes).
+    Retorna la lista de archivos creados.
+    """
+    directorio.mkdir(parents=True, exist_ok=True)
+    archivos = []
+
+    for nombre_sector, lista_datos in agrupar_por_sector(obtener_datos_facturas(db, periodo=periodo)).items():
+        nombre_archivo = "".join(c if c.isalnum() else "_" for c in nombre_sector)
+        destino = directorio / f"facturas_{periodo:%Y-%m}_{nombre_archivo}.zip"
+        with open(destino, "wb") as f:
+            escribir_zip(f, lista_datos)
+        print(f"✅ Paquete generado: {destino} ({len(lista_datos)} facturas)")
+        archivos.append(destino)
+
+    return archivos
+
+
+def migrar_facturas(db: Session) -> None:
+    """
+    Bases existentes: adapta facturacion.t_factura al modelo Factura.
+    consumo_m3/exceso_m3 pasan a Numeric(12,2) y fecha_emision a timestamp;
+    se agregan periodo, lecturas, estado, medidor y sector, completados desde
+    la lectura facturada (o el medidor/afiliado). Falla si hay facturas sin
+    periodo o sin afiliado que no se pueden deducir. Hace commit.
+    """
+    db.execute(text("""
+        ALTER TABLE facturacion.t_factura
+            ALTER COLUMN num_factura TYPE VARCHAR(50),
+            ALTER COLUMN consumo_m3 TYPE NUMERIC(12, 2),
+            ALTER COLUMN exceso_m3 TYPE NUMERIC(12, 2),
+            ALTER COLUMN fecha_emision TYPE TIMESTAMP USING fecha_emision::timestamp,
+            ADD COLUMN IF NOT EXISTS periodo DATE,
+            ADD COLUMN IF NOT EXISTS lectura_anterior NUMERIC(12, 2),
+            ADD COLUMN IF NOT EXISTS lectura_actual NUMERIC(12, 2),
+            ADD COLUMN IF NOT EXISTS estado VARCHAR(20),
+            ADD COLUMN IF NOT EXISTS id_medidor INTEGER REFERENCES medidores.t_medidor (id_medidor),
+            ADD COLUMN IF NOT EXISTS id_sector INTEGER REFERENCES medidores.t_sector (id_sector)
+    """))
+
+    # Datos de la lectura facturada y de su medidor
+    db.execute(text("""
+        UPDATE facturacion.t_factura f SET
+            periodo = date_trunc('month', coalesce(l.fecha_lectura, f.fecha_emision))::date,
+            lectura_anterior = coalesce(f.lectura_anterior, l.lectura_anterior),
+            lectura_actual = coalesce(f.lectura_actual, l.lectura_actual),
+            consumo_m3 = coalesce(f.consumo_m3, l.consumo_m3),
+            id_medidor = coalesce(f.id_medidor, l.id_medidor),
+            id_usuario_afi = coalesce(f.id_usuario_afi, m.id_usuario_afi)
+        FROM medidores.t_lecturas l
+        LEFT JOIN medidores.t_medidor m ON m.id_medidor = l.id_medidor
+        WHERE l.id_lectura = f.id_lectura AND f.periodo IS NULL
+    """))
+    db.execute(text("""
+        UPDATE facturacion.t_factura f SET
+            periodo = coalesce(f.periodo, date_trunc('month', f.fecha_emision)::date),
+            fecha_emision = coalesce(f.fecha_emision, f.periodo),
+            id_sector = coalesce(f.id_sector,
+                (SELECT m.id_sector FROM medidores.t_medidor m WHERE m.id_medidor = f.id_medidor),
+                (SELECT a.id_sector FROM usuarios.t_usuario_afiliado a WHERE a.id_usuario_afi = f.id_usuario_afi)),
+            consumo_m3 = coalesce(f.consumo_m3, 0),
+            subtotal = coalesce(f.subtotal, f.total, 0),
+            total = coalesce(f.total, f.subtotal, 0),
+            estado = coalesce(f.estado, CASE WHEN f.activo IS FALSE THEN 'anulada' ELSE 'pendiente' END),
+            activo = coalesce(f.activo, true)
+        WHERE f.estado IS NULL OR f.periodo IS NULL OR f.fecha_emision IS NULL
+    """))
+
+    incompletas = db.execute(text("""
+        SELECT id_factura, num_factura FROM facturacion.t_factura
+        WHERE periodo IS NULL OR id_usuario_afi IS NULL ORDER BY id_factura
+    """)).all()
+    if incompletas:
+        for id_factura, num_factura in incompletas:
+            print(f"⚠️ Factura {id_factura} ({num_factura}) sin periodo o sin afiliado")
+        raise RuntimeError("Hay facturas sin periodo o sin afiliado; corríjalas antes de migrar")
+
+    db.execute(text("""
+        ALTER TABLE facturacion.t_factura
+            ALTER COLUMN periodo SET NOT NULL,
+            ALTER COLUMN fecha_emision SET NOT NULL,
+            ALTER COLUMN fecha_emision SET DEFAULT now(),
+            ALTER COLUMN consumo_m3 SET NOT NULL,
+            ALTER COLUMN subtotal SET NOT NULL,
+            ALTER COLUMN total SET NOT NULL,
+            ALTER COLUMN estado SET NOT NULL,
+            ALTER COLUMN activo SET DEFAULT true,
+            ALTER COLUMN id_usuario_afi SET NOT NULL
+    """))
+    for columna in ("periodo", "id_usuario_afi", "id_sector"):
+        db.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_facturacion_t_factura_{columna} ON facturacion.t_factura ({columna})"
+        ))
+    db.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    from db.session import SessionLocal
+
+    # Uso: python -m services.invoice_documents 2025-11-01 [directorio]
+    periodo_arg = date.fromisoformat(sys.argv[1])
+    directorio_arg = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("facturas_pdf")
+
+    db = SessionLocal()
+    try:
+        generar_paquetes_por_sector(db, periodo_arg, directorio_arg)
+    finally:
+        db.close()
@@ -0,0 +1,277 @@
+# services/invoice_numbers.py
+"""
+Asignación de números de factura secuenciales y sin huecos por punto de emisión
+
+Los trabajadores de facturación reservan BLOQUES de números (no uno por factura):
+- La reserva se hace en su propia transacción corta, con bloqueo de fila sobre
+  t_contador_factura, para no mantener el bloqueo durante toda la facturación.
+- Si la facturación falla o usa menos números de los reservados, el sobrante se
+  devuelve: si está al final se retrocede el contador, si no se guarda en
+  t_rango_factura_libre y se reasigna en la siguiente reserva.
+"""
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import select, update, exists, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from db.session import SessionLocal
+from models.invoice import ContadorFactura, RangoFacturaLibre
+
+
+def formatear_num_factura(punto_emision: str, secuencial: int) -> str:
+    """'001-001' + 123 -> '001-001-000000123'"""
+    return f"{punto_emision}-{secuencial:09d}"
+
+
+def _bloquear_contador(db, punto_emision: str) -> int:
+    """SELECT ... FOR UPDATE del contador (lo crea si no existe). Retorna 'siguiente'."""
+    stmt = select(ContadorFactura.siguiente).where(
+        ContadorFactura.punto_emision == punto_emision
+    ).with_for_update()
+
+    siguiente = db.execute(stmt).scalar()
+    if siguiente is None:
+        db.execute(
+            pg_insert(ContadorFactura)
+            .values(punto_emision=punto_emision, siguiente=1)
+            .on_conflict_do_nothing(index_elements=["punto_emision"])
+        )
+        siguiente = db.execute(stmt).scalar()
+    return siguiente
+
+
+def reservar_rangos(punto_emision: str, cantidad: int, session_factory=SessionLocal) -> List[Tuple[int, int]]:
+    """
+    Reserva `cantidad` secuenciales y retorna la lista de rangos [(desde, hasta), ...].
+
+    Camino rápido (sin rangos libres): un solo UPDATE ... RETURNING.
+    Camino lento: bloquea el contador, consume primero los rangos libres
+    (en orden) y completa con el contador.
+    """
+    if cantidad <= 0:
+        return []
+
+    db = session_factory()
+    try:
+        # Camino rápido: una sola ida y vuelta a la base de datos
+        inicio = db.execute(
+            update(ContadorFactura)
+            .where(
+                ContadorFactura.punto_emision == punto_emision,
+                ~exists().where(RangoFacturaLibre.punto_emision == punto_emision)
+            )
+            .values(siguiente=ContadorFactura.siguiente + cantidad)
+            .returning(ContadorFactura.siguiente - cantidad)
+        ).scalar()
+
+        if inicio is not None:
+            db.commit()
+            return [(inicio, inicio + cantidad - 1)]
+
+        # Camino lento: hay rangos devueltos pendientes (o el contador no existe)
+        siguiente = _bloquear_contador(db, punto_emision)
+        rangos = []
+        faltan = cantidad
+
+        libres = db.execute(
+            select(RangoFacturaLibre)
+            .where(RangoFacturaLibre.punto_emision == punto_emision)
+            .order_by(RangoFacturaLibre.desde)
+        ).scalars().all()
+
+        for libre in libres:
+            if faltan == 0:
+                break
+            tomar = min(faltan, libre.hasta - libre.desde + 1)
+            rangos.append((libre.desde, libre.desde + tomar - 1))
+            faltan -= tomar
+            if libre.desde + tomar > libre.hasta:
+                db.delete(libre)
+            else:
+                libre.desde += tomar
+
+        if faltan:
+            rangos.append((siguiente, siguiente + faltan - 1))
+            db.execute(
+                update(ContadorFactura)
+                .where(ContadorFactura.punto_emision == punto_emision)
+                .values(siguiente=siguiente + faltan)
+            )
+
+        db.commit()
+        return rangos
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def liberar_rango(punto_emision: str, desde: int, hasta: int, session_factory=SessionLocal) -> None:
+    """
+    Devuelve un rango reservado que no se usó.
+    Si es el final de la numeración se retrocede el contador (absorbiendo
+    también los rangos libres que queden contiguos); si no, se guarda como libre.
+    """
+    if hasta < desde:
+        return
+
+    db = session_factory()
+    try:
+        siguiente = _bloquear_contador(db, punto_emision)
+
+        if hasta == siguiente - 1:
+            siguiente = desde
+            # Absorber rangos libres que ahora quedan al final
+            while True:
+                contiguo = db.execute(
+                    select(RangoFacturaLibre).where(
+                        RangoFacturaLibre.punto_emision == punto_emision,
+                        RangoFacturaLibre.hasta == siguiente - 1
+                    )
+                ).scalar()
+                if contiguo is None:
+                    break
+                siguiente = contiguo.desde
+                db.delete(contiguo)
+
+            db.execute(
+                update(ContadorFactura)
+                .where(ContadorFactura.punto_emision == punto_emision)
+                .values(siguiente=siguiente)
+            )
+        else:
+            db.add(RangoFacturaLibre(punto_emision=punto_emision, desde=desde, hasta=hasta))
+
+        db.commit()
+        print(f"↩️ Rango de facturas devuelto: {punto_emision} {desde}-{hasta}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class BloqueNumeracion:
+    """Bloque de secuenciales reservado para un trabajador de facturación"""
+
+    def __init__(self, punto_emision: str, rangos: List[Tuple[int, int]]):
+        self.punto_emision = punto_emision
+        self.rangos = rangos
+        self._numeros = [n for desde, hasta in rangos for n in range(desde, hasta + 1)]
+        self._usados = 0
+        self._confirmados = 0
+
+    def __len__(self):
+        return len(self._numeros)
+
+    def siguiente(self) -> int:
+        """Toma el siguiente secuencial del bloque"""
+        if self._usados >= len(self._numeros):
+            raise ValueError("El bloque de numeración está agotado")
+        numero = self._numeros[self._usados]
+        self._usados += 1
+        return numero
+
+    def confirmar(self) -> None:
+        """Marca como definitivos los números usados (llamar después del commit)"""
+        self._confirmados = self._usados
+
+    def sobrantes(self) -> List[Tuple[int, int]]:
+        """Rangos no confirmados, agrupados en tramos consecutivos"""
+        rangos = []
+        for numero in self._numeros[self._confirmados:]:
+            if rangos and rangos[-1][1] == numero - 1:
+                rangos[-1] = (rangos[-1][0], numero)
+            else:
+                rangos.append((numero, numero))
+        return rangos
+
+
+@contextmanager
+def reservar_numeros(punto_emision: str, cantidad: int, session_factory=SessionLocal) -> Iterator[BloqueNumeracion]:
+    """
+    Reserva un bloque y garantiza que lo no confirmado vuelva al pool.
+
+        with reservar_numeros("001-001", 5000) as bloque:
+            ... bloque.siguiente() ...
+            db.commit()
+            bloque.confirmar()
+    """
+    bloque = BloqueNumeracion(punto_emision, reservar_rangos(punto_emision, cantidad, session_factory))
+    try:
+        yield bloque
+    finally:
+        # Los sobrantes se devuelven de mayor a menor para que el contador retroceda
+        for desde, hasta in reversed(bloque.sobrantes()):
+            liberar_rango(punto_emision, desde, hasta, session_factory)
+
+
+def migrar_numeracion(db: Session) -> None:
+    """
+    Bases existentes: agrega punto_emision y secuencial a facturacion.t_factura
+    (tomados de los num_factura con formato '001-001-000000123'), crea el
+    contador y los rangos libres y deja el contador después del mayor
+    secuencial emitido. Falla si hay números de factura repetidos o lecturas
+    facturadas dos veces. Hace commit.
+    """
+    db.execute(text("""
+        ALTER TABLE facturacion.t_factura
+            ADD COLUMN IF NOT EXISTS punto_emision VARCHAR(7),
+            ADD COLUMN IF NOT EXISTS secuencial INTEGER
+    """))
+    db.execute(text(r"""
+        UPDATE facturacion.t_factura SET
+            punto_emision = CASE WHEN num_factura ~ '^\d{3}-\d{3}-\d{1,9}$' THEN left(num_factura, 7) ELSE '001-001' END,
+            secuencial = CASE WHEN num_factura ~ '^\d{3}-\d{3}-\d{1,9}$' THEN split_part(num_factura, '-', 3)::int END
+        WHERE punto_emision IS NULL
+    """))
+
+    repetidas = db.execute(text("""
+        SELECT punto_emision, secuencial, count(*) FROM facturacion.t_factura
+        WHERE secuencial IS NOT NULL
+        GROUP BY punto_emision, secuencial HAVING count(*) > 1 ORDER BY punto_emision, secuencial
+    """)).all()
+    for punto_emision, secuencial, cantidad in repetidas:
+        print(f"⚠️ Número {formatear_num_factura(punto_emision, secuencial)} en {cantidad} facturas")
+    lecturas = db.execute(text("""
+        SELECT id_lectura, count(*) FROM facturacion.t_factura
+        WHERE id_lectura IS NOT NULL GROUP BY id_lectura HAVING count(*) > 1 ORDER BY id_lectura
+    """)).all()
+    for id_lectura, cantidad in lecturas:
+        print(f"⚠️ Lectura {id_lectura} facturada {cantidad} veces")
+    if repetidas or lecturas:
+        raise RuntimeError("Hay facturas repetidas; corríjalas antes de migrar")
+
+    db.execute(text("""
+        ALTER TABLE facturacion.t_factura
+            ALTER COLUMN punto_emision SET NOT NULL,
+            ALTER COLUMN punto_emision SET DEFAULT '001-001'
+    """))
+    restricciones = set(db.execute(text("""
+        SELECT conname FROM pg_constraint
+        WHERE conname IN ('uq_factura_punto_secuencial', 't_factura_id_lectura_key')
+    """)).scalars())
+    if "uq_factura_punto_secuencial" not in restricciones:
+        db.execute(text(
+            "ALTER TABLE facturacion.t_factura "
+            "ADD CONSTRAINT uq_factura_punto_secuencial UNIQUE (punto_emision, secuencial)"
+        ))
+    if "t_factura_id_lectura_key" not in restricciones:
+        db.execute(text(
+            "ALTER TABLE facturacion.t_factura ADD CONSTRAINT t_factura_id_lectura_key UNIQUE (id_lectura)"
+        ))
+
+    ContadorFactura.__table__.create(db.connection(), checkfirst=True)
+    RangoFacturaLibre.__table__.create(db.connection(), checkfirst=True)
+    # La numeración continúa después del mayor secuencial emitido
+    db.execute(text("""
+        INSERT INTO facturacion.t_contador_factura (punto_emision, siguiente)
+        SELECT punto_emision, max(secuencial) + 1 FROM facturacion.t_factura
+        WHERE secuencial IS NOT NULL GROUP BY punto_emision
+        ON CONFLICT (punto_emision) DO UPDATE
+        SET siguiente = greatest(t_contador_factura.siguiente, excluded.siguiente)
+    """))
+    db.commit()
@@ -0,0 +1,331 @@
+# services/meter_map.py
+"""
+Consultas de mapa sobre los medidores
+
+- Rectángulo visible (viewport): ubicacion <@ box(...) sobre el índice GiST
+  ix_medidor_ubicacion; respuesta en columnas + filas (sin repetir nombres).
+- Más cercanos: ORDER BY ubicacion <-> point(...) (búsqueda KNN del índice).
+  El operador mide en grados, así que se piden candidatos de más y se
+  reordenan por distancia real (haversine) en metros.
+- GeoJSON completo en streaming: cursor del lado del servidor (yield_per) y
+  un bloque de bytes por lote; nunca se arma la lista completa.
+- Teselas z/x/y (Web Mercator) en GeoJSON: bajo TESELA_ZOOM_DETALLE los
+  medidores se agrupan en celdas de TESELA_CELDA_PX píxeles con GROUP BY en
+  la base; desde ese zoom van uno por uno. Se guardan comprimidas en
+  t_tesela_mapa y se borran solo las teselas que contienen un medidor que
+  cambió (mismo commit que el cambio).
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from sqlalchemy import select, delete, text, func, cast, tuple_, Float, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from db.session import SessionLocal
+from models.meter import Medidor, TeselaMapa, ubicacion_medidor
+from utils.spatial import distancia_metros, METROS_POR_GRADO
+
+TESELA_ZOOM_MAX = int(os.getenv("TESELA_ZOOM_MAX", 20))
+TESELA_ZOOM_DETALLE = int(os.getenv("TESELA_ZOOM_DETALLE", 16))   # desde aquí, medidores individuales
+TESELA_CELDA_PX = int(os.getenv("TESELA_CELDA_PX", 64))          # agrupación en teselas de 256 px
+GEOJSON_LOTE = int(os.getenv("GEOJSON_LOTE", 2000))
+LATITUD_MERCATOR = 85.05112878
+
+COLUMNAS_MAPA = ["id_medidor", "num_medidor", "latitud", "longitud", "activo", "asignado", "id_sector"]
+
+
+def _columnas_mapa():
+    return (
+        Medidor.id_medidor,
+        Medidor.num_medidor,
+        cast(Medidor.latitud, Float).label("latitud"),
+        cast(Medidor.longitud, Float).label("longitud"),
+        Medidor.activo,
+        Medidor.id_usuario_afi.isnot(None).label("asignado"),
+        Medidor.id_sector,
+    )
+
+
+def caja(min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    """box de Postgres con esquinas (lon, lat) para comparar con ubicacion_medidor"""
+    return func.box(func.point(min_lon, min_lat), func.point(max_lon, max_lat))
+
+
+def medidores_en_caja(
+    db: Session,
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+    id_sector: Optional[int] = None,
+    activo: Optional[bool] = None,
+    limite: int = 5000,
+) -> dict:
+    """Medidores dentro del rectángulo -> {columnas, filas, total, truncado}"""
+    stmt = select(*_columnas_mapa()).where(
+        ubicacion_medidor.op("<@")(caja(min_lat, min_lon, max_lat, max_lon))
+    )
+    if id_sector is not None:
+        stmt = stmt.where(Medidor.id_sector == id_sector)
+    if activo is not None:
+        stmt = stmt.where(Medidor.activo == activo)
+
+    filas = [tuple(fila) for fila in db.execute(stmt.limit(limite + 1))]
+    truncado = len(filas) > limite
+    filas = filas[:limite]
+    return {"columnas": COLUMNAS_MAPA, "filas": filas, "total": len(filas), "truncado": truncado}
+
+
+def medidores_cercanos(
+    db: Session,
+    latitud: float, longitud: float,
+    k: int = 10,
+    radio: Optional[float] = None,
+    id_sector: Optional[int] = None,
+    activo: Optional[bool] = True,
+) -> dict:
+    """Los k medidores más cercanos al punto (radio opcional en metros)"""
+    stmt = select(*_columnas_mapa())
+    if radio is not None:
+        # Prefiltro por el rectángulo que contiene el círculo (usa el mismo índice)
+        delta_lat = radio / METROS_POR_GRADO
+        delta_lon = radio / (METROS_POR_GRADO * max(math.cos(math.radians(latitud)), 1e-6))
+        stmt = stmt.where(ubicacion_medidor.op("<@")(
+            caja(latitud - delta_lat, longitud - delta_lon, latitud + delta_lat, longitud + delta_lon)
+        ))
+    if id_sector is not None:
+        stmt = stmt.where(Medidor.id_sector == id_sector)
+    if activo is not None:
+        stmt = stmt.where(Medidor.activo == activo)
+
+    # Candidatos de más: el orden en grados se distorsiona con la latitud
+    candidatos = max(3 * k, k + 20)
+    filas = db.execute(
+        stmt.order_by(ubicacion_medidor.op("<->")(func.point(longitud, latitud))).limit(candidatos)
+    ).all()
+
+    if filas:
+        distancias = distancia_metros(latitud, longitud, [f.latitud for f in filas], [f.longitud for f in filas])
+        orden = sorted(range(len(filas)), key=lambda i: distancias[i])
+        filas = [(tuple(filas[i]) + (round(float(distancias[i]), 1),)) for i in orden
+                 if radio is None or distancias[i] <= radio][:k]
+
+    return {"columnas": COLUMNAS_MAPA + ["distancia"], "filas": filas, "total": len(filas)}
+
+
+# ========================================
+# GEOJSON EN STREAMING
+# ========================================
+def _punto(id_medidor, num_medidor, latitud, longitud, activo, **extra) -> dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitud, latitud]},
+        "properties": {"id_medidor": id_medidor, "num_medidor": num_medidor, "activo": activo, **extra},
+    }
+
+
+def transmitir_geojson(
+    id_sector: Optional[int] = None,
+    activo: Optional[bool] = None,
+    session_factory=SessionLocal,
+) -> Iterator[bytes]:
+    """
+    FeatureCollection de los medidores con coordenadas, por bloques de bytes.
+    Abre su propia sesión: la respuesta se envía después de cerrar la del endpoint.
+    """
+    stmt = select(
+        Medidor.id_medidor,
+        Medidor.num_medidor,
+        cast(Medidor.latitud, Float),
+        cast(Medidor.longitud, Float),
+        Medidor.activo,
+        Medidor.id_sector,
+    ).where(Medidor.latitud.isnot(None), Medidor.longitud.isnot(None)).order_by(Medidor.id_medidor)
+    if id_sector is not None:
+        stmt = stmt.where(Medidor.id_sector == id_sector)
+    if activo is not None:
+        stmt = stmt.where(Medidor.activo == activo)
+
+    db = session_factory()
+    try:
+        yield b'{"type":"FeatureCollection","features":['
+        primero = True
+        resultado = db.execute(stmt.execution_options(yield_per=GEOJSON_LOTE))
+        for lote in resultado.partitions():
+            bloque = ",".join(
+                json.dumps(_punto(id_medidor, num, lat, lon, act, id_sector=sector), separators=(",", ":"))
+                for id_medidor, num, lat, lon, act, sector in lote
+            )
+            yield (bloque if primero else "," + bloque).encode()
+            primero = False
+        yield b"]}"
+    finally:
+        db.close()
+
+
+# ========================================
+# TESELAS
+# ========================================
+def limites_tesela(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) de la tesela"""
+    n = 2 ** z
+    latitud = lambda fila: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * fila / n))))
+    return latitud(y + 1), x / n * 360 - 180, latitud(y), (x + 1) / n * 360 - 180
+
+
+def tesela_de(latitud: float, longitud: float, z: int) -> Tuple[int, int]:
+    """Tesela (x, y) que contiene el punto en el zoom z"""
+    n = 2 ** z
+    latitud = max(min(float(latitud), LATITUD_MERCATOR), -LATITUD_MERCATOR)
+    radianes = math.radians(latitud)
+    x = int((float(longitud) + 180) / 360 * n)
+    y = int((1 - math.log(math.tan(radianes) + 1 / math.cos(radianes)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def generar_tesela(db: Session, z: int, x: int, y: int) -> Tuple[dict, int]:
+    """FeatureCollection de la tesela -> (geojson, medidores incluidos)"""
+    min_lat, min_lon, max_lat, max_lon = limites_tesela(z, x, y)
+    en_tesela = ubicacion_medidor.op("<@")(caja(min_lat, min_lon, max_lat, max_lon))
+
+    if z >= TESELA_ZOOM_DETALLE:
+        filas = db.execute(
+            select(Medidor.id_medidor, Medidor.num_medidor, cast(Medidor.latitud, Float),
+                   cast(Medidor.longitud, Float), Medidor.activo)
+            .where(en_tesela)
+        ).all()
+        features = [_punto(*fila) for fila in filas]
+        return {"type": "FeatureCollection", "features": features}, len(filas)
+
+    # Agrupación por celdas de píxeles en la propia base (pocas filas de vuelta)
+    escala = 2 ** z * 256 / TESELA_CELDA_PX
+    latitud = func.radians(cast(Medidor.latitud, Float), type_=Float)
+    mercator = func.ln(func.tan(latitud, type_=Float) + 1.0 / func.cos(latitud, type_=Float), type_=Float)
+    columna = cast(func.floor((cast(Medidor.longitud, Float) + 180.0) * (escala / 360)), Integer)
+    fila = cast(func.floor((1.0 - mercator / math.pi) * (escala / 2)), Integer)
+    grupos = db.execute(
+        select(
+            func.count(),
+            func.count().filter(Medidor.activo == True),
+            func.avg(cast(Medidor.latitud, Float)),
+            func.avg(cast(Medidor.longitud, Float)),
+            func.min(Medidor.id_medidor),
+            func.min(Medidor.num_medidor),
+        )
+        .where(en_tesela)
+        .group_by(columna, fila)
+    ).all()
+
+    features = []
+    for cantidad, activos, lat, lon, id_medidor, num_medidor in grupos:
+        if cantidad == 1:
+            features.append(_punto(id_medidor, num_medidor, lat, lon, bool(activos)))
+        else:
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"grupo": True, "cantidad": cantidad, "activos": activos},
+            })
+    return {"type": "FeatureCollection", "features": features}, sum(g[0] for g in grupos)
+
+
+def obtener_tesela(db: Session, z: int, x: int, y: int) -> TeselaMapa:
+    """Tesela guardada; si no existe (o se invalidó) se genera y se guarda"""
+    tesela = db.get(TeselaMapa, (z, x, y))
+    if tesela is not None:
+        return tesela
+
+    geojson, cantidad = generar_tesela(db, z, x, y)
+    contenido = json.dumps(geojson, separators=(",", ":")).encode()
+    valores = {
+        "z": z, "x": x, "y": y,
+        "contenido": gzip.compress(contenido, compresslevel=6, mtime=0),
+        "etag": hashlib.sha1(contenido).hexdigest(),
+        "num_medidores": cantidad,
+    }
+    db.execute(pg_insert(TeselaMapa).values(**valores).on_conflict_do_nothing())
+    db.commit()
+    return TeselaMapa(**valores)
+
+
+def invalidar_teselas(db: Session, coordenadas: Iterable[Tuple]) -> None:
+    """
+    Borra las teselas (todos los zoom) que contienen alguna de las coordenadas
+    (lat, lon). Llamar antes del commit del cambio del medidor.
+    """
+    claves = {
+        (z, *tesela_de(latitud, longitud, z))
+        for latitud, longitud in coordenadas
+        if latitud is not None and longitud is not None
+        for z in range(TESELA_ZOOM_MAX + 1)
+    }
+    if claves:
+        db.execute(delete(TeselaMapa).where(tuple_(TeselaMapa.z, TeselaMapa.x, TeselaMapa.y).in_(claves)))
+
+
+def precalcular_teselas(db: Session, zoom_max: int = TESELA_ZOOM_DETALLE - 1) -> int:
+    """Genera las teselas con medidores hasta zoom_max (después de una carga masiva)"""
+    latitud, longitud = db.execute(
+        select(func.array_agg(cast(Medidor.latitud, Float)), func.array_agg(cast(Medidor.longitud, Float)))
+        .where(Medidor.latitud.isnot(None), Medidor.longitud.isnot(None))
+    ).one()
+    if latitud is None:
+        return 0
+
+    # Posición en el mundo Mercator normalizado [0, 1): la tesela de cada zoom es floor(posición * 2^z)
+    radianes = np.radians(np.clip(np.asarray(latitud), -LATITUD_MERCATOR, LATITUD_MERCATOR))
+    mundo_x = (np.asarray(longitud) + 180) / 360
+    mundo_y = (1 - np.log(np.tan(radianes) + 1 / np.cos(radianes)) / math.pi) / 2
+
+    generadas = 0
+    for z in range(zoom_max + 1):
+        n = 2 ** z
+        ocupadas = np.unique(np.column_stack((
+            np.clip((mundo_x * n).astype(np.int64), 0, n - 1),
+            np.clip((mundo_y * n).astype(np.int64), 0, n - 1),
+        )), axis=0)
+        for x, y in ocupadas.tolist():
+            obtener_tesela(db, z, x, y)
+            generadas += 1
+        print(f"🗺️ Zoom {z}: {len(ocupadas)} teselas")
+    return generadas
+
+
+# ========================================
+# MIGRACIÓN
+# ========================================
+def migrar_coordenadas(db: Session) -> None:
+    """
+    Bases existentes: amplía latitud/longitud de Numeric(10,2) a Numeric(10,7),
+    crea el índice GiST de ubicación y la tabla de teselas. Hace commit.
+    """
+    db.execute(text("ALTER TABLE medidores.t_medidor ALTER COLUMN latitud TYPE NUMERIC(10, 7)"))
+    db.execute(text("ALTER TABLE medidores.t_medidor ALTER COLUMN longitud TYPE NUMERIC(10, 7)"))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medidor_ubicacion ON medidores.t_medidor "
+        "USING gist (point(CAST(longitud AS FLOAT), CAST(latitud AS FLOAT)))"
+    ))
+    TeselaMapa.__table__.create(db.connection(), checkfirst=True)
+    db.commit()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Uso: python -m services.meter_map --migrar      (una sola vez en bases existentes)
+    #      python -m services.meter_map --teselas [zoom_max]
+    db = SessionLocal()
+    try:
+        if "--migrar" in sys.argv:
+            migrar_coordenadas(db)
+            print("✅ Coordenadas de medidores migradas a Numeric(10,7) con índice GiST y tabla de teselas")
+        if "--teselas" in sys.argv:
+            argumentos = sys.argv[sys.argv.index("--teselas") + 1:]
+            zoom_max = int(argumentos[0]) if argumentos else TESELA_ZOOM_DETALLE - 1
+            print(f"✅ Teselas generadas: {precalcular_teselas(db, zoom_max)}")
+    finally:
+        db.close()
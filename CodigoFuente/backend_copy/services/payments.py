@@ -0,0 +1,458 @@
+# services/payments.py
+"""
+Registro de pagos en caja
+
+- Cada pago trae una clave de idempotencia generada por el cliente; el INSERT
+  usa ON CONFLICT DO NOTHING, así un doble clic o un reintento no cobra dos veces.
+- El lote completo (un pago o todo un cierre de caja) se inserta con un solo
+  INSERT, se suma al saldo materializado del afiliado y se aplica a las
+  facturas pendientes de la más antigua a la más nueva con una sola sentencia
+  (sin recorrer pagos ni facturas en Python), todo en la misma transacción.
+- El excedente de un pago queda como saldo a favor en t_saldo_afiliado; la
+  facturación lo descuenta de las facturas nuevas y registra esa aplicación
+  contra los pagos con excedente (aplicar_saldo_a_favor).
+"""
+from collections import defaultdict, deque, Counter
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import select, insert, update, func, case, and_, any_, bindparam, text, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from db.bulk import filas_unnest, insertar_filas
+from models.affiliate import UsuarioAfiliado
+from models.invoice import Factura
+from models.payment import Pago, PagoFactura, SaldoAfiliado, CierreCaja
+from services.balances import acumular_saldos, restar_pendientes, reconstruir_saldos
+from services.aging import sumar_deuda, eliminar_deuda_saldada
+
+COLUMNAS_PAGO = ("clave_idempotencia", "id_usuario_afi", "monto", "metodo", "referencia", "observacion", "id_cajero")
+
+
+def aplicar_a_facturas(db: Session, pagos: list) -> Counter:
+    """
+    Aplica los pagos (filas con id_pago, id_usuario_afi, monto) a las facturas
+    pendientes de cada afiliado, de la más antigua a la más nueva, con una
+    sola sentencia: cada pago cubre un tramo del acumulado de pagos del
+    afiliado y cada factura un tramo del acumulado de sus saldos; lo aplicado
+    es el cruce de los dos tramos. La misma sentencia registra t_pago_factura
+    y actualiza las facturas (bloqueadas con FOR UPDATE) y la deuda por
+    periodo. Los saldos ya deben estar bloqueados (acumular_saldos o
+    bloquear_saldos), el mismo orden que la facturación.
+    Retorna {id_usuario_afi: facturas que quedaron pagadas}.
+    """
+    ids_afiliado = sorted({pago.id_usuario_afi for pago in pagos})
+    lote = filas_unnest(
+        Pago.__table__,
+        ("id_pago", "id_usuario_afi", "monto"),
+        [{"id_pago": pago.id_pago, "id_usuario_afi": pago.id_usuario_afi, "monto": pago.monto} for pago in pagos],
+    )
+    acumulados = select(
+        lote,
+        func.sum(lote.c.monto).over(partition_by=lote.c.id_usuario_afi, order_by=lote.c.id_pago).label("hasta"),
+    ).cte("pagos")
+    pendientes = (
+        select(
+            Factura.id_factura,
+            Factura.id_usuario_afi,
+            Factura.saldo_pendiente,
+            Factura.periodo,
+            Factura.id_sector,
+            Factura.fecha_emision,
+        )
+        .where(
+            Factura.id_usuario_afi == any_(bindparam("ids_afiliado", ids_afiliado, type_=ARRAY(Integer))),
+            Factura.estado == "pendiente",
+            Factura.activo == True,
+            Factura.saldo_pendiente > 0,
+        )
+        .order_by(Factura.id_usuario_afi, Factura.periodo, Factura.id_factura)
+        .with_for_update()
+        .cte("pendientes")
+    )
+    facturas = select(
+        pendientes,
+        func.sum(pendientes.c.saldo_pendiente).over(
+            partition_by=pendientes.c.id_usuario_afi,
+            order_by=(pendientes.c.periodo, pendientes.c.id_factura),
+        ).label("hasta"),
+    ).cte("facturas")
+
+    # Tramos [hasta - monto, hasta) de pagos y facturas del mismo afiliado que se cruzan
+    p, f = acumulados.c, facturas.c
+    aplicaciones = (
+        select(
+            p.id_pago,
+            f.id_factura,
+            f.id_usuario_afi,
+            f.periodo,
+            f.id_sector,
+            f.fecha_emision,
+            f.saldo_pendiente,
+            (func.least(p.hasta, f.hasta) - func.greatest(p.hasta - p.monto, f.hasta - f.saldo_pendiente)).label("monto"),
+        )
+        .join_from(acumulados, facturas, and_(
+            f.id_usuario_afi == p.id_usuario_afi,
+            p.hasta - p.monto < f.hasta,
+            f.hasta - f.saldo_pendiente < p.hasta,
+        ))
+        .cte("aplicaciones")
+    )
+    a = aplicaciones.c
+    por_factura = (
+        select(
+            a.id_factura,
+            a.id_usuario_afi,
+            a.periodo,
+            func.max(a.id_sector).label("id_sector"),
+            func.min(func.date(a.fecha_emision)).label("fecha_emision"),
+            func.sum(a.monto).label("abono"),
+            (func.min(a.saldo_pendiente) - func.sum(a.monto)).label("saldo"),
+        )
+        .group_by(a.id_factura, a.id_usuario_afi, a.periodo)
+        .cte("por_factura")
+    )
+    pf = por_factura.c
+    registro = insert(PagoFactura.__table__).from_select(
+        ["id_pago", "id_factura", "monto"],
+        select(a.id_pago, a.id_factura, a.monto).order_by(a.id_pago, a.id_factura),
+    ).cte("registro")
+    tabla_facturas = Factura.__table__
+    facturas_actualizadas = (
+        update(tabla_facturas)
+        .where(tabla_facturas.c.id_factura == pf.id_factura)
+        .values(saldo_pendiente=pf.saldo, estado=case((pf.saldo == 0, "pagada"), else_="pendiente"))
+        .cte("facturas_actualizadas")
+    )
+    deuda = sumar_deuda(
+        select(
+            pf.id_usuario_afi,
+            pf.periodo,
+            func.max(pf.id_sector),
+            func.min(pf.fecha_emision),
+            -func.sum(pf.abono),
+            -func.count().filter(pf.saldo == 0),
+        )
+        .group_by(pf.id_usuario_afi, pf.periodo)
+        .order_by(pf.id_usuario_afi, pf.periodo)
+    ).cte("deuda")
+
+    # Los CTE que modifican tablas se ejecutan aunque la consulta final no los lea
+    pagadas = Counter(dict(db.execute(
+        select(pf.id_usuario_afi, func.count().filter(pf.saldo == 0))
+        .group_by(pf.id_usuario_afi)
+        .add_cte(registro, facturas_actualizadas, deuda)
+    ).all()))
+    eliminar_deuda_saldada(db, ids_afiliado)
+    return pagadas
+
+
+def aplicar_saldo_a_favor(db: Session, aplicaciones: list) -> None:
+    """
+    Registra en t_pago_factura el saldo a favor que la facturación descontó
+    de facturas nuevas: aplicaciones [(id_usuario_afi, id_factura, monto)] se
+    reparten entre los pagos con excedente del afiliado, del más antiguo al
+    más nuevo. El saldo del afiliado ya debe estar bloqueado (bloquear_saldos).
+    """
+    if not aplicaciones:
+        return
+
+    aplicado = (
+        select(func.coalesce(func.sum(PagoFactura.monto), 0))
+        .where(PagoFactura.id_pago == Pago.id_pago)
+        .scalar_subquery()
+    )
+    excedentes = db.execute(
+        select(Pago.id_pago, Pago.id_usuario_afi, (Pago.monto - aplicado).label("restante"))
+        .where(
+            Pago.id_usuario_afi.in_({id_usuario_afi for id_usuario_afi, _, _ in aplicaciones}),
+            Pago.activo == True,
+            Pago.monto > aplicado,
+        )
+        .order_by(Pago.id_usuario_afi, Pago.id_pago)
+    ).all()
+
+    colas = defaultdict(deque)
+    for pago in excedentes:
+        colas[pago.id_usuario_afi].append([pago.id_pago, pago.restante])
+
+    filas = []
+    for id_usuario_afi, id_factura, monto in aplicaciones:
+        restante = Decimal(monto)
+        cola = colas[id_usuario_afi]
+        while restante > 0 and cola:
+            pago = cola[0]
+            abono = min(restante, pago[1])
+            pago[1] -= abono
+            restante -= abono
+            filas.append({"id_pago": pago[0], "id_factura": id_factura, "monto": abono})
+            if pago[1] == 0:
+                cola.popleft()
+
+    if filas:
+        db.execute(insertar_filas(PagoFactura.__table__, ("id_pago", "id_factura", "monto"), filas))
+
+
+def registrar_pagos(db: Session, pagos: list, id_cajero: int, commit: bool = True, detalle: bool = True) -> dict:
+    """
+    Registra un lote de pagos (objetos con clave_idempotencia, id_usuario_afi,
+    monto, metodo, referencia y observacion). Los pagos cuya clave ya existe se
+    devuelven como duplicados sin volver a aplicarse. Con detalle=False el
+    resultado no trae la lista de pagos (lotes grandes: solo los conteos).
+    """
+    errores = []
+    ids_lote = {pago.id_usuario_afi for pago in pagos}
+    afiliados = set(db.execute(
+        select(UsuarioAfiliado.id_usuario_afi)
+        .where(UsuarioAfiliado.id_usuario_afi == any_(bindparam("ids_lote", list(ids_lote), type_=ARRAY(Integer))))
+    ).scalars())
+
+    filas = {}
+    for fila, pago in enumerate(pagos):
+        if pago.id_usuario_afi not in afiliados:
+            errores.append({"fila": fila, "clave_idempotencia": pago.clave_idempotencia, "error": "Afiliado no encontrado"})
+            continue
+        filas.setdefault(pago.clave_idempotencia, {
+            "clave_idempotencia": pago.clave_idempotencia,
+            "id_usuario_afi": pago.id_usuario_afi,
+            "monto": pago.monto,
+            "metodo": pago.metodo,
+            "referencia": pago.referencia,
+            "observacion": pago.observacion,
+            "id_cajero": id_cajero,
+        })
+
+    columnas = (
+        Pago.id_pago, Pago.clave_idempotencia, Pago.id_usuario_afi,
+        Pago.monto.label("monto"), Pago.metodo.label("metodo"), Pago.fecha_pago,
+    )
+    nuevos = []
+    if filas:
+        # Un solo INSERT ... SELECT FROM unnest(...) para todo el lote
+        stmt = (
+            insertar_filas(Pago.__table__, COLUMNAS_PAGO, list(filas.values()))
+            .on_conflict_do_nothing(index_elements=["clave_idempotencia"])
+            .returning(*columnas)
+        )
+        nuevos = sorted(db.execute(stmt).all(), key=lambda p: p.id_pago)
+
+    claves_nuevas = {pago.clave_idempotencia for pago in nuevos}
+    claves_duplicadas = [clave for clave in filas if clave not in claves_nuevas]
+    duplicados = db.execute(
+        select(*columnas).where(Pago.clave_idempotencia.in_(claves_duplicadas))
+    ).all() if claves_duplicadas else []
+
+    saldos = {}
+    if nuevos:
+        pagado = defaultdict(Decimal)
+        for pago in nuevos:
+            pagado[pago.id_usuario_afi] += pago.monto
+        # El upsert del saldo es el primer bloqueo (en orden de afiliado); luego las facturas
+        saldos = acumular_saldos(
+            db,
+            ((id_usuario_afi, {"total_pagado": monto}) for id_usuario_afi, monto in pagado.items()),
+            fecha_ultimo_pago=nuevos[0].fecha_pago,
+        )
+        pagadas = aplicar_a_facturas(db, nuevos)
+        restar_pendientes(db, pagadas)
+
+    faltantes = {pago.id_usuario_afi for pago in duplicados} - saldos.keys()
+    if faltantes:
+        saldos.update({
+            fila.id_usuario_afi: fila.saldo
+            for fila in db.execute(
+                select(SaldoAfiliado.id_usuario_afi, SaldoAfiliado.saldo)
+                .where(SaldoAfiliado.id_usuario_afi.in_(faltantes))
+            )
+        })
+
+    if commit:
+        db.commit()
+
+    resultado = [
+        {**pago._asdict(), "duplicado": duplicado, "saldo": saldos.get(pago.id_usuario_afi)}
+        for duplicado, grupo in ((False, nuevos), (True, duplicados))
+        for pago in grupo
+    ] if detalle else []
+    return {
+        "registrados": len(nuevos),
+        "duplicados": len(duplicados),
+        "rechazados": len(errores),
+        "monto_total": sum((pago.monto for pago in nuevos), Decimal(0)),
+        "pagos": resultado,
+        "errores": errores,
+    }
+
+
+def cerrar_caja(
+    db: Session,
+    id_cajero: int,
+    pagos: Optional[List] = None,
+    monto_declarado: Optional[Decimal] = None,
+    observacion: Optional[str] = None,
+    clave_idempotencia: Optional[str] = None,
+) -> tuple:
+    """
+    Registra los pagos pendientes de la caja (si vienen en lote) y cierra la
+    caja del cajero con todos sus pagos sin cierre, en una sola transacción.
+    Retorna (cierre, resumen_del_lote).
+    """
+    if clave_idempotencia:
+        cierre = db.query(CierreCaja).filter(CierreCaja.clave_idempotencia == clave_idempotencia).first()
+        if cierre:
+            return cierre, None
+
+    resumen = registrar_pagos(db, pagos, id_cajero, commit=False) if pagos else None
+
+    try:
+        cierre = CierreCaja(
+            id_cajero=id_cajero,
+            clave_idempotencia=clave_idempotencia,
+            monto_declarado=monto_declarado,
+            observacion=observacion,
+        )
+        db.add(cierre)
+        db.flush()
+
+        montos = db.execute(
+            update(Pago)
+            .where(Pago.id_cajero == id_cajero, Pago.id_cierre_caja.is_(None))
+            .values(id_cierre_caja=cierre.id_cierre_caja)
+            .returning(Pago.monto)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        cierre.num_pagos = len(montos)
+        cierre.monto_total = sum(montos, Decimal(0))
+        if monto_declarado is not None:
+            cierre.diferencia = Decimal(monto_declarado) - cierre.monto_total
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    db.refresh(cierre)
+    return cierre, resumen
+
+
+def migrar_pagos(db: Session) -> None:
+    """
+    Bases existentes: adapta facturacion.t_pagos al libro de pagos y crea
+    cierres de caja, aplicaciones y saldos. A cada pago anterior se le asigna
+    la clave 'migrado-<id_pago>' y un cierre "Pagos anteriores a la
+    migración" de su cajero. Los pagos activos se aplican a la factura que
+    tenían (hasta su total; el excedente queda como saldo a favor) y de ahí
+    sale saldo_pendiente. Falla si hay pagos sin monto o sin afiliado.
+    Hace commit.
+    """
+    for modelo in (CierreCaja, PagoFactura, SaldoAfiliado):
+        modelo.__table__.create(db.connection(), checkfirst=True)
+    db.execute(text("""
+        ALTER TABLE facturacion.t_pagos
+            ALTER COLUMN monto_pago TYPE NUMERIC(12, 2),
+            ADD COLUMN IF NOT EXISTS clave_idempotencia VARCHAR(64),
+            ADD COLUMN IF NOT EXISTS referencia VARCHAR(100),
+            ADD COLUMN IF NOT EXISTS id_cierre_caja INTEGER REFERENCES facturacion.t_cierre_caja (id_cierre_caja)
+    """))
+    db.execute(text("ALTER TABLE facturacion.t_factura ADD COLUMN IF NOT EXISTS saldo_pendiente NUMERIC(10, 2)"))
+
+    # El afiliado de un pago sin afiliado es el de su factura
+    db.execute(text("""
+        UPDATE facturacion.t_pagos p SET id_usuario_afi = f.id_usuario_afi
+        FROM facturacion.t_factura f
+        WHERE f.id_factura = p.id_factura AND p.id_usuario_afi IS NULL
+    """))
+    incompletos = db.execute(text("""
+        SELECT id_pago, id_factura FROM facturacion.t_pagos
+        WHERE monto_pago IS NULL OR id_usuario_afi IS NULL ORDER BY id_pago
+    """)).all()
+    if incompletos:
+        for id_pago, id_factura in incompletos:
+            print(f"⚠️ Pago {id_pago} (factura {id_factura}) sin monto o sin afiliado")
+        raise RuntimeError("Hay pagos sin monto o sin afiliado; corríjalos antes de migrar")
+
+    db.execute(text("""
+        UPDATE facturacion.t_pagos SET
+            clave_idempotencia = 'migrado-' || id_pago,
+            metodo_pago = coalesce(metodo_pago, 'efectivo'),
+            fecha_pago = coalesce(fecha_pago, fecha_anulacion, now()),
+            activo = coalesce(activo, true)
+        WHERE clave_idempotencia IS NULL
+    """))
+    db.execute(text("""
+        ALTER TABLE facturacion.t_pagos
+            ALTER COLUMN clave_idempotencia SET NOT NULL,
+            ALTER COLUMN monto_pago SET NOT NULL,
+            ALTER COLUMN metodo_pago SET NOT NULL,
+            ALTER COLUMN metodo_pago SET DEFAULT 'efectivo',
+            ALTER COLUMN fecha_pago SET NOT NULL,
+            ALTER COLUMN fecha_pago SET DEFAULT now(),
+            ALTER COLUMN activo SET NOT NULL,
+            ALTER COLUMN activo SET DEFAULT true,
+            ALTER COLUMN id_usuario_afi SET NOT NULL
+    """))
+    existe = db.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 't_pagos_clave_idempotencia_key'")).scalar()
+    if not existe:
+        db.execute(text(
+            "ALTER TABLE facturacion.t_pagos ADD CONSTRAINT t_pagos_clave_idempotencia_key UNIQUE (clave_idempotencia)"
+        ))
+    for columna in ("fecha_pago", "id_usuario_afi", "id_cajero", "id_cierre_caja"):
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_facturacion_t_pagos_{columna} ON facturacion.t_pagos ({columna})"))
+
+    # Un cierre por cajero con sus pagos anteriores: el primer cierre real no los arrastra
+    db.execute(text("""
+        INSERT INTO facturacion.t_cierre_caja (clave_idempotencia, id_cajero, fecha_cierre, num_pagos, monto_total, observacion)
+        SELECT 'migrado-cajero-' || id_cajero, id_cajero, max(fecha_pago),
+               count(*) FILTER (WHERE activo), coalesce(sum(monto_pago) FILTER (WHERE activo), 0),
+               'Pagos anteriores a la migración'
+        FROM facturacion.t_pagos
+        WHERE clave_idempotencia LIKE 'migrado-%' AND id_cierre_caja IS NULL AND id_cajero IS NOT NULL
+        GROUP BY id_cajero
+        ON CONFLICT (clave_idempotencia) DO NOTHING
+    """))
+    db.execute(text("""
+        UPDATE facturacion.t_pagos p SET id_cierre_caja = c.id_cierre_caja
+        FROM facturacion.t_cierre_caja c
+        WHERE c.clave_idempotencia = 'migrado-cajero-' || p.id_cajero
+          AND p.clave_idempotencia LIKE 'migrado-%' AND p.id_cierre_caja IS NULL
+    """))
+
+    # Aplicaciones: cada pago activo cubre su factura, en orden, hasta el total
+    db.execute(text("""
+        INSERT INTO facturacion.t_pago_factura (id_pago, id_factura, monto)
+        SELECT id_pago, id_factura, least(monto_pago, total - (acumulado - monto_pago))
+        FROM (
+            SELECT p.id_pago, p.id_factura, p.monto_pago, f.total,
+                   sum(p.monto_pago) OVER (PARTITION BY p.id_factura ORDER BY p.id_pago) AS acumulado
+            FROM facturacion.t_pagos p
+            JOIN facturacion.t_factura f ON f.id_factura = p.id_factura
+            WHERE p.activo AND p.clave_idempotencia LIKE 'migrado-%'
+              AND f.activo AND f.estado <> 'anulada'
+              AND NOT EXISTS (SELECT 1 FROM facturacion.t_pago_factura pf WHERE pf.id_pago = p.id_pago)
+        ) pagos
+        WHERE acumulado - monto_pago < total
+        ORDER BY id_pago
+    """))
+    db.execute(text("""
+        UPDATE facturacion.t_factura f SET
+            saldo_pendiente = CASE WHEN f.activo AND f.estado <> 'anulada'
+                                   THEN f.total - coalesce((SELECT sum(pf.monto) FROM facturacion.t_pago_factura pf
+                                                            WHERE pf.id_factura = f.id_factura), 0)
+                                   ELSE 0 END
+        WHERE f.saldo_pendiente IS NULL
+    """))
+    db.execute(text("""
+        UPDATE facturacion.t_factura SET estado = 'pagada'
+        WHERE estado = 'pendiente' AND saldo_pendiente = 0
+    """))
+    db.execute(text("""
+        ALTER TABLE facturacion.t_factura
+            ALTER COLUMN saldo_pendiente SET NOT NULL,
+            ALTER COLUMN saldo_pendiente SET DEFAULT 0
+    """))
+    db.commit()
+
+    # Saldo materializado desde facturas y pagos (el excedente queda a favor)
+    reconstruir_saldos(db)
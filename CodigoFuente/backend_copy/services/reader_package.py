@@ -0,0 +1,263 @@
+# services/reader_package.py
+"""
+Paquete de trabajo sin conexión para los lectores
+
+El dispositivo descarga, antes de salir al campo, los datos de su sector y
+periodo para validar las lecturas sin conexión:
+- medidores: activos del sector en el orden de la ruta de lectura.
+- afiliados: nombre y dirección de los dueños de esos medidores.
+- lecturas_previas: hasta dónde ya se facturó cada medidor (incluye el
+  ajuste pendiente de estimaciones), igual que al registrar la lectura.
+- rangos: consumo esperado (mediana ± ANOMALIA_Z desviaciones robustas),
+  los mismos límites que usa la detección de anomalías del servidor.
+
+Cada tabla sale de una sola consulta por conjunto. El paquete se guarda en
+disco (JSON comprimido en columnas + filas, o base SQLite) por sector y
+periodo; el nombre del archivo lleva el hash del contenido, que se usa como
+ETag. Se regenera al vencer PAQUETE_TTL o cuando cambian los medidores o las
+lecturas de periodos anteriores. Las lecturas tomadas vuelven por
+POST /readings/bulk.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import warnings
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.affiliate import UsuarioAfiliado
+from models.meter import Medidor
+from models.user import UsuarioSistema
+from services.anomalies import (
+    matriz_consumo, ANOMALIA_HISTORIA, ANOMALIA_MIN_HISTORIA, ANOMALIA_Z, ANOMALIA_MAD_MINIMO
+)
+from services.readings import lecturas_previas
+from services.routing import calcular_ruta
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PAQUETE_DIR = Path(os.getenv("PAQUETE_DIR", BASE_DIR / "paquetes"))
+PAQUETE_TTL = int(os.getenv("PAQUETE_TTL", 6 * 3600))  # segundos
+PAQUETE_VERSION = 1
+
+FORMATOS = {
+    "json": ("json.gz", "application/gzip"),
+    "sqlite": ("sqlite", "application/vnd.sqlite3"),
+}
+
+TABLAS = {
+    "medidores": [
+        ("id_medidor", "INTEGER PRIMARY KEY"), ("orden", "INTEGER"), ("num_medidor", "TEXT"),
+        ("latitud", "REAL"), ("longitud", "REAL"), ("id_usuario_afi", "INTEGER"),
+    ],
+    "afiliados": [
+        ("id_usuario_afi", "INTEGER PRIMARY KEY"), ("cod_usuario_afi", "INTEGER"),
+        ("nombres", "TEXT"), ("apellidos", "TEXT"), ("direccion", "TEXT"),
+    ],
+    "lecturas_previas": [
+        ("id_medidor", "INTEGER PRIMARY KEY"), ("lectura", "REAL"), ("estimada", "INTEGER"),
+    ],
+    "rangos": [
+        ("id_medidor", "INTEGER PRIMARY KEY"), ("mediana", "REAL"),
+        ("minimo", "REAL"), ("maximo", "REAL"), ("meses", "INTEGER"),
+    ],
+}
+
+
+# ========================================
+# CONTENIDO
+# ========================================
+def _valor(valor):
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+
+def rangos_consumo(db: Session, periodo: date, ids_medidor: list) -> list:
+    """[(id_medidor, mediana, minimo, maximo, meses)] de los medidores con historia suficiente"""
+    ids, consumo, _, _ = matriz_consumo(db, periodo, ANOMALIA_HISTORIA, ids_medidor)
+    historia = consumo[:, :-1]
+    meses = np.sum(~np.isnan(historia), axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # filas sin historia
+        mediana = np.nanmedian(historia, axis=1)
+        mad = np.nanmedian(np.abs(historia - mediana[:, None]), axis=1)
+
+    # |0.6745 * (x - mediana) / MAD| <= ANOMALIA_Z
+    margen = ANOMALIA_Z * np.maximum(mad, ANOMALIA_MAD_MINIMO) / 0.6745
+    minimo = np.maximum(mediana - margen, 0)
+    maximo = mediana + margen
+    return [
+        (int(ids[i]), round(float(mediana[i]), 2), round(float(minimo[i]), 2), round(float(maximo[i]), 2), int(meses[i]))
+        for i in np.flatnonzero(meses >= ANOMALIA_MIN_HISTORIA)
+    ]
+
+
+def construir_paquete(db: Session, id_sector: int, periodo: date) -> dict:
+    """Tablas del paquete -> {tabla: [filas]} (una consulta por tabla)"""
+    ruta = calcular_ruta(db, id_sector=id_sector)
+    orden = {medidor["id_medidor"]: medidor["orden"] for medidor in ruta["medidores"]}
+
+    medidores = db.execute(
+        select(Medidor.id_medidor, Medidor.num_medidor, Medidor.latitud, Medidor.longitud, Medidor.id_usuario_afi)
+        .where(Medidor.id_sector == id_sector, Medidor.activo == True)
+        .order_by(Medidor.id_medidor)
+    ).all()
+    ids_medidor = [m.id_medidor for m in medidores]
+
+    afiliados = db.execute(
+        select(
+            UsuarioAfiliado.id_usuario_afi,
+            UsuarioAfiliado.cod_usuario_afi,
+            UsuarioSistema.nombres,
+            UsuarioSistema.apellidos,
+            UsuarioSistema.direccion,
+        )
+        .join(UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema)
+        .join(Medidor, Medidor.id_usuario_afi == UsuarioAfiliado.id_usuario_afi)
+        .where(Medidor.id_sector == id_sector, Medidor.activo == True)
+        .order_by(UsuarioAfiliado.id_usuario_afi)
+    ).all()
+
+    previas = lecturas_previas(db, ids_medidor, periodo) if ids_medidor else {}
+
+    return {
+        "medidores": sorted(
+            [
+                (m.id_medidor, orden.get(m.id_medidor), m.num_medidor, _valor(m.latitud), _valor(m.longitud), m.id_usuario_afi)
+                for m in medidores
+            ],
+            # Orden de la ruta; los medidores sin coordenadas al final
+            key=lambda fila: (fila[1] is None, fila[1] or 0, fila[0])
+        ),
+        "afiliados": [tuple(a) for a in afiliados],
+        "lecturas_previas": [
+            (fila.id_medidor, _valor(fila.valor), int(bool(fila.estimada)))
+            for fila in sorted(previas.values(), key=lambda fila: fila.id_medidor)
+        ],
+        "rangos": rangos_consumo(db, periodo, ids_medidor) if ids_medidor else [],
+    }
+
+
+def _cabecera(id_sector: int, periodo: date) -> dict:
+    return {
+        "version": PAQUETE_VERSION,
+        "id_sector": id_sector,
+        "periodo": periodo.isoformat(),
+        "sincronizacion": "POST /readings/bulk",
+    }
+
+
+def paquete_json(id_sector: int, periodo: date, tablas: dict) -> bytes:
+    """JSON compacto (columnas + filas por tabla) comprimido con gzip"""
+    contenido = {
+        **_cabecera(id_sector, periodo),
+        "tablas": {
+            nombre: {"columnas": [columna for columna, _ in TABLAS[nombre]], "filas": filas}
+            for nombre, filas in tablas.items()
+        },
+    }
+    return gzip.compress(json.dumps(contenido, separators=(",", ":")).encode(), compresslevel=9, mtime=0)
+
+
+def paquete_sqlite(id_sector: int, periodo: date, tablas: dict, destino: Path) -> None:
+    """Base SQLite lista para abrir en el dispositivo"""
+    conexion = sqlite3.connect(destino)
+    try:
+        conexion.execute("CREATE TABLE paquete (clave TEXT PRIMARY KEY, valor TEXT)")
+        conexion.executemany("INSERT INTO paquete VALUES (?, ?)", [(k, str(v)) for k, v in _cabecera(id_sector, periodo).items()])
+        for nombre, filas in tablas.items():
+            columnas = TABLAS[nombre]
+            conexion.execute(f"CREATE TABLE {nombre} ({', '.join(f'{c} {t}' for c, t in columnas)})")
+            conexion.executemany(f"INSERT INTO {nombre} VALUES ({', '.join('?' * len(columnas))})", filas)
+        conexion.commit()
+        conexion.execute("VACUUM")
+    finally:
+        conexion.close()
+
+
+# ========================================
+# CACHÉ EN DISCO
+# ========================================
+def _prefijo(id_sector: int, periodo: date) -> str:
+    return f"{id_sector}_{periodo:%Y%m}_"
+
+
+def _vigente(id_sector: int, periodo: date, formato: str) -> Optional[Path]:
+    extension = FORMATOS[formato][0]
+    for archivo in PAQUETE_DIR.glob(f"{_prefijo(id_sector, periodo)}*.{extension}"):
+        try:
+            if time.time() - archivo.stat().st_mtime < PAQUETE_TTL:
+                return archivo
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _guardar(id_sector: int, periodo: date, formato: str, temporal: Path) -> Path:
+    """Renombra el archivo generado con el hash del contenido y borra versiones anteriores"""
+    extension = FORMATOS[formato][0]
+    huella = hashlib.sha1(temporal.read_bytes()).hexdigest()[:20]
+    destino = PAQUETE_DIR / f"{_prefijo(id_sector, periodo)}{huella}.{extension}"
+    os.replace(temporal, destino)
+    for anterior in PAQUETE_DIR.glob(f"{_prefijo(id_sector, periodo)}*.{extension}"):
+        if anterior != destino:
+            anterior.unlink(missing_ok=True)
+    return destino
+
+
+def obtener_paquete(db: Session, id_sector: int, periodo: date, formato: str = "json") -> Tuple[Path, str]:
+    """
+    Archivo del paquete del sector y periodo -> (ruta, hash del contenido).
+    Si no hay uno vigente se generan los dos formatos con las mismas consultas.
+    """
+    periodo = periodo.replace(day=1)
+    archivo = _vigente(id_sector, periodo, formato)
+    if archivo is None:
+        PAQUETE_DIR.mkdir(parents=True, exist_ok=True)
+        tablas = construir_paquete(db, id_sector, periodo)
+        # Nombre temporal único: varios procesos pueden generar a la vez
+        temporal = f".{_prefijo(id_sector, periodo)}{os.getpid()}_{time.monotonic_ns()}"
+
+        temporal_json = PAQUETE_DIR / f"{temporal}.json"
+        temporal_json.write_bytes(paquete_json(id_sector, periodo, tablas))
+        generados = {"json": _guardar(id_sector, periodo, "json", temporal_json)}
+
+        temporal_sqlite = PAQUETE_DIR / f"{temporal}.sqlite"
+        paquete_sqlite(id_sector, periodo, tablas, temporal_sqlite)
+        generados["sqlite"] = _guardar(id_sector, periodo, "sqlite", temporal_sqlite)
+
+        archivo = generados[formato]
+        print(f"📦 Paquete de lector sector {id_sector} {periodo:%m/%Y}: {len(tablas['medidores'])} medidores")
+
+    huella = archivo.name[len(_prefijo(id_sector, periodo)):].split(".", 1)[0]
+    return archivo, huella
+
+
+def invalidar_paquetes(id_sectores: Optional[Iterable[int]] = None, despues_de: Optional[date] = None) -> int:
+    """
+    Borra los paquetes guardados de los sectores indicados (todos si es None)
+    cuyos periodos son posteriores a despues_de (todos si es None).
+    Llamar después del commit del cambio.
+    """
+    if not PAQUETE_DIR.exists():
+        return 0
+    sectores = None if id_sectores is None else {str(s) for s in id_sectores if s is not None}
+    borrados = 0
+    for archivo in PAQUETE_DIR.iterdir():
+        partes = archivo.name.split("_")
+        if archivo.name.startswith(".") or len(partes) < 3:
+            continue
+        if sectores is not None and partes[0] not in sectores:
+            continue
+        if despues_de is not None and partes[1] <= f"{despues_de:%Y%m}":
+            continue
+        archivo.unlink(missing_ok=True)
+        borrados += 1
+    return borrados
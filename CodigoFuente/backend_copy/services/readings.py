@@ -0,0 +1,231 @@
+# services/readings.py
+"""
+Carga masiva de lecturas
+
+- Una consulta (DISTINCT ON) trae la lectura previa de todos los medidores del lote.
+- El consumo se calcula en memoria y las lecturas se insertan con un solo
+  INSERT ... ON CONFLICT (una lectura por medidor y periodo; reenviar la
+  misma lectura desde el dispositivo la actualiza mientras no esté
+  facturada: una lectura facturada, real o estimada, no se reemplaza).
+- En la misma transacción se actualizan los resúmenes mensuales de consumo.
+- Conciliación de estimaciones: si la lectura previa fue estimada y el medidor
+  marca menos de lo estimado, el consumo queda en cero y la diferencia pasa
+  como ajuste_estimacion a los meses siguientes.
+- La foto del medidor se sube antes (POST /blobs) y la lectura lleva su hash;
+  los hashes del lote se validan con una sola consulta.
+- Todos los periodos del lote se guardan en una sola transacción: si algo
+  falla no queda ninguna lectura a medias.
+- Después del commit se ejecuta la etapa de detección de anomalías del
+  periodo y se recalcula el agua no facturada de los periodos afectados. Si
+  el análisis falla las lecturas quedan guardadas (se repite con
+  POST /readings/analysis) y el resumen lo indica con analizado=False.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from sqlalchemy import select, exists, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models.invoice import Factura
+from models.meter import Medidor
+from models.reading import Lectura
+from services.anomalies import detectar_anomalias
+from services.blobs import blobs_existentes
+from services.water_loss import analizar_periodos
+from services import rollups
+
+
+def lecturas_previas(db: Session, ids_medidor: List[int], periodo) -> dict:
+    """
+    Última lectura anterior al periodo de cada medidor -> {id_medidor: fila}
+    fila.valor es la lectura hasta donde ya se facturó (lectura_actual más el
+    ajuste pendiente de estimaciones); fila.estimada indica si fue estimada.
+    """
+    filas = db.execute(
+        select(
+            Lectura.id_medidor,
+            (Lectura.lectura_actual + Lectura.ajuste_estimacion).label("valor"),
+            Lectura.ajuste_estimacion,
+            Lectura.estimada,
+        )
+        .where(Lectura.id_medidor.in_(ids_medidor), Lectura.periodo < periodo)
+        .distinct(Lectura.id_medidor)
+        .order_by(Lectura.id_medidor, Lectura.periodo.desc())
+    ).all()
+    return {fila.id_medidor: fila for fila in filas}
+
+
+def lecturas_existentes(db: Session, ids_medidor: List[int], periodo) -> dict:
+    """Lecturas ya registradas en el periodo (reenvíos) -> {id_medidor: fila(consumo, estimada, facturada)}"""
+    filas = db.execute(
+        select(
+            Lectura.id_medidor,
+            Lectura.consumo,
+            Lectura.estimada,
+            exists().where(Factura.id_lectura == Lectura.id_lectura).label("facturada"),
+        )
+        .where(Lectura.id_medidor.in_(ids_medidor), Lectura.periodo == periodo)
+    ).all()
+    return {fila.id_medidor: fila for fila in filas}
+
+
+def registrar_lecturas(db: Session, lecturas: list, id_lector: int = None, analizar: bool = True) -> dict:
+    """
+    Registra un lote de lecturas (objetos con id_medidor, periodo, lectura_actual,
+    fecha_lectura, observacion y foto_hash). Retorna un resumen con los errores por fila.
+    """
+    errores = []
+    por_periodo = defaultdict(list)
+
+    # Medidores existentes y activos del lote (una sola consulta)
+    ids_lote = list({l.id_medidor for l in lecturas})
+    activos = {
+        fila.id_medidor: fila
+        for fila in db.execute(
+            select(Medidor.id_medidor, Medidor.id_usuario_afi, Medidor.id_sector)
+            .where(Medidor.id_medidor.in_(ids_lote), Medidor.activo == True)
+        )
+    }
+
+    fotos = blobs_existentes(db, (l.foto_hash for l in lecturas))
+
+    primeras = {}  # (id_medidor, periodo) -> fila donde apareció primero
+    for fila, lectura in enumerate(lecturas):
+        if lectura.id_medidor not in activos:
+            errores.append({"fila": fila, "id_medidor": lectura.id_medidor, "error": "Medidor no encontrado o inactivo"})
+            continue
+        if lectura.foto_hash and lectura.foto_hash not in fotos:
+            errores.append({"fila": fila, "id_medidor": lectura.id_medidor, "error": "Foto no encontrada; súbala antes en /blobs"})
+            continue
+        periodo = lectura.periodo.replace(day=1)
+        primera = primeras.setdefault((lectura.id_medidor, periodo), fila)
+        if primera != fila:
+            errores.append({"fila": fila, "id_medidor": lectura.id_medidor, "error": f"Lectura duplicada en el lote (fila {primera})"})
+            continue
+        por_periodo[periodo].append((fila, lectura))
+
+    registradas = 0
+    registradas_por_periodo = {}
+    sectores = set()
+    for periodo, grupo in sorted(por_periodo.items()):
+        ids_medidor = [l.id_medidor for _, l in grupo]
+        previas = lecturas_previas(db, ids_medidor, periodo)
+        existentes = lecturas_existentes(db, ids_medidor, periodo)
+
+        filas = {}
+        for numero_fila, lectura in grupo:
+            existente = existentes.get(lectura.id_medidor)
+            if existente is not None and existente.facturada:
+                # La factura y el consumo guardado tienen que coincidir
+                errores.append({
+                    "fila": numero_fila,
+                    "id_medidor": lectura.id_medidor,
+                    "error": (
+                        "La lectura estimada del periodo ya fue facturada; registre la lectura en el periodo siguiente"
+                        if existente.estimada else
+                        "La lectura del periodo ya fue facturada; no se puede reemplazar"
+                    ),
+                })
+                continue
+
+            previa = previas.get(lectura.id_medidor)
+            anterior = previa.valor if previa is not None else None
+            actual = Decimal(lectura.lectura_actual)
+            ajuste = Decimal(0)
+            if anterior is None:
+                consumo = Decimal(0)
+            elif actual < anterior and (previa.estimada or previa.ajuste_estimacion > 0):
+                # Se estimó de más: no hay consumo y la diferencia queda a favor
+                consumo = Decimal(0)
+                ajuste = anterior - actual
+            else:
+                # Una diferencia negativa queda en cero y la marca el análisis de anomalías
+                consumo = max(Decimal(0), actual - anterior)
+            filas[lectura.id_medidor] = {
+                "id_medidor": lectura.id_medidor,
+                "periodo": periodo,
+                "fecha_lectura": lectura.fecha_lectura or datetime.now(),
+                "lectura_anterior": anterior,
+                "lectura_actual": actual,
+                "consumo": consumo,
+                "observacion": lectura.observacion,
+                "foto_hash": lectura.foto_hash,
+                "estimada": False,
+                "metodo_estimacion": None,
+                "ajuste_estimacion": ajuste,
+                "id_lector": id_lector,
+            }
+
+        if not filas:
+            continue
+
+        stmt = pg_insert(Lectura).values(list(filas.values()))
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_lectura_medidor_periodo",
+            set_={
+                "fecha_lectura": stmt.excluded.fecha_lectura,
+                "lectura_anterior": stmt.excluded.lectura_anterior,
+                "lectura_actual": stmt.excluded.lectura_actual,
+                "consumo": stmt.excluded.consumo,
+                "observacion": stmt.excluded.observacion,
+                # Un reenvío sin foto conserva la que ya tenía
+                "foto_hash": func.coalesce(stmt.excluded.foto_hash, Lectura.foto_hash),
+                "estimada": stmt.excluded.estimada,
+                "metodo_estimacion": stmt.excluded.metodo_estimacion,
+                "ajuste_estimacion": stmt.excluded.ajuste_estimacion,
+                "id_lector": stmt.excluded.id_lector,
+            }
+        )
+        db.execute(stmt)
+
+        # Resúmenes mensuales: solo la diferencia respecto a lo ya registrado
+        rollups.acumular(db, periodo, (
+            (
+                activos[id_medidor].id_usuario_afi,
+                activos[id_medidor].id_sector,
+                {
+                    "consumo": fila["consumo"] - (existentes[id_medidor].consumo if id_medidor in existentes else 0),
+                    "num_lecturas": 0 if id_medidor in existentes else 1,
+                },
+            )
+            for id_medidor, fila in filas.items()
+        ))
+
+        registradas += len(filas)
+        registradas_por_periodo[periodo] = list(filas)
+        sectores.update(activos[id_medidor].id_sector for id_medidor in filas)
+
+    db.commit()
+
+    analizado = True
+    if analizar and registradas_por_periodo:
+        analizado = analizar_lecturas(db, registradas_por_periodo, sectores)
+
+    return {
+        "registradas": registradas,
+        "rechazadas": len(errores),
+        "errores": errores,
+        "periodos": sorted(registradas_por_periodo),
+        "analizado": analizado,
+    }
+
+
+def analizar_lecturas(db: Session, ids_por_periodo: dict, sectores: set) -> bool:
+    """
+    Anomalías de las lecturas registradas ({periodo: [id_medidor]}) y agua no
+    facturada de sus periodos. Las lecturas ya están guardadas: un error se
+    informa y no se propaga. Retorna si el análisis terminó.
+    """
+    try:
+        for periodo, ids_medidor in ids_por_periodo.items():
+            detectar_anomalias(db, periodo, ids_medidor)
+        # El consumo facturable de los sectores cambió: el agua no facturada también
+        analizar_periodos(db, list(ids_por_periodo), sectores)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Lecturas guardadas sin análisis de anomalías: {e}")
+        return False
@@ -0,0 +1,398 @@
+# services/reconciliation.py
+"""
+Conciliación de archivos de pagos de bancos y recaudadores
+
+- El archivo (CSV o de ancho fijo) se lee línea por línea, sin cargarlo entero.
+- Antes de leerlo se arma en memoria un índice (diccionarios) de las facturas
+  abiertas por número de factura, secuencial, cédula y código de afiliado.
+- Cada línea se concilia en una sola pasada: primero coincidencia exacta y
+  luego aproximada (ceros a la izquierda, un dígito cambiado o dos dígitos
+  invertidos), que solo se acepta si el monto cuadra con la deuda del afiliado.
+- Los pagos conciliados se registran por bloques con registrar_pagos (clave de
+  idempotencia por línea: subir dos veces el mismo archivo no duplica pagos),
+  que inserta y aplica cada bloque con sentencias sobre conjuntos (unnest y
+  una sola sentencia para facturas, aplicaciones y deuda), sin ir pago por pago.
+"""
+import csv
+import hashlib
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, List, NamedTuple, Optional, TextIO
+
+from sqlalchemy import select, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from models.affiliate import UsuarioAfiliado
+from models.invoice import Factura
+from models.payment import Pago
+from models.user import UsuarioSistema
+from services.payments import registrar_pagos
+
+CONCILIACION_CHUNK = int(os.getenv("CONCILIACION_CHUNK", 5000))
+
+# Columnas del formato de ancho fijo: nombre:ancho,... (monto en centavos)
+ANCHO_FIJO = os.getenv("CONCILIACION_ANCHO_FIJO", "fecha:8,referencia:20,monto:12,transaccion:20")
+
+# Nombres de columna aceptados en los CSV de cada banco
+ALIAS_COLUMNAS = {
+    "referencia": ("referencia", "ref", "contrapartida", "codigo_pago"),
+    "num_factura": ("num_factura", "factura", "numero_factura", "nro_factura"),
+    "cod_usuario_afi": ("cod_usuario_afi", "codigo", "cod_afiliado", "codigo_afiliado"),
+    "cedula": ("cedula", "identificacion", "ruc", "ci"),
+    "monto": ("monto", "valor", "importe", "total"),
+    "fecha": ("fecha", "fecha_pago", "fecha_transaccion"),
+    "transaccion": ("transaccion", "id_transaccion", "comprobante", "secuencia", "documento"),
+}
+
+SOLO_DIGITOS = re.compile(r"\D")
+
+
+class PagoConciliado(NamedTuple):
+    """Pago listo para registrar_pagos"""
+    clave_idempotencia: str
+    id_usuario_afi: int
+    monto: Decimal
+    metodo: str
+    referencia: Optional[str]
+    observacion: Optional[str]
+
+
+@dataclass
+class LineaPago:
+    numero: int
+    texto: str
+    monto: Optional[Decimal] = None
+    referencia: str = ""
+    num_factura: str = ""
+    cod_usuario_afi: str = ""
+    cedula: str = ""
+    transaccion: str = ""
+    fecha: str = ""
+
+
+# ========================================
+# LECTURA DEL ARCHIVO
+# ========================================
+def _parsear_monto(valor: str, centavos: bool = False) -> Optional[Decimal]:
+    valor = (valor or "").strip().replace("$", "").replace(" ", "")
+    if not valor:
+        return None
+    if centavos and valor.isdigit():
+        return (Decimal(valor) / 100).quantize(Decimal("0.01"))
+    # 1.234,56 -> 1234.56 ; 1,234.56 -> 1234.56
+    if "," in valor and "." in valor:
+        valor = valor.replace(".", "").replace(",", ".") if valor.rfind(",") > valor.rfind(".") else valor.replace(",", "")
+    elif "," in valor:
+        valor = valor.replace(",", ".")
+    try:
+        return Decimal(valor).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+
+
+def leer_csv(archivo: TextIO) -> Iterator[LineaPago]:
+    """Lee un CSV con encabezado (separador detectado: , ; | o tabulador)"""
+    muestra = archivo.readline()
+    separador = max(",;|\t", key=muestra.count)
+    encabezado = [c.strip().lower().replace(" ", "_") for c in next(csv.reader([muestra], delimiter=separador))]
+
+    posiciones = {}
+    for campo, alias in ALIAS_COLUMNAS.items():
+        for nombre in alias:
+            if nombre in encabezado:
+                posiciones[campo] = encabezado.index(nombre)
+                break
+
+    for numero, fila in enumerate(csv.reader(archivo, delimiter=separador), start=2):
+        if not fila or not any(fila):
+            continue
+        linea = LineaPago(numero=numero, texto=separador.join(fila))
+        for campo, posicion in posiciones.items():
+            valor = fila[posicion].strip() if posicion < len(fila) else ""
+            if campo == "monto":
+                linea.monto = _parsear_monto(valor)
+            else:
+                setattr(linea, campo, valor)
+        yield linea
+
+
+def leer_ancho_fijo(archivo: TextIO, columnas: str = ANCHO_FIJO) -> Iterator[LineaPago]:
+    """Lee un archivo de ancho fijo según la definición nombre:ancho,..."""
+    cortes = []
+    inicio = 0
+    for columna in columnas.split(","):
+        nombre, ancho = columna.split(":")
+        cortes.append((nombre.strip(), inicio, inicio + int(ancho)))
+        inicio += int(ancho)
+
+    for numero, texto in enumerate(archivo, start=1):
+        texto = texto.rstrip("\r\n")
+        if not texto.strip():
+            continue
+        linea = LineaPago(numero=numero, texto=texto)
+        for nombre, desde, hasta in cortes:
+            valor = texto[desde:hasta].strip()
+            if nombre == "monto":
+                linea.monto = _parsear_monto(valor, centavos=True)
+            else:
+                setattr(linea, nombre, valor)
+        yield linea
+
+
+# ========================================
+# ÍNDICE DE FACTURAS ABIERTAS
+# ========================================
+def _indexar(indice: dict, clave, id_usuario_afi: int) -> None:
+    """Agrega la clave al índice; si apunta a dos afiliados queda en None (ambigua)"""
+    previo = indice.get(clave, id_usuario_afi)
+    indice[clave] = id_usuario_afi if previo == id_usuario_afi else None
+
+
+class IndiceFacturas:
+    """Diccionarios en memoria para conciliar sin consultar la base por línea"""
+
+    def __init__(self, db: Session):
+        self.por_factura = {}
+        self.por_secuencial = {}
+        self.por_cedula = {}
+        self.por_codigo = {}
+        self.deuda = {}
+        self.saldos_factura = {}
+
+        filas = db.execute(
+            select(
+                Factura.num_factura,
+                Factura.secuencial,
+                Factura.saldo_pendiente,
+                UsuarioAfiliado.id_usuario_afi,
+                UsuarioAfiliado.cod_usuario_afi,
+                UsuarioSistema.cedula,
+            )
+            .join(UsuarioAfiliado, UsuarioAfiliado.id_usuario_afi == Factura.id_usuario_afi)
+            .join(UsuarioSistema, UsuarioSistema.id_usuario_sistema == UsuarioAfiliado.id_usuario_sistema)
+            .where(Factura.estado == "pendiente", Factura.activo == True, Factura.saldo_pendiente > 0)
+        )
+
+        for num_factura, secuencial, saldo, id_usuario_afi, cod_usuario_afi, cedula in filas:
+            if num_factura:
+                self.por_factura[SOLO_DIGITOS.sub("", num_factura)] = id_usuario_afi
+            if secuencial is not None:
+                # Un mismo secuencial puede repetirse entre puntos de emisión
+                _indexar(self.por_secuencial, secuencial, id_usuario_afi)
+            # Una persona puede tener varias afiliaciones
+            _indexar(self.por_cedula, SOLO_DIGITOS.sub("", cedula or ""), id_usuario_afi)
+            self.por_codigo[cod_usuario_afi] = id_usuario_afi
+            self.deuda[id_usuario_afi] = self.deuda.get(id_usuario_afi, Decimal(0)) + saldo
+            self.saldos_factura.setdefault(id_usuario_afi, set()).add(saldo)
+
+    def __len__(self):
+        return len(self.deuda)
+
+    def exacta(self, linea: LineaPago) -> Optional[tuple]:
+        """Coincidencia exacta por factura, cédula o código -> (id_usuario_afi, criterio)"""
+        if linea.num_factura:
+            id_afi = self.por_factura.get(SOLO_DIGITOS.sub("", linea.num_factura))
+            if id_afi:
+                return id_afi, "num_factura"
+        if linea.cedula:
+            id_afi = self.por_cedula.get(SOLO_DIGITOS.sub("", linea.cedula))
+            if id_afi:
+                return id_afi, "cedula"
+        if linea.cod_usuario_afi.isdigit():
+            id_afi = self.por_codigo.get(int(linea.cod_usuario_afi))
+            if id_afi:
+                return id_afi, "cod_usuario_afi"
+
+        # Referencia genérica: puede ser cualquiera de las tres
+        referencia = SOLO_DIGITOS.sub("", linea.referencia)
+        if referencia:
+            for criterio, indice in (("num_factura", self.por_factura), ("cedula", self.por_cedula)):
+                id_afi = indice.get(referencia)
+                if id_afi:
+                    return id_afi, criterio
+            if len(referencia) <= 9:
+                id_afi = self.por_codigo.get(int(referencia))
+                if id_afi:
+                    return id_afi, "cod_usuario_afi"
+        return None
+
+    def _cuadra(self, id_usuario_afi: int, monto: Optional[Decimal]) -> bool:
+        return monto is not None and (
+            monto == self.deuda.get(id_usuario_afi) or monto in self.saldos_factura.get(id_usuario_afi, ())
+        )
+
+    def aproximada(self, linea: LineaPago) -> Optional[tuple]:
+        """
+        Coincidencia aproximada, aceptada solo si es única y el monto cuadra con
+        la deuda total o con una factura del afiliado.
+        """
+        candidatos = {}
+        valores = [SOLO_DIGITOS.sub("", v) for v in (linea.num_factura, linea.cedula, linea.cod_usuario_afi, linea.referencia)]
+
+        for valor in filter(None, valores):
+            sin_ceros = valor.lstrip("0")
+            # Número de factura sin punto de emisión, o con ceros de relleno del banco
+            if sin_ceros and len(sin_ceros) <= 9:
+                id_afi = self.por_secuencial.get(int(sin_ceros))
+                if id_afi:
+                    candidatos.setdefault(id_afi, "secuencial")
+                id_afi = self.por_codigo.get(int(sin_ceros))
+                if id_afi:
+                    candidatos.setdefault(id_afi, "cod_usuario_afi")
+            # Cédula sin el cero inicial (columnas numéricas en Excel)
+            if len(valor) == 9:
+                id_afi = self.por_cedula.get("0" + valor)
+                if id_afi:
+                    candidatos.setdefault(id_afi, "cedula")
+            if len(valor) == 10:
+                for variante in _variantes(valor):
+                    id_afi = self.por_cedula.get(variante)
+                    if id_afi:
+                        candidatos.setdefault(id_afi, "cedula_aproximada")
+
+        validos = [(id_afi, criterio) for id_afi, criterio in candidatos.items() if self._cuadra(id_afi, linea.monto)]
+        return validos[0] if len(validos) == 1 else None
+
+    def descontar(self, id_usuario_afi: int, monto: Decimal) -> None:
+        self.deuda[id_usuario_afi] = self.deuda.get(id_usuario_afi, Decimal(0)) - monto
+
+
+def _variantes(valor: str) -> Iterator[str]:
+    """Un dígito cambiado o dos dígitos contiguos invertidos"""
+    for i, digito in enumerate(valor):
+        for reemplazo in "0123456789":
+            if reemplazo != digito:
+                yield valor[:i] + reemplazo + valor[i + 1:]
+    for i in range(len(valor) - 1):
+        if valor[i] != valor[i + 1]:
+            yield valor[:i] + valor[i + 1] + valor[i] + valor[i + 2:]
+
+
+# ========================================
+# CONCILIACIÓN
+# ========================================
+def _contenido_linea(linea: LineaPago) -> str:
+    """Identificación, monto, fecha y referencia de la línea (sin su número ni el texto crudo)"""
+    monto = f"{linea.monto:.2f}" if linea.monto is not None else ""
+    return "|".join((linea.cod_usuario_afi, linea.cedula, linea.num_factura, linea.referencia, monto, linea.fecha))
+
+
+def _clave_linea(origen: str, linea: LineaPago, ocurrencia: int = 1) -> str:
+    """
+    Clave de idempotencia de la línea según su contenido, no su posición:
+    agregar o quitar líneas del archivo no cambia las claves de las demás.
+    Sin id de transacción, `ocurrencia` distingue pagos iguales del mismo
+    archivo (la segunda línea idéntica es otro pago, no un duplicado).
+    """
+    base = f"{origen}|{linea.transaccion}" if linea.transaccion else f"{origen}|{_contenido_linea(linea)}|{ocurrencia}"
+    return "conc-" + hashlib.sha256(base.encode("utf-8")).hexdigest()[:59]
+
+
+def conciliar_archivo(
+    db: Session,
+    lineas: Iterator[LineaPago],
+    id_cajero: int,
+    origen: str,
+    metodo: str = "deposito",
+    simular: bool = False,
+) -> dict:
+    """
+    Concilia las líneas contra las facturas abiertas y registra los pagos
+    conciliados en una sola transacción. Las líneas ya registradas en una carga
+    anterior se cuentan como duplicadas. Retorna el resumen y el reporte de
+    líneas no conciliadas.
+    """
+    inicio = datetime.now()
+    indice = IndiceFacturas(db)
+
+    no_conciliadas: List[dict] = []
+    por_criterio = {}
+    ocurrencias = Counter()  # contenido de línea sin transacción -> veces vista en el archivo
+    leidas = conciliadas = registrados = duplicados = 0
+    monto_conciliado = Decimal(0)
+
+    try:
+        while True:
+            bloque = list(islice(lineas, CONCILIACION_CHUNK))
+            if not bloque:
+                break
+            leidas += len(bloque)
+
+            claves = {}
+            for linea in bloque:
+                ocurrencia = 1
+                if not linea.transaccion:
+                    contenido = _contenido_linea(linea)
+                    ocurrencias[contenido] += 1
+                    ocurrencia = ocurrencias[contenido]
+                claves.setdefault(_clave_linea(origen, linea, ocurrencia), linea)
+
+            # Líneas ya registradas en una carga anterior del mismo archivo
+            existentes = set(db.execute(
+                select(Pago.clave_idempotencia)
+                .where(Pago.clave_idempotencia == any_(bindparam("claves", list(claves), type_=ARRAY(String))))
+            ).scalars())
+            # Un id de transacción repetido dentro del archivo también cuenta como duplicado
+            duplicados += len(existentes) + len(bloque) - len(claves)
+
+            pendientes: List[PagoConciliado] = []
+            for clave, linea in claves.items():
+                if clave in existentes:
+                    continue
+                if linea.monto is None or linea.monto <= 0:
+                    no_conciliadas.append({"linea": linea.numero, "texto": linea.texto, "motivo": "Monto inválido"})
+                    continue
+
+                coincidencia = indice.exacta(linea) or indice.aproximada(linea)
+                if not coincidencia:
+                    no_conciliadas.append({"linea": linea.numero, "texto": linea.texto, "motivo": "Sin coincidencia con facturas abiertas"})
+                    continue
+
+                id_usuario_afi, criterio = coincidencia
+                por_criterio[criterio] = por_criterio.get(criterio, 0) + 1
+                conciliadas += 1
+                monto_conciliado += linea.monto
+                indice.descontar(id_usuario_afi, linea.monto)
+
+                pendientes.append(PagoConciliado(
+                    clave_idempotencia=clave,
+                    id_usuario_afi=id_usuario_afi,
+                    monto=linea.monto,
+                    metodo=metodo,
+                    referencia=(linea.transaccion or linea.referencia or linea.num_factura)[:100] or None,
+                    observacion=f"Conciliación {origen} línea {linea.numero}"[:255],
+                ))
+
+            if pendientes and not simular:
+                resumen = registrar_pagos(db, pendientes, id_cajero, commit=False, detalle=False)
+                registrados += resumen["registrados"]
+                duplicados += resumen["duplicados"]
+
+        if simular:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "origen": origen,
+        "simulacion": simular,
+        "lineas": leidas,
+        "conciliadas": conciliadas,
+        "no_conciliadas": len(no_conciliadas),
+        "registrados": registrados,
+        "duplicados": duplicados,
+        "monto_conciliado": float(monto_conciliado),
+        "por_criterio": por_criterio,
+        "facturas_abiertas_afiliados": len(indice),
+        "segundos": round((datetime.now() - inicio).total_seconds(), 2),
+        "reporte": no_conciliadas,
+    }
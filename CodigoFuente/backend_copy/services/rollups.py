@@ -0,0 +1,126 @@
+# services/rollups.py
+"""
+Resúmenes mensuales de consumo y facturación
+
+Se actualizan de forma incremental (sumando diferencias con
+INSERT ... ON CONFLICT DO UPDATE) dentro de la misma transacción de la
+carga de lecturas y de la facturación. Los dashboards leen solo de aquí.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import select, delete, func, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models.consumption import ConsumoMensualAfiliado, ConsumoMensualSector
+from models.invoice import Factura
+from models.reading import Lectura
+from models.meter import Medidor
+
+CAMPOS = ("consumo", "num_lecturas", "monto_facturado", "num_facturas")
+
+
+def _acumular(db: Session, modelo, clave: str, periodo: date, totales: dict) -> None:
+    """Suma los totales {id: {campo: delta}} a las filas del periodo (un solo INSERT)"""
+    if not totales:
+        return
+
+    # Orden fijo de claves: dos transacciones concurrentes bloquean en el mismo orden
+    filas = [
+        {clave: id_, "periodo": periodo, **{campo: totales[id_].get(campo, 0) for campo in CAMPOS}}
+        for id_ in sorted(totales)
+    ]
+    tabla = modelo.__table__
+    stmt = pg_insert(modelo).values(filas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[clave, "periodo"],
+        set_={
+            **{campo: tabla.c[campo] + stmt.excluded[campo] for campo in CAMPOS},
+            "fecha_actualizacion": func.now(),
+        }
+    )
+    db.execute(stmt)
+
+
+def acumular(db: Session, periodo: date, movimientos: Iterable[tuple]) -> None:
+    """
+    Agrega movimientos (id_usuario_afi, id_sector, {campo: delta}) por afiliado
+    y por sector y los suma a los resúmenes del periodo. No hace commit.
+    """
+    por_afiliado = defaultdict(lambda: defaultdict(Decimal))
+    por_sector = defaultdict(lambda: defaultdict(Decimal))
+
+    for id_usuario_afi, id_sector, deltas in movimientos:
+        for campo, delta in deltas.items():
+            if id_usuario_afi is not None:
+                por_afiliado[id_usuario_afi][campo] += Decimal(delta)
+            if id_sector is not None:
+                por_sector[id_sector][campo] += Decimal(delta)
+
+    _acumular(db, ConsumoMensualAfiliado, "id_usuario_afi", periodo, por_afiliado)
+    _acumular(db, ConsumoMensualSector, "id_sector", periodo, por_sector)
+
+
+def reconstruir(db: Session, periodo: date) -> dict:
+    """
+    Recalcula desde cero los resúmenes de un periodo a partir de lecturas y facturas
+    (carga inicial o corrección). Hace commit.
+    """
+    db.execute(delete(ConsumoMensualAfiliado).where(ConsumoMensualAfiliado.periodo == periodo))
+    db.execute(delete(ConsumoMensualSector).where(ConsumoMensualSector.periodo == periodo))
+
+    lecturas = db.execute(
+        select(Medidor.id_usuario_afi, Medidor.id_sector, Lectura.consumo)
+        .join(Medidor, Medidor.id_medidor == Lectura.id_medidor)
+        .where(Lectura.periodo == periodo)
+    ).all()
+    facturas = db.execute(
+        select(Factura.id_usuario_afi, Factura.id_sector, Factura.total)
+        .where(Factura.periodo == periodo, Factura.activo == True, Factura.estado != "anulada")
+    ).all()
+
+    acumular(db, periodo, (
+        (fila.id_usuario_afi, fila.id_sector, {"consumo": fila.consumo, "num_lecturas": 1})
+        for fila in lecturas
+    ))
+    acumular(db, periodo, (
+        (fila.id_usuario_afi, fila.id_sector, {"monto_facturado": fila.total, "num_facturas": 1})
+        for fila in facturas
+    ))
+    db.commit()
+
+    return {"periodo": periodo.isoformat(), "lecturas": len(lecturas), "facturas": len(facturas)}
+
+
+def crear_resumenes(db: Session) -> None:
+    """
+    Bases existentes: crea las tablas de resúmenes mensuales y reconstruye
+    los periodos con lecturas o facturas que todavía no tienen resumen.
+    Hace commit (uno por periodo).
+    """
+    ConsumoMensualAfiliado.__table__.create(db.connection(), checkfirst=True)
+    ConsumoMensualSector.__table__.create(db.connection(), checkfirst=True)
+    db.commit()
+
+    periodos = set(db.execute(union(select(Lectura.periodo), select(Factura.periodo))).scalars())
+    periodos -= set(db.execute(
+        union(select(ConsumoMensualAfiliado.periodo), select(ConsumoMensualSector.periodo))
+    ).scalars())
+    for periodo in sorted(periodos):
+        print(f"📊 Resumen reconstruido: {reconstruir(db, periodo)}")
+
+
+if __name__ == "__main__":
+    import sys
+    from db.session import SessionLocal
+
+    # Uso: python -m services.rollups 2025-11-01 [2025-12-01 ...]
+    db = SessionLocal()
+    try:
+        for arg in sys.argv[1:]:
+            print(f"📊 Resumen reconstruido: {reconstruir(db, date.fromisoformat(arg).replace(day=1))}")
+    finally:
+        db.close()
@@ -0,0 +1,279 @@
+# services/routing.py
+"""
+Rutas de lectura a partir de las coordenadas de los medidores
+
+1. Una consulta trae los medidores activos del sector (o del polígono) con
+   coordenadas; se proyectan a metros (la altitud cuenta en la distancia).
+2. IndiceGrilla da los RUTA_VECINOS vecinos más cercanos de cada medidor.
+3. Ruta inicial por vecino más cercano (primero se buscan los vecinos de la
+   lista; solo si todos están visitados se recorre el resto con numpy).
+4. Mejora 2-opt sobre las listas de vecinos con cola de nodos pendientes
+   (don't-look bits): solo se revisan los medidores cuyos tramos cambiaron.
+
+La ruta es abierta (el lector no vuelve al punto de partida). El resultado
+se guarda en memoria con una clave que incluye los ids y coordenadas
+cargados, así cualquier cambio de medidores genera una ruta nueva.
+"""
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select, cast, Float
+from sqlalchemy.orm import Session
+
+from models.meter import Medidor, ubicacion_medidor
+from services.meter_map import caja
+from utils.spatial import IndiceGrilla, proyectar, dentro_poligono
+
+RUTA_VECINOS = int(os.getenv("RUTA_VECINOS", 10))
+RUTA_TIEMPO_MAXIMO = float(os.getenv("RUTA_TIEMPO_MAXIMO", 0.5))  # segundos para 2-opt
+RUTAS_CACHE_MAX = int(os.getenv("RUTAS_CACHE_MAX", 64))
+
+_cache_rutas: "OrderedDict[str, dict]" = OrderedDict()
+
+
+# ========================================
+# HEURÍSTICAS
+# ========================================
+def _vecino_mas_cercano(puntos: np.ndarray, vecinos: np.ndarray, inicio: int) -> np.ndarray:
+    """Ruta inicial: siempre al medidor no visitado más cercano"""
+    n = len(puntos)
+    visitado = np.zeros(n, dtype=bool)
+    ruta = np.empty(n, dtype=np.int64)
+    actual = inicio
+    for paso in range(n):
+        ruta[paso] = actual
+        visitado[actual] = True
+        if paso == n - 1:
+            break
+        siguiente = -1
+        for candidato in vecinos[actual]:
+            if not visitado[candidato]:
+                siguiente = candidato
+                break
+        if siguiente < 0:
+            distancias = np.sum((puntos - puntos[actual]) ** 2, axis=1)
+            distancias[visitado] = np.inf
+            siguiente = int(np.argmin(distancias))
+        actual = int(siguiente)
+    return ruta
+
+
+def _dos_opt(puntos: np.ndarray, vecinos: np.ndarray, ruta: np.ndarray, inicio_fijo: bool,
+             tiempo_maximo: float = RUTA_TIEMPO_MAXIMO) -> Tuple[np.ndarray, int]:
+    """
+    2-opt para ruta abierta sobre listas de vecinos. Dos variantes por nodo a:
+    - sucesores: quita (a, sig a) y (c, sig c), agrega (a, c) y (sig a, sig c)
+    - predecesores: quita (ant a, a) y (ant c, c), agrega (a, c) y (ant a, ant c)
+    Retorna (ruta, mejoras aplicadas).
+    """
+    n = len(ruta)
+    coordenadas = puntos.tolist()
+    lista_vecinos = vecinos.tolist()
+    ruta = ruta.copy()
+    posicion = np.empty(n, dtype=np.int64)
+    posicion[ruta] = np.arange(n)
+
+    def dist(a: int, b: int) -> float:
+        return math.dist(coordenadas[a], coordenadas[b])
+
+    pendientes = deque(ruta.tolist())
+    en_cola = np.ones(n, dtype=bool)
+    mejoras = 0
+    limite = time.perf_counter() + tiempo_maximo
+
+    while pendientes and time.perf_counter() < limite:
+        a = pendientes.popleft()
+        en_cola[a] = False
+        mejorado = True
+        while mejorado:
+            mejorado = False
+            i = int(posicion[a])
+
+            # Variante sucesores
+            if i < n - 1:
+                sig_a = int(ruta[i + 1])
+                d_a = dist(a, sig_a)
+                for c in lista_vecinos[a]:
+                    d_ac = dist(a, c)
+                    if d_ac >= d_a:
+                        continue
+                    j = int(posicion[c])
+                    if j == i + 1:
+                        continue
+                    sig_c = int(ruta[j + 1]) if j < n - 1 else -1
+                    if j < i and sig_c == a:
+                        continue
+                    ganancia = d_a - d_ac
+                    if sig_c >= 0:
+                        ganancia += dist(c, sig_c) - dist(sig_a, sig_c)
+                    if ganancia > 1e-9:
+                        menor, mayor = min(i, j), max(i, j)
+                        tramo = ruta[menor + 1:mayor + 1][::-1].copy()
+                        ruta[menor + 1:mayor + 1] = tramo
+                        posicion[tramo] = np.arange(menor + 1, mayor + 1)
+                        cambiados = (a, sig_a, c, sig_c)
+                        mejorado = True
+                        break
+
+            # Variante predecesores
+            if not mejorado and i > 0:
+                ant_a = int(ruta[i - 1])
+                d_a = dist(ant_a, a)
+                for c in lista_vecinos[a]:
+                    d_ac = dist(a, c)
+                    if d_ac >= d_a:
+                        continue
+                    j = int(posicion[c])
+                    if j == i - 1:
+                        continue
+                    ant_c = int(ruta[j - 1]) if j > 0 else -1
+                    if j > i and ant_c == a:
+                        continue
+                    if ant_c < 0 and inicio_fijo:
+                        continue
+                    ganancia = d_a - d_ac
+                    if ant_c >= 0:
+                        ganancia += dist(ant_c, c) - dist(ant_a, ant_c)
+                    if ganancia > 1e-9:
+                        menor, mayor = min(i, j), max(i, j)
+                        tramo = ruta[menor:mayor][::-1].copy()
+                        ruta[menor:mayor] = tramo
+                        posicion[tramo] = np.arange(menor, mayor)
+                        cambiados = (a, ant_a, c, ant_c)
+                        mejorado = True
+                        break
+
+            if mejorado:
+                mejoras += 1
+                for nodo in cambiados:
+                    if nodo >= 0 and not en_cola[nodo]:
+                        en_cola[nodo] = True
+                        pendientes.append(nodo)
+
+    return ruta, mejoras
+
+
+def largo_ruta(puntos: np.ndarray, ruta: np.ndarray) -> float:
+    """Distancia total en metros"""
+    if len(ruta) < 2:
+        return 0.0
+    return float(np.linalg.norm(np.diff(puntos[ruta], axis=0), axis=1).sum())
+
+
+def optimizar_ruta(puntos: np.ndarray, inicio: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, dict]:
+    """
+    Ordena los puntos (metros) en una ruta de recorrido.
+    inicio: punto (x, y) desde donde parte el lector; si no se indica, la ruta
+    arranca en el medidor más alejado del centro (un extremo del sector).
+    """
+    n = len(puntos)
+    if n == 0:
+        return np.arange(0), {"mejoras": 0, "largo_inicial": 0.0}
+
+    indice = IndiceGrilla(puntos)
+    vecinos = indice.vecinos(RUTA_VECINOS)
+
+    if inicio is not None:
+        primero = int(indice.cercanos(inicio, 1)[0][0])
+    else:
+        primero = int(np.argmax(np.sum((puntos[:, :2] - puntos[:, :2].mean(axis=0)) ** 2, axis=1)))
+
+    ruta = _vecino_mas_cercano(puntos, vecinos, primero)
+    largo_inicial = largo_ruta(puntos, ruta)
+    ruta, mejoras = _dos_opt(puntos, vecinos, ruta, inicio_fijo=inicio is not None)
+    return ruta, {"mejoras": mejoras, "largo_inicial": largo_inicial}
+
+
+# ========================================
+# RUTA DE LECTURA
+# ========================================
+def calcular_ruta(
+    db: Session,
+    id_sector: Optional[int] = None,
+    poligono: Optional[List[Tuple[float, float]]] = None,
+    inicio: Optional[Tuple[float, float]] = None,
+) -> dict:
+    """
+    Ruta de lectura de los medidores activos del sector y/o polígono
+    [(lat, lon), ...]. inicio: (lat, lon) del punto de partida del lector.
+    """
+    stmt = select(
+        Medidor.id_medidor,
+        Medidor.num_medidor,
+        cast(Medidor.latitud, Float).label("latitud"),
+        cast(Medidor.longitud, Float).label("longitud"),
+        cast(Medidor.altitud, Float).label("altitud"),
+    ).where(Medidor.activo == True).order_by(Medidor.id_medidor)
+    if id_sector is not None:
+        stmt = stmt.where(Medidor.id_sector == id_sector)
+    if poligono:
+        latitudes, longitudes = zip(*poligono)
+        stmt = stmt.where(ubicacion_medidor.op("<@")(
+            caja(min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+        ))
+    filas = db.execute(stmt).all()
+
+    con_coordenadas = [f for f in filas if f.latitud is not None and f.longitud is not None]
+    sin_coordenadas = [f.id_medidor for f in filas if f.latitud is None or f.longitud is None]
+    if poligono and con_coordenadas:
+        dentro = dentro_poligono([f.latitud for f in con_coordenadas], [f.longitud for f in con_coordenadas], poligono)
+        con_coordenadas = [f for f, d in zip(con_coordenadas, dentro) if d]
+        sin_coordenadas = []
+
+    latitud = np.array([f.latitud for f in con_coordenadas], dtype=np.float64)
+    longitud = np.array([f.longitud for f in con_coordenadas], dtype=np.float64)
+    altitud = np.array([np.nan if f.altitud is None else f.altitud for f in con_coordenadas], dtype=np.float64)
+
+    # Clave de caché: cualquier cambio de medidores (alta, baja, coordenadas) la cambia
+    huella = hashlib.sha1()
+    huella.update(np.array([f.id_medidor for f in con_coordenadas], dtype=np.int64).tobytes())
+    for arreglo in (latitud, longitud, altitud):
+        huella.update(arreglo.tobytes())
+    huella.update(repr(inicio).encode())
+    clave = huella.hexdigest()
+
+    if clave in _cache_rutas:
+        _cache_rutas.move_to_end(clave)
+        return {**_cache_rutas[clave], "desde_cache": True}
+
+    inicio_tiempo = time.perf_counter()
+    latitud_referencia = float(latitud.mean()) if len(latitud) else 0.0
+    puntos = proyectar(latitud, longitud, altitud, latitud_referencia=latitud_referencia)
+    punto_inicio = None
+    if inicio is not None and len(puntos):
+        punto_inicio = proyectar([inicio[0]], [inicio[1]], latitud_referencia=latitud_referencia)[0]
+
+    ruta, estadisticas = optimizar_ruta(puntos, punto_inicio)
+
+    tramos = np.linalg.norm(np.diff(puntos[ruta], axis=0), axis=1) if len(ruta) > 1 else np.empty(0)
+    acumulado = np.concatenate(([0.0], np.cumsum(tramos)))
+    resultado = {
+        "total_medidores": len(ruta),
+        "distancia_total": round(float(acumulado[-1]), 1),
+        "distancia_inicial": round(estadisticas["largo_inicial"], 1),
+        "mejoras_2opt": estadisticas["mejoras"],
+        "tiempo_calculo": round(time.perf_counter() - inicio_tiempo, 3),
+        "medidores": [
+            {
+                "orden": orden + 1,
+                "id_medidor": con_coordenadas[i].id_medidor,
+                "num_medidor": con_coordenadas[i].num_medidor,
+                "latitud": con_coordenadas[i].latitud,
+                "longitud": con_coordenadas[i].longitud,
+                "distancia_acumulada": round(float(acumulado[orden]), 1),
+            }
+            for orden, i in enumerate(ruta.tolist())
+        ],
+        "sin_coordenadas": sin_coordenadas,
+    }
+
+    _cache_rutas[clave] = resultado
+    while len(_cache_rutas) > RUTAS_CACHE_MAX:
+        _cache_rutas.popitem(last=False)
+
+    return {**resultado, "desde_cache": False}
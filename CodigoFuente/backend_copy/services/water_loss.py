@@ -0,0 +1,284 @@
+# services/water_loss.py
+"""
+Agua no facturada por sector
+
+- Los macromedidores miden el volumen que entra a cada sector por sus líneas
+  de distribución.
+- El análisis de un periodo trae en dos consultas (array_agg) los volúmenes de
+  los macromedidores y los consumos de los medidores de clientes de los últimos
+  PERDIDAS_MESES meses, los suma por sector y mes con np.bincount y calcula
+  pérdida, porcentaje, tendencia (pendiente en puntos por mes) y ranking.
+- El resultado se guarda en t_perdida_sector; el dashboard solo lee esa tabla.
+  Se recalcula al cargar lecturas de macromedidores o de clientes, al estimar
+  lecturas faltantes, a pedido o con python -m services.water_loss <periodo>.
+"""
+import os
+import warnings
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select, extract, cast, func, Float, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models.meter import Medidor
+from models.reading import Lectura
+from models.water_loss import MacroMedidor, LecturaMacro, PerdidaSector
+from services.anomalies import indice_mes
+
+PERDIDAS_MESES = int(os.getenv("PERDIDAS_MESES", 6))  # meses para la tendencia
+
+
+# ========================================
+# LECTURAS DE MACROMEDIDORES
+# ========================================
+def registrar_lecturas_macro(db: Session, lecturas: list, id_lector: int = None) -> dict:
+    """
+    Registra lecturas de macromedidores (objetos con id_macro_medidor, periodo,
+    lectura_actual, fecha_lectura y observacion). Reenviar una lectura del
+    mismo periodo la actualiza. Hace commit.
+    """
+    errores = []
+    activos = set(db.execute(
+        select(MacroMedidor.id_macro_medidor).where(
+            MacroMedidor.id_macro_medidor.in_({l.id_macro_medidor for l in lecturas}),
+            MacroMedidor.activo == True,
+        )
+    ).scalars())
+
+    filas = {}
+    for fila, lectura in enumerate(lecturas):
+        if lectura.id_macro_medidor not in activos:
+            errores.append({"fila": fila, "id_macro_medidor": lectura.id_macro_medidor, "error": "Macromedidor no encontrado o inactivo"})
+            continue
+        periodo = lectura.periodo.replace(day=1)
+        filas[(lectura.id_macro_medidor, periodo)] = lectura
+
+    if filas:
+        # Lecturas anteriores de los macromedidores del lote (una consulta; son
+        # pocas filas por mes) más las del propio lote
+        valores = {}
+        for fila in db.execute(
+            select(LecturaMacro.id_macro_medidor, LecturaMacro.periodo, LecturaMacro.lectura_actual)
+            .where(
+                LecturaMacro.id_macro_medidor.in_({id_macro for id_macro, _ in filas}),
+                LecturaMacro.periodo < max(periodo for _, periodo in filas),
+            )
+        ):
+            valores.setdefault(fila.id_macro_medidor, {})[fila.periodo] = fila.lectura_actual
+        for (id_macro, periodo), lectura in filas.items():
+            valores.setdefault(id_macro, {})[periodo] = Decimal(lectura.lectura_actual)
+
+        registros = []
+        for (id_macro, periodo), lectura in sorted(filas.items()):
+            anteriores = [p for p in valores[id_macro] if p < periodo]
+            anterior = valores[id_macro][max(anteriores)] if anteriores else None
+            actual = Decimal(lectura.lectura_actual)
+            registros.append({
+                "id_macro_medidor": id_macro,
+                "periodo": periodo,
+                "fecha_lectura": lectura.fecha_lectura or datetime.now(),
+                "lectura_anterior": anterior,
+                "lectura_actual": actual,
+                "volumen": max(Decimal(0), actual - anterior) if anterior is not None else Decimal(0),
+                "observacion": lectura.observacion,
+                "id_lector": id_lector,
+            })
+
+        tabla = LecturaMacro.__table__
+        stmt = pg_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_lectura_macro_periodo",
+            set_={
+                campo: stmt.excluded[campo]
+                for campo in ("fecha_lectura", "lectura_anterior", "lectura_actual", "volumen", "observacion", "id_lector")
+            }
+        )
+        db.execute(stmt, registros)
+        db.commit()
+
+    return {
+        "registradas": len(filas),
+        "rechazadas": len(errores),
+        "errores": errores,
+        "periodos": sorted({periodo for _, periodo in filas}),
+    }
+
+
+# ========================================
+# ANÁLISIS
+# ========================================
+def _sumar_por_sector(sectores: np.ndarray, fila_sector: np.ndarray, columna: np.ndarray, valores: np.ndarray, meses: int) -> np.ndarray:
+    """Suma valores en una matriz sectores x meses (np.bincount sobre el índice plano)"""
+    plano = fila_sector * meses + columna
+    return np.bincount(plano, weights=valores, minlength=len(sectores) * meses).reshape(len(sectores), meses)
+
+
+def calcular_tendencia(porcentaje: np.ndarray) -> np.ndarray:
+    """
+    Pendiente por mínimos cuadrados de cada fila (puntos porcentuales por mes),
+    ignorando meses sin dato. NaN si la fila tiene menos de dos puntos.
+    """
+    x = np.arange(porcentaje.shape[1], dtype=np.float64)
+    con_dato = ~np.isnan(porcentaje)
+    n = con_dato.sum(axis=1)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        x_media = (x * con_dato).sum(axis=1) / n
+        y_media = np.nanmean(porcentaje, axis=1)
+        dx = np.where(con_dato, x - x_media[:, None], 0)
+        dy = np.where(con_dato, porcentaje - y_media[:, None], 0)
+        pendiente = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    pendiente[n < 2] = np.nan
+    return pendiente
+
+
+def analizar_perdidas(db: Session, periodo: date, meses: int = PERDIDAS_MESES) -> dict:
+    """
+    Calcula el agua no facturada de todos los sectores con macromedidor en el
+    periodo y reemplaza el resultado guardado. Hace commit.
+    """
+    periodo = periodo.replace(day=1)
+    mes_final = indice_mes(periodo)
+    mes_inicial = mes_final - meses + 1
+    desde = date(mes_inicial // 12, mes_inicial % 12 + 1, 1)
+    mes_col = lambda columna: cast(extract("year", columna) * 12 + extract("month", columna) - 1, Integer)
+
+    sector_macro, mes_macro, volumen = db.execute(
+        select(
+            func.array_agg(MacroMedidor.id_sector),
+            func.array_agg(mes_col(LecturaMacro.periodo)),
+            func.array_agg(cast(LecturaMacro.volumen, Float)),
+        )
+        .join(MacroMedidor, MacroMedidor.id_macro_medidor == LecturaMacro.id_macro_medidor)
+        .where(LecturaMacro.periodo.between(desde, periodo))
+    ).one()
+    if sector_macro is None:
+        return {"periodo": periodo.isoformat(), "sectores": 0, "detalle": []}
+
+    sectores = np.unique(np.asarray(sector_macro, dtype=np.int64))
+
+    sector_cli, mes_cli, consumo, estimada = db.execute(
+        select(
+            func.array_agg(Medidor.id_sector),
+            func.array_agg(mes_col(Lectura.periodo)),
+            func.array_agg(cast(Lectura.consumo, Float)),
+            func.array_agg(Lectura.estimada),
+        )
+        .join(Medidor, Medidor.id_medidor == Lectura.id_medidor)
+        .where(Lectura.periodo.between(desde, periodo), Medidor.id_sector.in_(sectores.tolist()))
+    ).one()
+
+    def ubicar(sector_col, mes_col_valores):
+        fila = np.searchsorted(sectores, np.asarray(sector_col, dtype=np.int64))
+        columna = np.asarray(mes_col_valores, dtype=np.int64) - mes_inicial
+        return fila, columna
+
+    fila, columna = ubicar(sector_macro, mes_macro)
+    suministrado = _sumar_por_sector(sectores, fila, columna, np.asarray(volumen, dtype=np.float64), meses)
+    con_macro = _sumar_por_sector(sectores, fila, columna, np.ones(len(fila)), meses) > 0
+
+    if sector_cli is None:
+        consumido = np.zeros((len(sectores), meses))
+        lecturas = estimadas = np.zeros((len(sectores), meses))
+    else:
+        fila, columna = ubicar(sector_cli, mes_cli)
+        consumido = _sumar_por_sector(sectores, fila, columna, np.asarray(consumo, dtype=np.float64), meses)
+        lecturas = _sumar_por_sector(sectores, fila, columna, np.ones(len(fila)), meses)
+        estimadas = _sumar_por_sector(sectores, fila, columna, np.asarray(estimada, dtype=np.float64), meses)
+
+    perdido = suministrado - consumido
+    with np.errstate(invalid="ignore", divide="ignore"):
+        porcentaje = np.where(con_macro & (suministrado > 0), perdido / suministrado * 100, np.nan)
+    tendencia = calcular_tendencia(porcentaje)
+
+    # Ranking del periodo: mayor porcentaje de pérdida primero
+    actual = porcentaje[:, -1]
+    ranking = np.zeros(len(sectores), dtype=np.int64)
+    con_dato = np.flatnonzero(~np.isnan(actual))
+    ranking[con_dato[np.argsort(-actual[con_dato], kind="stable")]] = np.arange(1, len(con_dato) + 1)
+
+    redondear = lambda valor: None if np.isnan(valor) else Decimal(str(round(float(valor), 2)))
+    filas = [
+        {
+            "id_sector": int(sectores[i]),
+            "periodo": periodo,
+            "volumen_suministrado": redondear(suministrado[i, -1]),
+            "volumen_consumido": redondear(consumido[i, -1]),
+            "volumen_perdido": redondear(perdido[i, -1]),
+            "porcentaje_perdida": redondear(actual[i]),
+            "tendencia": redondear(tendencia[i]),
+            "ranking": int(ranking[i]) or None,
+            "num_medidores": int(lecturas[i, -1]),
+            "num_estimadas": int(estimadas[i, -1]),
+            "fecha_calculo": datetime.now(),
+        }
+        for i in range(len(sectores))
+        if con_macro[i, -1] or lecturas[i, -1]
+    ]
+
+    tabla = PerdidaSector.__table__
+    db.execute(tabla.delete().where(tabla.c.periodo == periodo))
+    if filas:
+        db.execute(pg_insert(tabla), filas)
+    db.commit()
+
+    print(f"💧 Agua no facturada {periodo:%m/%Y}: {len(filas)} sectores analizados")
+    return {
+        "periodo": periodo.isoformat(),
+        "sectores": len(filas),
+        "detalle": sorted(filas, key=lambda f: (f["ranking"] is None, f["ranking"] or 0)),
+    }
+
+
+def analizar_periodos(db: Session, periodos: List[date], sectores: Optional[Iterable[int]] = None) -> None:
+    """
+    Recalcula el análisis de los periodos (después de cargar lecturas) y de los
+    ya analizados cuya tendencia incluye alguno de ellos (los PERDIDAS_MESES - 1
+    siguientes). Con sectores (lecturas de clientes) solo recalcula si alguno
+    tiene macromedidor: los demás sectores no entran en el análisis. El
+    ranking compara todos los sectores, así que se recalcula el periodo entero.
+    """
+    periodos = {periodo.replace(day=1) for periodo in periodos}
+    if not periodos:
+        return
+    if sectores is not None:
+        sectores = set(sectores)
+        if not sectores or not db.execute(
+            select(MacroMedidor.id_macro_medidor)
+            .where(MacroMedidor.id_sector.in_(sectores))
+            .limit(1)
+        ).first():
+            return
+
+    primero = min(periodos)
+    mes_limite = indice_mes(max(periodos)) + PERDIDAS_MESES - 1
+    limite = date(mes_limite // 12, mes_limite % 12 + 1, 1)
+    periodos.update(db.execute(
+        select(PerdidaSector.periodo).distinct()
+        .where(PerdidaSector.periodo > primero, PerdidaSector.periodo <= limite)
+    ).scalars())
+
+    for periodo in sorted(periodos):
+        analizar_perdidas(db, periodo)
+
+
+def crear_tablas_perdidas(db: Session) -> None:
+    """Bases existentes: crea macromedidores, sus lecturas y t_perdida_sector. Hace commit."""
+    for modelo in (MacroMedidor, LecturaMacro, PerdidaSector):
+        modelo.__table__.create(db.connection(), checkfirst=True)
+    db.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    from db.session import SessionLocal
+
+    # Uso: python -m services.water_loss 2025-11-01 [2025-12-01 ...]
+    db = SessionLocal()
+    try:
+        analizar_periodos(db, [date.fromisoformat(arg) for arg in sys.argv[1:]])
+    finally:
+        db.close()
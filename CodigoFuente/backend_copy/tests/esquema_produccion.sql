@@ -0,0 +1,511 @@
+-- Esquema de la base de producción antes de la migración (solo estructura),
+-- tomado de backups/jaap_sanjapamba_2025-11-09_21-34.dump (PostgreSQL 17).
+-- Lo usa tests/test_migraciones.py para probar python -m db.migrations.
+-- Sin la extensión pgcrypto: ninguna tabla la usa.
+
+CREATE SCHEMA auditoria;
+
+CREATE SCHEMA facturacion;
+
+CREATE SCHEMA medidores;
+
+CREATE SCHEMA multas;
+
+CREATE SCHEMA notificaciones;
+
+CREATE SCHEMA seguridad;
+
+CREATE SCHEMA usuarios;
+
+CREATE TABLE auditoria.t_auditoria_sistema (
+    id_auditoria_sistema integer NOT NULL,
+    fecha timestamp without time zone DEFAULT now() NOT NULL,
+    accion character varying(100) NOT NULL,
+    descripcion text,
+    id_usuario_sistema integer
+);
+
+CREATE SEQUENCE auditoria.t_auditoria_sistema_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE auditoria.t_auditoria_sistema_id_seq OWNED BY auditoria.t_auditoria_sistema.id_auditoria_sistema;
+
+CREATE TABLE facturacion.t_detalle_factura (
+    id_detalle integer NOT NULL,
+    id_factura integer,
+    id_servicio integer,
+    subtotal_detalle numeric(10,2),
+    total_pagar numeric(10,2),
+    descripcion text
+);
+
+CREATE TABLE facturacion.t_factura (
+    id_factura integer NOT NULL,
+    num_factura character varying(50),
+    id_usuario_afi integer,
+    id_lectura integer,
+    consumo_m3 integer,
+    valor_consumo numeric(10,2),
+    valor_exceso numeric(10,2),
+    descuento numeric(10,2),
+    subtotal numeric(10,2),
+    impuesto numeric(10,2),
+    total numeric(10,2),
+    fecha_emision date,
+    exceso_m3 integer,
+    activo boolean
+);
+
+CREATE SEQUENCE facturacion.t_factura_cod_factura_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE facturacion.t_factura_cod_factura_seq OWNED BY facturacion.t_factura.id_factura;
+
+CREATE SEQUENCE facturacion.t_factura_servicio_cod_factura_servicio_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE facturacion.t_factura_servicio_cod_factura_servicio_seq OWNED BY facturacion.t_detalle_factura.id_detalle;
+
+CREATE TABLE facturacion.t_pagos (
+    id_pago integer NOT NULL,
+    id_factura integer,
+    monto_pago numeric(10,2),
+    fecha_pago timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    metodo_pago character varying(50),
+    id_usuario_afi integer,
+    id_cajero integer,
+    observaciones text,
+    motivo_anulacion character varying(200),
+    fecha_anulacion timestamp with time zone,
+    activo boolean
+);
+
+CREATE SEQUENCE facturacion.t_pagos_cod_pago_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE facturacion.t_pagos_cod_pago_seq OWNED BY facturacion.t_pagos.id_pago;
+
+CREATE TABLE facturacion.t_tarifa (
+    id_tarifa integer NOT NULL,
+    nombre character varying(100),
+    detalle text,
+    precio_por_m3 integer,
+    limite_min_m3 integer,
+    limite_max_m3 integer,
+    tipo_tarifa character varying(50),
+    fecha_creacion timestamp without time zone,
+    activo boolean
+);
+
+CREATE SEQUENCE facturacion.t_tarifa_cod_tarifa_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE facturacion.t_tarifa_cod_tarifa_seq OWNED BY facturacion.t_tarifa.id_tarifa;
+
+CREATE TABLE medidores.t_lecturas (
+    id_lectura integer NOT NULL,
+    id_medidor integer,
+    lectura_actual integer,
+    lectura_anterior integer,
+    consumo_m3 integer,
+    fecha_lectura date,
+    id_lector integer,
+    observacion text,
+    activo boolean
+);
+
+CREATE SEQUENCE medidores.t_lecturas_cod_lectura_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE medidores.t_lecturas_cod_lectura_seq OWNED BY medidores.t_lecturas.id_lectura;
+
+CREATE TABLE medidores.t_medidor (
+    id_medidor integer NOT NULL,
+    num_medidor character varying(50),
+    id_usuario_afi integer,
+    id_sector integer,
+    latitud numeric(10,2),
+    longitud numeric(10,2),
+    altitud numeric(10,2),
+    activo boolean
+);
+
+CREATE SEQUENCE medidores.t_medidor_cod_medidor_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE medidores.t_medidor_cod_medidor_seq OWNED BY medidores.t_medidor.id_medidor;
+
+CREATE TABLE medidores.t_sector (
+    id_sector integer NOT NULL,
+    nombre_sector character varying(100),
+    descripcion text,
+    activo boolean
+);
+
+CREATE SEQUENCE medidores.t_sector_cod_sector_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE medidores.t_sector_cod_sector_seq OWNED BY medidores.t_sector.id_sector;
+
+CREATE TABLE medidores.t_servicios (
+    id_servicio integer NOT NULL,
+    nombre character varying(100),
+    descripcion text,
+    precio_base numeric(10,2),
+    activo boolean
+);
+
+CREATE SEQUENCE medidores.t_servicios_cod_servicio_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE medidores.t_servicios_cod_servicio_seq OWNED BY medidores.t_servicios.id_servicio;
+
+CREATE TABLE multas.t_multa (
+    id_tipo_multa integer NOT NULL,
+    nombre_multa character varying(100) NOT NULL,
+    descripcion text,
+    monto numeric(10,2),
+    activo boolean DEFAULT true
+);
+
+CREATE SEQUENCE multas.t_multa_cod_tipo_multa_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE multas.t_multa_cod_tipo_multa_seq OWNED BY multas.t_multa.id_tipo_multa;
+
+CREATE TABLE multas.t_multas_usuario (
+    id_multa_usuario integer NOT NULL,
+    id_usuario_afi integer NOT NULL,
+    id_tipo_multa integer NOT NULL,
+    monto numeric(10,2) NOT NULL,
+    fecha_multa date DEFAULT CURRENT_DATE NOT NULL,
+    fecha_pago date,
+    observaciones text,
+    activo boolean
+);
+
+CREATE SEQUENCE multas.t_multas_usuario_cod_multa_usuario_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE multas.t_multas_usuario_cod_multa_usuario_seq OWNED BY multas.t_multas_usuario.id_multa_usuario;
+
+CREATE TABLE notificaciones.t_notificaciones (
+    id_notificacion integer NOT NULL,
+    id_usuario_sistema integer,
+    titulo character varying(100),
+    mensaje text,
+    tipo character varying(50),
+    estado character varying(20),
+    fecha_creacion timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    fecha_leido timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE SEQUENCE notificaciones.t_notificaciones_cod_notificacion_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE notificaciones.t_notificaciones_cod_notificacion_seq OWNED BY notificaciones.t_notificaciones.id_notificacion;
+
+CREATE SEQUENCE public.usuarios_id_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+CREATE TABLE seguridad.t_rol_acciones (
+    id_rol_accion integer NOT NULL,
+    id_rol integer NOT NULL,
+    nombre_accion character varying(100) NOT NULL,
+    tipo_accion character varying(20),
+    activo boolean DEFAULT true,
+    fecha_asignacion timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE SEQUENCE seguridad.t_rol_acciones_id_rol_accion_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE seguridad.t_rol_acciones_id_rol_accion_seq OWNED BY seguridad.t_rol_acciones.id_rol_accion;
+
+CREATE TABLE seguridad.t_roles (
+    id_rol integer NOT NULL,
+    nombre_rol character varying(50) NOT NULL,
+    descripcion text,
+    activo boolean DEFAULT true,
+    fecha_creacion timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE SEQUENCE seguridad.t_roles_id_rol_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE seguridad.t_roles_id_rol_seq OWNED BY seguridad.t_roles.id_rol;
+
+CREATE TABLE usuarios.t_usuario_afiliado (
+    id_usuario_afi integer NOT NULL,
+    fecha_afiliacion date,
+    id_sector integer NOT NULL,
+    id_usuario_sistema integer NOT NULL,
+    activo boolean,
+    cod_usuario_afi integer NOT NULL
+);
+
+CREATE SEQUENCE usuarios.t_usuario_afiliado_cod_usuario_afi_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE usuarios.t_usuario_afiliado_cod_usuario_afi_seq OWNED BY usuarios.t_usuario_afiliado.id_usuario_afi;
+
+CREATE TABLE usuarios.t_usuario_sistema (
+    id_usuario_sistema integer NOT NULL,
+    usuario character varying(15) NOT NULL,
+    clave text NOT NULL,
+    nombres character varying(100),
+    apellidos character varying(100),
+    cedula character varying(10),
+    email character varying(50),
+    fecha_registro timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    foto bytea,
+    telefono character varying(10),
+    direccion character varying(255),
+    activo boolean DEFAULT true,
+    sexo character varying(10),
+    fecha_nac timestamp without time zone,
+    intentos_fallidos integer DEFAULT 0,
+    bloqueado_hasta timestamp without time zone,
+    bloqueado_permanente boolean DEFAULT false,
+    ultimo_acceso timestamp without time zone,
+    id_rol integer
+);
+
+CREATE SEQUENCE usuarios.t_usuario_sistema_cod_usuario_sistema_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+ALTER SEQUENCE usuarios.t_usuario_sistema_cod_usuario_sistema_seq OWNED BY usuarios.t_usuario_sistema.id_usuario_sistema;
+
+ALTER TABLE ONLY auditoria.t_auditoria_sistema ALTER COLUMN id_auditoria_sistema SET DEFAULT nextval('auditoria.t_auditoria_sistema_id_seq'::regclass);
+
+ALTER TABLE ONLY facturacion.t_detalle_factura ALTER COLUMN id_detalle SET DEFAULT nextval('facturacion.t_factura_servicio_cod_factura_servicio_seq'::regclass);
+
+ALTER TABLE ONLY facturacion.t_factura ALTER COLUMN id_factura SET DEFAULT nextval('facturacion.t_factura_cod_factura_seq'::regclass);
+
+ALTER TABLE ONLY facturacion.t_pagos ALTER COLUMN id_pago SET DEFAULT nextval('facturacion.t_pagos_cod_pago_seq'::regclass);
+
+ALTER TABLE ONLY facturacion.t_tarifa ALTER COLUMN id_tarifa SET DEFAULT nextval('facturacion.t_tarifa_cod_tarifa_seq'::regclass);
+
+ALTER TABLE ONLY medidores.t_lecturas ALTER COLUMN id_lectura SET DEFAULT nextval('medidores.t_lecturas_cod_lectura_seq'::regclass);
+
+ALTER TABLE ONLY medidores.t_medidor ALTER COLUMN id_medidor SET DEFAULT nextval('medidores.t_medidor_cod_medidor_seq'::regclass);
+
+ALTER TABLE ONLY medidores.t_sector ALTER COLUMN id_sector SET DEFAULT nextval('medidores.t_sector_cod_sector_seq'::regclass);
+
+ALTER TABLE ONLY medidores.t_servicios ALTER COLUMN id_servicio SET DEFAULT nextval('medidores.t_servicios_cod_servicio_seq'::regclass);
+
+ALTER TABLE ONLY multas.t_multa ALTER COLUMN id_tipo_multa SET DEFAULT nextval('multas.t_multa_cod_tipo_multa_seq'::regclass);
+
+ALTER TABLE ONLY multas.t_multas_usuario ALTER COLUMN id_multa_usuario SET DEFAULT nextval('multas.t_multas_usuario_cod_multa_usuario_seq'::regclass);
+
+ALTER TABLE ONLY notificaciones.t_notificaciones ALTER COLUMN id_notificacion SET DEFAULT nextval('notificaciones.t_notificaciones_cod_notificacion_seq'::regclass);
+
+ALTER TABLE ONLY seguridad.t_rol_acciones ALTER COLUMN id_rol_accion SET DEFAULT nextval('seguridad.t_rol_acciones_id_rol_accion_seq'::regclass);
+
+ALTER TABLE ONLY seguridad.t_roles ALTER COLUMN id_rol SET DEFAULT nextval('seguridad.t_roles_id_rol_seq'::regclass);
+
+ALTER TABLE ONLY usuarios.t_usuario_afiliado ALTER COLUMN id_usuario_afi SET DEFAULT nextval('usuarios.t_usuario_afiliado_cod_usuario_afi_seq'::regclass);
+
+ALTER TABLE ONLY usuarios.t_usuario_sistema ALTER COLUMN id_usuario_sistema SET DEFAULT nextval('usuarios.t_usuario_sistema_cod_usuario_sistema_seq'::regclass);
+
+ALTER TABLE ONLY auditoria.t_auditoria_sistema
+    ADD CONSTRAINT t_auditoria_sistema_pkey PRIMARY KEY (id_auditoria_sistema);
+
+ALTER TABLE ONLY facturacion.t_detalle_factura
+    ADD CONSTRAINT t_cod_detalle_pkey PRIMARY KEY (id_detalle);
+
+ALTER TABLE ONLY facturacion.t_factura
+    ADD CONSTRAINT t_factura_pkey PRIMARY KEY (id_factura);
+
+ALTER TABLE ONLY facturacion.t_pagos
+    ADD CONSTRAINT t_pagos_pkey PRIMARY KEY (id_pago);
+
+ALTER TABLE ONLY facturacion.t_tarifa
+    ADD CONSTRAINT t_tarifa_pkey PRIMARY KEY (id_tarifa);
+
+ALTER TABLE ONLY medidores.t_lecturas
+    ADD CONSTRAINT t_lecturas_pkey PRIMARY KEY (id_lectura);
+
+ALTER TABLE ONLY medidores.t_medidor
+    ADD CONSTRAINT t_medidor_pkey PRIMARY KEY (id_medidor);
+
+ALTER TABLE ONLY medidores.t_sector
+    ADD CONSTRAINT t_sector_pkey PRIMARY KEY (id_sector);
+
+ALTER TABLE ONLY medidores.t_servicios
+    ADD CONSTRAINT t_servicios_pkey PRIMARY KEY (id_servicio);
+
+ALTER TABLE ONLY multas.t_multa
+    ADD CONSTRAINT t_multa_pkey PRIMARY KEY (id_tipo_multa);
+
+ALTER TABLE ONLY multas.t_multas_usuario
+    ADD CONSTRAINT t_multas_usuario_pkey PRIMARY KEY (id_multa_usuario);
+
+ALTER TABLE ONLY notificaciones.t_notificaciones
+    ADD CONSTRAINT t_notificaciones_pkey PRIMARY KEY (id_notificacion);
+
+ALTER TABLE ONLY seguridad.t_rol_acciones
+    ADD CONSTRAINT t_rol_acciones_pkey PRIMARY KEY (id_rol_accion);
+
+ALTER TABLE ONLY seguridad.t_roles
+    ADD CONSTRAINT t_roles_nombre_rol_key UNIQUE (nombre_rol);
+
+ALTER TABLE ONLY seguridad.t_roles
+    ADD CONSTRAINT t_roles_pkey PRIMARY KEY (id_rol);
+
+ALTER TABLE ONLY usuarios.t_usuario_afiliado
+    ADD CONSTRAINT t_usuario_afiliado_pkey PRIMARY KEY (id_usuario_afi);
+
+ALTER TABLE ONLY usuarios.t_usuario_sistema
+    ADD CONSTRAINT t_usuario_sistema_pkey PRIMARY KEY (id_usuario_sistema);
+
+ALTER TABLE ONLY usuarios.t_usuario_sistema
+    ADD CONSTRAINT uq_cedula UNIQUE (cedula);
+
+ALTER TABLE ONLY usuarios.t_usuario_sistema
+    ADD CONSTRAINT uq_usuario UNIQUE (usuario);
+
+CREATE INDEX idx_fecha ON multas.t_multas_usuario USING btree (fecha_multa);
+
+CREATE INDEX idx_usuario_bloqueado ON usuarios.t_usuario_sistema USING btree (usuario, bloqueado_permanente, bloqueado_hasta);
+
+ALTER TABLE ONLY auditoria.t_auditoria_sistema
+    ADD CONSTRAINT t_auditoria_sistema_id_usuario_sistema_fkey FOREIGN KEY (id_usuario_sistema) REFERENCES usuarios.t_usuario_sistema(id_usuario_sistema) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_detalle_factura
+    ADD CONSTRAINT t_detalle_factura_id_factura_fkey FOREIGN KEY (id_factura) REFERENCES facturacion.t_factura(id_factura) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_detalle_factura
+    ADD CONSTRAINT t_detalle_factura_id_servicio_fkey FOREIGN KEY (id_servicio) REFERENCES medidores.t_servicios(id_servicio) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_factura
+    ADD CONSTRAINT t_factura_id_lectura_fkey FOREIGN KEY (id_lectura) REFERENCES medidores.t_lecturas(id_lectura) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_factura
+    ADD CONSTRAINT t_factura_id_usuario_afi_fkey FOREIGN KEY (id_usuario_afi) REFERENCES usuarios.t_usuario_afiliado(id_usuario_afi) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_pagos
+    ADD CONSTRAINT t_pagos_id_cajero_fkey FOREIGN KEY (id_cajero) REFERENCES usuarios.t_usuario_sistema(id_usuario_sistema) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_pagos
+    ADD CONSTRAINT t_pagos_id_factura_fkey FOREIGN KEY (id_factura) REFERENCES facturacion.t_factura(id_factura) NOT VALID;
+
+ALTER TABLE ONLY facturacion.t_pagos
+    ADD CONSTRAINT t_pagos_id_usuario_afi_fkey FOREIGN KEY (id_usuario_afi) REFERENCES usuarios.t_usuario_afiliado(id_usuario_afi) NOT VALID;
+
+ALTER TABLE ONLY medidores.t_lecturas
+    ADD CONSTRAINT t_lecturas_id_lector_fkey FOREIGN KEY (id_lector) REFERENCES usuarios.t_usuario_sistema(id_usuario_sistema) NOT VALID;
+
+ALTER TABLE ONLY medidores.t_lecturas
+    ADD CONSTRAINT t_lecturas_id_medidor_fkey FOREIGN KEY (id_medidor) REFERENCES medidores.t_medidor(id_medidor) NOT VALID;
+
+ALTER TABLE ONLY medidores.t_medidor
+    ADD CONSTRAINT t_medidor_id_sector_fkey FOREIGN KEY (id_sector) REFERENCES medidores.t_sector(id_sector) NOT VALID;
+
+ALTER TABLE ONLY medidores.t_medidor
+    ADD CONSTRAINT t_medidor_id_usuario_afi_fkey FOREIGN KEY (id_usuario_afi) REFERENCES usuarios.t_usuario_afiliado(id_usuario_afi) NOT VALID;
+
+ALTER TABLE ONLY multas.t_multas_usuario
+    ADD CONSTRAINT t_multas_usuario_id_tipo_multa_fkey FOREIGN KEY (id_tipo_multa) REFERENCES multas.t_multa(id_tipo_multa) NOT VALID;
+
+ALTER TABLE ONLY multas.t_multas_usuario
+    ADD CONSTRAINT t_multas_usuario_id_usuario_afi_fkey FOREIGN KEY (id_usuario_afi) REFERENCES usuarios.t_usuario_afiliado(id_usuario_afi) NOT VALID;
+
+ALTER TABLE ONLY notificaciones.t_notificaciones
+    ADD CONSTRAINT t_notificaciones_id_usuario_sistema_fkey FOREIGN KEY (id_usuario_sistema) REFERENCES usuarios.t_usuario_sistema(id_usuario_sistema) NOT VALID;
+
+ALTER TABLE ONLY seguridad.t_rol_acciones
+    ADD CONSTRAINT fk_rol FOREIGN KEY (id_rol) REFERENCES seguridad.t_roles(id_rol);
+
+ALTER TABLE ONLY usuarios.t_usuario_afiliado
+    ADD CONSTRAINT fk_id_usuario_sistema FOREIGN KEY (id_usuario_sistema) REFERENCES usuarios.t_usuario_sistema(id_usuario_sistema) NOT VALID;
+
+ALTER TABLE ONLY usuarios.t_usuario_afiliado
+    ADD CONSTRAINT t_usuario_afiliado_id_sector_fkey FOREIGN KEY (id_sector) REFERENCES medidores.t_sector(id_sector) NOT VALID;
+
+ALTER TABLE ONLY usuarios.t_usuario_sistema
+    ADD CONSTRAINT t_usuario_sistema_id_rol_fkey FOREIGN KEY (id_rol) REFERENCES seguridad.t_roles(id_rol);
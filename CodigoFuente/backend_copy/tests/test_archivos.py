@@ -0,0 +1,32 @@
+# tests/test_archivos.py
+"""
+Subida de fotos: el tipo que se guarda (y con el que luego se sirve el
+archivo) sale de los primeros bytes, nunca del Content-Type del cliente.
+"""
+import io
+
+import pytest
+
+
+@pytest.fixture
+def directorio_archivos(tmp_path, monkeypatch):
+    from utils import blob_storage
+
+    monkeypatch.setattr(blob_storage, "BLOB_DIR", tmp_path)
+    return tmp_path
+
+
+def test_archivo_que_no_es_imagen_se_rechaza(cliente_api, directorio_archivos):
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+    respuesta = cliente_api.post("/blobs/", files={"file": ("foto.svg", io.BytesIO(svg), "image/svg+xml")})
+
+    assert respuesta.status_code == 400
+    assert list(directorio_archivos.iterdir()) == []
+
+
+def test_imagen_se_registra_con_el_tipo_de_sus_bytes(cliente_api, directorio_archivos):
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    respuesta = cliente_api.post("/blobs/", files={"file": ("foto.png", io.BytesIO(png), "image/svg+xml")})
+
+    assert respuesta.status_code == 201, respuesta.text
+    assert respuesta.json()["tipo_contenido"] == "image/png"
@@ -0,0 +1,85 @@
+# tests/test_carga_lecturas.py
+"""
+Carga masiva de lecturas (POST /readings/bulk): las filas repetidas del lote
+se rechazan una por una y un error en el análisis posterior no convierte en
+500 una carga que ya quedó guardada.
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+
+@pytest.fixture(scope="module")
+def id_medidor(datos_base, crear_usuarios):
+    """Medidor activo de un afiliado nuevo"""
+    from db.session import SessionLocal
+    from models.affiliate import UsuarioAfiliado
+    from models.meter import Medidor
+    from services.affiliate_codes import reservar_codigos
+
+    db = SessionLocal()
+    try:
+        afiliado = UsuarioAfiliado(
+            cod_usuario_afi=reservar_codigos(db, 1)[0], fecha_afiliacion=date(2020, 1, 1), activo=True,
+            id_sector=datos_base["sectores"][0], id_usuario_sistema=crear_usuarios(1)[0]
+        )
+        db.add(afiliado)
+        db.flush()
+        medidor = Medidor(num_medidor=f"CARGA-{afiliado.id_usuario_afi}", activo=True,
+                          id_usuario_afi=afiliado.id_usuario_afi, id_sector=afiliado.id_sector)
+        db.add(medidor)
+        db.commit()
+        return medidor.id_medidor
+    finally:
+        db.close()
+
+
+def _lecturas_guardadas(id_medidor: int) -> list:
+    from db.session import SessionLocal
+    from models.reading import Lectura
+
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(Lectura.periodo, Lectura.lectura_actual)
+            .where(Lectura.id_medidor == id_medidor)
+            .order_by(Lectura.periodo)
+        ).all()
+    finally:
+        db.close()
+
+
+def test_lectura_repetida_en_el_lote_se_rechaza(cliente_api, id_medidor):
+    respuesta = cliente_api.post("/readings/bulk", json={"lecturas": [
+        {"id_medidor": id_medidor, "periodo": "2020-01-01", "lectura_actual": 10},
+        {"id_medidor": id_medidor, "periodo": "2020-01-15", "lectura_actual": 12},
+    ]})
+
+    assert respuesta.status_code == 201, respuesta.text
+    resumen = respuesta.json()
+    assert (resumen["registradas"], resumen["rechazadas"]) == (1, 1)
+    assert resumen["errores"] == [{"fila": 1, "id_medidor": id_medidor, "error": "Lectura duplicada en el lote (fila 0)"}]
+    # Se conserva la primera: la segunda no la reemplaza en silencio
+    assert [tuple(fila) for fila in _lecturas_guardadas(id_medidor)] == [(date(2020, 1, 1), Decimal("10.00"))]
+
+
+def test_error_en_el_analisis_no_pierde_la_carga(cliente_api, id_medidor, monkeypatch):
+    from services import readings
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("falla simulada")
+
+    monkeypatch.setattr(readings, "analizar_periodos", falla)
+    respuesta = cliente_api.post("/readings/bulk", json={"lecturas": [
+        {"id_medidor": id_medidor, "periodo": "2020-02-01", "lectura_actual": 25},
+        {"id_medidor": id_medidor, "periodo": "2020-03-01", "lectura_actual": 40},
+    ]})
+
+    assert respuesta.status_code == 201, respuesta.text
+    assert respuesta.json()["registradas"] == 2
+    assert respuesta.json()["analizado"] is False
+    assert [periodo for periodo, _ in _lecturas_guardadas(id_medidor)] == [
+        date(2020, 1, 1), date(2020, 2, 1), date(2020, 3, 1)
+    ]
@@ -0,0 +1,100 @@
+# tests/test_codigos_afiliado.py
+"""
+Afiliaciones simultáneas (antes benchmarks/codigos_afiliado.py en modo secuencia
+y bloques): los códigos nunca se repiten y un usuario nunca queda con dos
+afiliaciones activas.
+"""
+from collections import Counter
+from datetime import date
+
+import pytest
+from sqlalchemy import select, delete, insert
+
+CREADORES = 100
+POR_CREADOR = 5
+
+
+def _borrar_afiliados(Sesion, ids):
+    from models.affiliate import UsuarioAfiliado
+
+    db = Sesion()
+    try:
+        db.execute(delete(UsuarioAfiliado).where(UsuarioAfiliado.id_usuario_afi.in_(ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("modo", ["secuencia", "bloques"])
+def test_codigos_unicos_con_creadores_simultaneos(Sesion, simultaneos, datos_base, modo):
+    from models.affiliate import UsuarioAfiliado
+    from services.affiliate_codes import reservar_codigos, siguiente_codigo
+
+    id_sector = datos_base["sectores"][0]
+
+    def crear(_):
+        db = Sesion()
+        try:
+            if modo == "secuencia":
+                codigos = [siguiente_codigo(db) for _ in range(POR_CREADOR)]
+            else:
+                codigos = reservar_codigos(db, POR_CREADOR)
+            # Inactivos: el mismo usuario puede tener varias afiliaciones dadas de baja
+            creados = db.execute(
+                insert(UsuarioAfiliado).returning(UsuarioAfiliado.id_usuario_afi, UsuarioAfiliado.cod_usuario_afi),
+                [
+                    {"cod_usuario_afi": codigo, "fecha_afiliacion": date.today(), "id_sector": id_sector,
+                     "id_usuario_sistema": datos_base["id_admin"], "activo": False}
+                    for codigo in codigos
+                ]
+            ).all()
+            db.commit()
+            return creados
+        finally:
+            db.close()
+
+    creados = [fila for filas in simultaneos(CREADORES, crear) for fila in filas]
+    try:
+        codigos = Counter(codigo for _, codigo in creados)
+        assert len(creados) == CREADORES * POR_CREADOR
+        assert [codigo for codigo, veces in codigos.items() if veces > 1] == []
+    finally:
+        _borrar_afiliados(Sesion, [id_afi for id_afi, _ in creados])
+
+
+def test_afiliacion_masiva_simultanea_no_duplica_usuarios(Sesion, simultaneos, datos_base, crear_usuarios):
+    from models.affiliate import UsuarioAfiliado
+    from schemas.affiliate import AffiliateCreate
+    from services.affiliates import crear_afiliados
+
+    ids_usuario = crear_usuarios(50)
+    lote = [
+        AffiliateCreate(id_usuario_sistema=id_usuario, id_sector=datos_base["sectores"][0], activo=True)
+        for id_usuario in ids_usuario
+    ]
+
+    def afiliar(_):
+        db = Sesion()
+        try:
+            return crear_afiliados(db, lote)
+        finally:
+            db.close()
+
+    resumenes = simultaneos(10, afiliar)
+
+    db = Sesion()
+    try:
+        afiliaciones = db.execute(
+            select(UsuarioAfiliado.id_usuario_afi, UsuarioAfiliado.id_usuario_sistema)
+            .where(UsuarioAfiliado.id_usuario_sistema.in_(ids_usuario), UsuarioAfiliado.activo == True)
+        ).all()
+    finally:
+        db.close()
+    try:
+        assert sorted(id_usuario for _, id_usuario in afiliaciones) == sorted(ids_usuario)
+        assert sum(resumen["creados"] for resumen in resumenes) == len(ids_usuario)
+        for resumen in resumenes:
+            assert resumen["creados"] + resumen["rechazados"] == len(lote)
+            assert {error["error"].split(" (")[0] for error in resumen["errores"]} <= {"El usuario ya está afiliado"}
+    finally:
+        _borrar_afiliados(Sesion, [id_afi for id_afi, _ in afiliaciones])
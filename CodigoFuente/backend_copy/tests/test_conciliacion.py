@@ -0,0 +1,87 @@
+# tests/test_conciliacion.py
+"""
+Conciliación de archivos de pagos (services/reconciliation.py): la clave de
+idempotencia de cada línea sale de su contenido, así que volver a subir el
+archivo con otras líneas en medio no duplica pagos y dos pagos iguales del
+mismo archivo se registran los dos.
+"""
+import io
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+
+@pytest.fixture
+def afiliado(datos_base, crear_usuarios):
+    """Afiliado nuevo con una factura pendiente de 3.00 -> (id_usuario_afi, cod_usuario_afi)"""
+    from db.session import SessionLocal
+    from models.affiliate import UsuarioAfiliado
+    from models.meter import Medidor
+    from services.affiliate_codes import reservar_codigos
+    from services.billing import facturar_periodo
+    from services.readings import registrar_lecturas
+
+    db = SessionLocal()
+    try:
+        nuevo = UsuarioAfiliado(
+            cod_usuario_afi=reservar_codigos(db, 1)[0], fecha_afiliacion=date(2018, 1, 1), activo=True,
+            id_sector=datos_base["sectores"][0], id_usuario_sistema=crear_usuarios(1)[0]
+        )
+        db.add(nuevo)
+        db.flush()
+        medidor = Medidor(num_medidor=f"CONC-{nuevo.id_usuario_afi}", activo=True,
+                          id_usuario_afi=nuevo.id_usuario_afi, id_sector=nuevo.id_sector)
+        db.add(medidor)
+        db.commit()
+
+        registrar_lecturas(db, [SimpleNamespace(
+            id_medidor=medidor.id_medidor, periodo=date(2018, 1, 1), lectura_actual=Decimal(50),
+            fecha_lectura=None, observacion=None, foto_hash=None,
+        )], analizar=False)
+        facturar_periodo(db, date(2018, 1, 1), estimar=False)
+        return nuevo.id_usuario_afi, nuevo.cod_usuario_afi
+    finally:
+        db.close()
+
+
+def _conciliar(datos_base, texto: str) -> dict:
+    from db.session import SessionLocal
+    from services.reconciliation import conciliar_archivo, leer_csv
+
+    db = SessionLocal()
+    try:
+        return conciliar_archivo(db, leer_csv(io.StringIO(texto)), datos_base["id_admin"], "banco-pruebas")
+    finally:
+        db.close()
+
+
+def _pagos(id_usuario_afi: int) -> int:
+    from db.session import SessionLocal
+    from models.payment import Pago
+
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.count()).where(Pago.id_usuario_afi == id_usuario_afi)).scalar()
+    finally:
+        db.close()
+
+
+def test_lineas_iguales_se_registran_y_otras_posiciones_no_duplican(datos_base, afiliado):
+    id_usuario_afi, codigo = afiliado
+    linea = f"{codigo};1,00;20180210"
+
+    # Dos pagos iguales del mismo día: no son duplicados entre sí
+    resumen = _conciliar(datos_base, f"codigo;valor;fecha\n{linea}\n{linea}\n")
+    assert (resumen["registrados"], resumen["duplicados"]) == (2, 0)
+
+    # El mismo archivo con una línea en blanco al inicio: todos los números de línea cambian
+    resumen = _conciliar(datos_base, f"codigo;valor;fecha\n\n{linea}\n{linea}\n")
+    assert (resumen["registrados"], resumen["duplicados"]) == (0, 2)
+
+    # El archivo corregido con un tercer pago igual: solo ese es nuevo
+    resumen = _conciliar(datos_base, f"codigo;valor;fecha\n{linea}\n{linea}\n{linea}\n")
+    assert (resumen["registrados"], resumen["duplicados"]) == (1, 2)
+    assert _pagos(id_usuario_afi) == 3
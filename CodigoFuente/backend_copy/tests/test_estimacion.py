@@ -0,0 +1,89 @@
+# tests/test_estimacion.py
+"""
+Conciliación de estimaciones (services/estimation.py y services/readings.py):
+si la lectura real queda por debajo de la estimada y facturada, ese mes no
+tiene consumo y la diferencia pasa como ajuste_estimacion a los siguientes
+hasta que el medidor la alcance.
+"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+
+@pytest.fixture
+def id_medidor(datos_base, crear_usuarios):
+    """Medidor de un afiliado nuevo con consumo de 20 m3 por mes de enero a marzo de 2015"""
+    from db.session import SessionLocal
+    from models.affiliate import UsuarioAfiliado
+    from models.meter import Medidor
+    from services.affiliate_codes import reservar_codigos
+
+    db = SessionLocal()
+    try:
+        afiliado = UsuarioAfiliado(
+            cod_usuario_afi=reservar_codigos(db, 1)[0], fecha_afiliacion=date(2014, 12, 1), activo=True,
+            id_sector=datos_base["sectores"][0], id_usuario_sistema=crear_usuarios(1)[0]
+        )
+        db.add(afiliado)
+        db.flush()
+        medidor = Medidor(num_medidor=f"ESTIM-{afiliado.id_usuario_afi}", activo=True,
+                          id_usuario_afi=afiliado.id_usuario_afi, id_sector=afiliado.id_sector)
+        db.add(medidor)
+        db.commit()
+
+        for periodo, lectura in ((date(2014, 12, 1), 80), (date(2015, 1, 1), 100),
+                                 (date(2015, 2, 1), 120), (date(2015, 3, 1), 140)):
+            _registrar(db, medidor.id_medidor, periodo, lectura)
+        return medidor.id_medidor
+    finally:
+        db.close()
+
+
+def _registrar(db, id_medidor: int, periodo: date, lectura_actual: int) -> dict:
+    from services.readings import registrar_lecturas
+
+    return registrar_lecturas(db, [SimpleNamespace(
+        id_medidor=id_medidor, periodo=periodo, lectura_actual=Decimal(lectura_actual),
+        fecha_lectura=None, observacion=None, foto_hash=None,
+    )], analizar=False)
+
+
+def _lectura(db, id_medidor: int, periodo: date) -> tuple:
+    from models.reading import Lectura
+
+    db.expire_all()
+    return tuple(db.execute(
+        select(Lectura.lectura_anterior, Lectura.lectura_actual, Lectura.consumo, Lectura.ajuste_estimacion, Lectura.estimada)
+        .where(Lectura.id_medidor == id_medidor, Lectura.periodo == periodo)
+    ).one())
+
+
+def test_estimacion_de_mas_pasa_como_ajuste_a_los_meses_siguientes(id_medidor):
+    from db.session import SessionLocal
+    from models.invoice import Factura
+    from services.billing import facturar_periodo
+
+    db = SessionLocal()
+    try:
+        # Abril sin lectura: se estima con el promedio (20 m3) y se factura
+        facturar_periodo(db, date(2015, 4, 1))
+        assert _lectura(db, id_medidor, date(2015, 4, 1)) == (140, 160, 20, 0, True)
+        factura = db.execute(select(Factura).where(Factura.id_medidor == id_medidor, Factura.periodo == date(2015, 4, 1))).scalar_one()
+        assert (factura.estimada, factura.consumo) == (True, 20)
+
+        # Mayo: el medidor real marca 150, por debajo de los 160 facturados
+        assert _registrar(db, id_medidor, date(2015, 5, 1), 150)["registradas"] == 1
+        assert _lectura(db, id_medidor, date(2015, 5, 1)) == (160, 150, 0, 10, False)
+
+        # Junio todavía no alcanza lo facturado: el ajuste se arrastra con lo que falta
+        _registrar(db, id_medidor, date(2015, 6, 1), 155)
+        assert _lectura(db, id_medidor, date(2015, 6, 1)) == (160, 155, 0, 5, False)
+
+        # Julio lo supera: solo se cobra lo consumido desde los 160 ya facturados
+        _registrar(db, id_medidor, date(2015, 7, 1), 170)
+        assert _lectura(db, id_medidor, date(2015, 7, 1)) == (160, 170, 10, 0, False)
+    finally:
+        db.close()
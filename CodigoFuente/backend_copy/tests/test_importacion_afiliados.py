@@ -0,0 +1,64 @@
+# tests/test_importacion_afiliados.py
+"""Importación de hogares: los valores fuera de rango son errores de fila, no del archivo"""
+import io
+
+from sqlalchemy import select
+
+
+def _importar(contenido: str, **opciones) -> dict:
+    from db.session import SessionLocal
+    from services.affiliation_import import importar_afiliaciones, leer_csv
+
+    db = SessionLocal()
+    try:
+        return importar_afiliaciones(db, leer_csv(io.StringIO(contenido)), **opciones)
+    finally:
+        db.close()
+
+
+def _cedulas(ids_usuario: list) -> list:
+    from db.session import SessionLocal
+    from models.user import UsuarioSistema
+
+    db = SessionLocal()
+    try:
+        por_id = dict(db.execute(
+            select(UsuarioSistema.id_usuario_sistema, UsuarioSistema.cedula)
+            .where(UsuarioSistema.id_usuario_sistema.in_(ids_usuario))
+        ).all())
+        return [por_id[id_usuario] for id_usuario in ids_usuario]
+    finally:
+        db.close()
+
+
+def test_altitud_fuera_de_rango_es_error_de_fila(datos_base, crear_usuarios):
+    cedulas = _cedulas(crear_usuarios(3))
+    id_sector = datos_base["sectores"][0]
+    resumen = _importar(
+        "cedula;sector;num_medidor;latitud;longitud;altitud\n"
+        f"{cedulas[0]};{id_sector};IMP-ALT-1;-1,5;-78,5;2800,5\n"
+        f"{cedulas[1]};{id_sector};IMP-ALT-2;-1,5;-78,5;100000000\n"
+        f"{cedulas[2]};{id_sector};IMP-ALT-3;-1,5;-78,5;NaN\n"
+    )
+    assert resumen["medidores_creados"] == 1
+    assert [(error["fila"], error["error"].split(":")[0]) for error in resumen["errores"]] == [
+        (3, "Coordenadas inválidas"), (4, "Coordenadas inválidas"),
+    ]
+
+
+def test_valor_rechazado_por_la_base_descarta_solo_su_bloque(datos_base, crear_usuarios, monkeypatch):
+    from services import affiliation_import
+
+    # Sin la validación de rango la altitud llega a la base y desborda Numeric(10, 2)
+    monkeypatch.setattr(affiliation_import, "ALTITUD_MAXIMA", 10 ** 12)
+    monkeypatch.setattr(affiliation_import, "IMPORTACION_CHUNK", 1)
+    cedulas = _cedulas(crear_usuarios(2))
+    id_sector = datos_base["sectores"][0]
+    resumen = _importar(
+        "cedula,sector,num_medidor,altitud\n"
+        f"{cedulas[0]},{id_sector},IMP-DAT-1,100000000000\n"
+        f"{cedulas[1]},{id_sector},IMP-DAT-2,2750\n"
+    )
+    assert resumen["medidores_creados"] == 1
+    assert [error["fila"] for error in resumen["errores"]] == [2]
+    assert resumen["errores"][0]["error"].startswith("La base rechazó un valor del bloque")
@@ -0,0 +1,203 @@
+# tests/test_migraciones.py
+"""
+python -m db.migrations sobre una base con el esquema de producción
+(tests/esquema_produccion.sql) y algunas filas anteriores a la migración:
+después de migrar, cada columna de los modelos existe y la aplicación puede
+leer las filas heredadas.
+"""
+import os
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+ESQUEMA = Path(__file__).with_name("esquema_produccion.sql")
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+@pytest.fixture(scope="module")
+def base_produccion():
+    """Base nueva (<base de pruebas>_produccion) con el esquema de producción y filas heredadas -> engine"""
+    url_pruebas = os.getenv("TEST_DATABASE_URL")
+    if not url_pruebas:
+        pytest.skip("TEST_DATABASE_URL no está configurada")
+    import main  # noqa: F401  (registra todos los modelos)
+
+    url = make_url(url_pruebas)
+    nombre = f"{url.database}_produccion"
+    servidor = create_engine(url, isolation_level="AUTOCOMMIT")
+    with servidor.connect() as conexion:
+        conexion.execute(text(f'DROP DATABASE IF EXISTS "{nombre}"'))
+        conexion.execute(text(f'CREATE DATABASE "{nombre}"'))
+
+    engine = create_engine(url.set(database=nombre))
+    with engine.begin() as conexion:
+        conexion.exec_driver_sql(ESQUEMA.read_text(encoding="utf-8"))
+        conexion.execute(text("""
+            INSERT INTO seguridad.t_roles (nombre_rol) VALUES ('administrador');
+            INSERT INTO usuarios.t_usuario_sistema (usuario, clave, nombres, apellidos, cedula, email, id_rol, foto)
+            VALUES ('legado', 'x', 'Usuario', 'Heredado', '0102030405', 'legado@x', 1, :foto);
+            INSERT INTO medidores.t_sector (nombre_sector, activo) VALUES ('Centro', true);
+            INSERT INTO usuarios.t_usuario_afiliado (fecha_afiliacion, id_sector, id_usuario_sistema, activo, cod_usuario_afi)
+            VALUES ('2020-01-01', 1, 1, true, 7);
+            INSERT INTO medidores.t_medidor (num_medidor, id_usuario_afi, id_sector, latitud, longitud, activo)
+            VALUES ('LEG-1', 1, 1, -1.67, -78.65, true);
+            INSERT INTO medidores.t_lecturas (id_medidor, lectura_anterior, lectura_actual, consumo_m3, fecha_lectura, id_lector, activo)
+            VALUES (1, 100, 118, 18, '2024-03-05', 1, true);
+            INSERT INTO facturacion.t_factura (num_factura, id_usuario_afi, id_lectura, consumo_m3, valor_consumo, valor_exceso,
+                                               descuento, subtotal, impuesto, total, fecha_emision, exceso_m3, activo)
+            VALUES ('001-001-000000001', 1, 1, 18, 3.00, 0.75, 0, 3.75, 0, 3.75, '2024-03-10', 3, true),
+                   ('FAC-0002', 1, NULL, NULL, 2.00, 0, 0, NULL, 0, 2.00, '2024-02-08', 0, false);
+            INSERT INTO facturacion.t_pagos (id_factura, monto_pago, fecha_pago, metodo_pago, id_usuario_afi, id_cajero,
+                                             observaciones, motivo_anulacion, fecha_anulacion, activo)
+            VALUES (1, 5.00, '2024-03-12 10:00', 'EFECTIVO', 1, 1, 'Pago en ventanilla', NULL, NULL, true),
+                   (1, 2.00, '2024-03-12 11:00', 'EFECTIVO', NULL, 1, NULL, 'Cobro repetido', '2024-03-12 12:00', false);
+        """), {"foto": PNG})
+
+    yield engine
+    engine.dispose()
+    with servidor.connect() as conexion:
+        conexion.execute(text(f'DROP DATABASE IF EXISTS "{nombre}"'))
+    servidor.dispose()
+
+
+@pytest.fixture(scope="module")
+def migrada(base_produccion, tmp_path_factory):
+    """La base de producción después de ejecutar la migración dos veces (los pasos se pueden repetir)"""
+    from utils import blob_storage
+    from db.migrations import migrar
+
+    directorio = blob_storage.BLOB_DIR
+    blob_storage.BLOB_DIR = tmp_path_factory.mktemp("archivos")
+    try:
+        with Session(base_produccion) as db:
+            migrar(db)
+            migrar(db)
+    finally:
+        blob_storage.BLOB_DIR = directorio
+    return base_produccion
+
+
+def _columnas_faltantes(engine, tablas) -> list:
+    inspector = inspect(engine)
+    faltantes = []
+    for tabla in tablas:
+        if not inspector.has_table(tabla.name, schema=tabla.schema):
+            faltantes.append(tabla.fullname)
+            continue
+        existentes = {columna["name"] for columna in inspector.get_columns(tabla.name, schema=tabla.schema)}
+        faltantes += [f"{tabla.fullname}.{columna.name}" for columna in tabla.columns if columna.name not in existentes]
+    return faltantes
+
+
+def test_migracion_crea_tablas_y_columnas_de_los_modelos(migrada):
+    from db.session import Base
+
+    assert _columnas_faltantes(migrada, Base.metadata.sorted_tables) == []
+
+
+def test_usuarios_heredados_se_leen_con_el_modelo(migrada):
+    from models.blob import Blob
+    from models.user import UsuarioSistema
+
+    with Session(migrada) as db:
+        usuario = db.execute(select(UsuarioSistema).where(UsuarioSistema.usuario == "legado")).scalar_one()
+        # La foto pasó al almacenamiento de archivos
+        assert usuario.foto is None
+        assert db.get(Blob, usuario.foto_hash).tipo_contenido == "image/png"
+
+
+def test_facturas_heredadas_se_leen_con_el_modelo(migrada):
+    from models.invoice import Factura
+
+    with Session(migrada) as db:
+        facturas = db.execute(
+            select(Factura.periodo, Factura.consumo, Factura.lectura_actual, Factura.id_medidor,
+                   Factura.id_sector, Factura.subtotal, Factura.estado)
+            .order_by(Factura.id_factura)
+        ).all()
+
+    # Periodo y lecturas salen de la lectura facturada; sin lectura, de la fecha de emisión.
+    # La primera la cubre un pago heredado; la inactiva queda anulada
+    assert [tuple(factura) for factura in facturas] == [
+        (date(2024, 3, 1), 18, 118, 1, 1, Decimal("3.75"), "pagada"),
+        (date(2024, 2, 1), 0, None, None, 1, Decimal("2.00"), "anulada"),
+    ]
+
+
+def test_lecturas_heredadas_tienen_periodo_y_la_numeracion_continua(migrada):
+    from models.invoice import ContadorFactura, Factura
+    from models.reading import Lectura
+
+    with Session(migrada) as db:
+        lectura = db.execute(select(Lectura)).scalar_one()
+        assert (lectura.periodo, lectura.consumo, lectura.estimada) == (date(2024, 3, 1), 18, False)
+
+        numeros = db.execute(
+            select(Factura.punto_emision, Factura.secuencial).order_by(Factura.id_factura)
+        ).all()
+        # Los números con otro formato quedan sin secuencial
+        assert [tuple(numero) for numero in numeros] == [("001-001", 1), ("001-001", None)]
+        assert db.get(ContadorFactura, "001-001").siguiente == 2
+
+
+def test_resumenes_mensuales_de_los_periodos_heredados(migrada):
+    from models.consumption import ConsumoMensualSector
+
+    with Session(migrada) as db:
+        resumenes = db.execute(
+            select(ConsumoMensualSector.periodo, ConsumoMensualSector.consumo, ConsumoMensualSector.num_lecturas,
+                   ConsumoMensualSector.monto_facturado, ConsumoMensualSector.num_facturas)
+            .order_by(ConsumoMensualSector.periodo)
+        ).all()
+
+    # La factura anulada de febrero no suma
+    assert [tuple(resumen) for resumen in resumenes] == [
+        (date(2024, 3, 1), 18, 1, Decimal("3.75"), 1),
+    ]
+
+
+def test_pagos_heredados_se_aplican_y_dejan_saldo(migrada):
+    from models.invoice import Factura
+    from models.payment import CierreCaja, Pago, PagoFactura, SaldoAfiliado
+
+    with Session(migrada) as db:
+        pagos = db.execute(select(Pago).order_by(Pago.id_pago)).scalars().all()
+        assert [(p.clave_idempotencia, p.monto, p.metodo, p.activo, p.id_usuario_afi) for p in pagos] == [
+            ("migrado-1", Decimal("5.00"), "EFECTIVO", True, 1),
+            ("migrado-2", Decimal("2.00"), "EFECTIVO", False, 1),
+        ]
+        assert pagos[0].observacion == "Pago en ventanilla"
+
+        # Un cierre con los pagos anteriores del cajero: el primer cierre real no los incluye
+        cierre = db.execute(select(CierreCaja)).scalar_one()
+        assert {p.id_cierre_caja for p in pagos} == {cierre.id_cierre_caja}
+        assert (cierre.id_cajero, cierre.num_pagos, cierre.monto_total) == (1, 1, Decimal("5.00"))
+
+        # El pago activo cubre su factura hasta el total; el anulado no cuenta
+        aplicaciones = db.execute(select(PagoFactura.id_pago, PagoFactura.id_factura, PagoFactura.monto)).all()
+        assert [tuple(a) for a in aplicaciones] == [(pagos[0].id_pago, 1, Decimal("3.75"))]
+        facturas = db.execute(
+            select(Factura.saldo_pendiente, Factura.estado).order_by(Factura.id_factura)
+        ).all()
+        assert [tuple(f) for f in facturas] == [(Decimal("0.00"), "pagada"), (Decimal("0.00"), "anulada")]
+
+        # El excedente queda como saldo a favor
+        saldo = db.get(SaldoAfiliado, 1)
+        assert (saldo.total_facturado, saldo.total_pagado, saldo.saldo) == (
+            Decimal("3.75"), Decimal("5.00"), Decimal("-1.25")
+        )
+
+
+def test_deuda_por_periodo_coincide_con_las_facturas(migrada):
+    from services.aging import reconstruir_deuda
+
+    with Session(migrada) as db:
+        resultado = reconstruir_deuda(db)
+
+    # La única factura vigente quedó pagada: no hay deuda abierta
+    assert (resultado["filas_actuales"], resultado["diferencias"]) == (0, 0)
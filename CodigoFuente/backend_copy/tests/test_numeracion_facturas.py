@@ -0,0 +1,122 @@
+# tests/test_numeracion_facturas.py
+"""
+Numeración de facturas por bloques (services/invoice_numbers.py): las
+reservas simultáneas no se repiten ni dejan huecos, y los números de una
+facturación que falla vuelven al contador o a los rangos libres.
+"""
+from itertools import count
+
+import pytest
+from sqlalchemy import delete, select
+
+TRABAJADORES = 40
+POR_TRABAJADOR = 25
+
+_puntos = count(101)
+
+
+@pytest.fixture
+def punto_emision(Sesion):
+    """Punto de emisión nuevo para cada prueba (su contador y rangos se borran al final)"""
+    from models.invoice import ContadorFactura, RangoFacturaLibre
+
+    punto = f"{next(_puntos):03d}-001"
+    yield punto
+    db = Sesion()
+    try:
+        db.execute(delete(RangoFacturaLibre).where(RangoFacturaLibre.punto_emision == punto))
+        db.execute(delete(ContadorFactura).where(ContadorFactura.punto_emision == punto))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _numeros(rangos) -> list:
+    return [numero for desde, hasta in rangos for numero in range(desde, hasta + 1)]
+
+
+def _estado(Sesion, punto: str) -> tuple:
+    """(siguiente del contador, [(desde, hasta) libres])"""
+    from models.invoice import ContadorFactura, RangoFacturaLibre
+
+    db = Sesion()
+    try:
+        siguiente = db.execute(
+            select(ContadorFactura.siguiente).where(ContadorFactura.punto_emision == punto)
+        ).scalar()
+        libres = db.execute(
+            select(RangoFacturaLibre.desde, RangoFacturaLibre.hasta)
+            .where(RangoFacturaLibre.punto_emision == punto)
+            .order_by(RangoFacturaLibre.desde)
+        ).all()
+        return siguiente, [tuple(libre) for libre in libres]
+    finally:
+        db.close()
+
+
+def test_reservas_simultaneas_unicas_y_contiguas(Sesion, simultaneos, punto_emision):
+    from services.invoice_numbers import reservar_rangos
+
+    reservas = simultaneos(TRABAJADORES, lambda _: reservar_rangos(punto_emision, POR_TRABAJADOR, Sesion))
+
+    numeros = sorted(numero for rangos in reservas for numero in _numeros(rangos))
+    assert numeros == list(range(1, TRABAJADORES * POR_TRABAJADOR + 1))
+    assert _estado(Sesion, punto_emision) == (TRABAJADORES * POR_TRABAJADOR + 1, [])
+
+
+def test_facturaciones_fallidas_devuelven_sus_numeros(Sesion, simultaneos, punto_emision):
+    from services.invoice_numbers import reservar_numeros, reservar_rangos
+
+    def facturar(i):
+        try:
+            with reservar_numeros(punto_emision, POR_TRABAJADOR, Sesion) as bloque:
+                usados = [bloque.siguiente() for _ in range(len(bloque))]
+                if i % 2:
+                    raise RuntimeError("falla simulada")
+                bloque.confirmar()
+                return usados
+        except RuntimeError:
+            return []
+
+    confirmados = [numero for usados in simultaneos(TRABAJADORES, facturar) for numero in usados]
+    assert len(confirmados) == len(set(confirmados)) == TRABAJADORES // 2 * POR_TRABAJADOR
+
+    # La siguiente reserva reutiliza primero los números devueltos: no queda ningún hueco
+    siguiente, libres = _estado(Sesion, punto_emision)
+    pendientes = siguiente - 1 - len(confirmados)
+    reutilizados = _numeros(reservar_rangos(punto_emision, pendientes, Sesion)) if pendientes else []
+    assert sorted(confirmados + reutilizados) == list(range(1, siguiente))
+    assert _estado(Sesion, punto_emision) == (siguiente, [])
+
+
+def test_rango_fallido_se_reasigna_antes_de_avanzar_el_contador(Sesion, punto_emision):
+    from services.invoice_numbers import reservar_numeros, reservar_rangos
+
+    with reservar_numeros(punto_emision, 10, Sesion) as primero:
+        primero.siguiente()
+        primero.confirmar()
+    # Solo se confirmó el 1: los números 2-10 estaban al final y el contador retrocede
+    assert _estado(Sesion, punto_emision) == (2, [])
+
+    with pytest.raises(RuntimeError):
+        with reservar_numeros(punto_emision, 10, Sesion) as fallido:
+            assert fallido.rangos == [(2, 11)]
+            otra = reservar_rangos(punto_emision, 5, Sesion)
+            raise RuntimeError("falla simulada")
+    assert otra == [(12, 16)]
+    assert _estado(Sesion, punto_emision) == (17, [(2, 11)])
+
+    assert reservar_rangos(punto_emision, 15, Sesion) == [(2, 11), (17, 21)]
+    assert _estado(Sesion, punto_emision) == (22, [])
+
+
+def test_liberar_rango_al_final_absorbe_los_rangos_libres_contiguos(Sesion, punto_emision):
+    from services.invoice_numbers import liberar_rango, reservar_rangos
+
+    assert reservar_rangos(punto_emision, 30, Sesion) == [(1, 30)]
+
+    liberar_rango(punto_emision, 11, 20, Sesion)
+    assert _estado(Sesion, punto_emision) == (31, [(11, 20)])
+
+    liberar_rango(punto_emision, 21, 30, Sesion)
+    assert _estado(Sesion, punto_emision) == (11, [])
@@ -0,0 +1,138 @@
+# tests/test_pagos.py
+"""
+Pagos en caja (services/payments.py): cada pago se aplica a las facturas
+pendientes de la más antigua a la más nueva, el excedente queda como saldo a
+favor y la facturación siguiente lo descuenta; una clave de idempotencia
+repetida nunca cobra dos veces.
+"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+
+@pytest.fixture
+def afiliado(datos_base, crear_usuarios):
+    """Afiliado nuevo con medidor -> (id_usuario_afi, id_medidor)"""
+    from db.session import SessionLocal
+    from models.affiliate import UsuarioAfiliado
+    from models.meter import Medidor
+    from services.affiliate_codes import reservar_codigos
+
+    db = SessionLocal()
+    try:
+        nuevo = UsuarioAfiliado(
+            cod_usuario_afi=reservar_codigos(db, 1)[0], fecha_afiliacion=date(2019, 1, 1), activo=True,
+            id_sector=datos_base["sectores"][1], id_usuario_sistema=crear_usuarios(1)[0]
+        )
+        db.add(nuevo)
+        db.flush()
+        medidor = Medidor(num_medidor=f"PAGOS-{nuevo.id_usuario_afi}", activo=True,
+                          id_usuario_afi=nuevo.id_usuario_afi, id_sector=nuevo.id_sector)
+        db.add(medidor)
+        db.commit()
+        return nuevo.id_usuario_afi, medidor.id_medidor
+    finally:
+        db.close()
+
+
+def _facturar(db, id_medidor: int, periodo: date, lectura_actual: int) -> None:
+    from services.billing import facturar_periodo
+    from services.readings import registrar_lecturas
+
+    registrar_lecturas(db, [SimpleNamespace(
+        id_medidor=id_medidor, periodo=periodo, lectura_actual=Decimal(lectura_actual),
+        fecha_lectura=None, observacion=None, foto_hash=None,
+    )], analizar=False)
+    facturar_periodo(db, periodo, estimar=False)
+
+
+def _pago(clave: str, id_usuario_afi: int, monto: str):
+    return SimpleNamespace(clave_idempotencia=clave, id_usuario_afi=id_usuario_afi, monto=Decimal(monto),
+                           metodo="efectivo", referencia=None, observacion=None)
+
+
+def _facturas(db, id_usuario_afi: int) -> list:
+    from models.invoice import Factura
+
+    return [tuple(fila) for fila in db.execute(
+        select(Factura.periodo, Factura.total, Factura.saldo_pendiente, Factura.estado)
+        .where(Factura.id_usuario_afi == id_usuario_afi)
+        .order_by(Factura.periodo)
+    )]
+
+
+def test_pago_cubre_primero_la_factura_mas_antigua_y_el_excedente_se_descuenta(datos_base, afiliado):
+    from db.session import SessionLocal
+    from models.payment import Pago, PagoFactura, SaldoAfiliado
+    from services.payments import registrar_pagos
+
+    id_usuario_afi, id_medidor = afiliado
+    db = SessionLocal()
+    try:
+        # Primera lectura: consumo 0 (3.00); segunda: 20 m3 (3.00 + 5 x 0.25)
+        _facturar(db, id_medidor, date(2019, 1, 1), 100)
+        _facturar(db, id_medidor, date(2019, 2, 1), 120)
+
+        resumen = registrar_pagos(db, [_pago("pagos-1", id_usuario_afi, "4.00")], datos_base["id_admin"])
+        assert resumen["registrados"] == 1
+        assert _facturas(db, id_usuario_afi) == [
+            (date(2019, 1, 1), Decimal("3.00"), Decimal("0.00"), "pagada"),
+            (date(2019, 2, 1), Decimal("4.25"), Decimal("3.25"), "pendiente"),
+        ]
+
+        # Pago de más: 3.25 cubren febrero y 1.75 quedan a favor
+        registrar_pagos(db, [_pago("pagos-2", id_usuario_afi, "5.00")], datos_base["id_admin"])
+        assert db.get(SaldoAfiliado, id_usuario_afi).saldo == Decimal("-1.75")
+
+        # La factura de marzo (3.00) descuenta el saldo a favor
+        _facturar(db, id_medidor, date(2019, 3, 1), 130)
+        assert _facturas(db, id_usuario_afi)[-1] == (date(2019, 3, 1), Decimal("3.00"), Decimal("1.25"), "pendiente")
+        db.expire_all()
+        saldo = db.get(SaldoAfiliado, id_usuario_afi)
+        assert (saldo.total_facturado, saldo.total_pagado, saldo.saldo, saldo.facturas_pendientes) == (
+            Decimal("10.25"), Decimal("9.00"), Decimal("1.25"), 1
+        )
+
+        # Todo lo pagado quedó aplicado: 3.00 de enero, 4.25 de febrero y 1.75 de marzo
+        aplicado = db.execute(
+            select(func.sum(PagoFactura.monto))
+            .join(Pago, Pago.id_pago == PagoFactura.id_pago)
+            .where(Pago.id_usuario_afi == id_usuario_afi)
+        ).scalar()
+        assert aplicado == Decimal("9.00")
+    finally:
+        db.close()
+
+
+def test_clave_repetida_no_cobra_dos_veces(Sesion, simultaneos, datos_base, afiliado):
+    from models.payment import Pago, SaldoAfiliado
+    from services.payments import registrar_pagos
+
+    id_usuario_afi, id_medidor = afiliado
+    db = Sesion()
+    try:
+        _facturar(db, id_medidor, date(2019, 4, 1), 100)
+    finally:
+        db.close()
+
+    def cobrar(_):
+        db = Sesion()
+        try:
+            return registrar_pagos(db, [_pago("doble-clic", id_usuario_afi, "3.00")], datos_base["id_admin"])
+        finally:
+            db.close()
+
+    resumenes = simultaneos(10, cobrar)
+
+    db = Sesion()
+    try:
+        assert sum(resumen["registrados"] for resumen in resumenes) == 1
+        assert sum(resumen["duplicados"] for resumen in resumenes) == 9
+        assert len(db.execute(select(Pago.id_pago).where(Pago.clave_idempotencia == "doble-clic")).all()) == 1
+        assert db.get(SaldoAfiliado, id_usuario_afi).saldo == Decimal("0.00")
+        assert _facturas(db, id_usuario_afi)[-1][2:] == (Decimal("0.00"), "pagada")
+    finally:
+        db.close()
@@ -0,0 +1,46 @@
+# tests/test_perdidas.py
+"""
+Carga de lecturas de macromedidores (POST /perdidas/macro-lecturas): un
+error en el análisis de pérdidas posterior no convierte en 500 una carga que
+ya quedó guardada, y la carga queda en la auditoría.
+"""
+from sqlalchemy import func, select
+
+
+def test_error_en_el_analisis_no_pierde_la_carga_de_macromedidores(cliente_api, datos_base, monkeypatch):
+    from db.session import SessionLocal
+    from models.audit import AuditoriaSistema
+    from models.water_loss import LecturaMacro, MacroMedidor
+    from routes import water_loss
+
+    db = SessionLocal()
+    try:
+        macro = MacroMedidor(num_macro_medidor="MACRO-ANALISIS", id_sector=datos_base["sectores"][0], activo=True)
+        db.add(macro)
+        db.commit()
+        id_macro = macro.id_macro_medidor
+        ultima_auditoria = db.execute(select(func.coalesce(func.max(AuditoriaSistema.id_auditoria_sistema), 0))).scalar()
+    finally:
+        db.close()
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("falla simulada")
+
+    monkeypatch.setattr(water_loss, "analizar_periodos", falla)
+    respuesta = cliente_api.post("/perdidas/macro-lecturas", json={"lecturas": [
+        {"id_macro_medidor": id_macro, "periodo": "2017-05-01", "lectura_actual": 1000},
+    ]})
+
+    assert respuesta.status_code == 201, respuesta.text
+    assert (respuesta.json()["registradas"], respuesta.json()["analizado"]) == (1, False)
+
+    db = SessionLocal()
+    try:
+        lecturas = db.execute(select(LecturaMacro.periodo).where(LecturaMacro.id_macro_medidor == id_macro)).scalars().all()
+        assert [periodo.isoformat() for periodo in lecturas] == ["2017-05-01"]
+        nuevas = db.execute(
+            select(AuditoriaSistema.descripcion).where(AuditoriaSistema.id_auditoria_sistema > ultima_auditoria)
+        ).scalars().all()
+        assert any("macromedidores" in descripcion for descripcion in nuevas)
+    finally:
+        db.close()
@@ -0,0 +1,57 @@
+# tests/test_perfiles_carga.py
+"""Perfiles de carga: con SQL_RAISELOAD=1 una relación que el perfil no carga lanza error"""
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+
+@pytest.fixture
+def id_medidor(datos_base, crear_usuarios):
+    from db.session import SessionLocal
+    from models.affiliate import UsuarioAfiliado
+    from models.meter import Medidor
+    from services.affiliate_codes import siguiente_codigo
+
+    id_usuario, = crear_usuarios(1)
+    id_sector = datos_base["sectores"][0]
+    db = SessionLocal()
+    try:
+        afiliado = UsuarioAfiliado(
+            cod_usuario_afi=siguiente_codigo(db), fecha_afiliacion=date.today(),
+            id_sector=id_sector, id_usuario_sistema=id_usuario, activo=True
+        )
+        db.add(afiliado)
+        db.flush()
+        medidor = Medidor(num_medidor=f"PERFIL-{id_usuario}", id_usuario_afi=afiliado.id_usuario_afi,
+                          id_sector=id_sector, activo=True)
+        db.add(medidor)
+        db.commit()
+        return medidor.id_medidor
+    finally:
+        db.close()
+
+
+def test_raiseload_activo_en_pruebas():
+    from db.load_profiles import SQL_RAISELOAD
+
+    assert SQL_RAISELOAD
+
+
+@pytest.mark.parametrize("nombre", ["medidor_lista", "medidor_detalle"])
+def test_perfil_medidor_no_carga_relaciones_ajenas(id_medidor, nombre):
+    from db.load_profiles import perfil
+    from db.session import SessionLocal
+    from models.meter import Medidor
+
+    db = SessionLocal()
+    try:
+        medidor = db.query(Medidor).options(*perfil(nombre)).filter(Medidor.id_medidor == id_medidor).one()
+        # Lo que el perfil carga se lee sin consultas
+        assert medidor.usuario_afiliado.id_usuario_afi is not None
+        assert medidor.sector.nombre_sector
+        # Lo que no carga falla en lugar de consultar por fila
+        with pytest.raises(InvalidRequestError):
+            medidor.usuario_afiliado.usuario_sistema
+    finally:
+        db.close()
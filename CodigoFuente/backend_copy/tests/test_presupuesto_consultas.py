@@ -0,0 +1,191 @@
+# tests/test_presupuesto_consultas.py
+"""
+Presupuesto de consultas de los listados: cada endpoint con @max_queries se
+llama sobre datos con varias filas por relación (afiliados, medidores,
+lecturas, facturas, pagos, pérdidas, notificaciones, roles) y cliente_api
+verifica que no pase de su presupuesto ni repita una consulta por fila.
+Con raiseload("*") una relación que el perfil no carga responde 500.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+AFILIADOS = 8
+
+
+def _periodos(cantidad: int) -> list:
+    """Los `cantidad` meses anteriores al actual, del más antiguo al más reciente"""
+    mes = date.today().year * 12 + date.today().month - 1
+    return [date((mes - i) // 12, (mes - i) % 12 + 1, 1) for i in range(cantidad, 0, -1)]
+
+
+@pytest.fixture(scope="module")
+def datos_api(datos_base, crear_usuarios):
+    """Afiliados con medidor, lecturas de cuatro meses facturadas, pagos, macromedidores y notificaciones"""
+    from db.session import SessionLocal
+    from models.affiliate import UsuarioAfiliado
+    from models.collection import DeudaPeriodo
+    from models.invoice import Factura
+    from models.meter import Medidor
+    from models.role import Rol, RolAccion
+    from models.user import UsuarioSistema
+    from models.water_loss import MacroMedidor
+    from schemas.payment import PagoCreate
+    from services.affiliate_codes import reservar_codigos
+    from services.billing import facturar_periodo
+    from services.payments import cerrar_caja
+    from services.readings import registrar_lecturas
+    from services.water_loss import registrar_lecturas_macro
+    from security.jwt import create_access_token
+    from utils.notifications import registrar_notificacion
+
+    ids_usuario = crear_usuarios(AFILIADOS + 3)
+    sectores = datos_base["sectores"]
+    periodos = _periodos(4)
+    db = SessionLocal()
+    try:
+        afiliados = [
+            UsuarioAfiliado(cod_usuario_afi=codigo, fecha_afiliacion=date(2024, 1, 1), activo=True,
+                            id_sector=sectores[i % 2], id_usuario_sistema=ids_usuario[i])
+            for i, codigo in enumerate(reservar_codigos(db, AFILIADOS))
+        ]
+        # Afiliado sin medidor (/meters/available/affiliates)
+        afiliado_sin_medidor = UsuarioAfiliado(
+            cod_usuario_afi=reservar_codigos(db, 1)[0], fecha_afiliacion=date(2024, 1, 1), activo=True,
+            id_sector=sectores[0], id_usuario_sistema=ids_usuario[-1]
+        )
+        db.add_all(afiliados + [afiliado_sin_medidor])
+        db.flush()
+        medidores = [
+            Medidor(num_medidor=f"API-{afiliado.id_usuario_afi}", latitud=Decimal("-1.5") + Decimal(i) / 1000,
+                    longitud=Decimal("-78.5") + Decimal(i) / 1000, activo=True,
+                    id_usuario_afi=afiliado.id_usuario_afi, id_sector=afiliado.id_sector)
+            for i, afiliado in enumerate(afiliados)
+        ]
+        medidores.append(Medidor(num_medidor="API-LIBRE", activo=True, id_sector=sectores[0]))
+        macros = [MacroMedidor(num_macro_medidor=f"MACRO-{id_sector}", id_sector=id_sector, activo=True)
+                  for id_sector in sectores]
+        db.add_all(medidores + macros)
+
+        # Más roles con acciones y usuarios bloqueados para los listados de administración
+        for nombre in ("cajero", "lector", "cliente"):
+            rol = Rol(nombre_rol=nombre, activo=True)
+            db.add(rol)
+            db.flush()
+            db.add_all([RolAccion(id_rol=rol.id_rol, nombre_accion=modulo, tipo_accion="lectura", activo=True)
+                        for modulo in ("pagos", "lecturas", "clientes")])
+        db.execute(
+            update(UsuarioSistema)
+            .where(UsuarioSistema.id_usuario_sistema.in_(ids_usuario[AFILIADOS:AFILIADOS + 2]))
+            .values(bloqueado_permanente=True, intentos_fallidos=5)
+        )
+        for i in range(5):
+            registrar_notificacion(db, datos_base["id_admin"], f"Aviso {i}", "Mensaje de prueba")
+        db.commit()
+
+        # Lecturas: el primer medidor queda sin consumo (alerta de consumo cero)
+        for mes, periodo in enumerate(periodos):
+            lecturas = [
+                SimpleNamespace(id_medidor=medidor.id_medidor, periodo=periodo, fecha_lectura=None,
+                                observacion=None, foto_hash=None,
+                                lectura_actual=Decimal(100) if i == 0 else Decimal(100 + mes * (10 + i)))
+                for i, medidor in enumerate(medidores[:AFILIADOS])
+            ]
+            registrar_lecturas(db, lecturas)
+            registrar_lecturas_macro(db, [
+                SimpleNamespace(id_macro_medidor=macro.id_macro_medidor, periodo=periodo, fecha_lectura=None,
+                                observacion=None, lectura_actual=Decimal(1000 + mes * 200))
+                for macro in macros
+            ])
+            facturar_periodo(db, periodo, estimar=False)
+
+        cerrar_caja(db, datos_base["id_admin"], pagos=[
+            PagoCreate(clave_idempotencia=f"prueba-api-{afiliado.id_usuario_afi}", id_usuario_afi=afiliado.id_usuario_afi,
+                       monto=Decimal("2.50"), metodo="efectivo")
+            for afiliado in afiliados[:AFILIADOS // 2]
+        ], monto_declarado=None, observacion=None, clave_idempotencia=None)
+
+        # Deuda del primer mes vencida hace 90 días (antigüedad y candidatos a corte)
+        emision = datetime.now() - timedelta(days=90)
+        db.execute(update(Factura).where(Factura.periodo == periodos[0]).values(fecha_emision=emision))
+        db.execute(update(DeudaPeriodo).where(DeudaPeriodo.periodo == periodos[0]).values(fecha_emision=emision.date()))
+        db.commit()
+
+        return {
+            "periodos": periodos,
+            "id_rol": datos_base["id_rol"],
+            "sectores": sectores,
+            # Usuario afiliado: ve su propio consumo en /clientes/me/consumo
+            "token_cliente": create_access_token({
+                "sub": db.get(UsuarioSistema, ids_usuario[1]).usuario, "id_usuario_sistema": ids_usuario[1]
+            }),
+        }
+    finally:
+        db.close()
+
+
+def _listados(datos: dict) -> list:
+    """(url, usa token del cliente) de cada endpoint con @max_queries, con y sin filtros"""
+    periodo = datos["periodos"][-1].isoformat()
+    return [
+        ("/affiliates/", False),
+        ("/affiliates/?search=Nombre", False),
+        ("/affiliates/?fields=cod_usuario_afi,usuario", False),
+        ("/affiliates/available/users", False),
+        ("/admin/blocked-users", False),
+        ("/cobranza/aging", False),
+        ("/cobranza/aging?rango=0_30", False),
+        ("/cobranza/candidatos-corte?dias_minimo=1&monto_minimo=0", False),
+        ("/meters/", False),
+        ("/meters/?search=API&fields=num_medidor,usuario_afiliado,sector", False),
+        ("/meters/available/affiliates", False),
+        ("/meters/bbox?min_lat=-2&min_lon=-79&max_lat=0&max_lon=-77", False),
+        ("/meters/nearest?lat=-1.5&lon=-78.5", False),
+        ("/notifications/", False),
+        ("/payments/affiliates?q=Nombre", False),
+        ("/payments/", False),
+        ("/payments/cierre-caja", False),
+        ("/readings/alerts", False),
+        ("/roles/", False),
+        (f"/roles/{datos['id_rol']}/acciones", False),
+        ("/sectors/", False),
+        ("/sectors/?search=Sector", False),
+        ("/sectors/stats/consumo", False),
+        ("/users", False),
+        ("/users?search=Nombre&fields=id,usuario,rol,permisos", False),
+        ("/users/admin/blocked-users", False),
+        ("/perdidas/macro-medidores", False),
+        (f"/perdidas/?periodo={periodo}", False),
+        ("/perdidas/serie", False),
+        ("/clientes/me/consumo", True),
+    ]
+
+
+def test_listados_dentro_del_presupuesto(cliente_api, datos_api):
+    vacios = []
+    for url, como_cliente in _listados(datos_api):
+        respuesta = cliente_api.get(url, token=datos_api["token_cliente"] if como_cliente else None)
+        assert respuesta.status_code == 200, f"{url}: {respuesta.status_code} {respuesta.text[:300]}"
+        assert cliente_api.max_consultas is not None, f"{url} no tiene @max_queries"
+        if not respuesta.json():
+            vacios.append(url)
+    # Un listado vacío no prueba el N+1: los datos de prueba deben llenarlos
+    assert vacios == []
+
+
+def test_todos_los_listados_con_presupuesto_estan_probados(datos_api):
+    import main
+    from fastapi.routing import APIRoute
+
+    con_presupuesto = {
+        ruta.path for ruta in main.app.routes
+        if isinstance(ruta, APIRoute) and hasattr(ruta.endpoint, "max_consultas")
+    }
+    probados = set()
+    for url, _ in _listados(datos_api):
+        ruta = url.split("?")[0].replace(f"/{datos_api['id_rol']}/", "/{id_rol}/")
+        probados.add(ruta if ruta in con_presupuesto else ruta.rstrip("/"))
+    assert con_presupuesto - probados == set()
@@ -0,0 +1,179 @@
+# utils/blob_storage.py
+"""
+Almacenamiento de archivos por contenido (fotos de lecturas, fotos de perfil)
+
+- Cada archivo se guarda una sola vez con su SHA-256 como nombre; subir la
+  misma foto dos veces no ocupa más espacio.
+- Directorios repartidos por los primeros caracteres del hash
+  (BLOB_DIR/ab/cd/abcd...) para no tener miles de archivos en una carpeta.
+- Se escribe en un temporal del mismo disco y se renombra (os.replace), así
+  nunca se lee un archivo a medio escribir.
+- El tipo de las imágenes se toma de sus primeros bytes (tipo_imagen), no
+  del nombre ni del Content-Type que manda el cliente.
+- Las miniaturas las genera un hilo en segundo plano (necesita Pillow; si no
+  está instalado solo se guardan los originales).
+"""
+import hashlib
+import os
+import queue
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él no hay miniaturas
+    Image = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BLOB_DIR = Path(os.getenv("BLOB_DIR", BASE_DIR / "archivos"))
+BLOB_TAMANO_MAXIMO = int(os.getenv("BLOB_TAMANO_MAXIMO", 10 * 1024 * 1024))
+BLOB_MINIATURA_PX = int(os.getenv("BLOB_MINIATURA_PX", 320))
+BLOQUE = 64 * 1024
+
+_HASH_VALIDO = re.compile(r"^[0-9a-f]{64}$")
+
+# Firmas (primeros bytes) de los formatos de imagen que se aceptan
+FIRMAS_IMAGEN = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def hash_valido(hash_blob: str) -> bool:
+    return bool(hash_blob) and _HASH_VALIDO.match(hash_blob) is not None
+
+
+def ruta_blob(hash_blob: str) -> Path:
+    return BLOB_DIR / hash_blob[:2] / hash_blob[2:4] / hash_blob
+
+
+def ruta_miniatura(hash_blob: str) -> Path:
+    return BLOB_DIR / "miniaturas" / hash_blob[:2] / hash_blob[2:4] / f"{hash_blob}.jpg"
+
+
+def existe_blob(hash_blob: str) -> bool:
+    return hash_valido(hash_blob) and ruta_blob(hash_blob).is_file()
+
+
+def tipo_imagen(cabecera: bytes) -> Optional[str]:
+    """Tipo MIME de la imagen según sus primeros bytes (None si no se reconoce)"""
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    for firma, tipo in FIRMAS_IMAGEN:
+        if cabecera.startswith(firma):
+            return tipo
+    return None
+
+
+# ========================================
+# ESCRITURA Y LECTURA
+# ========================================
+def guardar_stream(origen: BinaryIO, limite: int = BLOB_TAMANO_MAXIMO) -> Tuple[str, int, bool]:
+    """
+    Guarda el contenido de un archivo abierto calculando el hash por bloques
+    (no se carga completo en memoria) -> (hash, tamaño, ya_existia).
+    Lanza ValueError si supera el límite.
+    """
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    sha = hashlib.sha256()
+    tamano = 0
+    descriptor, temporal = tempfile.mkstemp(dir=BLOB_DIR, prefix=".subida_")
+    try:
+        with os.fdopen(descriptor, "wb") as destino:
+            while True:
+                bloque = origen.read(BLOQUE)
+                if not bloque:
+                    break
+                tamano += len(bloque)
+                if tamano > limite:
+                    raise ValueError(f"El archivo supera el máximo de {limite // (1024 * 1024)} MB")
+                sha.update(bloque)
+                destino.write(bloque)
+
+        hash_blob = sha.hexdigest()
+        ruta = ruta_blob(hash_blob)
+        if ruta.is_file():
+            return hash_blob, tamano, True
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temporal, ruta)
+        return hash_blob, tamano, False
+    finally:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+
+
+def guardar_bytes(contenido: bytes) -> Tuple[str, int, bool]:
+    """Igual que guardar_stream para contenido que ya está en memoria"""
+    hash_blob = hashlib.sha256(contenido).hexdigest()
+    ruta = ruta_blob(hash_blob)
+    if ruta.is_file():
+        return hash_blob, len(contenido), True
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=".subida_")
+    with os.fdopen(descriptor, "wb") as destino:
+        destino.write(contenido)
+    os.replace(temporal, ruta)
+    return hash_blob, len(contenido), False
+
+
+def leer_blob(hash_blob: str) -> Optional[bytes]:
+    """Contenido completo (para archivos pequeños, p. ej. fotos de perfil)"""
+    if not existe_blob(hash_blob):
+        return None
+    return ruta_blob(hash_blob).read_bytes()
+
+
+# ========================================
+# MINIATURAS (HILO EN SEGUNDO PLANO)
+# ========================================
+_cola_miniaturas: "queue.Queue[str]" = queue.Queue()
+_hilo_miniaturas: Optional[threading.Thread] = None
+_hilo_lock = threading.Lock()
+
+
+def generar_miniatura(hash_blob: str) -> bool:
+    """Crea la miniatura JPEG del blob (False si no es imagen o no hay Pillow)"""
+    destino = ruta_miniatura(hash_blob)
+    if destino.is_file():
+        return True
+    if Image is None or not existe_blob(hash_blob):
+        return False
+    try:
+        with Image.open(ruta_blob(hash_blob)) as imagen:
+            imagen.thumbnail((BLOB_MINIATURA_PX, BLOB_MINIATURA_PX))
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=destino.parent, prefix=".miniatura_")
+            with os.fdopen(descriptor, "wb") as salida:
+                imagen.convert("RGB").save(salida, "JPEG", quality=80, optimize=True)
+            os.replace(temporal, destino)
+        return True
+    except Exception as e:
+        print(f"⚠️ No se pudo generar la miniatura de {hash_blob}: {e}")
+        return False
+
+
+def _trabajador_miniaturas():
+    while True:
+        hash_blob = _cola_miniaturas.get()
+        try:
+            generar_miniatura(hash_blob)
+        finally:
+            _cola_miniaturas.task_done()
+
+
+def encolar_miniatura(hash_blob: str) -> None:
+    """Pide la miniatura al hilo de fondo (se inicia con el primer pedido)"""
+    global _hilo_miniaturas
+    if Image is None:
+        return
+    with _hilo_lock:
+        if _hilo_miniaturas is None or not _hilo_miniaturas.is_alive():
+            _hilo_miniaturas = threading.Thread(target=_trabajador_miniaturas, name="miniaturas", daemon=True)
+            _hilo_miniaturas.start()
+    _cola_miniaturas.put(hash_blob)
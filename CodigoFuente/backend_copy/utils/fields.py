@@ -0,0 +1,62 @@
+# utils/fields.py
+"""
+Campos dispersos (?fields=) para listados y detalles
+
+Cada endpoint declara su lista blanca de claves de la respuesta; por cada
+clave, las columnas que necesita y cómo se arma su valor desde la fila:
+
+    CAMPOS = CamposPermitidos({
+        "id": ([Modelo.id], lambda f: f.id),
+        "sector": ([Sector.id_sector, Sector.nombre_sector], lambda f: {...}),
+    })
+
+    elegidos = CAMPOS.elegir(fields)               # 400 si piden una clave fuera de la lista
+    stmt = select(*CAMPOS.columnas(elegidos))      # solo las columnas de esas claves
+    [CAMPOS.respuesta(fila, elegidos) for fila in filas]
+
+Los JOIN se agregan solo si la consulta usa columnas de la tabla
+(usa_tabla), así la consulta y el JSON se reducen juntos.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+class CamposPermitidos:
+    """Lista blanca de campos de un endpoint: clave -> (columnas, valor(fila))"""
+
+    def __init__(self, campos: Dict[str, Tuple[list, Callable]], por_defecto: Optional[Iterable[str]] = None):
+        self.campos = campos
+        self.por_defecto = tuple(por_defecto) if por_defecto is not None else tuple(campos)
+
+    def elegir(self, fields: Optional[str]) -> Tuple[str, ...]:
+        """'id,nombres,sector' -> claves en el orden de la lista blanca (sin fields: las por defecto)"""
+        if fields is None:
+            return self.por_defecto
+
+        pedidos = {campo.strip() for campo in fields.split(",") if campo.strip()}
+        desconocidos = pedidos - set(self.campos)
+        if not pedidos or desconocidos:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos no válidos: {', '.join(sorted(desconocidos)) or fields!r}. "
+                       f"Disponibles: {', '.join(self.campos)}"
+            )
+        return tuple(clave for clave in self.campos if clave in pedidos)
+
+    def columnas(self, elegidos: Iterable[str]) -> List:
+        """Columnas para select() de las claves elegidas (sin repetir)"""
+        columnas = {}
+        for clave in elegidos:
+            for columna in self.campos[clave][0]:
+                columnas.setdefault(columna.key, columna)
+        return list(columnas.values())
+
+    def respuesta(self, fila, elegidos: Iterable[str]) -> dict:
+        """Fila de la consulta -> dict con las claves elegidas"""
+        return {clave: self.campos[clave][1](fila) for clave in elegidos}
+
+
+def usa_tabla(stmt, modelo) -> bool:
+    """True si las columnas o filtros de la consulta usan la tabla del modelo"""
+    return modelo.__table__ in stmt.get_final_froms()
@@ -0,0 +1,231 @@
+# utils/invoice_pdf.py
+"""
+Generación de facturas en PDF
+
+- La plantilla se compila una sola vez por proceso (lru_cache).
+- Los lotes grandes se reparten en un pool de procesos.
+- Los PDF individuales se guardan en caché por hash del contenido.
+"""
+import hashlib
+import io
+import json
+import os
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from string import Template
+from threading import Lock
+from typing import Iterable, Iterator, List, Tuple
+
+# Cambiar la versión invalida todos los PDF cacheados
+VERSION_PLANTILLA = "1"
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PDF_CHUNKSIZE = int(os.getenv("PDF_CHUNKSIZE", 64))
+PDF_CACHE_MAX = int(os.getenv("PDF_CACHE_MAX", 2000))
+
+# (x, y, tamaño de fuente, texto) sobre una página A4 (595 x 842 pt)
+PLANTILLA_FACTURA = [
+    (50, 790, 16, "JAAP Sanjapamba"),
+    (50, 772, 10, "Factura de consumo de agua potable"),
+    (380, 790, 11, "Factura N° $num_factura"),
+    (380, 775, 9, "Emisión: $fecha_emision"),
+    (50, 730, 10, "Afiliado: $nombre_afiliado"),
+    (50, 715, 10, "Cédula: $cedula"),
+    (50, 700, 10, "Código de afiliado: $cod_usuario_afi"),
+    (50, 685, 10, "Sector: $nombre_sector"),
+    (50, 670, 10, "Medidor: $num_medidor"),
+    (50, 640, 10, "Periodo: $periodo"),
+    (50, 622, 10, "Lectura anterior: $lectura_anterior"),
+    (50, 607, 10, "Lectura actual: $lectura_actual"),
+    (50, 592, 10, "Consumo (m3): $consumo"),
+    (50, 562, 10, "Subtotal: $$ $subtotal"),
+    (50, 540, 12, "TOTAL A PAGAR: $$ $total"),
+]
+
+
+def _escapar(texto: str) -> bytes:
+    """Escapa un texto para usarlo como literal de cadena PDF (WinAnsi)"""
+    texto = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return texto.encode("cp1252", errors="replace")
+
+
+@lru_cache(maxsize=None)
+def _plantilla_compilada() -> Tuple[tuple, ...]:
+    """
+    Compila la plantilla una sola vez por proceso.
+    Las líneas sin variables quedan pre-codificadas como bytes.
+    """
+    compilada = []
+    for x, y, size, texto in PLANTILLA_FACTURA:
+        prefijo = f"BT /F1 {size} Tf {x} {y} Td (".encode("ascii")
+        sufijo = b") Tj ET\n"
+        plantilla = Template(texto)
+        if plantilla.get_identifiers():
+            compilada.append((prefijo, plantilla, sufijo))
+        else:
+            compilada.append((prefijo + _escapar(plantilla.safe_substitute()) + sufijo, None, None))
+    return tuple(compilada)
+
+
+def renderizar_contenido(datos: dict) -> bytes:
+    """Genera el flujo de contenido (una página) para una factura"""
+    partes = []
+    for prefijo, plantilla, sufijo in _plantilla_compilada():
+        if plantilla is None:
+            partes.append(prefijo)
+        else:
+            partes.append(prefijo + _escapar(plantilla.safe_substitute(datos)) + sufijo)
+    return b"".join(partes)
+
+
+def escribir_pdf(destino, contenidos: Iterable[bytes], paginas: int) -> None:
+    """
+    Escribe en `destino` (archivo o stream) un PDF con una página por cada
+    flujo de contenido, a medida que llegan: solo se guardan los offsets de
+    los objetos para la tabla xref. `paginas` es la cantidad de contenidos.
+    """
+    offsets = []
+    posicion = 0
+
+    def escribir(datos: bytes):
+        nonlocal posicion
+        destino.write(datos)
+        posicion += len(datos)
+
+    def objeto(cuerpo: bytes):
+        offsets.append(posicion)
+        escribir(f"{len(offsets)} 0 obj\n".encode("ascii") + cuerpo + b"\nendobj\n")
+
+    # Cada página ocupa dos objetos (página y contenido) a partir del 4
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(paginas))
+    escribir(b"%PDF-1.4\n")
+    objeto(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objeto(f"<< /Type /Pages /Kids [{kids}] /Count {paginas} >>".encode("ascii"))
+    objeto(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    escritas = 0
+    for contenido in contenidos:
+        num_pagina = len(offsets) + 1
+        objeto(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {num_pagina + 1} 0 R >>".encode("ascii")
+        )
+        objeto(f"<< /Length {len(contenido)} >>\nstream\n".encode("ascii") + contenido + b"\nendstream")
+        escritas += 1
+    if escritas != paginas:
+        raise ValueError(f"Se esperaban {paginas} páginas y llegaron {escritas}")
+
+    inicio_xref = posicion
+    escribir(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    for offset in offsets:
+        escribir(f"{offset:010d} 00000 n \n".encode("ascii"))
+    escribir((
+        f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{inicio_xref}\n%%EOF\n"
+    ).encode("ascii"))
+
+
+def construir_pdf(contenidos: List[bytes]) -> bytes:
+    """
+    Arma un documento PDF en memoria con una página por cada flujo de
+    contenido (facturas individuales).
+    """
+    salida = io.BytesIO()
+    escribir_pdf(salida, contenidos, len(contenidos))
+    return salida.getvalue()
+
+
+def renderizar_factura_pdf(datos: dict) -> bytes:
+    """Genera el PDF de una sola factura"""
+    return construir_pdf([renderizar_contenido(datos)])
+
+
+# ========================================
+# CACHÉ POR HASH DE CONTENIDO
+# ========================================
+_cache_pdf: "OrderedDict[str, bytes]" = OrderedDict()
+_cache_lock = Lock()
+
+
+def hash_contenido(datos: dict) -> str:
+    """Hash estable de los datos de la factura + versión de la plantilla"""
+    serializado = json.dumps(datos, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(f"{VERSION_PLANTILLA}:{serializado}".encode("utf-8")).hexdigest()
+
+
+def obtener_pdf_cacheado(datos: dict) -> Tuple[str, bytes]:
+    """
+    Devuelve (hash, bytes) del PDF de la factura.
+    Si el contenido no cambió, se reutilizan los bytes ya renderizados.
+    """
+    clave = hash_contenido(datos)
+    with _cache_lock:
+        pdf = _cache_pdf.get(clave)
+        if pdf is not None:
+            _cache_pdf.move_to_end(clave)
+            return clave, pdf
+
+    pdf = renderizar_factura_pdf(datos)
+
+    with _cache_lock:
+        _cache_pdf[clave] = pdf
+        while len(_cache_pdf) > PDF_CACHE_MAX:
+            _cache_pdf.popitem(last=False)
+    return clave, pdf
+
+
+# ========================================
+# RENDERIZADO EN PARALELO
+# ========================================
+_pool = None
+_pool_lock = Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido, creado bajo demanda"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def renderizar_lote(lista_datos: List[dict], combinado: bool = False) -> Iterator[bytes]:
+    """
+    Renderiza un lote de facturas en el pool de procesos, en el mismo orden.
+
+    combinado=False -> un PDF completo por factura (para ZIP)
+    combinado=True  -> solo flujos de contenido (para un PDF combinado)
+    """
+    funcion = renderizar_contenido if combinado else renderizar_factura_pdf
+    if PDF_WORKERS <= 1 or len(lista_datos) < PDF_CHUNKSIZE:
+        return map(funcion, lista_datos)
+    return _get_pool().map(funcion, lista_datos, chunksize=PDF_CHUNKSIZE)
+
+
+def escribir_pdf_combinado(destino, lista_datos: List[dict]) -> None:
+    """
+    Escribe en `destino` un solo PDF con todas las facturas del lote, listo
+    para imprimir. Cada página se escribe apenas sale del pool.
+    """
+    escribir_pdf(destino, renderizar_lote(lista_datos, combinado=True), len(lista_datos))
+
+
+def escribir_zip(destino, lista_datos: List[dict]) -> None:
+    """
+    Escribe en `destino` (archivo o stream) un ZIP con un PDF por factura.
+    Cada PDF se agrega apenas sale del pool, sin acumular el lote en memoria.
+    """
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED) as zf:
+        for datos, pdf in zip(lista_datos, renderizar_lote(lista_datos)):
+            zf.writestr(f"factura_{datos['num_factura']}.pdf", pdf)
+
+
+def agrupar_por_sector(lista_datos: Iterable[dict]) -> "OrderedDict[str, List[dict]]":
+    """Agrupa los datos de facturas por nombre de sector"""
+    grupos: "OrderedDict[str, List[dict]]" = OrderedDict()
+    for datos in lista_datos:
+        grupos.setdefault(datos.get("nombre_sector") or "sin_sector", []).append(datos)
+    return grupos
@@ -0,0 +1,216 @@
+# utils/metrics.py
+"""
+Métricas por ruta en formato de texto de Prometheus (GET /metrics)
+
+MetricasMiddleware registra cada petición HTTP bajo la plantilla de su ruta
+(/meters/{id_medidor}, no la URL concreta; las URL sin ruta van a
+"<sin_ruta>" para no crear una serie por URL):
+
+- http_request_duration_seconds: histograma de latencia (hasta enviar el
+  último byte de la respuesta; las tareas en segundo plano no cuentan).
+- http_requests_total: peticiones por código de estado.
+- http_request_db_queries_total / http_request_db_seconds_total: sentencias
+  SQL y tiempo en la base, medidos con los eventos before/after_cursor_execute
+  de todos los engines (síncrono y async).
+- http_response_size_bytes_total: bytes del cuerpo de las respuestas.
+
+Los contadores son enteros y floats en objetos con __slots__ y el histograma
+tiene los buckets fijos: registrar una petición no crea objetos nuevos salvo
+la primera vez que aparece una ruta o un código de estado. Todo se actualiza
+desde el event loop (un hilo); los endpoints síncronos solo suman sus
+consultas al contador de su petición.
+
+exportar() agrega el estado de los pools de conexiones (estadisticas_pool).
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db.session import estadisticas_pool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SIN_RUTA = "<sin_ruta>"
+
+# Límites superiores de los buckets de latencia (segundos)
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ========================================
+# CONSULTAS SQL POR PETICIÓN
+# ========================================
+class ConsultasPeticion:
+    """Sentencias SQL y segundos en la base de la petición en curso"""
+    __slots__ = ("sentencias", "segundos")
+
+    def __init__(self):
+        self.sentencias = 0
+        self.segundos = 0.0
+
+
+# El threadpool de Starlette y las sesiones async (greenlet) copian el
+# contexto: las consultas de la petición suman a su propio contador.
+_consultas_peticion: ContextVar[Optional[ConsultasPeticion]] = ContextVar("consultas_peticion", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    if _consultas_peticion.get() is not None:
+        context._inicio_metricas = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    consultas = _consultas_peticion.get()
+    if consultas is not None:
+        consultas.sentencias += 1
+        consultas.segundos += time.perf_counter() - context._inicio_metricas
+
+
+# ========================================
+# REGISTRO POR RUTA
+# ========================================
+class MetricasRuta:
+    __slots__ = ("estados", "buckets", "suma", "cuenta", "sentencias", "segundos_sql", "bytes")
+
+    def __init__(self):
+        self.estados: Dict[int, int] = {}
+        self.buckets = [0] * (len(BUCKETS_LATENCIA) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+        self.sentencias = 0
+        self.segundos_sql = 0.0
+        self.bytes = 0
+
+
+_rutas: Dict[Tuple[str, str], MetricasRuta] = {}
+
+
+def observar(metodo: str, ruta: str, estado: int, duracion: float, consultas: ConsultasPeticion, tamano: int):
+    """Suma una petición terminada a las métricas de su ruta"""
+    metricas = _rutas.get((metodo, ruta))
+    if metricas is None:
+        metricas = _rutas[(metodo, ruta)] = MetricasRuta()
+
+    metricas.estados[estado] = metricas.estados.get(estado, 0) + 1
+    metricas.buckets[bisect_left(BUCKETS_LATENCIA, duracion)] += 1
+    metricas.suma += duracion
+    metricas.cuenta += 1
+    metricas.sentencias += consultas.sentencias
+    metricas.segundos_sql += consultas.segundos
+    metricas.bytes += tamano
+
+
+# ========================================
+# MIDDLEWARE
+# ========================================
+class MetricasMiddleware:
+    """Middleware ASGI: mide cada petición HTTP y la registra bajo su ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        consultas = ConsultasPeticion()
+        token = _consultas_peticion.set(consultas)
+        inicio = time.perf_counter()
+        estado = 500
+        tamano = 0
+        duracion = None
+
+        async def enviar(mensaje):
+            nonlocal estado, tamano, duracion
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                tamano += len(mensaje.get("body", b""))
+                if not mensaje.get("more_body", False):
+                    duracion = time.perf_counter() - inicio
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _consultas_peticion.reset(token)
+            if duracion is None:  # error sin respuesta completa
+                duracion = time.perf_counter() - inicio
+            ruta = scope.get("route")
+            observar(scope["method"], getattr(ruta, "path", SIN_RUTA), estado, duracion, consultas, tamano)
+
+
+# ========================================
+# EXPOSICIÓN (formato de texto de Prometheus)
+# ========================================
+def _etiquetas(**valores) -> str:
+    partes = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar(pools: Optional[dict] = None) -> str:
+    """Métricas de las rutas (y de los pools {"nombre": engine}) en formato Prometheus"""
+    rutas = sorted(_rutas.items())
+    lineas = [
+        "# HELP http_request_duration_seconds Latencia de las peticiones por ruta",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (metodo, ruta), m in rutas:
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS_LATENCIA + ("+Inf",), m.buckets):
+            acumulado += cantidad
+            le = limite if limite == "+Inf" else repr(limite)
+            lineas.append(f"http_request_duration_seconds_bucket{_etiquetas(method=metodo, route=ruta, le=le)} {acumulado}")
+        etiquetas = _etiquetas(method=metodo, route=ruta)
+        lineas.append(f"http_request_duration_seconds_sum{etiquetas} {_numero(m.suma)}")
+        lineas.append(f"http_request_duration_seconds_count{etiquetas} {m.cuenta}")
+
+    lineas += [
+        "# HELP http_requests_total Peticiones por ruta y código de estado",
+        "# TYPE http_requests_total counter",
+    ]
+    for (metodo, ruta), m in rutas:
+        for estado, cantidad in sorted(m.estados.items()):
+            lineas.append(f"http_requests_total{_etiquetas(method=metodo, route=ruta, status=estado)} {cantidad}")
+
+    contadores = (
+        ("http_request_db_queries_total", "Sentencias SQL ejecutadas por ruta", "sentencias"),
+        ("http_request_db_seconds_total", "Segundos en la base (SQL) por ruta", "segundos_sql"),
+        ("http_response_size_bytes_total", "Bytes del cuerpo de las respuestas por ruta", "bytes"),
+    )
+    for nombre, ayuda, campo in contadores:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+        for (metodo, ruta), m in rutas:
+            lineas.append(f"{nombre}{_etiquetas(method=metodo, route=ruta)} {_numero(getattr(m, campo))}")
+
+    if pools:
+        estados = {nombre: estadisticas_pool(engine_medido) for nombre, engine_medido in pools.items()}
+        metricas_pool = (
+            ("db_pool_size", "gauge", "Conexiones fijas del pool", "tamano", 1),
+            ("db_pool_checked_out", "gauge", "Conexiones en uso", "en_uso", 1),
+            ("db_pool_overflow", "gauge", "Conexiones abiertas sobre el tamaño fijo", "overflow", 1),
+            ("db_pool_waits_total", "counter", "Pedidos de conexión al pool", "esperas", 1),
+            ("db_pool_wait_seconds_avg", "gauge", "Espera promedio por una conexión", "espera_promedio_ms", 1000),
+            ("db_pool_wait_seconds_max", "gauge", "Espera máxima por una conexión", "espera_maxima_ms", 1000),
+            ("db_pool_timeouts_total", "counter", "Pedidos de conexión que vencieron el timeout", "timeouts", 1),
+        )
+        for nombre, tipo, ayuda, clave, divisor in metricas_pool:
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+            for pool, estado in estados.items():
+                if clave in estado:
+                    valor = estado[clave] / divisor if divisor != 1 else estado[clave]
+                    lineas.append(f"{nombre}{_etiquetas(pool=pool)} {_numero(valor)}")
+
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,25 @@
+# utils/search.py
+"""
+Filtros de búsqueda por prefijo que aprovechan índices btree
+
+lower(columna) LIKE 'texto%' usa los índices con text_pattern_ops; un
+patrón '%texto%' obliga a recorrer toda la tabla.
+"""
+from sqlalchemy import func, or_
+
+
+def patron_prefijo(texto: str) -> str:
+    """'Pé_rez' -> 'pé\\_rez%' (escapa los comodines de LIKE)"""
+    texto = texto.strip().lower()
+    for caracter in ("\\", "%", "_"):
+        texto = texto.replace(caracter, "\\" + caracter)
+    return texto + "%"
+
+
+def filtro_prefijo(texto: str, *columnas, minusculas: bool = True):
+    """Alguna de las columnas empieza con el texto"""
+    patron = patron_prefijo(texto)
+    return or_(*(
+        (func.lower(columna) if minusculas else columna).like(patron, escape="\\")
+        for columna in columnas
+    ))
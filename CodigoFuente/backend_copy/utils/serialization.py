@@ -0,0 +1,51 @@
+# utils/serialization.py
+"""
+Serialización JSON rápida para las respuestas
+
+- RespuestaJSON: clase de respuesta por defecto de la aplicación; codifica
+  con orjson (si no está instalado, con json de la biblioteca estándar).
+- respuesta_json(): para listados que arman sus filas directamente desde la
+  consulta (tuplas de columnas). Devuelve la respuesta ya codificada, así
+  FastAPI no vuelve a validar cada fila con el response_model (que queda en
+  el decorador solo para la documentación).
+
+Los Decimal se codifican como texto, igual que lo hacía Pydantic.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json
+    orjson = None
+
+
+def _por_defecto(valor: Any):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):  # solo para json (orjson los codifica solo)
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def a_json(contenido: Any) -> bytes:
+    """Contenido -> bytes JSON (UTF-8, sin espacios)"""
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_por_defecto, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(contenido, default=_por_defecto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespuestaJSON(JSONResponse):
+    """JSONResponse codificada con orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return a_json(content)
+
+
+def respuesta_json(contenido: Any, status_code: int = 200) -> RespuestaJSON:
+    """Respuesta sin pasar por la validación del response_model (contenido de confianza)"""
+    return RespuestaJSON(contenido, status_code=status_code)
@@ -0,0 +1,160 @@
+# utils/spatial.py
+"""
+Utilidades espaciales para coordenadas de medidores
+
+- proyectar(): latitud/longitud (y altitud) a metros en un plano local
+  (equirectangular alrededor de la latitud media; suficiente para un sector).
+- IndiceGrilla: índice espacial de grilla uniforme sobre los puntos proyectados.
+  Las celdas se guardan en formato CSR (puntos ordenados por celda + inicio de
+  cada celda), así una consulta solo revisa las celdas cercanas.
+- dentro_poligono(): prueba punto en polígono vectorizada (ray casting).
+- distancia_metros(): distancia haversine vectorizada.
+"""
+import math
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+METROS_POR_GRADO = 111_320.0
+RADIO_TIERRA = 6_371_008.8
+
+
+def proyectar(latitud: np.ndarray, longitud: np.ndarray, altitud: Optional[np.ndarray] = None,
+              latitud_referencia: Optional[float] = None) -> np.ndarray:
+    """
+    Convierte coordenadas geográficas a metros (x, y[, z]).
+    Con altitud retorna tres columnas (la altura pesa en el recorrido a pie).
+    """
+    latitud = np.asarray(latitud, dtype=np.float64)
+    longitud = np.asarray(longitud, dtype=np.float64)
+    if latitud_referencia is None:
+        latitud_referencia = float(latitud.mean()) if len(latitud) else 0.0
+    columnas = [
+        longitud * METROS_POR_GRADO * math.cos(math.radians(latitud_referencia)),
+        latitud * METROS_POR_GRADO,
+    ]
+    if altitud is not None:
+        altitud = np.asarray(altitud, dtype=np.float64)
+        columnas.append(np.where(np.isnan(altitud), np.nanmean(altitud) if np.any(~np.isnan(altitud)) else 0.0, altitud))
+    return np.column_stack(columnas) if len(latitud) else np.empty((0, len(columnas)))
+
+
+def distancia_metros(latitud1, longitud1, latitud2, longitud2) -> np.ndarray:
+    """Distancia sobre la superficie terrestre (haversine), en metros"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (latitud1, longitud1, latitud2, longitud2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA * np.arcsin(np.sqrt(a))
+
+
+def dentro_poligono(latitud: np.ndarray, longitud: np.ndarray, poligono: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Máscara de los puntos dentro del polígono [(lat, lon), ...] (ray casting vectorizado)"""
+    latitud = np.asarray(latitud, dtype=np.float64)
+    longitud = np.asarray(longitud, dtype=np.float64)
+    dentro = np.zeros(len(latitud), dtype=bool)
+    vertices = list(poligono)
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, vertices[1:] + vertices[:1]):
+        cruza = (lat1 > latitud) != (lat2 > latitud)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_corte = (lon2 - lon1) * (latitud - lat1) / (lat2 - lat1) + lon1
+        dentro ^= cruza & (longitud < lon_corte)
+    return dentro
+
+
+class IndiceGrilla:
+    """
+    Índice espacial de grilla uniforme sobre puntos en metros (usa x, y).
+    El lado de la celda se elige para tener en promedio `por_celda` puntos.
+    """
+
+    def __init__(self, puntos: np.ndarray, por_celda: int = 4):
+        self.puntos = np.asarray(puntos, dtype=np.float64)
+        xy = self.puntos[:, :2]
+        n = len(xy)
+
+        self.minimo = xy.min(axis=0) if n else np.zeros(2)
+        extension = (xy.max(axis=0) - self.minimo) if n else np.zeros(2)
+        area = max(float(extension[0]) * float(extension[1]), float(max(extension.max(), 1.0)) ** 2 / max(n, 1))
+        self.lado = max(math.sqrt(area * por_celda / max(n, 1)), 1.0)
+        self.dimensiones = (np.floor(extension / self.lado).astype(np.int64) + 1)
+
+        celdas = self._celdas(xy)
+        clave = celdas[:, 0] * self.dimensiones[1] + celdas[:, 1]
+        self.orden = np.argsort(clave, kind="stable")
+        conteo = np.bincount(clave, minlength=int(self.dimensiones.prod()))
+        self.inicio = np.concatenate(([0], np.cumsum(conteo)))
+
+    def _celdas(self, xy: np.ndarray) -> np.ndarray:
+        celdas = np.floor((xy - self.minimo) / self.lado).astype(np.int64)
+        return np.clip(celdas, 0, self.dimensiones - 1)
+
+    def _en_bloque(self, cx0: int, cy0: int, cx1: int, cy1: int) -> np.ndarray:
+        """Índices de los puntos en el rectángulo de celdas [cx0..cx1] x [cy0..cy1]"""
+        cx0, cy0 = max(cx0, 0), max(cy0, 0)
+        cx1, cy1 = min(cx1, self.dimensiones[0] - 1), min(cy1, self.dimensiones[1] - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.int64)
+        # Cada columna de celdas (cx fijo, cy0..cy1) es un tramo contiguo en self.orden
+        tramos = [
+            self.orden[self.inicio[cx * self.dimensiones[1] + cy0]:self.inicio[cx * self.dimensiones[1] + cy1 + 1]]
+            for cx in range(cx0, cx1 + 1)
+        ]
+        return np.concatenate(tramos) if tramos else np.empty(0, dtype=np.int64)
+
+    def en_rectangulo(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Índices de los puntos dentro del rectángulo (en metros)"""
+        (cx0, cy0), (cx1, cy1) = self._celdas(np.array([[x0, y0], [x1, y1]]))
+        candidatos = self._en_bloque(int(cx0), int(cy0), int(cx1), int(cy1))
+        xy = self.puntos[candidatos, :2]
+        dentro = (xy[:, 0] >= x0) & (xy[:, 0] <= x1) & (xy[:, 1] >= y0) & (xy[:, 1] <= y1)
+        return candidatos[dentro]
+
+    def cercanos(self, punto: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Los k puntos más cercanos a `punto` (x, y) -> (índices, distancias) ordenados"""
+        k = min(k, len(self.puntos))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx, cy = self._celdas(np.asarray([punto[:2]], dtype=np.float64))[0]
+        radio = 0
+        while True:
+            candidatos = self._en_bloque(cx - radio, cy - radio, cx + radio, cy + radio)
+            if len(candidatos) >= k:
+                distancias = np.hypot(*(self.puntos[candidatos, :2] - np.asarray(punto[:2])).T)
+                mejores = np.argsort(distancias, kind="stable")[:k]
+                # Exacto si el k-ésimo está dentro de la zona ya cubierta por el bloque
+                cubre_todo = radio >= max(self.dimensiones)
+                if distancias[mejores[-1]] <= radio * self.lado or cubre_todo:
+                    return candidatos[mejores], distancias[mejores]
+            radio += 1
+
+    def vecinos(self, k: int) -> np.ndarray:
+        """
+        Los k vecinos más cercanos de cada punto (sin incluirse) -> matriz n x k.
+        Se procesa por celda: todos los puntos de una celda comparten candidatos.
+        """
+        n = len(self.puntos)
+        k = min(k, n - 1)
+        resultado = np.empty((n, max(k, 0)), dtype=np.int64)
+        if k <= 0:
+            return resultado
+
+        xy = self.puntos[:, :2]
+        for clave in np.flatnonzero(np.diff(self.inicio)):
+            propios = self.orden[self.inicio[clave]:self.inicio[clave + 1]]
+            cx, cy = divmod(int(clave), int(self.dimensiones[1]))
+            radio = 1
+            while True:
+                candidatos = self._en_bloque(cx - radio, cy - radio, cx + radio, cy + radio)
+                if len(candidatos) > k:
+                    distancias = np.hypot(
+                        xy[propios, 0][:, None] - xy[candidatos, 0][None, :],
+                        xy[propios, 1][:, None] - xy[candidatos, 1][None, :],
+                    )
+                    distancias[propios[:, None] == candidatos[None, :]] = np.inf
+                    mejores = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+                    lejanos = np.take_along_axis(distancias, mejores, axis=1).max(axis=1)
+                    if np.all(lejanos <= radio * self.lado) or radio >= max(self.dimensiones):
+                        orden = np.argsort(np.take_along_axis(distancias, mejores, axis=1), axis=1)
+                        resultado[propios] = candidatos[np.take_along_axis(mejores, orden, axis=1)]
+                        break
+                radio += 1
+        return resultado